@@ -191,10 +191,31 @@ if _sched_permitido:
         verificar_estoque_critico,
         verificar_feedback_7dias,
     )
+    from utils.arquivamento import arquivar_animais_encerrados
+    from utils.cotacoes import gravar_cotacoes_diarias
+    from utils.custeio import fechar_custos_mes_anterior
+    from utils.jobs import manter_jobs
+    from utils.purga import retomar_purgas_pendentes
+    from utils.ranking_touros import atualizar_ranking_touros
+    from utils.relatorio import enviar_relatorios_mensais
+    from utils.snapshot import gravar_snapshot_diario
     scheduler.add_job(verificar_contas_vencendo,    'cron', hour=8, args=[app])
     scheduler.add_job(verificar_protocolos_vencendo,'cron', hour=8, args=[app])
     scheduler.add_job(verificar_estoque_critico,    'cron', day_of_week='mon', hour=8, args=[app])
     scheduler.add_job(verificar_feedback_7dias,     'cron', hour=9, args=[app])
+    # Snapshot do rebanho e, na sequência, os PDFs do relatório do dia (cache)
+    scheduler.add_job(gravar_snapshot_diario,       'cron', hour=2, args=[app])
+    scheduler.add_job(arquivar_animais_encerrados,  'cron', hour=3, args=[app])
+    scheduler.add_job(atualizar_ranking_touros,     'cron', hour=4, args=[app])
+    scheduler.add_job(fechar_custos_mes_anterior,   'cron', day=1, hour=5, args=[app])
+    # PDF do mês por email (opt-in); o dia 2 é repescagem de quem falhou
+    scheduler.add_job(enviar_relatorios_mensais,    'cron', day='1,2', hour=6, args=[app])
+    # Duas passadas (upsert): a segunda pega atualização tardia do feed
+    scheduler.add_job(gravar_cotacoes_diarias,      'cron', hour='10,19', args=[app])
+    # Retoma purgas de contas interrompidas por restart/deploy no meio do caminho
+    scheduler.add_job(retomar_purgas_pendentes,     'interval', minutes=15, args=[app])
+    # Jobs em segundo plano: sem heartbeat viram erro, expirados saem com o blob
+    scheduler.add_job(manter_jobs,                  'interval', minutes=5, args=[app])
 
     # Heartbeat observável: um listener cobre todos os jobs (atuais e futuros).
     # Sem isso, o scheduler parando ou duplicando é silencioso — ver #80.
@@ -23,9 +23,22 @@ db_settings = {
 
 connection_pool = None
 
+# Threads fora das requests que também pegam conexão: jobs (PDF, simulações),
+# scheduler, envio do relatório mensal.
+_FOLGA_POOL = 6
+
+
+def tamanho_pool():
+    """DB_POOL_SIZE, ou uma conexão por thread de request (WEB_THREADS) mais _FOLGA_POOL.
+
+    O pool não espera: sem conexão livre, get_db_connection falha na hora.
+    """
+    return int(os.getenv('DB_POOL_SIZE') or int(os.getenv('WEB_THREADS', 4)) + _FOLGA_POOL)
+
+
 try:
     connection_pool = mysql.connector.pooling.MySQLConnectionPool(
-        pool_name="gado_pool", pool_size=int(os.getenv('DB_POOL_SIZE', 5)), **db_settings
+        pool_name="gado_pool", pool_size=tamanho_pool(), **db_settings
     )
     logger.info(" Modo Rápido (Pool) ativado!")
 except Error as e:
@@ -58,4 +71,36 @@ def get_db_cursor():
         conn.rollback()
         raise e
     finally:
-        close_db_connection(conn)
\ No newline at end of file
+        close_db_connection(conn)
+
+def iterar_consulta(sql, params=(), tamanho=500):
+    """Gerador das linhas de `sql`, lidas do servidor em blocos de `tamanho` (fetchmany).
+
+    Para listagens que vão direto para um stream (stream_template, PDF
+    nativo): a memória fica em um bloco, não no resultado inteiro. A conexão
+    é própria, aberta na primeira iteração fora do pool, e fecha quando o
+    gerador termina ou é fechado — o que stream_with_context faz ao fim da
+    resposta, mesmo com o cliente desconectando no meio. Um download lento
+    não segura conexão do pool; o total delas fica limitado pelas threads que
+    fazem stream (uma por request).
+    """
+    try:
+        conn = mysql.connector.connect(**db_settings)
+    except Error as e:
+        logger.error(f" ERRO CRÍTICO DE CONEXÃO: {e}")
+        raise ConnectionError("Falha na conexão com BD") from e
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        while True:
+            linhas = cursor.fetchmany(tamanho)
+            if not linhas:
+                return
+            yield from linhas
+    finally:
+        # Fechado no meio: derruba o socket sem ler o resto do resultado
+        # (close() mandaria QUIT com leitura pendente).
+        if conn.unread_result:
+            conn.shutdown()
+        else:
+            conn.close()
@@ -2,6 +2,10 @@ import os
 
 bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
 workers = 3
+# gthread: o acompanhamento de jobs por SSE/long polling (/api/v1/jobs/...)
+# segura a conexão por até um minuto — com um só thread por worker, três
+# downloads de PDF em andamento travariam o site inteiro.
+threads = int(os.getenv('WEB_THREADS', 4))
 timeout = 60
 preload_app = True
 
@@ -18,7 +22,7 @@ def post_fork(server, worker):
         import mysql.connector.pooling
         db_config.connection_pool = mysql.connector.pooling.MySQLConnectionPool(
             pool_name="gado_pool",
-            pool_size=5,
+            pool_size=db_config.tamanho_pool(),
             host=os.getenv('DB_HOST'),
             user=os.getenv('DB_USER'),
             password=os.getenv('DB_PASSWORD'),
@@ -30,10 +30,12 @@ def _connect(retries=5, delay=3):
 def criar_schema(cursor):
     """Cria/atualiza tabelas, colunas, índices e views no banco selecionado por `cursor`.
 
-    Idempotente (IF NOT EXISTS / try-except em ALTERs) — pode ser chamada tanto
-    contra um banco de produção já populado (python init_db.py) quanto contra um
-    banco de teste recém-criado (conftest.py:db_setup), sempre convergindo para
-    o mesmo schema. Não faz commit — quem chama controla a transação.
+    Idempotente (IF NOT EXISTS / try-except em ALTERs) — converge tanto num
+    banco de produção já populado quanto num banco recém-criado. Não faz
+    commit — quem chama controla a transação.
+
+    Congelada como baseline: roda uma única vez, via migrations/v0001_baseline.py.
+    Mudanças de schema novas entram em migrations/vNNNN_*.py, não aqui.
     """
     # ==============================================================================
     # ETAPA 1: TABELAS FUNDAMENTAIS (Ordem de Dependência: Usuários -> Outros)
@@ -415,6 +417,106 @@ def criar_schema(cursor):
       AND r.data_parto_prevista IS NOT NULL;
     """)
 
+    # ==============================================================================
+    # ETAPA 1.10: ARQUIVO (HOT/COLD) — animais encerrados e seu histórico
+    # ==============================================================================
+    # Animais vendidos há muito tempo ou esquecidos na lixeira saem das tabelas
+    # quentes (ver repositories/arquivo_repository.py). Mesmas colunas, mesmo id:
+    # sem AUTO_INCREMENT nem FKs para animais, já que o id original é preservado
+    # e a linha pode voltar para a tabela quente ao restaurar.
+    print(" Criando tabelas de arquivo (animais, pesagens, medicações)...")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS animais_arquivo (
+        id INT PRIMARY KEY,
+        brinco VARCHAR(50) NOT NULL,
+        sexo CHAR(1) NOT NULL,
+        raca VARCHAR(100) NULL,
+        data_compra DATE NULL,
+        preco_compra DECIMAL(10, 2),
+        data_venda DATE,
+        preco_venda DECIMAL(10, 2),
+        user_id INT NOT NULL,
+        deleted_at DATETIME NULL DEFAULT NULL,
+        lote_id INT NULL,
+        pai_id INT NULL,
+        mae_id INT NULL,
+        data_nascimento DATE NULL,
+        arquivado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_animais_arq_user (user_id, data_venda),
+        KEY idx_animais_arq_lote (lote_id),
+        KEY idx_animais_arq_pai (pai_id),
+        KEY idx_animais_arq_mae (mae_id),
+        FOREIGN KEY (user_id) REFERENCES usuarios(id)
+    );
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS pesagens_arquivo (
+        id INT PRIMARY KEY,
+        animal_id INT NOT NULL,
+        data_pesagem DATE NOT NULL,
+        peso DECIMAL(10, 2) NOT NULL,
+        deleted_at DATETIME NULL DEFAULT NULL,
+        arquivado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_pesagens_arq_animal (animal_id, data_pesagem)
+    );
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS medicacoes_arquivo (
+        id INT PRIMARY KEY,
+        animal_id INT NOT NULL,
+        data_aplicacao DATE NOT NULL,
+        nome_medicamento VARCHAR(100) NOT NULL,
+        custo DECIMAL(10, 2),
+        observacoes TEXT,
+        deleted_at DATETIME NULL DEFAULT NULL,
+        arquivado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_med_arq_animal (animal_id, data_aplicacao)
+    );
+    """)
+
+    # Vínculos com ocupações já encerradas — sem isso o DELETE do animal
+    # cascatearia em ocupacao_animais e o histórico do módulo se perderia.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ocupacao_animais_arquivo (
+        id INT PRIMARY KEY,
+        ocupacao_id INT NOT NULL,
+        animal_id INT NOT NULL,
+        arquivado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_oa_arq_animal (animal_id),
+        KEY idx_oa_arq_ocupacao (ocupacao_id)
+    );
+    """)
+
+    # Leitura transparente quente + frio para relatórios históricos (progênie,
+    # P&L de lote). As telas do rebanho ativo continuam lendo só as tabelas quentes.
+    print(" Criando Views de histórico (quente + arquivo)...")
+    cursor.execute("""
+    CREATE OR REPLACE VIEW vw_animais_historico AS
+    SELECT id, brinco, sexo, raca, data_compra, preco_compra, data_venda, preco_venda,
+           user_id, deleted_at, lote_id, pai_id, mae_id, data_nascimento, 0 AS arquivado
+    FROM animais
+    UNION ALL
+    SELECT id, brinco, sexo, raca, data_compra, preco_compra, data_venda, preco_venda,
+           user_id, deleted_at, lote_id, pai_id, mae_id, data_nascimento, 1 AS arquivado
+    FROM animais_arquivo;
+    """)
+
+    cursor.execute("""
+    CREATE OR REPLACE VIEW vw_pesagens_historico AS
+    SELECT id, animal_id, data_pesagem, peso, deleted_at FROM pesagens
+    UNION ALL
+    SELECT id, animal_id, data_pesagem, peso, deleted_at FROM pesagens_arquivo;
+    """)
+
+    cursor.execute("""
+    CREATE OR REPLACE VIEW vw_medicacoes_historico AS
+    SELECT id, animal_id, data_aplicacao, nome_medicamento, custo, observacoes, deleted_at FROM medicacoes
+    UNION ALL
+    SELECT id, animal_id, data_aplicacao, nome_medicamento, custo, observacoes, deleted_at FROM medicacoes_arquivo;
+    """)
+
     # ==============================================================================
     # ETAPA 2: INTELIGÊNCIA DE DADOS
     # ==============================================================================
@@ -657,6 +759,32 @@ def criar_schema(cursor):
         else:
             print(f"   Alerta created_at: {err}")
 
+    # Conta apagada: desativada na hora, dados removidos depois em lotes (ver utils/purga.py)
+    print(" Adicionando coluna desativado_em em 'usuarios'...")
+    try:
+        cursor.execute("ALTER TABLE usuarios ADD COLUMN desativado_em DATETIME NULL DEFAULT NULL")
+        print("   -> Coluna 'desativado_em' adicionada.")
+    except mysql.connector.Error as err:
+        if err.errno == 1060:
+            print("   -> Coluna 'desativado_em' já existe.")
+        else:
+            print(f"   Alerta desativado_em: {err}")
+
+    # Progresso da purga por tenant. Sem FK: a linha sobrevive ao DELETE em usuarios
+    # e serve de registro de que a conta foi removida por completo.
+    print(" Criando tabela 'purga_tenant'...")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS purga_tenant (
+        user_id INT PRIMARY KEY,
+        solicitada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        etapa INT NOT NULL DEFAULT 0,
+        linhas_apagadas BIGINT NOT NULL DEFAULT 0,
+        atualizada_em DATETIME NULL DEFAULT NULL,
+        concluida_em DATETIME NULL DEFAULT NULL,
+        KEY idx_purga_pendente (concluida_em)
+    );
+    """)
+
     print(" Criando tabela 'password_reset_tokens'...")
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS password_reset_tokens (
@@ -691,6 +819,16 @@ def criar_schema(cursor):
         SELECT a.user_id, YEAR(m.data_aplicacao) as ano, 0, 0, m.custo, 0
         FROM medicacoes m JOIN animais a ON m.animal_id = a.id WHERE m.deleted_at IS NULL AND a.deleted_at IS NULL
         UNION ALL
+        -- Animais arquivados continuam compondo o histórico financeiro
+        SELECT user_id, YEAR(data_venda) as ano, preco_venda, 0, 0, 0
+        FROM animais_arquivo WHERE data_venda IS NOT NULL AND deleted_at IS NULL
+        UNION ALL
+        SELECT user_id, YEAR(data_compra) as ano, 0, preco_compra, 0, 0
+        FROM animais_arquivo WHERE deleted_at IS NULL AND data_compra IS NOT NULL
+        UNION ALL
+        SELECT a.user_id, YEAR(m.data_aplicacao) as ano, 0, 0, m.custo, 0
+        FROM medicacoes_arquivo m JOIN animais_arquivo a ON m.animal_id = a.id WHERE m.deleted_at IS NULL AND a.deleted_at IS NULL
+        UNION ALL
         SELECT user_id, YEAR(data_custo) as ano, 0, 0, 0, valor
         FROM custos_operacionais WHERE deleted_at IS NULL
     ) as uniao_geral
@@ -738,10 +876,10 @@ def criar_schema(cursor):
           - COALESCE(SUM(a.preco_compra), 0)
           - COALESCE(SUM(med.custo_med), 0)                           AS margem_bruta
     FROM lotes l
-    JOIN animais a ON a.lote_id = l.id AND a.deleted_at IS NULL
+    JOIN vw_animais_historico a ON a.lote_id = l.id AND a.deleted_at IS NULL
     LEFT JOIN (
         SELECT animal_id, SUM(custo) AS custo_med
-        FROM medicacoes
+        FROM vw_medicacoes_historico
         WHERE deleted_at IS NULL
         GROUP BY animal_id
     ) med ON med.animal_id = a.id
@@ -751,18 +889,20 @@ def criar_schema(cursor):
 
 
 def main():
-    print("\n---  INICIANDO SETUP COMPLETO DO BANCO DE DADOS ---")
+    """Aplica as migrações pendentes (migrations/). `--dry-run` só lista o que rodaria."""
+    from migrations import aplicar_pendentes
+
+    dry_run = '--dry-run' in sys.argv
+    print("\n---  MIGRAÇÕES DO BANCO DE DADOS ---")
     try:
         conn = _connect()
-        cursor = conn.cursor()
         print(" Conexão estabelecida.")
 
-        criar_schema(cursor)
+        aplicar_pendentes(conn, dry_run=dry_run)
 
         conn.commit()
-        cursor.close()
         conn.close()
-        print("\n [6/6] SUCESSO! ")
+        print("\n SUCESSO! ")
     except Exception as e:
         print(f"\n ERRO FATAL: {e}")
         sys.exit(1)
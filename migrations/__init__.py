@@ -0,0 +1,146 @@
+"""Migrações de schema versionadas.
+
+Cada arquivo `vNNNN_descricao.py` deste pacote é uma migração: define
+`DESCRICAO` e `aplicar(ddl)`. `aplicar_pendentes` roda, em ordem, só as
+versões ainda ausentes de `schema_migrations` — o deploy deixa de reemitir
+todo o DDL do schema a cada execução.
+
+A v0001 é o baseline: chama init_db.criar_schema uma única vez (idempotente,
+então converge tanto em banco novo quanto no de produção já populado). Toda
+mudança posterior entra numa migração nova, nunca em criar_schema.
+
+Índices e colunas usam DDL online (ALGORITHM=INPLACE, LOCK=NONE) e checam
+information_schema antes — sem ALTERs falhando com errno 1060/1061 e sem
+metadata lock longo nas tabelas quentes.
+"""
+import importlib
+import pkgutil
+import re
+import time
+
+_NOME_MIGRACAO = re.compile(r"^v(\d{4})_\w+$")
+_LOCK = "schema_migrations"
+
+
+class Ddl:
+    """Executor de DDL entregue a cada migração. Em dry-run só imprime o que faria.
+
+    As checagens em information_schema rodam mesmo em dry-run (são leituras),
+    então a listagem reflete exatamente o que seria executado.
+    """
+
+    def __init__(self, cursor, dry_run=False, saida=print):
+        self.cursor = cursor
+        self.dry_run = dry_run
+        self.saida = saida
+
+    def executar(self, sql, params=None):
+        if self.dry_run:
+            self.saida("   [dry-run] " + " ".join(sql.split()))
+            return
+        self.cursor.execute(sql, params)
+
+    def coluna_existe(self, tabela, coluna):
+        self.cursor.execute(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+            (tabela, coluna)
+        )
+        return self.cursor.fetchone() is not None
+
+    def indice_existe(self, tabela, indice):
+        self.cursor.execute(
+            "SELECT 1 FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+            (tabela, indice)
+        )
+        return self.cursor.fetchone() is not None
+
+    def adicionar_coluna(self, tabela, coluna, definicao):
+        """Coluna nova (nullable ou com DEFAULT) sem bloquear leituras/escritas."""
+        if self.coluna_existe(tabela, coluna):
+            self.saida(f"   -> Coluna '{tabela}.{coluna}' já existe.")
+            return
+        self.executar(
+            f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}, ALGORITHM=INPLACE, LOCK=NONE"
+        )
+
+    def criar_indice(self, tabela, indice, colunas, unico=False):
+        if self.indice_existe(tabela, indice):
+            self.saida(f"   -> Índice '{indice}' já existe.")
+            return
+        tipo = "UNIQUE INDEX" if unico else "INDEX"
+        self.executar(
+            f"ALTER TABLE {tabela} ADD {tipo} {indice} ({colunas}), ALGORITHM=INPLACE, LOCK=NONE"
+        )
+
+
+def _garantir_tabela_controle(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        versao INT PRIMARY KEY,
+        descricao VARCHAR(255) NOT NULL,
+        duracao_ms INT NOT NULL,
+        aplicada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+
+def descobrir():
+    """[(versao, modulo)] de todas as migrações do pacote, em ordem de versão."""
+    migracoes = []
+    for info in pkgutil.iter_modules(__path__):
+        m = _NOME_MIGRACAO.match(info.name)
+        if m:
+            migracoes.append((int(m.group(1)), importlib.import_module(f"{__name__}.{info.name}")))
+    migracoes.sort(key=lambda par: par[0])
+    versoes = [v for v, _ in migracoes]
+    if len(versoes) != len(set(versoes)):
+        raise RuntimeError(f"Versões de migração duplicadas: {versoes}")
+    return migracoes
+
+
+def versoes_aplicadas(cursor):
+    cursor.execute("SELECT versao FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def aplicar_pendentes(conn, dry_run=False, saida=print):
+    """Aplica as migrações pendentes em ordem. Retorna as versões aplicadas (ou que seriam).
+
+    Cada migração é registrada com sua duração logo após rodar, com commit
+    próprio — se a versão N falhar, as anteriores continuam registradas e o
+    próximo deploy recomeça em N. GET_LOCK impede dois deploys simultâneos
+    aplicando a mesma versão.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 60)", (_LOCK,))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Outra execução de migrações está em andamento.")
+        try:
+            _garantir_tabela_controle(cursor)
+            aplicadas = versoes_aplicadas(cursor)
+            pendentes = [(v, mod) for v, mod in descobrir() if v not in aplicadas]
+            if not pendentes:
+                saida(" Schema em dia — nenhuma migração pendente.")
+            ddl = Ddl(cursor, dry_run=dry_run, saida=saida)
+            for versao, mod in pendentes:
+                saida(f" Migração v{versao:04d}: {mod.DESCRICAO}" + (" (dry-run)" if dry_run else ""))
+                inicio = time.perf_counter()
+                mod.aplicar(ddl)
+                duracao_ms = int((time.perf_counter() - inicio) * 1000)
+                if dry_run:
+                    continue
+                cursor.execute(
+                    "INSERT INTO schema_migrations (versao, descricao, duracao_ms) VALUES (%s, %s, %s)",
+                    (versao, mod.DESCRICAO, duracao_ms)
+                )
+                conn.commit()
+                saida(f"   -> v{versao:04d} aplicada em {duracao_ms} ms.")
+            return [v for v, _ in pendentes]
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (_LOCK,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
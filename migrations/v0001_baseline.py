@@ -0,0 +1,14 @@
+"""Baseline: o schema inteiro de init_db.criar_schema, aplicado uma única vez.
+
+Em banco de produção já existente é no-op (DDL idempotente) e só marca a
+versão 1 como aplicada.
+"""
+DESCRICAO = "Schema base (init_db.criar_schema)"
+
+
+def aplicar(ddl):
+    if ddl.dry_run:
+        ddl.saida("   [dry-run] init_db.criar_schema()")
+        return
+    from init_db import criar_schema
+    criar_schema(ddl.cursor)
@@ -0,0 +1,60 @@
+"""Estado de ocupação por módulo, mantido pelas escritas em vez de views globais.
+
+vw_ocupacao_atual (GROUP BY sobre as ocupações abertas de todos os tenants)
+e vw_dias_descanso (NOT IN sobre todas as ocupações) eram materializadas a
+cada request — o MySQL não empurra user_id para dentro de view agrupada.
+modulo_estado guarda o resultado por módulo; pasto_repository o atualiza em
+insert_modulo, iniciar_ocupacao e encerrar_ocupacao.
+"""
+DESCRICAO = "Tabela modulo_estado (substitui vw_ocupacao_atual / vw_dias_descanso)"
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS modulo_estado (
+        modulo_id INT PRIMARY KEY,
+        user_id INT NOT NULL,
+        pasto_id INT NOT NULL,
+        ocupacao_id INT NULL,
+        data_entrada DATE NULL,
+        qtd_animais INT NOT NULL DEFAULT 0,
+        ua_atual DECIMAL(10, 2) NULL,
+        pct_lotacao DECIMAL(7, 1) NULL,
+        ultima_saida DATE NULL,
+        atualizado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_modulo_estado_pasto (user_id, pasto_id),
+        FOREIGN KEY (modulo_id) REFERENCES modulos(id) ON DELETE CASCADE
+    );
+    """)
+
+    # Backfill único, mesma regra de pasto_repository._ESTADO_MODULO_SQL
+    ddl.executar("""
+    INSERT INTO modulo_estado
+        (modulo_id, user_id, pasto_id, ocupacao_id, data_entrada,
+         qtd_animais, ua_atual, pct_lotacao, ultima_saida)
+    SELECT m.id, m.user_id, m.pasto_id, ab.ocupacao_id, ab.data_entrada,
+        COALESCE(ab.qtd, 0),
+        ab.qtd,
+        ROUND(ab.qtd / NULLIF(m.capacidade_ua, 0) * 100, 1),
+        us.ultima_saida
+    FROM modulos m
+    LEFT JOIN (
+        SELECT o.modulo_id, o.id AS ocupacao_id, o.data_entrada, COUNT(oa.animal_id) AS qtd
+        FROM ocupacoes o
+        LEFT JOIN ocupacao_animais oa ON oa.ocupacao_id = o.id
+        WHERE o.data_saida IS NULL
+        GROUP BY o.modulo_id, o.id, o.data_entrada
+    ) ab ON ab.modulo_id = m.id
+    LEFT JOIN (
+        SELECT modulo_id, MAX(data_saida) AS ultima_saida
+        FROM ocupacoes WHERE data_saida IS NOT NULL
+        GROUP BY modulo_id
+    ) us ON us.modulo_id = m.id
+    ON DUPLICATE KEY UPDATE
+        ocupacao_id = VALUES(ocupacao_id), data_entrada = VALUES(data_entrada),
+        qtd_animais = VALUES(qtd_animais), ua_atual = VALUES(ua_atual),
+        pct_lotacao = VALUES(pct_lotacao), ultima_saida = VALUES(ultima_saida)
+    """)
+
+    ddl.executar("DROP VIEW IF EXISTS vw_ocupacao_atual")
+    ddl.executar("DROP VIEW IF EXISTS vw_dias_descanso")
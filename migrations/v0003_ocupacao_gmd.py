@@ -0,0 +1,108 @@
+"""GMD por janela de ocupação, persistido em vez de recalculado por view.
+
+vw_gmd_por_modulo atribuía o GMD da vida inteira do animal a todo módulo em
+que ele já esteve, rodando window functions sobre as pesagens de todos os
+tenants a cada /pastos/gmd. ocupacao_gmd guarda o ganho dentro de
+[data_entrada, data_saida] de cada ocupação (parcial enquanto aberta);
+modulo_estado.gmd_medio agrega as ocupações do módulo.
+
+O backfill traz sua própria SQL (a de pasto_repository nesta versão do
+schema); do app só usa o cálculo puro de utils.calculo.
+"""
+from datetime import date
+
+from utils.calculo import ganho_na_janela
+
+DESCRICAO = "Tabela ocupacao_gmd e GMD por módulo em modulo_estado (substitui vw_gmd_por_modulo)"
+
+# Pesagens de cada animal da ocupação, quentes e arquivadas (ordem animal, data).
+_PESAGENS_OCUPACAO_SQL = (
+    "SELECT oa.animal_id, p.data_pesagem, p.peso "
+    "FROM ocupacao_animais oa "
+    "LEFT JOIN pesagens p ON p.animal_id = oa.animal_id AND p.deleted_at IS NULL "
+    "WHERE oa.ocupacao_id = %s "
+    "UNION ALL "
+    "SELECT oa.animal_id, p.data_pesagem, p.peso "
+    "FROM ocupacao_animais_arquivo oa "
+    "LEFT JOIN pesagens_arquivo p ON p.animal_id = oa.animal_id AND p.deleted_at IS NULL "
+    "WHERE oa.ocupacao_id = %s "
+    "ORDER BY 1, 2"
+)
+
+_GMD_MODULO_SQL = (
+    "UPDATE modulo_estado SET "
+    "    gmd_medio = (SELECT ROUND(SUM(ganho_kg) / NULLIF(SUM(animal_dias), 0), 3) "
+    "                 FROM ocupacao_gmd WHERE modulo_id = %s), "
+    "    qtd_animais_historico = (SELECT COUNT(DISTINCT x.animal_id) FROM ("
+    "        SELECT oa.animal_id FROM ocupacoes o "
+    "        JOIN ocupacao_animais oa ON oa.ocupacao_id = o.id WHERE o.modulo_id = %s "
+    "        UNION ALL "
+    "        SELECT oa.animal_id FROM ocupacoes o "
+    "        JOIN ocupacao_animais_arquivo oa ON oa.ocupacao_id = o.id WHERE o.modulo_id = %s"
+    "    ) x) "
+    "WHERE modulo_id = %s"
+)
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS ocupacao_gmd (
+        ocupacao_id INT PRIMARY KEY,
+        modulo_id INT NOT NULL,
+        user_id INT NOT NULL,
+        qtd_animais INT NOT NULL DEFAULT 0,
+        animais_com_gmd INT NOT NULL DEFAULT 0,
+        ganho_kg DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        animal_dias INT NOT NULL DEFAULT 0,
+        gmd_medio DECIMAL(7, 3) NULL,
+        parcial TINYINT(1) NOT NULL DEFAULT 1,
+        calculado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_ocupacao_gmd_modulo (modulo_id),
+        FOREIGN KEY (ocupacao_id) REFERENCES ocupacoes(id) ON DELETE CASCADE
+    );
+    """)
+    ddl.adicionar_coluna("modulo_estado", "gmd_medio", "DECIMAL(7, 3) NULL")
+    ddl.adicionar_coluna("modulo_estado", "qtd_animais_historico", "INT NOT NULL DEFAULT 0")
+
+    if ddl.dry_run:
+        ddl.saida("   [dry-run] ocupacao_gmd de todas as ocupações e GMD por módulo")
+    else:
+        cursor = ddl.cursor
+        cursor.execute("SELECT id, modulo_id, user_id, data_entrada, data_saida FROM ocupacoes ORDER BY id")
+        modulos = set()
+        for ocupacao in cursor.fetchall():
+            _gravar_gmd_ocupacao(cursor, *ocupacao)
+            modulos.add(ocupacao[1])
+        for modulo_id in sorted(modulos):
+            cursor.execute(_GMD_MODULO_SQL, (modulo_id,) * 4)
+
+    ddl.executar("DROP VIEW IF EXISTS vw_gmd_por_modulo")
+
+
+def _gravar_gmd_ocupacao(cursor, ocupacao_id, modulo_id, user_id, data_entrada, data_saida):
+    """Ganho dentro da janela (pasto_repository._recalcular_gmd_ocupacao nesta versão)."""
+    cursor.execute(_PESAGENS_OCUPACAO_SQL, (ocupacao_id, ocupacao_id))
+    pesagens_por_animal = {}
+    for animal_id, data_pesagem, peso in cursor.fetchall():
+        serie = pesagens_por_animal.setdefault(animal_id, [])
+        if data_pesagem is not None:
+            serie.append((data_pesagem, peso))
+
+    fim = data_saida or date.today()
+    ganhos = [g for g in (ganho_na_janela(serie, data_entrada, fim)
+                          for serie in pesagens_por_animal.values()) if g]
+    ganho_kg = sum(g for g, _ in ganhos)
+    animal_dias = sum(d for _, d in ganhos)
+    cursor.execute(
+        "INSERT INTO ocupacao_gmd "
+        "    (ocupacao_id, modulo_id, user_id, qtd_animais, animais_com_gmd, "
+        "     ganho_kg, animal_dias, gmd_medio, parcial) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE "
+        "    qtd_animais = VALUES(qtd_animais), animais_com_gmd = VALUES(animais_com_gmd), "
+        "    ganho_kg = VALUES(ganho_kg), animal_dias = VALUES(animal_dias), "
+        "    gmd_medio = VALUES(gmd_medio), parcial = VALUES(parcial)",
+        (ocupacao_id, modulo_id, user_id, len(pesagens_por_animal), len(ganhos),
+         round(ganho_kg, 2), animal_dias,
+         round(ganho_kg / animal_dias, 3) if animal_dias else None, data_saida is None)
+    )
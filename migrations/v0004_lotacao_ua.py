@@ -0,0 +1,82 @@
+"""Lotação em UA pelo peso vivo, com a última pesagem de cada animal em cache.
+
+modulo_estado.ua_atual era a contagem de cabeças. Passa a ser
+SUM(último peso) / 450 kg, lido de animal_pesagem_resumo — mantida pelo hook
+de pesagem em animal_repository — para que a lotação nunca varra `pesagens`.
+Animal sem pesagem conta 1 UA. ua_por_ha e superlotado ficam gravados junto.
+"""
+DESCRICAO = "Tabela animal_pesagem_resumo e lotação por peso (UA, UA/ha) em modulo_estado"
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS animal_pesagem_resumo (
+        animal_id INT PRIMARY KEY,
+        user_id INT NOT NULL,
+        primeira_data DATE NOT NULL,
+        primeiro_peso DECIMAL(10, 2) NOT NULL,
+        ultima_data DATE NOT NULL,
+        ultimo_peso DECIMAL(10, 2) NOT NULL,
+        qtd_pesagens INT NOT NULL,
+        atualizado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_pesagem_resumo_user (user_id),
+        FOREIGN KEY (animal_id) REFERENCES animais(id) ON DELETE CASCADE
+    );
+    """)
+    ddl.adicionar_coluna("modulo_estado", "ua_por_ha", "DECIMAL(10, 2) NULL")
+    ddl.adicionar_coluna("modulo_estado", "superlotado", "TINYINT(1) NOT NULL DEFAULT 0")
+
+    # Backfill com a regra desta versão (animal_repository._RESUMO_PESAGENS_SQL
+    # e pasto_repository._ESTADO_MODULO_SQL), aplicada a todos de uma vez.
+    ddl.executar("DELETE FROM animal_pesagem_resumo")
+    ddl.executar("""
+    INSERT INTO animal_pesagem_resumo
+        (animal_id, user_id, primeira_data, primeiro_peso, ultima_data, ultimo_peso, qtd_pesagens)
+    SELECT x.animal_id, a.user_id,
+        MAX(CASE WHEN x.rn_asc = 1 THEN x.data_pesagem END),
+        MAX(CASE WHEN x.rn_asc = 1 THEN x.peso END),
+        MAX(CASE WHEN x.rn_desc = 1 THEN x.data_pesagem END),
+        MAX(CASE WHEN x.rn_desc = 1 THEN x.peso END),
+        COUNT(*)
+    FROM (
+        SELECT p.animal_id, p.data_pesagem, p.peso,
+            ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem, p.id) AS rn_asc,
+            ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem DESC, p.id DESC) AS rn_desc
+        FROM pesagens p WHERE p.deleted_at IS NULL
+    ) x
+    JOIN animais a ON a.id = x.animal_id
+    GROUP BY x.animal_id, a.user_id
+    """)
+
+    ddl.executar("""
+    INSERT INTO modulo_estado
+        (modulo_id, user_id, pasto_id, ocupacao_id, data_entrada,
+         qtd_animais, ua_atual, pct_lotacao, ua_por_ha, superlotado, ultima_saida)
+    SELECT m.id, m.user_id, m.pasto_id, ab.ocupacao_id, ab.data_entrada,
+        COALESCE(ab.qtd, 0), ROUND(ab.ua, 2),
+        ROUND(ab.ua / NULLIF(m.capacidade_ua, 0) * 100, 1),
+        ROUND(ab.ua / NULLIF(m.area_hectares, 0), 2),
+        COALESCE(ab.ua > m.capacidade_ua, 0),
+        us.ultima_saida
+    FROM modulos m
+    LEFT JOIN (
+        SELECT o.modulo_id, o.id AS ocupacao_id, o.data_entrada, COUNT(oa.animal_id) AS qtd,
+            COALESCE(SUM(CASE WHEN oa.animal_id IS NOT NULL
+                              THEN COALESCE(r.ultimo_peso, 450) END), 0) / 450 AS ua
+        FROM ocupacoes o
+        LEFT JOIN ocupacao_animais oa ON oa.ocupacao_id = o.id
+        LEFT JOIN animal_pesagem_resumo r ON r.animal_id = oa.animal_id
+        WHERE o.data_saida IS NULL
+        GROUP BY o.modulo_id, o.id, o.data_entrada
+    ) ab ON ab.modulo_id = m.id
+    LEFT JOIN (
+        SELECT modulo_id, MAX(data_saida) AS ultima_saida
+        FROM ocupacoes WHERE data_saida IS NOT NULL
+        GROUP BY modulo_id
+    ) us ON us.modulo_id = m.id
+    ON DUPLICATE KEY UPDATE
+        ocupacao_id = VALUES(ocupacao_id), data_entrada = VALUES(data_entrada),
+        qtd_animais = VALUES(qtd_animais), ua_atual = VALUES(ua_atual),
+        pct_lotacao = VALUES(pct_lotacao), ua_por_ha = VALUES(ua_por_ha),
+        superlotado = VALUES(superlotado), ultima_saida = VALUES(ultima_saida)
+    """)
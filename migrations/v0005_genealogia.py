@@ -0,0 +1,61 @@
+"""Tabela de fechamento (closure) da genealogia.
+
+animais.pai_id/mae_id só respondem uma geração, e a progênie usava
+`pai_id = X OR mae_id = X`, que não aproveita os dois índices. genealogia
+guarda um par (ancestral, descendente) por distância em gerações (>= 1); é
+mantida por genealogia_repository no cadastro do animal e na troca de pais.
+Sem FK para animais: a linha sobrevive ao arquivamento (ids preservados).
+O backfill abaixo é a cópia de genealogia_repository.reconstruir_genealogia
+nesta versão, lendo animais e animais_arquivo em separado.
+"""
+DESCRICAO = "Tabela genealogia (ancestral/descendente por geração) com backfill"
+
+_TABELAS = ("animais", "animais_arquivo")
+_COLUNAS = ("pai_id", "mae_id")
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS genealogia (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        ancestral_id INT NOT NULL,
+        descendente_id INT NOT NULL,
+        geracoes SMALLINT NOT NULL,
+        UNIQUE KEY uk_genealogia (descendente_id, ancestral_id, geracoes),
+        KEY idx_genealogia_ancestral (ancestral_id, geracoes),
+        KEY idx_genealogia_user (user_id)
+    );
+    """)
+
+    if ddl.dry_run:
+        ddl.saida("   [dry-run] genealogia reconstruída a partir de pai_id/mae_id")
+    else:
+        _reconstruir(ddl.cursor)
+
+
+def _reconstruir(cursor):
+    """Primeira geração direto de pai_id/mae_id; depois uma geração por passada."""
+    cursor.execute("DELETE FROM genealogia")
+    for tabela in _TABELAS:
+        for coluna in _COLUNAS:
+            cursor.execute(
+                "INSERT IGNORE INTO genealogia (user_id, ancestral_id, descendente_id, geracoes) "
+                f"SELECT user_id, {coluna}, id, 1 FROM {tabela} WHERE {coluna} IS NOT NULL"
+            )
+    geracao = 1
+    while True:
+        inseridos = 0
+        for tabela in _TABELAS:
+            for coluna in _COLUNAS:
+                cursor.execute(
+                    "INSERT IGNORE INTO genealogia (user_id, ancestral_id, descendente_id, geracoes) "
+                    "SELECT f.user_id, g.ancestral_id, f.id, g.geracoes + 1 "
+                    f"FROM genealogia g JOIN {tabela} f ON f.{coluna} = g.descendente_id "
+                    "WHERE g.geracoes = %s",
+                    (geracao,)
+                )
+                inseridos += cursor.rowcount
+        if not inseridos:
+            break
+        geracao += 1
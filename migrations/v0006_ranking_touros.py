@@ -0,0 +1,77 @@
+"""Ranking de touros calculado em lote (job noturno) em vez de CTE por request.
+
+get_ranking_touros fazia a média do GMD bruto dos filhos com window functions
+a cada acesso, misturando filhos de anos e lotes diferentes. ranking_touros
+guarda o efeito do touro ajustado por grupo contemporâneo (utils.genetica.
+avaliar_touros), com acurácia; a tela vira uma leitura indexada.
+
+A carga inicial tem a própria consulta dos filhos, como estava em
+animal_repository.recalcular_ranking_touros quando esta versão saiu; o
+modelo estatístico continua vindo de utils.genetica, que não toca no banco.
+"""
+from utils.genetica import avaliar_touros, grupo_contemporaneo
+
+DESCRICAO = "Tabela ranking_touros (efeito ajustado por grupo contemporâneo)"
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS ranking_touros (
+        user_id INT NOT NULL,
+        touro_id INT NOT NULL,
+        qtd_filhos INT NOT NULL,
+        filhos_avaliados INT NOT NULL DEFAULT 0,
+        gmd_medio_filhos DECIMAL(7, 3) NULL,
+        desvio_medio DECIMAL(7, 3) NULL,
+        efeito_touro DECIMAL(7, 3) NULL,
+        acuracia DECIMAL(4, 3) NULL,
+        calculado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, touro_id),
+        KEY idx_ranking_touros_efeito (user_id, efeito_touro),
+        FOREIGN KEY (touro_id) REFERENCES animais(id) ON DELETE CASCADE
+    );
+    """)
+
+    if ddl.dry_run:
+        ddl.saida("   [dry-run] ranking_touros calculado para todos os tenants")
+    else:
+        _calcular(ddl.cursor)
+
+
+def _calcular(cursor):
+    cursor.execute(
+        "SELECT f.user_id, f.pai_id, f.sexo, f.lote_id, "
+        "    COALESCE(f.data_nascimento, f.data_compra), "
+        "    (r.ultimo_peso - r.primeiro_peso) "
+        "        / NULLIF(DATEDIFF(r.ultima_data, r.primeira_data), 0) "
+        "FROM animais f "
+        "JOIN animais t ON t.id = f.pai_id AND t.deleted_at IS NULL "
+        "LEFT JOIN animal_pesagem_resumo r ON r.animal_id = f.id "
+        "WHERE f.pai_id IS NOT NULL AND f.deleted_at IS NULL"
+    )
+    por_touro = {}
+    com_gmd = []
+    for user_id, touro_id, sexo, lote_id, data_ref, gmd in cursor.fetchall():
+        registro = por_touro.setdefault((user_id, touro_id), [0, []])
+        registro[0] += 1
+        if gmd is not None:
+            registro[1].append(float(gmd))
+            com_gmd.append((touro_id, grupo_contemporaneo(user_id, data_ref, sexo, lote_id), float(gmd)))
+
+    avaliacao = avaliar_touros([c[0] for c in com_gmd], [c[1] for c in com_gmd], [c[2] for c in com_gmd])
+
+    linhas = []
+    for (user_id, touro_id), (qtd, gmds) in por_touro.items():
+        avaliados, desvio, efeito, acuracia = avaliacao.get(touro_id, (0, None, None, None))
+        gmd_medio = round(sum(gmds) / len(gmds), 3) if gmds else None
+        linhas.append((user_id, touro_id, qtd, avaliados, gmd_medio, desvio, efeito, acuracia))
+
+    cursor.execute("DELETE FROM ranking_touros")
+    if linhas:
+        cursor.executemany(
+            "INSERT INTO ranking_touros "
+            "    (user_id, touro_id, qtd_filhos, filhos_avaliados, gmd_medio_filhos, "
+            "     desvio_medio, efeito_touro, acuracia) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            linhas
+        )
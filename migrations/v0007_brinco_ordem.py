@@ -0,0 +1,52 @@
+"""Chave de ordenação natural do brinco, gravada e indexada.
+
+As listagens ordenavam por `LENGTH(brinco), brinco` (ou só `brinco`), o que
+nenhum índice atende: toda listagem terminava num filesort do rebanho.
+brinco_ordem = brinco com os trechos numéricos completados com zeros
+(animal_repository.chave_ordem_brinco), gravado no cadastro e na importação.
+A coluna também vai para animais_arquivo e vw_animais_historico, para que
+relatórios históricos ordenem igual.
+"""
+DESCRICAO = "Coluna brinco_ordem (ordenação natural) em animais/animais_arquivo, índice e backfill"
+
+_LOTE = 1000
+
+
+def _backfill(ddl, tabela):
+    from repositories.animal_repository import chave_ordem_brinco
+    ultimo_id = 0
+    while True:
+        ddl.cursor.execute(
+            f"SELECT id, brinco FROM {tabela} WHERE id > %s ORDER BY id LIMIT %s",
+            (ultimo_id, _LOTE)
+        )
+        linhas = ddl.cursor.fetchall()
+        if not linhas:
+            break
+        ddl.cursor.executemany(
+            f"UPDATE {tabela} SET brinco_ordem = %s WHERE id = %s",
+            [(chave_ordem_brinco(brinco), aid) for aid, brinco in linhas]
+        )
+        ultimo_id = linhas[-1][0]
+
+
+def aplicar(ddl):
+    for tabela in ("animais", "animais_arquivo"):
+        ddl.adicionar_coluna(tabela, "brinco_ordem", "VARCHAR(255) NOT NULL DEFAULT ''")
+        if ddl.dry_run:
+            ddl.saida(f"   [dry-run] backfill de {tabela}.brinco_ordem em lotes de {_LOTE}")
+        else:
+            _backfill(ddl, tabela)
+
+    ddl.criar_indice("animais", "idx_animais_brinco_ordem", "user_id, deleted_at, brinco_ordem")
+
+    ddl.executar("""
+    CREATE OR REPLACE VIEW vw_animais_historico AS
+    SELECT id, brinco, sexo, raca, data_compra, preco_compra, data_venda, preco_venda,
+           user_id, deleted_at, lote_id, pai_id, mae_id, data_nascimento, brinco_ordem, 0 AS arquivado
+    FROM animais
+    UNION ALL
+    SELECT id, brinco, sexo, raca, data_compra, preco_compra, data_venda, preco_venda,
+           user_id, deleted_at, lote_id, pai_id, mae_id, data_nascimento, brinco_ordem, 1 AS arquivado
+    FROM animais_arquivo
+    """)
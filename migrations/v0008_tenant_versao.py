@@ -0,0 +1,19 @@
+"""Versão dos dados de cada tenant, para invalidar caches em memória.
+
+O índice de busca (utils.busca) fica em memória em cada worker; para saber
+se ficou velho basta comparar a versão guardada com tenant_versao.versao,
+incrementada na mesma transação das escritas de animais, lotes, pastos e
+produtos (busca_repository.incrementar_versao). Sem linha = versão 0.
+"""
+DESCRICAO = "Tabela tenant_versao (versão dos dados por tenant)"
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS tenant_versao (
+        user_id INT PRIMARY KEY,
+        versao BIGINT NOT NULL DEFAULT 0,
+        atualizada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    );
+    """)
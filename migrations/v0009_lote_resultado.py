@@ -0,0 +1,84 @@
+"""Resultado (P&L) por lote materializado em lote_resultado.
+
+vw_resultado_lote juntava cada lote aos seus animais e a uma derivada que
+somava as medicações de TODOS os tenants por animal, a cada abertura de
+/financeiro/lotes. lote_resultado guarda os totais (e o GMD médio) por lote,
+refeitos por animal_repository.atualizar_resultado_lotes nas escritas que os
+alteram: venda, medicação, pesagem, exclusão/restauração de animal e
+cadastro do lote.
+"""
+DESCRICAO = "Tabela lote_resultado (P&L por lote) com backfill; remove vw_resultado_lote"
+
+# SQL de animal_repository.atualizar_resultado_lotes como era nesta versão do
+# schema — a do repositório evolui (a v0010 já lê custo_animal).
+_BACKFILL_SQL = (
+    "INSERT INTO lote_resultado (lote_id, user_id, total_animais, custo_aquisicao, "
+    "    receita_vendas, custo_medicacoes, animais_vendidos, margem_bruta, gmd_medio) "
+    "WITH po AS ("
+    "  SELECT p.animal_id, p.data_pesagem, p.peso,"
+    "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem ASC)  AS rn_asc,"
+    "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem DESC) AS rn_desc"
+    "  FROM vw_pesagens_historico p"
+    "  JOIN vw_animais_historico ap ON ap.id = p.animal_id AND ap.lote_id IN ({lotes})"
+    "  WHERE p.deleted_at IS NULL"
+    "),"
+    " pu AS ("
+    "  SELECT animal_id,"
+    "    MAX(CASE WHEN rn_asc  = 1 THEN data_pesagem END) AS data_ini,"
+    "    MAX(CASE WHEN rn_asc  = 1 THEN peso END)         AS peso_ini,"
+    "    MAX(CASE WHEN rn_desc = 1 THEN data_pesagem END) AS data_fim,"
+    "    MAX(CASE WHEN rn_desc = 1 THEN peso END)         AS peso_fim"
+    "  FROM po GROUP BY animal_id"
+    " )"
+    " SELECT l.id, l.user_id, COUNT(a.id), COALESCE(SUM(a.preco_compra), 0), "
+    "    COALESCE(SUM(CASE WHEN a.data_venda IS NOT NULL THEN a.preco_venda END), 0), "
+    "    COALESCE(SUM(med.custo_med), 0), "
+    "    COUNT(CASE WHEN a.data_venda IS NOT NULL THEN 1 END), "
+    "    COALESCE(SUM(CASE WHEN a.data_venda IS NOT NULL THEN a.preco_venda END), 0) "
+    "      - COALESCE(SUM(a.preco_compra), 0) - COALESCE(SUM(med.custo_med), 0), "
+    "    ROUND(AVG((pu.peso_fim - pu.peso_ini) / NULLIF(DATEDIFF(pu.data_fim, pu.data_ini), 0)), 3) "
+    " FROM lotes l "
+    " JOIN vw_animais_historico a ON a.lote_id = l.id AND a.deleted_at IS NULL "
+    " LEFT JOIN ("
+    "    SELECT m.animal_id, SUM(m.custo) AS custo_med FROM vw_medicacoes_historico m "
+    "    JOIN vw_animais_historico am ON am.id = m.animal_id AND am.lote_id IN ({lotes}) "
+    "    WHERE m.deleted_at IS NULL GROUP BY m.animal_id"
+    " ) med ON med.animal_id = a.id "
+    " LEFT JOIN pu ON pu.animal_id = a.id "
+    " WHERE l.id IN ({lotes}) "
+    " GROUP BY l.id, l.user_id"
+)
+
+_LOTES_POR_VEZ = 500
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS lote_resultado (
+        lote_id INT PRIMARY KEY,
+        user_id INT NOT NULL,
+        total_animais INT NOT NULL DEFAULT 0,
+        custo_aquisicao DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        receita_vendas DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        custo_medicacoes DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        animais_vendidos INT NOT NULL DEFAULT 0,
+        margem_bruta DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        gmd_medio DECIMAL(7, 3) NULL,
+        atualizado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_lote_resultado_user (user_id),
+        FOREIGN KEY (lote_id) REFERENCES lotes(id) ON DELETE CASCADE
+    );
+    """)
+
+    if ddl.dry_run:
+        ddl.saida("   [dry-run] backfill de lote_resultado")
+    else:
+        ddl.cursor.execute("SELECT id FROM lotes ORDER BY id")
+        ids = [row[0] for row in ddl.cursor.fetchall()]
+        for inicio in range(0, len(ids), _LOTES_POR_VEZ):
+            lote = ids[inicio:inicio + _LOTES_POR_VEZ]
+            placeholders = ','.join(['%s'] * len(lote))
+            ddl.cursor.execute(f"DELETE FROM lote_resultado WHERE lote_id IN ({placeholders})", lote)
+            ddl.cursor.execute(_BACKFILL_SQL.format(lotes=placeholders), lote * 3)
+
+    ddl.executar("DROP VIEW IF EXISTS vw_resultado_lote")
@@ -0,0 +1,178 @@
+"""Custo operacional por animal (rateio por animal-dia) e razão acumulado.
+
+detalhes somava só compra + medicações, e calcular_kpis_unificados dividia
+o custo do ano pelo rebanho de hoje. utils.custeio rateia cada mês de
+custos_operacionais entre os animais presentes, proporcional aos dias:
+
+- custo_animal_mes: parcela de cada animal em cada competência;
+- custo_animal: acumulado por animal (razão), lido por chave primária;
+- fechamento_custos: totais do mês (custo por animal-dia para os KPIs).
+
+Nenhuma das três referencia animais: o animal arquivado mantém seu custo.
+lote_resultado ganha custo_operacional e margem_liquida. O backfill fecha
+os meses anteriores ao corrente e refaz lote_resultado com as colunas novas.
+A SQL fica copiada aqui: a dos repositórios continua mudando depois desta
+versão do schema.
+"""
+from datetime import date
+
+from utils.custeio import fim_competencia, ratear
+
+DESCRICAO = "Rateio de custos operacionais por animal-dia (custo_animal) e margem líquida por lote"
+
+# SQL de animal_repository.atualizar_resultado_lotes como é nesta versão do
+# schema (a da v0009 mais custo_operacional e margem_liquida).
+_RESULTADO_LOTE_SQL = (
+    "INSERT INTO lote_resultado (lote_id, user_id, total_animais, custo_aquisicao, "
+    "    receita_vendas, custo_medicacoes, animais_vendidos, margem_bruta, gmd_medio, "
+    "    custo_operacional, margem_liquida) "
+    "WITH po AS ("
+    "  SELECT p.animal_id, p.data_pesagem, p.peso,"
+    "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem ASC)  AS rn_asc,"
+    "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem DESC) AS rn_desc"
+    "  FROM vw_pesagens_historico p"
+    "  JOIN vw_animais_historico ap ON ap.id = p.animal_id AND ap.lote_id IN ({lotes})"
+    "  WHERE p.deleted_at IS NULL"
+    "),"
+    " pu AS ("
+    "  SELECT animal_id,"
+    "    MAX(CASE WHEN rn_asc  = 1 THEN data_pesagem END) AS data_ini,"
+    "    MAX(CASE WHEN rn_asc  = 1 THEN peso END)         AS peso_ini,"
+    "    MAX(CASE WHEN rn_desc = 1 THEN data_pesagem END) AS data_fim,"
+    "    MAX(CASE WHEN rn_desc = 1 THEN peso END)         AS peso_fim"
+    "  FROM po GROUP BY animal_id"
+    " )"
+    " SELECT l.id, l.user_id, COUNT(a.id), COALESCE(SUM(a.preco_compra), 0), "
+    "    COALESCE(SUM(CASE WHEN a.data_venda IS NOT NULL THEN a.preco_venda END), 0), "
+    "    COALESCE(SUM(med.custo_med), 0), "
+    "    COUNT(CASE WHEN a.data_venda IS NOT NULL THEN 1 END), "
+    "    COALESCE(SUM(CASE WHEN a.data_venda IS NOT NULL THEN a.preco_venda END), 0) "
+    "      - COALESCE(SUM(a.preco_compra), 0) - COALESCE(SUM(med.custo_med), 0), "
+    "    ROUND(AVG((pu.peso_fim - pu.peso_ini) / NULLIF(DATEDIFF(pu.data_fim, pu.data_ini), 0)), 3), "
+    "    COALESCE(SUM(ca.custo_operacional), 0), "
+    "    COALESCE(SUM(CASE WHEN a.data_venda IS NOT NULL THEN a.preco_venda END), 0) "
+    "      - COALESCE(SUM(a.preco_compra), 0) - COALESCE(SUM(med.custo_med), 0) "
+    "      - COALESCE(SUM(ca.custo_operacional), 0) "
+    " FROM lotes l "
+    " JOIN vw_animais_historico a ON a.lote_id = l.id AND a.deleted_at IS NULL "
+    " LEFT JOIN ("
+    "    SELECT m.animal_id, SUM(m.custo) AS custo_med FROM vw_medicacoes_historico m "
+    "    JOIN vw_animais_historico am ON am.id = m.animal_id AND am.lote_id IN ({lotes}) "
+    "    WHERE m.deleted_at IS NULL GROUP BY m.animal_id"
+    " ) med ON med.animal_id = a.id "
+    " LEFT JOIN pu ON pu.animal_id = a.id "
+    " LEFT JOIN custo_animal ca ON ca.animal_id = a.id "
+    " WHERE l.id IN ({lotes}) "
+    " GROUP BY l.id, l.user_id"
+)
+
+_LOTES_POR_VEZ = 500
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS custo_animal_mes (
+        animal_id INT NOT NULL,
+        competencia DATE NOT NULL,
+        user_id INT NOT NULL,
+        valor DECIMAL(14, 2) NOT NULL,
+        dias SMALLINT NOT NULL,
+        PRIMARY KEY (animal_id, competencia),
+        KEY idx_custo_animal_mes_user (user_id, competencia),
+        FOREIGN KEY (user_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    );
+    """)
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS custo_animal (
+        animal_id INT PRIMARY KEY,
+        user_id INT NOT NULL,
+        custo_operacional DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        dias INT NOT NULL DEFAULT 0,
+        atualizado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_custo_animal_user (user_id),
+        FOREIGN KEY (user_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    );
+    """)
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS fechamento_custos (
+        user_id INT NOT NULL,
+        competencia DATE NOT NULL,
+        total_custos DECIMAL(14, 2) NOT NULL,
+        total_alocado DECIMAL(14, 2) NOT NULL,
+        animal_dias INT NOT NULL,
+        fechado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, competencia),
+        FOREIGN KEY (user_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    );
+    """)
+    ddl.adicionar_coluna("lote_resultado", "custo_operacional", "DECIMAL(14, 2) NOT NULL DEFAULT 0")
+    ddl.adicionar_coluna("lote_resultado", "margem_liquida", "DECIMAL(14, 2) NOT NULL DEFAULT 0")
+
+    if ddl.dry_run:
+        ddl.saida("   [dry-run] fechamento de custos por fazenda e mês anterior ao corrente")
+        ddl.saida("   [dry-run] custo_animal e lote_resultado refeitos")
+        return
+
+    cursor = ddl.cursor
+    cursor.execute(
+        "SELECT DISTINCT user_id, DATE_FORMAT(data_custo, '%%Y-%%m-01') FROM custos_operacionais "
+        "WHERE deleted_at IS NULL AND data_custo < %s ORDER BY 1, 2",
+        (date.today().replace(day=1),)
+    )
+    for user_id, competencia in cursor.fetchall():
+        _fechar(cursor, user_id, date.fromisoformat(competencia))
+
+    cursor.execute("DELETE FROM custo_animal")
+    cursor.execute(
+        "INSERT INTO custo_animal (animal_id, user_id, custo_operacional, dias) "
+        "SELECT animal_id, user_id, SUM(valor), SUM(dias) FROM custo_animal_mes "
+        "GROUP BY animal_id, user_id"
+    )
+
+    cursor.execute("SELECT id FROM lotes ORDER BY id")
+    ids = [row[0] for row in cursor.fetchall()]
+    for inicio in range(0, len(ids), _LOTES_POR_VEZ):
+        lote = ids[inicio:inicio + _LOTES_POR_VEZ]
+        placeholders = ','.join(['%s'] * len(lote))
+        cursor.execute(f"DELETE FROM lote_resultado WHERE lote_id IN ({placeholders})", lote)
+        cursor.execute(_RESULTADO_LOTE_SQL.format(lotes=placeholders), lote * 3)
+
+
+def _fechar(cursor, user_id, competencia):
+    """Fechamento de uma competência (financeiro_repository.fechar_competencia nesta versão)."""
+    fim = fim_competencia(competencia)
+    cursor.execute(
+        "SELECT COALESCE(SUM(valor), 0) FROM custos_operacionais "
+        "WHERE user_id = %s AND data_custo BETWEEN %s AND %s AND deleted_at IS NULL",
+        (user_id, competencia, fim)
+    )
+    total = float(cursor.fetchone()[0])
+    cursor.execute(
+        "SELECT id, COALESCE(data_compra, data_nascimento), data_venda FROM vw_animais_historico "
+        "WHERE user_id = %s AND deleted_at IS NULL "
+        "  AND COALESCE(data_compra, data_nascimento) <= %s "
+        "  AND (data_venda IS NULL OR data_venda > %s)",
+        (user_id, fim, competencia)
+    )
+    animais = cursor.fetchall()
+    dias, valores = ratear([a[1] for a in animais], [a[2] for a in animais],
+                           competencia, fim, total)
+    cursor.execute(
+        "DELETE FROM custo_animal_mes WHERE user_id = %s AND competencia = %s",
+        (user_id, competencia)
+    )
+    linhas = [(a[0], competencia, user_id, float(v), int(d))
+              for a, d, v in zip(animais, dias, valores) if d > 0]
+    if linhas:
+        cursor.executemany(
+            "INSERT INTO custo_animal_mes (animal_id, competencia, user_id, valor, dias) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            linhas
+        )
+    cursor.execute(
+        "INSERT INTO fechamento_custos (user_id, competencia, total_custos, total_alocado, animal_dias) "
+        "VALUES (%s, %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE total_custos = VALUES(total_custos), "
+        "  total_alocado = VALUES(total_alocado), animal_dias = VALUES(animal_dias)",
+        (user_id, competencia, total, float(valores.sum()), int(dias.sum()))
+    )
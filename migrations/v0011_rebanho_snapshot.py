@@ -0,0 +1,81 @@
+"""Retrato diário do rebanho por fazenda (rebanho_snapshot_diario).
+
+Gráficos só respondiam "hoje": reconstituir cabeças, peso, GMD e valor de
+datas passadas a partir de animais/pesagens a cada request é caro. O job
+noturno (utils.snapshot.gravar_snapshot_diario) grava uma linha por fazenda
+e dia; a série vem de uma leitura pela PK. O backfill reconstitui o
+histórico desde a primeira entrada (compra ou nascimento) de cada fazenda, em blocos de
+utils.snapshot.DIAS_POR_VEZ dias, com a SQL copiada aqui (só o cálculo,
+sem acesso a banco, vem de utils.snapshot).
+"""
+from datetime import date, timedelta
+
+from utils.snapshot import DIAS_POR_VEZ, calcular_snapshots
+
+DESCRICAO = "Tabela rebanho_snapshot_diario (série diária do rebanho) com backfill"
+
+# Quem esteve no rebanho em algum dia do bloco (snapshot_repository.get_dados_rebanho).
+_FILTRO = (
+    "a.user_id = %s AND a.deleted_at IS NULL AND COALESCE(a.data_compra, a.data_nascimento) <= %s "
+    "AND (a.data_venda IS NULL OR a.data_venda > %s)"
+)
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS rebanho_snapshot_diario (
+        user_id INT NOT NULL,
+        data DATE NOT NULL,
+        cabecas INT NOT NULL,
+        machos INT NOT NULL,
+        femeas INT NOT NULL,
+        bezerros INT NOT NULL,
+        animais_pesados INT NOT NULL,
+        peso_total DECIMAL(14, 1) NOT NULL,
+        peso_medio DECIMAL(8, 1) NULL,
+        gmd_medio DECIMAL(7, 3) NULL,
+        valor_contabil DECIMAL(14, 2) NOT NULL,
+        PRIMARY KEY (user_id, data),
+        FOREIGN KEY (user_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    );
+    """)
+
+    if ddl.dry_run:
+        ddl.saida("   [dry-run] backfill de rebanho_snapshot_diario por fazenda")
+        return
+
+    cursor = ddl.cursor
+    cursor.execute(
+        "SELECT user_id, MIN(COALESCE(data_compra, data_nascimento)) FROM vw_animais_historico "
+        "WHERE deleted_at IS NULL GROUP BY user_id ORDER BY user_id"
+    )
+    for user_id, desde in cursor.fetchall():
+        _backfill(cursor, user_id, desde)
+
+
+def _backfill(cursor, user_id, desde):
+    """Grava os dias de `desde` até ontem do tenant, em blocos de DIAS_POR_VEZ."""
+    ontem = date.today() - timedelta(days=1)
+    while desde is not None and desde <= ontem:
+        fim = min(desde + timedelta(days=DIAS_POR_VEZ - 1), ontem)
+        cursor.execute(
+            "SELECT a.id, a.sexo, a.data_compra, a.data_venda, a.data_nascimento, a.preco_compra "
+            f"FROM vw_animais_historico a WHERE {_FILTRO}",
+            (user_id, fim, desde)
+        )
+        animais = cursor.fetchall()
+        cursor.execute(
+            "SELECT p.animal_id, p.data_pesagem, p.peso FROM vw_pesagens_historico p "
+            f"JOIN vw_animais_historico a ON a.id = p.animal_id AND {_FILTRO} "
+            "WHERE p.deleted_at IS NULL AND p.data_pesagem <= %s",
+            (user_id, fim, desde, fim)
+        )
+        dias = [desde + timedelta(days=i) for i in range((fim - desde).days + 1)]
+        linhas = calcular_snapshots(animais, cursor.fetchall(), dias)
+        cursor.executemany(
+            "INSERT INTO rebanho_snapshot_diario (user_id, data, cabecas, machos, femeas, "
+            "    bezerros, animais_pesados, peso_total, peso_medio, gmd_medio, valor_contabil) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            [(user_id, *linha) for linha in linhas]
+        )
+        desde = fim + timedelta(days=1)
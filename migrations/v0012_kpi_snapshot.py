@@ -0,0 +1,26 @@
+"""KPIs do financeiro guardados por tenant com a versão dos dados (kpi_snapshot).
+
+calcular_kpis_unificados (contagem do rebanho, GMD médio por window CTE e
+custos do ano) rodava em toda abertura de /financeiro e do simulador, e o
+PDF refazia parte das contas. utils.kpis.get_kpis serve os três do mesmo
+snapshot e só recalcula quando tenant_versao.versao_kpi mudou (ou virou o
+dia, porque a janela de 12 meses anda).
+
+versao_kpi sobe junto com versao nas escritas de catálogo e sozinha nas de
+pesagem e custo operacional — essas não invalidam o índice de busca.
+"""
+DESCRICAO = "Coluna tenant_versao.versao_kpi e tabela kpi_snapshot"
+
+
+def aplicar(ddl):
+    ddl.adicionar_coluna("tenant_versao", "versao_kpi", "BIGINT NOT NULL DEFAULT 0")
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS kpi_snapshot (
+        user_id INT PRIMARY KEY,
+        versao_kpi BIGINT NOT NULL,
+        data_referencia DATE NOT NULL,
+        dados TEXT NOT NULL,
+        calculado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    );
+    """)
@@ -0,0 +1,21 @@
+"""Histórico diário das cotações da arroba por praça (cotacoes_historico).
+
+As cotações do scraper só viviam no cache de 30 min em memória de cada
+worker. O job diário (utils.cotacoes.gravar_cotacoes_diarias) grava boi e
+novilha por praça; o valor de mercado do rebanho (utils.kpis) e a série de
+valor ao longo do tempo leem daqui. Tabela global — a cotação não é do tenant.
+"""
+DESCRICAO = "Tabela cotacoes_historico (preço à vista da @ por data, categoria e praça)"
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS cotacoes_historico (
+        data DATE NOT NULL,
+        categoria VARCHAR(10) NOT NULL,
+        praca VARCHAR(100) NOT NULL,
+        preco_vista DECIMAL(10, 2) NOT NULL,
+        gravado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (data, categoria, praca)
+    );
+    """)
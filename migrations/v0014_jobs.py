@@ -0,0 +1,33 @@
+"""Registro de jobs em segundo plano no banco (tabela jobs).
+
+PDFs e simulações grandes guardavam o estado em arquivos de /tmp
+(sgg_pdf_*.pending/.pdf/.error, sgg_job_*.json) mais uma lista na sessão:
+o polling só funcionava caindo no mesmo container, e thread morta deixava
+.pending para sempre. Agora o estado é uma linha por job, com dono
+(user_id), status explícito, heartbeat do executor e prazo de expiração; o
+conteúdo binário (o PDF) vai para o blob store (utils.blob_store). O job de
+manutenção (utils.jobs.manter_jobs) marca como erro quem parou de bater e
+apaga os expirados com seus blobs.
+"""
+DESCRICAO = "Tabela jobs (registro de jobs em segundo plano com heartbeat e expiração)"
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id CHAR(36) PRIMARY KEY,
+        user_id INT NOT NULL,
+        tipo VARCHAR(30) NOT NULL,
+        status VARCHAR(12) NOT NULL DEFAULT 'pendente',
+        resultado MEDIUMTEXT NULL,
+        blob_chave VARCHAR(200) NULL,
+        erro VARCHAR(500) NULL,
+        criado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        heartbeat_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        concluido_em DATETIME NULL,
+        expira_em DATETIME NOT NULL,
+        KEY idx_jobs_status_heartbeat (status, heartbeat_em),
+        KEY idx_jobs_expira (expira_em),
+        FOREIGN KEY (user_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    );
+    """)
@@ -0,0 +1,29 @@
+"""Cache dos PDFs do relatório do rebanho (relatorio_cache).
+
+Cada clique em "Gerar PDF" abria um Chromium, mesmo com o rebanho parado.
+O PDF agora é guardado no blob store sob uma chave derivada do template, da
+versão dos dados do tenant (tenant_versao.versao_kpi) e do dia
+(utils.relatorio). Esta tabela indexa esses blobs: dono, tamanho e último
+acesso, para achar o PDF sem tocar no Chromium e despejar os menos usados
+quando o total passa do limite. solicitado_em só muda por pedido do usuário
+(a pré-geração noturna não conta): é por ela que o job noturno sabe quem
+ainda usa o relatório.
+"""
+DESCRICAO = "Tabela relatorio_cache (PDFs do relatório por chave de conteúdo, com LRU)"
+
+
+def aplicar(ddl):
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS relatorio_cache (
+        chave CHAR(64) PRIMARY KEY,
+        user_id INT NOT NULL,
+        blob_chave VARCHAR(200) NOT NULL,
+        tamanho INT NOT NULL,
+        criado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        acessado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        solicitado_em DATETIME NULL,
+        KEY idx_relatorio_cache_acesso (acessado_em),
+        KEY idx_relatorio_cache_solicitado (solicitado_em),
+        FOREIGN KEY (user_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    );
+    """)
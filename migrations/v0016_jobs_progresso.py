@@ -0,0 +1,12 @@
+"""Percentual de conclusão dos jobs (jobs.progresso).
+
+O acompanhamento por SSE/long polling (routes.api.job_eventos) recebe o
+progresso pelo pub/sub (utils.pubsub); sem Redis o aviso só chega ao mesmo
+processo, e o stream relê a linha do job no banco. Gravar o percentual aqui
+faz a releitura mostrar o mesmo que o aviso.
+"""
+DESCRICAO = "Coluna jobs.progresso (percentual de conclusão, 0-100)"
+
+
+def aplicar(ddl):
+    ddl.adicionar_coluna("jobs", "progresso", "TINYINT UNSIGNED NOT NULL DEFAULT 0")
@@ -0,0 +1,26 @@
+"""Relatório mensal por email: opt-in em configuracoes e registro de envios.
+
+No dia 1º o job utils.relatorio.enviar_relatorios_mensais gera o PDF de
+cada fazenda que marcou configuracoes.relatorio_mensal e manda por email.
+relatorio_mensal_envio guarda uma linha por (fazenda, mês de referência):
+uma segunda passada, ou um restart no meio do lote, só refaz quem ainda não
+recebeu, e as falhas ficam registradas com o erro.
+"""
+DESCRICAO = "configuracoes.relatorio_mensal (opt-in) e tabela relatorio_mensal_envio"
+
+
+def aplicar(ddl):
+    ddl.adicionar_coluna("configuracoes", "relatorio_mensal", "TINYINT(1) NOT NULL DEFAULT 0")
+    ddl.executar("""
+    CREATE TABLE IF NOT EXISTS relatorio_mensal_envio (
+        user_id INT NOT NULL,
+        referencia DATE NOT NULL,
+        status VARCHAR(10) NOT NULL,
+        tentativas INT NOT NULL DEFAULT 1,
+        blob_chave VARCHAR(200) NULL,
+        erro VARCHAR(500) NULL,
+        atualizado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, referencia),
+        FOREIGN KEY (user_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    );
+    """)
@@ -0,0 +1,47 @@
+"""Rateio dos meses fechados refeito para quem nasceu na fazenda.
+
+O fechamento selecionava os animais por data_compra, que é NULL no bezerro
+nascido na fazenda: ele nunca recebia custo operacional, e o mês inteiro
+caía sobre os comprados. A entrada passou a ser
+COALESCE(data_compra, data_nascimento). Bancos que já rodaram a v0010 têm os
+meses fechados com o rateio antigo; aqui são refeitos os das fazendas com
+algum animal nascido, e depois custo_animal e lote_resultado delas.
+O fechamento e a SQL de lote_resultado são os da v0010, congelados lá.
+"""
+from migrations.v0010_custo_animal import _LOTES_POR_VEZ, _RESULTADO_LOTE_SQL, _fechar
+
+DESCRICAO = "Rateio de custos refeito com data_nascimento como entrada dos nascidos na fazenda"
+
+
+def aplicar(ddl):
+    cursor = ddl.cursor
+    cursor.execute(
+        "SELECT f.user_id, f.competencia FROM fechamento_custos f "
+        "WHERE EXISTS (SELECT 1 FROM vw_animais_historico a WHERE a.user_id = f.user_id "
+        "              AND a.data_compra IS NULL AND a.data_nascimento IS NOT NULL) "
+        "ORDER BY 1, 2"
+    )
+    fechados = cursor.fetchall()
+    usuarios = sorted({user_id for user_id, _ in fechados})
+    if ddl.dry_run:
+        ddl.saida(f"   [dry-run] {len(fechados)} competências refeitas em {len(usuarios)} fazendas")
+        return
+
+    for user_id, competencia in fechados:
+        _fechar(cursor, user_id, competencia)
+
+    for user_id in usuarios:
+        cursor.execute("DELETE FROM custo_animal WHERE user_id = %s", (user_id,))
+        cursor.execute(
+            "INSERT INTO custo_animal (animal_id, user_id, custo_operacional, dias) "
+            "SELECT animal_id, user_id, SUM(valor), SUM(dias) FROM custo_animal_mes "
+            "WHERE user_id = %s GROUP BY animal_id, user_id",
+            (user_id,)
+        )
+        cursor.execute("SELECT id FROM lotes WHERE user_id = %s ORDER BY id", (user_id,))
+        ids = [row[0] for row in cursor.fetchall()]
+        for inicio in range(0, len(ids), _LOTES_POR_VEZ):
+            lote = ids[inicio:inicio + _LOTES_POR_VEZ]
+            placeholders = ','.join(['%s'] * len(lote))
+            cursor.execute(f"DELETE FROM lote_resultado WHERE lote_id IN ({placeholders})", lote)
+            cursor.execute(_RESULTADO_LOTE_SQL.format(lotes=placeholders), lote * 3)
@@ -0,0 +1,29 @@
+"""Série do rebanho refeita para as fazendas com animais nascidos na fazenda.
+
+O snapshot diário filtrava por data_compra e começava em MIN(data_compra):
+o animal nascido na fazenda (data_compra NULL) nunca contava em cabecas nem
+em bezerros, e a fazenda só com nascidos nunca ganhava snapshot. A entrada
+passou a ser COALESCE(data_compra, data_nascimento). Aqui os snapshots
+dessas fazendas são apagados e refeitos com o backfill da v0011.
+"""
+from migrations.v0011_rebanho_snapshot import _backfill
+
+DESCRICAO = "rebanho_snapshot_diario refeito com data_nascimento como entrada dos nascidos na fazenda"
+
+
+def aplicar(ddl):
+    cursor = ddl.cursor
+    cursor.execute(
+        "SELECT user_id, MIN(COALESCE(data_compra, data_nascimento)) FROM vw_animais_historico "
+        "WHERE deleted_at IS NULL GROUP BY user_id "
+        "HAVING SUM(data_compra IS NULL AND data_nascimento IS NOT NULL) > 0 "
+        "ORDER BY user_id"
+    )
+    fazendas = cursor.fetchall()
+    if ddl.dry_run:
+        ddl.saida(f"   [dry-run] rebanho_snapshot_diario refeito em {len(fazendas)} fazendas")
+        return
+
+    for user_id, desde in fazendas:
+        cursor.execute("DELETE FROM rebanho_snapshot_diario WHERE user_id = %s", (user_id,))
+        _backfill(cursor, user_id, desde)
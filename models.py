@@ -14,7 +14,11 @@ class User(UserMixin):
         if conn:
             try:
                 cursor = conn.cursor()
-                cursor.execute("SELECT id, username, password_hash, email FROM usuarios WHERE id = %s", (user_id,))
+                cursor.execute(
+                    "SELECT id, username, password_hash, email FROM usuarios "
+                    "WHERE id = %s AND desativado_em IS NULL",
+                    (user_id,)
+                )
                 dados = cursor.fetchone()
                 if dados:
                     return User(dados[0], dados[1], dados[2], dados[3])
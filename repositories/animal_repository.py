@@ -1,5 +1,8 @@
-from db_config import get_db_cursor
+import re
+from db_config import get_db_cursor, iterar_consulta
 from datetime import datetime
+from repositories import busca_repository, genealogia_repository, kpi_repository, pasto_repository
+from utils.genetica import avaliar_touros, grupo_contemporaneo
 
 
 def _normalizar_raca(raca):
@@ -13,6 +16,15 @@ def _normalizar_raca(raca):
     return ' '.join(raca.split()).title() or None
 
 
+def chave_ordem_brinco(brinco):
+    """Chave de ordenação natural gravada em animais.brinco_ordem.
+
+    Trechos numéricos completados com zeros à esquerda ("A2" < "A10"),
+    sem diferenciar maiúsculas. Indexada junto de (user_id, deleted_at).
+    """
+    return re.sub(r'\d+', lambda m: m.group().zfill(12), brinco.strip().casefold())[:255]
+
+
 # ATENÇÃO: `conds` deve conter apenas literais hardcoded (ex.: "deleted_at IS NULL").
 # Dados externos (usuário, banco, request) nunca devem ser interpolados em `conds` —
 # sempre vão para `params` e chegam ao banco via placeholder %s.
@@ -59,13 +71,15 @@ def _origem_cond(origem, alias='a.'):
 # ATENÇÃO: `join_clause` deve conter APENAS literais hardcoded (mesma regra de
 # _build_animais_where). Os %s dentro dela são preenchidos por `params` na ordem
 # em que aparecem — NUNCA interpolar dado externo (usuário/request) aqui.
-def _gmd_ctes(join_clause: str) -> str:
+def _gmd_ctes(join_clause: str, fonte: str = "pesagens") -> str:
+    """`fonte` troca a tabela de pesagens (ex.: vw_pesagens_historico para
+    relatórios que alcançam animais arquivados). Apenas literais fixos."""
     return (
         "WITH po AS ("
         "  SELECT p.animal_id, p.data_pesagem, p.peso,"
         "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem ASC)  AS rn_asc,"
         "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem DESC) AS rn_desc"
-        "  FROM pesagens p"
+        "  FROM " + fonte + " p"
         "  " + join_clause +
         "),"
         " pu AS ("
@@ -95,7 +109,7 @@ def get_animais_paginados(user_id, limit, offset, termo=None, status='todos', ra
         "       a.data_venda, a.preco_venda "
         "FROM animais a "
         + where +
-        " ORDER BY LENGTH(a.brinco) ASC, a.brinco ASC LIMIT %s OFFSET %s"
+        " ORDER BY a.brinco_ordem ASC LIMIT %s OFFSET %s"
     )
     with get_db_cursor() as cursor:
         cursor.execute(sql, tuple(params + [limit, offset]))
@@ -157,36 +171,102 @@ def get_animais_lixeira_paginados(user_id, limit, offset, termo=None):
         return cursor.fetchall()
 
 
+# (id, brinco) dos animais ativos, na ordem natural do brinco.
+_ATIVOS_SQL = (
+    "SELECT id, brinco FROM animais "
+    "WHERE user_id = %s AND data_venda IS NULL AND deleted_at IS NULL "
+    "ORDER BY brinco_ordem ASC"
+)
+_ATIVOS_POR_LOTE_SQL = (
+    "SELECT id, brinco FROM animais "
+    "WHERE user_id = %s AND data_venda IS NULL AND deleted_at IS NULL "
+    "AND lote_id = %s ORDER BY brinco_ordem ASC"
+)
+_ATIVOS_COM_ULTIMO_PESO_SQL = (
+    "WITH ultimo AS ("
+    "  SELECT p.animal_id, p.peso,"
+    "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem DESC, p.id DESC) AS rn"
+    "  FROM pesagens p WHERE p.deleted_at IS NULL"
+    ")"
+    " SELECT a.id, a.brinco, a.raca, u.peso AS ultimo_peso"
+    " FROM animais a"
+    " LEFT JOIN ultimo u ON u.animal_id = a.id AND u.rn = 1"
+    " WHERE a.user_id = %s AND a.data_venda IS NULL AND a.deleted_at IS NULL"
+    " ORDER BY a.brinco_ordem"
+)
+
+
 def get_animais_ativos(user_id):
     with get_db_cursor() as cursor:
-        cursor.execute(
-            "SELECT id, brinco FROM animais "
-            "WHERE user_id = %s AND data_venda IS NULL AND deleted_at IS NULL "
-            "ORDER BY brinco ASC",
-            (user_id,)
-        )
+        cursor.execute(_ATIVOS_SQL, (user_id,))
         return cursor.fetchall()
 
 
+def iterar_animais_ativos(user_id):
+    """Como get_animais_ativos, em streaming (fetchmany) — para stream_template."""
+    return iterar_consulta(_ATIVOS_SQL, (user_id,))
+
+
 def get_animais_ativos_com_ultimo_peso(user_id):
     """Animais ativos com o peso da pesagem mais recente (None se nunca pesado)."""
+    with get_db_cursor() as cursor:
+        cursor.execute(_ATIVOS_COM_ULTIMO_PESO_SQL, (user_id,))
+        return cursor.fetchall()
+
+
+def iterar_animais_ativos_com_ultimo_peso(user_id):
+    """Como get_animais_ativos_com_ultimo_peso, em streaming (fetchmany)."""
+    return iterar_consulta(_ATIVOS_COM_ULTIMO_PESO_SQL, (user_id,))
+
+
+def get_peso_rebanho_por_sexo(user_id):
+    """[(sexo, cabecas, pesados, peso_total, compra_nao_pesados)] do rebanho ativo.
+
+    Uma passada agrupada sobre animal_pesagem_resumo para o valor de mercado
+    (utils.kpis); animal nunca pesado entra pelo preço de compra.
+    """
     with get_db_cursor() as cursor:
         cursor.execute(
-            "WITH ultimo AS ("
-            "  SELECT p.animal_id, p.peso,"
-            "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem DESC, p.id DESC) AS rn"
-            "  FROM pesagens p WHERE p.deleted_at IS NULL"
-            ")"
-            " SELECT a.id, a.brinco, a.raca, u.peso AS ultimo_peso"
+            "SELECT a.sexo, COUNT(*), COUNT(r.animal_id), COALESCE(SUM(r.ultimo_peso), 0),"
+            "  COALESCE(SUM(CASE WHEN r.animal_id IS NULL THEN a.preco_compra END), 0)"
             " FROM animais a"
-            " LEFT JOIN ultimo u ON u.animal_id = a.id AND u.rn = 1"
+            " LEFT JOIN animal_pesagem_resumo r ON r.animal_id = a.id"
             " WHERE a.user_id = %s AND a.data_venda IS NULL AND a.deleted_at IS NULL"
-            " ORDER BY LENGTH(a.brinco), a.brinco",
+            " GROUP BY a.sexo",
             (user_id,)
         )
         return cursor.fetchall()
 
 
+def get_candidatos_venda(user_id, sexo=None, lote_id=None):
+    """Animais ativos pesados, com o necessário para a sugestão de venda (utils.venda).
+
+    (id, brinco, ultimo_peso, ultima_data, gmd, preco_compra, custo_operacional) —
+    peso e GMD (primeira x última pesagem) de animal_pesagem_resumo, custo do
+    razão custo_animal: uma linha por animal, sem window function.
+    """
+    filtros, params = "", [user_id]
+    if sexo:
+        filtros += " AND a.sexo = %s"
+        params.append(sexo)
+    if lote_id:
+        filtros += " AND a.lote_id = %s"
+        params.append(lote_id)
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT a.id, a.brinco, r.ultimo_peso, r.ultima_data,"
+            "  CASE WHEN r.ultima_data > r.primeira_data"
+            "    THEN (r.ultimo_peso - r.primeiro_peso) / DATEDIFF(r.ultima_data, r.primeira_data) END,"
+            "  a.preco_compra, ca.custo_operacional"
+            " FROM animais a"
+            " JOIN animal_pesagem_resumo r ON r.animal_id = a.id"
+            " LEFT JOIN custo_animal ca ON ca.animal_id = a.id"
+            " WHERE a.user_id = %s AND a.data_venda IS NULL AND a.deleted_at IS NULL" + filtros,
+            tuple(params)
+        )
+        return cursor.fetchall()
+
+
 def get_lotes(user_id):
     with get_db_cursor() as cursor:
         cursor.execute(
@@ -201,22 +281,162 @@ def get_lotes(user_id):
 def get_animais_ativos_por_lote(user_id, lote_id=None):
     with get_db_cursor() as cursor:
         if lote_id:
-            cursor.execute(
-                "SELECT id, brinco FROM animais "
-                "WHERE user_id = %s AND data_venda IS NULL AND deleted_at IS NULL "
-                "AND lote_id = %s ORDER BY brinco ASC",
-                (user_id, lote_id)
-            )
+            cursor.execute(_ATIVOS_POR_LOTE_SQL, (user_id, lote_id))
         else:
-            cursor.execute(
-                "SELECT id, brinco FROM animais "
-                "WHERE user_id = %s AND data_venda IS NULL AND deleted_at IS NULL "
-                "ORDER BY brinco ASC",
-                (user_id,)
-            )
+            cursor.execute(_ATIVOS_SQL, (user_id,))
         return cursor.fetchall()
 
 
+def iterar_animais_ativos_por_lote(user_id, lote_id=None):
+    """Como get_animais_ativos_por_lote, em streaming (fetchmany)."""
+    if lote_id:
+        return iterar_consulta(_ATIVOS_POR_LOTE_SQL, (user_id, lote_id))
+    return iterar_consulta(_ATIVOS_SQL, (user_id,))
+
+
+# Primeira/última pesagem válida por animal, com desempate por id na mesma data.
+# {filtro} restringe os animais; vazio = rebanho inteiro (backfill da v0004).
+_RESUMO_PESAGENS_SQL = (
+    "INSERT INTO animal_pesagem_resumo "
+    "    (animal_id, user_id, primeira_data, primeiro_peso, ultima_data, ultimo_peso, qtd_pesagens) "
+    "SELECT x.animal_id, a.user_id, "
+    "    MAX(CASE WHEN x.rn_asc = 1 THEN x.data_pesagem END), "
+    "    MAX(CASE WHEN x.rn_asc = 1 THEN x.peso END), "
+    "    MAX(CASE WHEN x.rn_desc = 1 THEN x.data_pesagem END), "
+    "    MAX(CASE WHEN x.rn_desc = 1 THEN x.peso END), "
+    "    COUNT(*) "
+    "FROM ("
+    "    SELECT p.animal_id, p.data_pesagem, p.peso, "
+    "        ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem, p.id) AS rn_asc, "
+    "        ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem DESC, p.id DESC) AS rn_desc "
+    "    FROM pesagens p WHERE p.deleted_at IS NULL {filtro}"
+    ") x "
+    "JOIN animais a ON a.id = x.animal_id "
+    "GROUP BY x.animal_id, a.user_id"
+)
+
+
+def atualizar_resumo_pesagens(cursor, animal_ids=None):
+    """Refaz animal_pesagem_resumo dos animais (None = todos).
+
+    Apaga e reinsere: um animal cujas pesagens foram todas excluídas sai do resumo.
+    """
+    if animal_ids is None:
+        cursor.execute("DELETE FROM animal_pesagem_resumo")
+        cursor.execute(_RESUMO_PESAGENS_SQL.format(filtro=""))
+        return
+    if not animal_ids:
+        return
+    ids = list(animal_ids)
+    placeholders = ','.join(['%s'] * len(ids))
+    cursor.execute(f"DELETE FROM animal_pesagem_resumo WHERE animal_id IN ({placeholders})", ids)
+    cursor.execute(
+        _RESUMO_PESAGENS_SQL.format(filtro=f"AND p.animal_id IN ({placeholders})"), ids
+    )
+
+
+# P&L por lote (lote_resultado), antes a view vw_resultado_lote. Arquivados
+# continuam contando; lote sem animal fora da lixeira fica sem linha, como na
+# view. Cada tabela física é filtrada pelos lotes e agregada por animal antes
+# do UNION ALL: as views *_historico de pesagens e medicações não têm user_id
+# nem lote_id, e o MySQL as materializaria inteiras a cada escrita.
+# {lotes} = placeholders dos lote_ids (7 vezes).
+_RESULTADO_LOTE_SQL = (
+    "INSERT INTO lote_resultado (lote_id, user_id, total_animais, custo_aquisicao, "
+    "    receita_vendas, custo_medicacoes, animais_vendidos, margem_bruta, gmd_medio, "
+    "    custo_operacional, margem_liquida) "
+    "WITH an AS ("
+    "  SELECT id, lote_id, preco_compra, data_venda, preco_venda FROM animais "
+    "  WHERE lote_id IN ({lotes}) AND deleted_at IS NULL "
+    "  UNION ALL "
+    "  SELECT id, lote_id, preco_compra, data_venda, preco_venda FROM animais_arquivo "
+    "  WHERE lote_id IN ({lotes}) AND deleted_at IS NULL"
+    "), po AS ("
+    "  SELECT p.animal_id, p.data_pesagem, p.peso,"
+    "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem ASC)  AS rn_asc,"
+    "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem DESC) AS rn_desc"
+    "  FROM pesagens p JOIN animais ap ON ap.id = p.animal_id AND ap.lote_id IN ({lotes}) "
+    "  WHERE p.deleted_at IS NULL "
+    "  UNION ALL "
+    "  SELECT p.animal_id, p.data_pesagem, p.peso,"
+    "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem ASC),"
+    "    ROW_NUMBER() OVER (PARTITION BY p.animal_id ORDER BY p.data_pesagem DESC)"
+    "  FROM pesagens_arquivo p JOIN animais_arquivo ap ON ap.id = p.animal_id AND ap.lote_id IN ({lotes}) "
+    "  WHERE p.deleted_at IS NULL"
+    "), pu AS ("
+    "  SELECT animal_id,"
+    "    MAX(CASE WHEN rn_asc  = 1 THEN data_pesagem END) AS data_ini,"
+    "    MAX(CASE WHEN rn_asc  = 1 THEN peso END)         AS peso_ini,"
+    "    MAX(CASE WHEN rn_desc = 1 THEN data_pesagem END) AS data_fim,"
+    "    MAX(CASE WHEN rn_desc = 1 THEN peso END)         AS peso_fim"
+    "  FROM po GROUP BY animal_id"
+    "), med AS ("
+    "  SELECT m.animal_id, SUM(m.custo) AS custo_med "
+    "  FROM medicacoes m JOIN animais am ON am.id = m.animal_id AND am.lote_id IN ({lotes}) "
+    "  WHERE m.deleted_at IS NULL GROUP BY m.animal_id "
+    "  UNION ALL "
+    "  SELECT m.animal_id, SUM(m.custo) "
+    "  FROM medicacoes_arquivo m JOIN animais_arquivo am ON am.id = m.animal_id AND am.lote_id IN ({lotes}) "
+    "  WHERE m.deleted_at IS NULL GROUP BY m.animal_id"
+    ")"
+    " SELECT l.id, l.user_id, COUNT(a.id), COALESCE(SUM(a.preco_compra), 0), "
+    "    COALESCE(SUM(CASE WHEN a.data_venda IS NOT NULL THEN a.preco_venda END), 0), "
+    "    COALESCE(SUM(med.custo_med), 0), "
+    "    COUNT(CASE WHEN a.data_venda IS NOT NULL THEN 1 END), "
+    "    COALESCE(SUM(CASE WHEN a.data_venda IS NOT NULL THEN a.preco_venda END), 0) "
+    "      - COALESCE(SUM(a.preco_compra), 0) - COALESCE(SUM(med.custo_med), 0), "
+    "    ROUND(AVG((pu.peso_fim - pu.peso_ini) / NULLIF(DATEDIFF(pu.data_fim, pu.data_ini), 0)), 3), "
+    "    COALESCE(SUM(ca.custo_operacional), 0), "
+    "    COALESCE(SUM(CASE WHEN a.data_venda IS NOT NULL THEN a.preco_venda END), 0) "
+    "      - COALESCE(SUM(a.preco_compra), 0) - COALESCE(SUM(med.custo_med), 0) "
+    "      - COALESCE(SUM(ca.custo_operacional), 0) "
+    " FROM lotes l "
+    " JOIN an a ON a.lote_id = l.id "
+    " LEFT JOIN med ON med.animal_id = a.id "
+    " LEFT JOIN pu ON pu.animal_id = a.id "
+    " LEFT JOIN custo_animal ca ON ca.animal_id = a.id "
+    " WHERE l.id IN ({lotes}) "
+    " GROUP BY l.id, l.user_id"
+)
+
+_LOTES_POR_VEZ = 500
+
+
+def atualizar_resultado_lotes(cursor, lote_ids=None):
+    """Refaz lote_resultado dos lotes (None = todos)."""
+    if lote_ids is None:
+        cursor.execute("SELECT id FROM lotes")
+        lote_ids = [row[0] for row in cursor.fetchall()]
+    ids = sorted({int(i) for i in lote_ids if i})
+    for inicio in range(0, len(ids), _LOTES_POR_VEZ):
+        lote = ids[inicio:inicio + _LOTES_POR_VEZ]
+        placeholders = ','.join(['%s'] * len(lote))
+        cursor.execute(f"DELETE FROM lote_resultado WHERE lote_id IN ({placeholders})", lote)
+        cursor.execute(_RESULTADO_LOTE_SQL.format(lotes=placeholders), lote * 7)
+
+
+def atualizar_resultado_por_animais(cursor, animal_ids):
+    """Refaz lote_resultado dos lotes a que os animais pertencem."""
+    if not animal_ids:
+        return
+    ids = list(animal_ids)
+    placeholders = ','.join(['%s'] * len(ids))
+    cursor.execute(
+        f"SELECT DISTINCT lote_id FROM animais WHERE id IN ({placeholders}) AND lote_id IS NOT NULL",
+        ids
+    )
+    atualizar_resultado_lotes(cursor, [row[0] for row in cursor.fetchall()])
+
+
+def _apos_pesagens(cursor, user_id, animal_ids):
+    """Mantém os dados derivados de pesagem na mesma transação da escrita."""
+    kpi_repository.incrementar_versao(cursor, user_id)
+    atualizar_resumo_pesagens(cursor, animal_ids)
+    pasto_repository.atualizar_lotacao_por_animais(cursor, animal_ids)
+    pasto_repository.recalcular_gmd_por_animais(cursor, animal_ids)
+    atualizar_resultado_por_animais(cursor, animal_ids)
+
+
 def registrar_pesagens_lote(pairs, user_id, data_pesagem):
     """Insere múltiplas pesagens em uma única transação.
 
@@ -244,6 +464,7 @@ def registrar_pesagens_lote(pairs, user_id, data_pesagem):
                 "INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, %s, %s)",
                 pares_validos
             )
+            _apos_pesagens(cursor, user_id, [aid for aid, _, _ in pares_validos])
 
     return len(pares_validos), invalidos
 
@@ -347,36 +568,42 @@ def get_gmd_medio_rebanho(user_id, sexo=None, origem=None):
         return float(res[0]) if res and res[0] else 0.0
 
 
+def _animais_com_gmd_sql():
+    return _gmd_ctes(
+        "JOIN animais a ON a.id = p.animal_id"
+        "    AND a.user_id = %s AND a.data_venda IS NULL AND a.deleted_at IS NULL"
+        "    AND p.deleted_at IS NULL"
+    ) + (
+        ","
+        " gmd_calc AS ("
+        "  SELECT animal_id, peso_fim AS peso_final,"
+        "    DATEDIFF(data_fim, data_ini) AS dias,"
+        "    CASE WHEN DATEDIFF(data_fim, data_ini) > 0"
+        "      THEN ROUND((peso_fim - peso_ini) / DATEDIFF(data_fim, data_ini), 3)"
+        "      ELSE NULL END AS gmd"
+        "  FROM pu WHERE data_ini <> data_fim"
+        " )"
+        " SELECT a.id, a.brinco, a.sexo, a.raca, a.data_compra,"
+        "  g.gmd, g.dias, g.peso_final"
+        " FROM animais a"
+        " LEFT JOIN gmd_calc g ON g.animal_id = a.id"
+        " WHERE a.user_id = %s AND a.data_venda IS NULL AND a.deleted_at IS NULL"
+        " ORDER BY a.brinco_ordem"
+    )
+
+
 def get_animais_com_gmd(user_id):
     """Animais ativos com GMD — CTE inline, sem v_gmd_analitico."""
     with get_db_cursor() as cursor:
-        cursor.execute(
-            _gmd_ctes(
-                "JOIN animais a ON a.id = p.animal_id"
-                "    AND a.user_id = %s AND a.data_venda IS NULL AND a.deleted_at IS NULL"
-                "    AND p.deleted_at IS NULL"
-            ) + (
-                ","
-                " gmd_calc AS ("
-                "  SELECT animal_id, peso_fim AS peso_final,"
-                "    DATEDIFF(data_fim, data_ini) AS dias,"
-                "    CASE WHEN DATEDIFF(data_fim, data_ini) > 0"
-                "      THEN ROUND((peso_fim - peso_ini) / DATEDIFF(data_fim, data_ini), 3)"
-                "      ELSE NULL END AS gmd"
-                "  FROM pu WHERE data_ini <> data_fim"
-                " )"
-                " SELECT a.id, a.brinco, a.sexo, a.raca, a.data_compra,"
-                "  g.gmd, g.dias, g.peso_final"
-                " FROM animais a"
-                " LEFT JOIN gmd_calc g ON g.animal_id = a.id"
-                " WHERE a.user_id = %s AND a.data_venda IS NULL AND a.deleted_at IS NULL"
-                " ORDER BY LENGTH(a.brinco), a.brinco"
-            ),
-            (user_id, user_id)
-        )
+        cursor.execute(_animais_com_gmd_sql(), (user_id, user_id))
         return cursor.fetchall()
 
 
+def iterar_animais_com_gmd(user_id):
+    """Como get_animais_com_gmd, em streaming (fetchmany) — relatório do rebanho."""
+    return iterar_consulta(_animais_com_gmd_sql(), (user_id, user_id))
+
+
 def get_animais_abaixo_gmd_medio(user_id, sexo=None, origem=None):
     """Animais ativos com GMD abaixo de (média - 2σ): outliers estatísticos do rebanho.
 
@@ -421,6 +648,23 @@ def get_animais_abaixo_gmd_medio(user_id, sexo=None, origem=None):
         return cursor.fetchall()
 
 
+def get_gmds_rebanho(user_id):
+    """GMD (kg/dia) de cada animal ativo com duas pesagens em datas distintas.
+
+    Lido de animal_pesagem_resumo (primeira x última pesagem) — uma linha por
+    animal, sem window function; alimenta a simulação de Monte Carlo.
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT (r.ultimo_peso - r.primeiro_peso) / DATEDIFF(r.ultima_data, r.primeira_data) "
+            "FROM animal_pesagem_resumo r "
+            "JOIN animais a ON a.id = r.animal_id AND a.deleted_at IS NULL AND a.data_venda IS NULL "
+            "WHERE r.user_id = %s AND r.ultima_data > r.primeira_data",
+            (user_id,)
+        )
+        return [float(row[0]) for row in cursor.fetchall()]
+
+
 def get_animais_abaixo_gmd_meta(user_id, gmd_meta):
     """Animais ativos com GMD abaixo de 75% da meta configurável da fazenda."""
     limite = float(gmd_meta) * 0.75
@@ -457,20 +701,27 @@ def get_animais_ativos_por_sexo(user_id, sexo):
         cursor.execute(
             "SELECT id, brinco FROM animais "
             "WHERE user_id = %s AND sexo = %s AND data_venda IS NULL AND deleted_at IS NULL "
-            "ORDER BY brinco ASC",
+            "ORDER BY brinco_ordem ASC",
             (user_id, sexo)
         )
         return cursor.fetchall()
 
 
 def get_progenie_by_touro(animal_id, user_id):
-    """Filhos onde animal é pai (pai_id) OU mãe (mae_id)."""
+    """Filhos onde animal é pai (pai_id) OU mãe (mae_id).
+
+    Inclui filhos já arquivados (vendidos há muito tempo) — a progênie é histórica.
+    Os filhos vêm da genealogia (ancestral_id, geracoes = 1) em vez de
+    `pai_id = X OR mae_id = X`, que não usava os dois índices.
+    """
     with get_db_cursor() as cursor:
         cursor.execute(
             _gmd_ctes(
-                "JOIN animais filho ON filho.id = p.animal_id"
-                "    AND (filho.pai_id = %s OR filho.mae_id = %s)"
-                "    AND filho.user_id = %s AND filho.deleted_at IS NULL AND p.deleted_at IS NULL"
+                "JOIN genealogia gen ON gen.descendente_id = p.animal_id"
+                "    AND gen.ancestral_id = %s AND gen.geracoes = 1"
+                " JOIN vw_animais_historico filho ON filho.id = p.animal_id"
+                "    AND filho.user_id = %s AND filho.deleted_at IS NULL AND p.deleted_at IS NULL",
+                fonte="vw_pesagens_historico",
             ) + (
                 ","
                 " gmd_calc AS ("
@@ -482,15 +733,16 @@ def get_progenie_by_touro(animal_id, user_id):
                 " )"
                 " SELECT f.id, f.brinco, f.sexo, f.data_compra, g.gmd,"
                 "  CASE WHEN f.pai_id = %s THEN 'pai' ELSE 'mae' END AS papel"
-                " FROM animais f"
+                " FROM genealogia gen"
+                " JOIN vw_animais_historico f ON f.id = gen.descendente_id"
                 " LEFT JOIN gmd_calc g ON g.animal_id = f.id"
-                " WHERE (f.pai_id = %s OR f.mae_id = %s)"
+                " WHERE gen.ancestral_id = %s AND gen.geracoes = 1"
                 "   AND f.user_id = %s AND f.deleted_at IS NULL"
-                " ORDER BY f.brinco"
+                " ORDER BY f.brinco_ordem"
             ),
-            (animal_id, animal_id, user_id,   # CTE
-             animal_id,                        # CASE WHEN papel
-             animal_id, animal_id, user_id)    # WHERE
+            (animal_id, user_id,   # CTE
+             animal_id,            # CASE WHEN papel
+             animal_id, user_id)   # WHERE
         )
         return cursor.fetchall()
 
@@ -509,37 +761,72 @@ def get_historico_reproducao(vaca_id, user_id):
 
 
 def get_ranking_touros(user_id):
-    """Ranking de touros por GMD médio dos filhos — inline, sem view."""
+    """Ranking de touros lido de ranking_touros (job noturno).
+
+    (touro_id, brinco, raca, qtd_filhos, gmd_medio_filhos, efeito_touro,
+    acuracia, filhos_avaliados, calculado_em), pelo efeito ajustado.
+    """
     with get_db_cursor() as cursor:
         cursor.execute(
-            _gmd_ctes(
-                "JOIN animais filho ON filho.id = p.animal_id"
-                "    AND filho.user_id = %s AND filho.pai_id IS NOT NULL"
-                "    AND filho.deleted_at IS NULL AND p.deleted_at IS NULL"
-            ) + (
-                ","
-                " gmd_filhos AS ("
-                "  SELECT animal_id,"
-                "    CASE WHEN DATEDIFF(data_fim, data_ini) > 0"
-                "      THEN (peso_fim - peso_ini) / DATEDIFF(data_fim, data_ini)"
-                "      ELSE NULL END AS gmd"
-                "  FROM pu WHERE data_ini <> data_fim"
-                " )"
-                " SELECT t.id AS touro_id, t.brinco AS touro_brinco, t.raca AS touro_raca,"
-                "  COUNT(f.id) AS qtd_filhos,"
-                "  ROUND(AVG(gf.gmd), 3) AS gmd_medio_filhos"
-                " FROM animais f"
-                " JOIN animais t ON t.id = f.pai_id AND t.deleted_at IS NULL"
-                " LEFT JOIN gmd_filhos gf ON gf.animal_id = f.id AND gf.gmd IS NOT NULL"
-                " WHERE f.user_id = %s AND f.pai_id IS NOT NULL AND f.deleted_at IS NULL"
-                " GROUP BY t.id, t.brinco, t.raca"
-                " ORDER BY gmd_medio_filhos DESC"
-            ),
-            (user_id, user_id)
+            "SELECT t.id, t.brinco, t.raca, r.qtd_filhos, r.gmd_medio_filhos, "
+            "    r.efeito_touro, r.acuracia, r.filhos_avaliados, r.calculado_em "
+            "FROM ranking_touros r "
+            "JOIN animais t ON t.id = r.touro_id AND t.deleted_at IS NULL "
+            "WHERE r.user_id = %s "
+            "ORDER BY r.efeito_touro IS NULL, r.efeito_touro DESC, r.gmd_medio_filhos DESC",
+            (user_id,)
         )
         return cursor.fetchall()
 
 
+def recalcular_ranking_touros(cursor):
+    """Refaz ranking_touros de todos os tenants numa passada (job noturno / v0006).
+
+    GMD de cada filho pela primeira/última pesagem (animal_pesagem_resumo);
+    grupo contemporâneo = fazenda x estação de nascimento x sexo x lote.
+    Retorna a quantidade de touros gravados.
+    """
+    cursor.execute(
+        "SELECT f.user_id, f.pai_id, f.sexo, f.lote_id, "
+        "    COALESCE(f.data_nascimento, f.data_compra), "
+        "    (r.ultimo_peso - r.primeiro_peso) "
+        "        / NULLIF(DATEDIFF(r.ultima_data, r.primeira_data), 0) "
+        "FROM animais f "
+        "JOIN animais t ON t.id = f.pai_id AND t.deleted_at IS NULL "
+        "LEFT JOIN animal_pesagem_resumo r ON r.animal_id = f.id "
+        "WHERE f.pai_id IS NOT NULL AND f.deleted_at IS NULL"
+    )
+    filhos = cursor.fetchall()
+
+    por_touro = {}
+    com_gmd = []
+    for user_id, touro_id, sexo, lote_id, data_ref, gmd in filhos:
+        registro = por_touro.setdefault((user_id, touro_id), [0, []])
+        registro[0] += 1
+        if gmd is not None:
+            registro[1].append(float(gmd))
+            com_gmd.append((touro_id, grupo_contemporaneo(user_id, data_ref, sexo, lote_id), float(gmd)))
+
+    avaliacao = avaliar_touros([c[0] for c in com_gmd], [c[1] for c in com_gmd], [c[2] for c in com_gmd])
+
+    linhas = []
+    for (user_id, touro_id), (qtd, gmds) in por_touro.items():
+        avaliados, desvio, efeito, acuracia = avaliacao.get(touro_id, (0, None, None, None))
+        gmd_medio = round(sum(gmds) / len(gmds), 3) if gmds else None
+        linhas.append((user_id, touro_id, qtd, avaliados, gmd_medio, desvio, efeito, acuracia))
+
+    cursor.execute("DELETE FROM ranking_touros")
+    if linhas:
+        cursor.executemany(
+            "INSERT INTO ranking_touros "
+            "    (user_id, touro_id, qtd_filhos, filhos_avaliados, gmd_medio_filhos, "
+            "     desvio_medio, efeito_touro, acuracia) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            linhas
+        )
+    return len(linhas)
+
+
 # ---- MEDICACOES ----
 
 def get_medicacoes_by_animal(animal_id):
@@ -598,21 +885,34 @@ def _inserir_animal(cursor, brinco, sexo, data_compra, preco_compra, peso_entrad
     """
     cursor.execute(
         "INSERT INTO animais "
-        "(brinco, sexo, raca, data_compra, data_nascimento, preco_compra, user_id, mae_id, pai_id) "
-        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
-        (brinco, sexo, _normalizar_raca(raca), data_compra or None, data_nascimento or None,
-         preco_compra or None, user_id, mae_id or None, pai_id or None)
+        "(brinco, brinco_ordem, sexo, raca, data_compra, data_nascimento, preco_compra, user_id, mae_id, pai_id) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        (brinco, chave_ordem_brinco(brinco), sexo, _normalizar_raca(raca), data_compra or None,
+         data_nascimento or None, preco_compra or None, user_id, mae_id or None, pai_id or None)
     )
     animal_id = cursor.lastrowid
+    genealogia_repository._inserir_genealogia(cursor, animal_id, user_id, pai_id, mae_id)
+    busca_repository.incrementar_versao(cursor, user_id)
     data_ref = data_compra or data_nascimento
     if peso_entrada and data_ref:
         cursor.execute(
             "INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, %s, %s)",
             (animal_id, data_ref, peso_entrada)
         )
+        atualizar_resumo_pesagens(cursor, [animal_id])
     return animal_id
 
 
+def _refechar_custos(cursor, user_id, *datas):
+    """Rateio dos meses já fechados desde a mais antiga das datas (entrada/saída do animal).
+
+    Entrada = data_compra, ou data_nascimento para quem nasceu na fazenda.
+    """
+    # Import local: financeiro_repository importa este módulo.
+    from repositories.financeiro_repository import refechar_competencias
+    refechar_competencias(cursor, user_id, datas)
+
+
 def cadastrar_animal(brinco, sexo, data_compra, preco_compra, peso_entrada, user_id,
                      data_nascimento=None, mae_id=None, pai_id=None, raca=None):
     """Insere animal e pesagem inicial (quando disponível) na mesma transação. Retorna animal_id.
@@ -621,18 +921,21 @@ def cadastrar_animal(brinco, sexo, data_compra, preco_compra, peso_entrada, user
     Pesagem inicial só é inserida se peso_entrada for fornecido (> 0).
     """
     with get_db_cursor() as cursor:
-        return _inserir_animal(cursor, brinco, sexo, data_compra, preco_compra, peso_entrada,
-                               user_id, data_nascimento, mae_id, pai_id, raca)
+        animal_id = _inserir_animal(cursor, brinco, sexo, data_compra, preco_compra, peso_entrada,
+                                    user_id, data_nascimento, mae_id, pai_id, raca)
+        _refechar_custos(cursor, user_id, data_compra or data_nascimento)
+        return animal_id
 
 
 def registrar_venda(animal_id, user_id, data_venda, preco_venda, peso_venda):
     """Atualiza venda e registra pesagem final na mesma transação. Retorna True se o animal pertence ao usuário."""
     with get_db_cursor() as cursor:
         cursor.execute(
-            "SELECT id FROM animais WHERE id = %s AND user_id = %s AND deleted_at IS NULL",
+            "SELECT data_venda FROM animais WHERE id = %s AND user_id = %s AND deleted_at IS NULL",
             (animal_id, user_id)
         )
-        if not cursor.fetchone():
+        row = cursor.fetchone()
+        if not row:
             return False
         cursor.execute(
             "UPDATE animais SET data_venda = %s, preco_venda = %s WHERE id = %s",
@@ -642,6 +945,9 @@ def registrar_venda(animal_id, user_id, data_venda, preco_venda, peso_venda):
             "INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, %s, %s)",
             (animal_id, data_venda, peso_venda)
         )
+        _apos_pesagens(cursor, user_id, [animal_id])
+        busca_repository.incrementar_versao(cursor, user_id)
+        _refechar_custos(cursor, user_id, data_venda, row[0])
         return True
 
 
@@ -677,6 +983,9 @@ def registrar_venda_lote(vendas, user_id, data_venda):
                 "INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, %s, %s)",
                 [(aid, data_venda, peso_venda) for aid, peso_venda, preco_venda in vendas_validas]
             )
+            _apos_pesagens(cursor, user_id, [aid for aid, _, _ in vendas_validas])
+            busca_repository.incrementar_versao(cursor, user_id)
+            _refechar_custos(cursor, user_id, data_venda)
 
     return len(vendas_validas), invalidos
 
@@ -694,6 +1003,7 @@ def registrar_pesagem(animal_id, user_id, data_pesagem, peso):
             "INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, %s, %s)",
             (animal_id, data_pesagem, peso)
         )
+        _apos_pesagens(cursor, user_id, [animal_id])
         return True
 
 
@@ -711,6 +1021,8 @@ def registrar_medicacao(animal_id, user_id, data_aplicacao, nome, custo, obs):
             "VALUES (%s, %s, %s, %s, %s)",
             (animal_id, data_aplicacao, nome, custo, obs)
         )
+        atualizar_resultado_por_animais(cursor, [animal_id])
+        kpi_repository.incrementar_versao(cursor, user_id)
         return True
 
 
@@ -736,21 +1048,27 @@ def insert_medicacao_lote(animal_ids, data_aplicacao, nome, custo, obs, user_id)
             "VALUES (%s, %s, %s, %s, %s)",
             [(aid, data_aplicacao, nome, custo, obs) for aid in animal_ids]
         )
+        atualizar_resultado_por_animais(cursor, animal_ids)
+        kpi_repository.incrementar_versao(cursor, user_id)
 
 
 def soft_delete_animal(animal_id, user_id):
     """Soft delete com verificação de propriedade. Retorna True se o animal pertence ao usuário."""
     with get_db_cursor() as cursor:
         cursor.execute(
-            "SELECT id FROM animais WHERE id = %s AND user_id = %s",
+            "SELECT COALESCE(data_compra, data_nascimento) FROM animais WHERE id = %s AND user_id = %s",
             (animal_id, user_id)
         )
-        if not cursor.fetchone():
+        row = cursor.fetchone()
+        if not row:
             return False
         cursor.execute(
             "UPDATE animais SET deleted_at = %s WHERE id = %s",
             (datetime.now(), animal_id)
         )
+        busca_repository.incrementar_versao(cursor, user_id)
+        atualizar_resultado_por_animais(cursor, [animal_id])
+        _refechar_custos(cursor, user_id, row[0])
         return True
 
 
@@ -771,6 +1089,7 @@ def soft_delete_pesagem(pesagem_id, user_id):
             "UPDATE pesagens SET deleted_at = %s WHERE id = %s",
             (datetime.now(), pesagem_id)
         )
+        _apos_pesagens(cursor, user_id, [animal_id])
         return animal_id
 
 
@@ -780,6 +1099,12 @@ def restore_animal(animal_id, user_id):
             "UPDATE animais SET deleted_at = NULL WHERE id = %s AND user_id = %s",
             (animal_id, user_id)
         )
+        if cursor.rowcount:
+            busca_repository.incrementar_versao(cursor, user_id)
+            atualizar_resultado_por_animais(cursor, [animal_id])
+            cursor.execute("SELECT COALESCE(data_compra, data_nascimento) FROM animais WHERE id = %s",
+                           (animal_id,))
+            _refechar_custos(cursor, user_id, cursor.fetchone()[0])
 
 
 def cadastrar_lote(user_id, codigo_lote, descricao, data_compra, animais_data, raca=None):
@@ -796,9 +1121,10 @@ def cadastrar_lote(user_id, codigo_lote, descricao, data_compra, animais_data, r
         lote_id = cursor.lastrowid
 
         cursor.executemany(
-            "INSERT INTO animais (brinco, sexo, raca, data_compra, preco_compra, user_id, lote_id) "
-            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
-            [(brinco, sexo, _normalizar_raca(raca), data_compra, custo_animal, user_id, lote_id)
+            "INSERT INTO animais (brinco, brinco_ordem, sexo, raca, data_compra, preco_compra, user_id, lote_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            [(brinco, chave_ordem_brinco(brinco), sexo, _normalizar_raca(raca), data_compra,
+              custo_animal, user_id, lote_id)
              for brinco, sexo, peso, custo_animal in animais_data]
         )
 
@@ -817,4 +1143,8 @@ def cadastrar_lote(user_id, codigo_lote, descricao, data_compra, animais_data, r
             "INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, %s, %s)",
             [(id_por_brinco[brinco], data_compra, peso) for brinco, sexo, peso, custo_animal in animais_data]
         )
+        atualizar_resumo_pesagens(cursor, list(id_por_brinco.values()))
+        atualizar_resultado_lotes(cursor, [lote_id])
+        busca_repository.incrementar_versao(cursor, user_id)
+        _refechar_custos(cursor, user_id, data_compra)
         return lote_id
@@ -0,0 +1,189 @@
+"""Arquivo frio de animais encerrados (vendidos há tempo ou esquecidos na lixeira).
+
+As telas do rebanho ativo filtram `data_venda IS NULL AND deleted_at IS NULL`,
+mas anos de animais vendidos continuavam nas mesmas tabelas e índices, inflando
+todo scan de GMD/peso atual. Aqui movemos esses animais — com pesagens,
+medicações e vínculos de ocupação — para as tabelas *_arquivo, em lotes
+pequenos (uma transação por lote) para não segurar locks por muito tempo.
+
+Relatórios históricos leem quente + frio pelas views vw_*_historico.
+"""
+from db_config import get_db_cursor
+from repositories import busca_repository
+from repositories.animal_repository import atualizar_resumo_pesagens
+
+_COLUNAS_ANIMAL = (
+    "id, brinco, sexo, raca, data_compra, preco_compra, data_venda, preco_venda, "
+    "user_id, deleted_at, lote_id, pai_id, mae_id, data_nascimento, brinco_ordem"
+)
+
+# Animais ainda referenciados por outras linhas ficam na tabela quente:
+#  - pais (pai_id/mae_id têm FK para animais, e a progênie precisa do registro);
+#  - vacas/touros em reproducao (vaca_id é CASCADE — arquivar apagaria o histórico);
+#  - animais em ocupação aberta (ainda contam na lotação do módulo).
+_CANDIDATOS_SQL = (
+    "SELECT a.id FROM animais a "
+    "WHERE a.id > %s {filtro_usuario}"
+    "  AND ((a.deleted_at IS NULL AND a.data_venda IS NOT NULL AND a.data_venda < %s) "
+    "       OR (a.deleted_at IS NOT NULL AND a.deleted_at < %s)) "
+    "  AND NOT EXISTS (SELECT 1 FROM animais f WHERE f.pai_id = a.id OR f.mae_id = a.id) "
+    "  AND NOT EXISTS (SELECT 1 FROM animais_arquivo f WHERE f.pai_id = a.id OR f.mae_id = a.id) "
+    "  AND NOT EXISTS (SELECT 1 FROM reproducao r WHERE r.vaca_id = a.id OR r.touro_id = a.id) "
+    "  AND NOT EXISTS (SELECT 1 FROM ocupacao_animais oa "
+    "                  JOIN ocupacoes o ON o.id = oa.ocupacao_id "
+    "                  WHERE oa.animal_id = a.id AND o.data_saida IS NULL) "
+    "ORDER BY a.id LIMIT %s "
+    "FOR UPDATE"
+)
+
+
+def _in_clause(ids):
+    return "(" + ", ".join(["%s"] * len(ids)) + ")"
+
+
+def arquivar_lote(corte_venda, corte_lixeira, apos_id=0, limite=500, user_id=None):
+    """Arquiva até `limite` animais elegíveis com id > `apos_id` numa única transação.
+
+    corte_venda: vendidos antes desta data são arquivados.
+    corte_lixeira: na lixeira desde antes deste datetime são arquivados.
+    user_id: restringe a um usuário; o job passa None e varre todos.
+    Retorna (qtd_arquivada, ultimo_id) — ultimo_id alimenta a próxima chamada
+    (paginação por chave, sem OFFSET). qtd 0 indica fim.
+    """
+    with get_db_cursor() as cursor:
+        if user_id is None:
+            sql, params = _CANDIDATOS_SQL.format(filtro_usuario=""), (apos_id,)
+        else:
+            sql, params = _CANDIDATOS_SQL.format(filtro_usuario="AND a.user_id = %s "), (apos_id, user_id)
+        cursor.execute(sql, params + (corte_venda, corte_lixeira, limite))
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return 0, apos_id
+
+        in_ids = _in_clause(ids)
+        params = tuple(ids)
+        cursor.execute(
+            "INSERT INTO animais_arquivo (" + _COLUNAS_ANIMAL + ") "
+            "SELECT " + _COLUNAS_ANIMAL + " FROM animais WHERE id IN " + in_ids,
+            params
+        )
+        cursor.execute(
+            "INSERT INTO pesagens_arquivo (id, animal_id, data_pesagem, peso, deleted_at) "
+            "SELECT id, animal_id, data_pesagem, peso, deleted_at "
+            "FROM pesagens WHERE animal_id IN " + in_ids,
+            params
+        )
+        cursor.execute(
+            "INSERT INTO medicacoes_arquivo "
+            "(id, animal_id, data_aplicacao, nome_medicamento, custo, observacoes, deleted_at) "
+            "SELECT id, animal_id, data_aplicacao, nome_medicamento, custo, observacoes, deleted_at "
+            "FROM medicacoes WHERE animal_id IN " + in_ids,
+            params
+        )
+        cursor.execute(
+            "INSERT INTO ocupacao_animais_arquivo (id, ocupacao_id, animal_id) "
+            "SELECT id, ocupacao_id, animal_id FROM ocupacao_animais WHERE animal_id IN " + in_ids,
+            params
+        )
+
+        # pesagens/medicacoes são RESTRICT: saem antes do animal.
+        for tabela in ("ocupacao_animais", "pesagens", "medicacoes"):
+            cursor.execute("DELETE FROM " + tabela + " WHERE animal_id IN " + in_ids, params)
+        cursor.execute("SELECT DISTINCT user_id FROM animais WHERE id IN " + in_ids, params)
+        for (user_id,) in cursor.fetchall():
+            busca_repository.incrementar_versao(cursor, user_id)
+        cursor.execute("DELETE FROM animais WHERE id IN " + in_ids, params)
+
+        return len(ids), ids[-1]
+
+
+def arquivar_encerrados(corte_venda, corte_lixeira, limite=500, user_id=None):
+    """Percorre todos os candidatos em lotes de `limite`. Retorna o total arquivado."""
+    total, ultimo_id = 0, 0
+    while True:
+        qtd, ultimo_id = arquivar_lote(corte_venda, corte_lixeira, ultimo_id, limite, user_id)
+        if qtd == 0:
+            return total
+        total += qtd
+
+
+def count_animais_arquivados(user_id, termo=None):
+    sql = "SELECT COUNT(*) FROM animais_arquivo WHERE user_id = %s"
+    params = [user_id]
+    if termo:
+        sql += " AND brinco LIKE %s"
+        params.append(f"{termo}%")
+    with get_db_cursor() as cursor:
+        cursor.execute(sql, tuple(params))
+        return cursor.fetchone()[0]
+
+
+def get_animais_arquivados_paginados(user_id, limit, offset, termo=None):
+    """Retorna (id, brinco, sexo, data_venda, preco_venda, deleted_at, arquivado_em)."""
+    sql = (
+        "SELECT id, brinco, sexo, data_venda, preco_venda, deleted_at, arquivado_em "
+        "FROM animais_arquivo WHERE user_id = %s"
+    )
+    params = [user_id]
+    if termo:
+        sql += " AND brinco LIKE %s"
+        params.append(f"{termo}%")
+    sql += " ORDER BY arquivado_em DESC, id DESC LIMIT %s OFFSET %s"
+    with get_db_cursor() as cursor:
+        cursor.execute(sql, tuple(params + [limit, offset]))
+        return cursor.fetchall()
+
+
+def restaurar_animal_arquivado(animal_id, user_id):
+    """Devolve o animal (e seu histórico) às tabelas quentes, preservando os ids.
+
+    Retorna 'ok', 'nao_encontrado' ou 'brinco_em_uso' — o brinco pode ter sido
+    reutilizado por outro animal depois do arquivamento (UNIQUE brinco+user_id).
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT brinco FROM animais_arquivo WHERE id = %s AND user_id = %s FOR UPDATE",
+            (animal_id, user_id)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return 'nao_encontrado'
+        cursor.execute(
+            "SELECT 1 FROM animais WHERE brinco = %s AND user_id = %s",
+            (row[0], user_id)
+        )
+        if cursor.fetchone():
+            return 'brinco_em_uso'
+
+        cursor.execute(
+            "INSERT INTO animais (" + _COLUNAS_ANIMAL + ") "
+            "SELECT " + _COLUNAS_ANIMAL + " FROM animais_arquivo WHERE id = %s",
+            (animal_id,)
+        )
+        cursor.execute(
+            "INSERT INTO pesagens (id, animal_id, data_pesagem, peso, deleted_at) "
+            "SELECT id, animal_id, data_pesagem, peso, deleted_at "
+            "FROM pesagens_arquivo WHERE animal_id = %s",
+            (animal_id,)
+        )
+        cursor.execute(
+            "INSERT INTO medicacoes "
+            "(id, animal_id, data_aplicacao, nome_medicamento, custo, observacoes, deleted_at) "
+            "SELECT id, animal_id, data_aplicacao, nome_medicamento, custo, observacoes, deleted_at "
+            "FROM medicacoes_arquivo WHERE animal_id = %s",
+            (animal_id,)
+        )
+        # Só volta o vínculo cuja ocupação ainda existe (o módulo pode ter sido removido).
+        cursor.execute(
+            "INSERT INTO ocupacao_animais (id, ocupacao_id, animal_id) "
+            "SELECT oa.id, oa.ocupacao_id, oa.animal_id FROM ocupacao_animais_arquivo oa "
+            "JOIN ocupacoes o ON o.id = oa.ocupacao_id "
+            "WHERE oa.animal_id = %s",
+            (animal_id,)
+        )
+        for tabela in ("ocupacao_animais_arquivo", "pesagens_arquivo", "medicacoes_arquivo"):
+            cursor.execute("DELETE FROM " + tabela + " WHERE animal_id = %s", (animal_id,))
+        cursor.execute("DELETE FROM animais_arquivo WHERE id = %s", (animal_id,))
+        atualizar_resumo_pesagens(cursor, [animal_id])
+        busca_repository.incrementar_versao(cursor, user_id)
+        return 'ok'
@@ -1,4 +1,7 @@
+from itertools import islice
+
 from db_config import get_db_cursor
+from utils.blob_store import get_blob_store
 
 
 def get_user_by_email(email):
@@ -62,41 +65,151 @@ def update_password(user_id, new_hash):
         )
 
 
-def delete_user_and_data(user_id):
-    """Apaga o tenant inteiro em uma única transação, na ordem de dependência.
+# Etapas da purga de um tenant, na ordem de dependência:
+# netos → filhos → tabelas diretas de usuarios → usuarios.
+# Cada etapa é (tabela, SELECT dos ids do tenant com LIMIT) ou, nas tabelas sem
+# coluna id, (tabela, DELETE ... WHERE user_id = %s LIMIT %s) pelo índice de
+# user_id. A maioria das FKs para usuarios(id) é RESTRICT, então um DELETE
+# direto em usuarios falha (errno 1451) enquanto houver qualquer dado. As
+# tabelas com CASCADE (ocupacao_animais a partir de ocupacoes/animais; custeio,
+# snapshots, relatórios e jobs a partir de usuarios) também são apagadas
+# explicitamente: a cascata não respeitaria o tamanho do lote.
+# Blobs saem antes das linhas que os apontam: a etapa "blobs" apaga o prefixo
+# do tenant no blob store, e um SELECT com segunda coluna (blob_chave) apaga o
+# blob de cada linha do lote antes da linha.
+_ETAPAS_PURGA = [
+    # arquivo frio (sem FKs para animais; animais_arquivo referencia usuarios)
+    ("pesagens_arquivo",
+     "SELECT p.id FROM pesagens_arquivo p JOIN animais_arquivo a ON p.animal_id = a.id WHERE a.user_id = %s LIMIT %s"),
+    ("medicacoes_arquivo",
+     "SELECT m.id FROM medicacoes_arquivo m JOIN animais_arquivo a ON m.animal_id = a.id WHERE a.user_id = %s LIMIT %s"),
+    ("ocupacao_animais_arquivo",
+     "SELECT oa.id FROM ocupacao_animais_arquivo oa JOIN animais_arquivo a ON oa.animal_id = a.id WHERE a.user_id = %s LIMIT %s"),
+    ("animais_arquivo", "SELECT id FROM animais_arquivo WHERE user_id = %s LIMIT %s"),
+    # filhos de animais que bloqueiam o DELETE de animais (RESTRICT)
+    ("pesagens",
+     "SELECT p.id FROM pesagens p JOIN animais a ON p.animal_id = a.id WHERE a.user_id = %s LIMIT %s"),
+    ("medicacoes",
+     "SELECT m.id FROM medicacoes m JOIN animais a ON m.animal_id = a.id WHERE a.user_id = %s LIMIT %s"),
+    ("reproducao", "SELECT id FROM reproducao WHERE user_id = %s LIMIT %s"),
+    ("genealogia", "SELECT id FROM genealogia WHERE user_id = %s LIMIT %s"),
+    # cadeia de pastos
+    ("ocupacao_animais",
+     "SELECT oa.id FROM ocupacao_animais oa JOIN ocupacoes o ON oa.ocupacao_id = o.id WHERE o.user_id = %s LIMIT %s"),
+    ("ocupacoes", "SELECT id FROM ocupacoes WHERE user_id = %s LIMIT %s"),
+    ("modulos", "SELECT id FROM modulos WHERE user_id = %s LIMIT %s"),
+    ("pastos", "SELECT id FROM pastos WHERE user_id = %s LIMIT %s"),
+    # animais antes de lotes (animais.lote_id é RESTRICT)
+    ("animais", "SELECT id FROM animais WHERE user_id = %s LIMIT %s"),
+    ("lotes", "SELECT id FROM lotes WHERE user_id = %s LIMIT %s"),
+    # estoque
+    ("estoque_movimentacoes", "SELECT id FROM estoque_movimentacoes WHERE user_id = %s LIMIT %s"),
+    ("estoque_produtos", "SELECT id FROM estoque_produtos WHERE user_id = %s LIMIT %s"),
+    # tabelas diretas de usuarios
+    ("custos_operacionais", "SELECT id FROM custos_operacionais WHERE user_id = %s LIMIT %s"),
+    ("configuracoes", "SELECT id FROM configuracoes WHERE user_id = %s LIMIT %s"),
+    ("financial_schedule", "SELECT id FROM financial_schedule WHERE user_id = %s LIMIT %s"),
+    ("protocolos_sanitarios", "SELECT id FROM protocolos_sanitarios WHERE user_id = %s LIMIT %s"),
+    ("password_reset_tokens", "SELECT id FROM password_reset_tokens WHERE user_id = %s LIMIT %s"),
+    # derivadas, CASCADE a partir de usuarios (custo_animal* não referenciam animais)
+    ("custo_animal_mes", "DELETE FROM custo_animal_mes WHERE user_id = %s LIMIT %s"),
+    ("custo_animal", "DELETE FROM custo_animal WHERE user_id = %s LIMIT %s"),
+    ("fechamento_custos", "DELETE FROM fechamento_custos WHERE user_id = %s LIMIT %s"),
+    ("rebanho_snapshot_diario", "DELETE FROM rebanho_snapshot_diario WHERE user_id = %s LIMIT %s"),
+    ("kpi_snapshot", "DELETE FROM kpi_snapshot WHERE user_id = %s LIMIT %s"),
+    ("blobs", "relatorios/{user_id}/"),
+    ("relatorio_cache", "DELETE FROM relatorio_cache WHERE user_id = %s LIMIT %s"),
+    ("relatorio_mensal_envio", "DELETE FROM relatorio_mensal_envio WHERE user_id = %s LIMIT %s"),
+    ("jobs", "SELECT id, blob_chave FROM jobs WHERE user_id = %s LIMIT %s"),
+    ("usuarios", "SELECT id FROM usuarios WHERE id = %s LIMIT %s"),
+]
+
+
+def desativar_conta(user_id):
+    """Bloqueia a conta na hora e enfileira a purga dos dados.
+
+    O email é apagado já aqui: sem ele a conta sai dos alertas por email e da
+    recuperação de senha enquanto a purga ainda não terminou.
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE usuarios SET desativado_em = NOW(), email = NULL WHERE id = %s",
+            (user_id,)
+        )
+        cursor.execute(
+            "UPDATE password_reset_tokens SET used = 1 WHERE user_id = %s AND used = 0",
+            (user_id,)
+        )
+        cursor.execute(
+            "INSERT IGNORE INTO purga_tenant (user_id) VALUES (%s)",
+            (user_id,)
+        )
+
+
+def get_purgas_pendentes():
+    """user_ids com purga solicitada e não concluída, mais antigas primeiro."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT user_id FROM purga_tenant WHERE concluida_em IS NULL ORDER BY solicitada_em"
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def purgar_lote(user_id, etapa, limite=5000):
+    """Apaga até `limite` linhas da etapa `etapa` numa transação curta.
 
-    A maioria das FKs para usuarios(id) é RESTRICT (sem ON DELETE CASCADE),
-    então um DELETE direto em usuarios falha (errno 1451) se houver qualquer
-    dado. Removemos os filhos primeiro. Tabelas com CASCADE a partir de
-    usuarios (pastos, estoque_produtos, protocolos_sanitarios,
-    password_reset_tokens) e a partir de animais (ocupacao_animais) somem
-    junto — mas as intermediárias com user_id RESTRICT (modulos, ocupacoes,
-    estoque_movimentacoes, reproducao) precisam ser apagadas explicitamente.
+    Retorna (proxima_etapa, linhas_apagadas). O progresso é gravado na mesma
+    transação do DELETE — após uma queda, a purga recomeça de onde parou.
+    proxima_etapa == len(_ETAPAS_PURGA) indica fim.
     """
-    # Ordem: netos → filhos → tabelas diretas de usuarios → usuarios.
-    comandos = [
-        # filhos de animais que bloqueiam o DELETE de animais (RESTRICT)
-        "DELETE p FROM pesagens p JOIN animais a ON p.animal_id = a.id WHERE a.user_id = %s",
-        "DELETE m FROM medicacoes m JOIN animais a ON m.animal_id = a.id WHERE a.user_id = %s",
-        "DELETE FROM reproducao WHERE user_id = %s",
-        # cadeia de pastos (ocupacao_animais cascateia de ocupacoes)
-        "DELETE FROM ocupacoes WHERE user_id = %s",
-        "DELETE FROM modulos WHERE user_id = %s",
-        "DELETE FROM pastos WHERE user_id = %s",
-        # animais antes de lotes (animais.lote_id é RESTRICT)
-        "DELETE FROM animais WHERE user_id = %s",
-        "DELETE FROM lotes WHERE user_id = %s",
-        # estoque
-        "DELETE FROM estoque_movimentacoes WHERE user_id = %s",
-        "DELETE FROM estoque_produtos WHERE user_id = %s",
-        # tabelas diretas de usuarios
-        "DELETE FROM custos_operacionais WHERE user_id = %s",
-        "DELETE FROM configuracoes WHERE user_id = %s",
-        "DELETE FROM financial_schedule WHERE user_id = %s",
-        "DELETE FROM protocolos_sanitarios WHERE user_id = %s",
-        "DELETE FROM password_reset_tokens WHERE user_id = %s",
-        "DELETE FROM usuarios WHERE id = %s",
-    ]
+    tabela, sql = _ETAPAS_PURGA[etapa]
+    with get_db_cursor() as cursor:
+        if tabela == "blobs":
+            store = get_blob_store()
+            chaves = [chave for chave, _ in islice(store.listar(sql.format(user_id=user_id)), limite)]
+            for chave in chaves:
+                store.apagar(chave)
+            apagadas = len(chaves)
+        elif sql.startswith("DELETE"):
+            cursor.execute(sql, (user_id, limite))
+            apagadas = cursor.rowcount
+        else:
+            cursor.execute(sql, (user_id, limite))
+            linhas = cursor.fetchall()
+            ids = [row[0] for row in linhas]
+            for row in linhas:
+                if len(row) > 1 and row[1]:
+                    get_blob_store().apagar(row[1])
+            if ids:
+                cursor.execute(
+                    "DELETE FROM " + tabela + " WHERE id IN (" + ", ".join(["%s"] * len(ids)) + ")",
+                    tuple(ids)
+                )
+            apagadas = len(ids)
+        # Lote incompleto: a etapa esvaziou, avança. Lote cheio: repete a etapa.
+        proxima = etapa if apagadas == limite else etapa + 1
+        concluida = proxima >= len(_ETAPAS_PURGA)
+        cursor.execute(
+            "UPDATE purga_tenant SET etapa = %s, linhas_apagadas = linhas_apagadas + %s, "
+            "atualizada_em = NOW(), concluida_em = IF(%s, NOW(), NULL) WHERE user_id = %s",
+            (proxima, apagadas, concluida, user_id)
+        )
+        return proxima, apagadas
+
+
+def get_etapa_purga(user_id):
     with get_db_cursor() as cursor:
-        for sql in comandos:
-            cursor.execute(sql, (user_id,))
+        cursor.execute("SELECT etapa FROM purga_tenant WHERE user_id = %s", (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+
+def delete_user_and_data(user_id, limite=5000):
+    """Apaga o tenant inteiro em lotes, na ordem de _ETAPAS_PURGA.
+
+    Retoma da etapa gravada em purga_tenant, se houver. Cada lote é uma
+    transação própria — nenhum lock longo em pesagens/animais.
+    """
+    etapa = get_etapa_purga(user_id)
+    while etapa < len(_ETAPAS_PURGA):
+        etapa, _ = purgar_lote(user_id, etapa, limite)
@@ -0,0 +1,44 @@
+"""Origem do índice de busca em memória (utils.busca) e versão dos dados do tenant."""
+from db_config import get_db_cursor
+
+
+def incrementar_versao(cursor, user_id):
+    """Marca os dados do tenant como alterados — invalida o índice de busca.
+
+    Chamada na mesma transação da escrita em animais, lotes, pastos ou produtos.
+    Sobe também versao_kpi: o rebanho ativo entra nos KPIs (utils.kpis).
+    """
+    cursor.execute(
+        "INSERT INTO tenant_versao (user_id, versao, versao_kpi) VALUES (%s, 1, 1) "
+        "ON DUPLICATE KEY UPDATE versao = versao + 1, versao_kpi = versao_kpi + 1",
+        (user_id,)
+    )
+
+
+def get_versao(user_id):
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT versao FROM tenant_versao WHERE user_id = %s", (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+
+def get_itens_busca(user_id):
+    """(tipo, id, rotulo, detalhe) de tudo que entra no typeahead.
+
+    Animais da lixeira ficam de fora; arquivados também (não estão em animais).
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT 'animal', id, brinco, "
+            "CONCAT(IF(sexo = 'M', 'macho', 'fêmea'), ', ', IF(data_venda IS NULL, 'ativo', 'vendido')) "
+            "FROM animais WHERE user_id = %s AND deleted_at IS NULL "
+            "UNION ALL "
+            "SELECT 'lote', id, codigo_lote, descricao "
+            "FROM lotes WHERE user_id = %s AND deleted_at IS NULL "
+            "UNION ALL "
+            "SELECT 'pasto', id, nome, forrageira FROM pastos WHERE user_id = %s "
+            "UNION ALL "
+            "SELECT 'produto', id, nome, categoria FROM estoque_produtos WHERE user_id = %s",
+            (user_id, user_id, user_id, user_id)
+        )
+        return cursor.fetchall()
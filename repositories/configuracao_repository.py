@@ -1,27 +1,36 @@
 from db_config import get_db_cursor
+from repositories import kpi_repository
 
 
 def get_configuracao(user_id):
-    """Retorna (nome_fazenda, cidade_estado, area_total, gmd_meta) ou None se não configurado."""
+    """Retorna (nome_fazenda, cidade_estado, area_total, gmd_meta, relatorio_mensal) ou None se não configurado."""
     with get_db_cursor() as cursor:
         cursor.execute(
-            "SELECT nome_fazenda, cidade_estado, area_total, gmd_meta "
+            "SELECT nome_fazenda, cidade_estado, area_total, gmd_meta, relatorio_mensal "
             "FROM configuracoes WHERE user_id = %s",
             (user_id,)
         )
         return cursor.fetchone()
 
 
-def upsert_configuracao(user_id, nome_fazenda, cidade_estado, area_total, gmd_meta=0.800):
-    """Cria ou atualiza as configurações do usuário (INSERT … ON DUPLICATE KEY UPDATE)."""
+def upsert_configuracao(user_id, nome_fazenda, cidade_estado, area_total, gmd_meta=0.800,
+                        relatorio_mensal=False):
+    """Cria ou atualiza as configurações do usuário (INSERT … ON DUPLICATE KEY UPDATE).
+
+    A cidade define a praça do valor de mercado — invalida os KPIs do tenant.
+    relatorio_mensal: opt-in do PDF por email no dia 1º (utils.relatorio).
+    """
     with get_db_cursor() as cursor:
         cursor.execute(
-            "INSERT INTO configuracoes (user_id, nome_fazenda, cidade_estado, area_total, gmd_meta) "
-            "VALUES (%s, %s, %s, %s, %s) "
+            "INSERT INTO configuracoes "
+            "(user_id, nome_fazenda, cidade_estado, area_total, gmd_meta, relatorio_mensal) "
+            "VALUES (%s, %s, %s, %s, %s, %s) "
             "ON DUPLICATE KEY UPDATE "
             "nome_fazenda = VALUES(nome_fazenda), "
             "cidade_estado = VALUES(cidade_estado), "
             "area_total = VALUES(area_total), "
-            "gmd_meta = VALUES(gmd_meta)",
-            (user_id, nome_fazenda, cidade_estado, area_total, gmd_meta)
+            "gmd_meta = VALUES(gmd_meta), "
+            "relatorio_mensal = VALUES(relatorio_mensal)",
+            (user_id, nome_fazenda, cidade_estado, area_total, gmd_meta, bool(relatorio_mensal))
         )
+        kpi_repository.incrementar_versao(cursor, user_id)
@@ -0,0 +1,50 @@
+"""Cotações da arroba gravadas por dia (cotacoes_historico) — tabela global, sem tenant."""
+from db_config import get_db_cursor
+
+
+def gravar_cotacoes(data, linhas):
+    """Upsert de [(categoria, praca, preco_vista)] na data; retorna as linhas gravadas."""
+    if not linhas:
+        return 0
+    with get_db_cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO cotacoes_historico (data, categoria, praca, preco_vista) "
+            "VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE preco_vista = VALUES(preco_vista)",
+            [(data, categoria, praca, preco) for categoria, praca, preco in linhas]
+        )
+    return len(linhas)
+
+
+def get_data_mais_recente():
+    """Data da última cotação gravada (None se a tabela está vazia)."""
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT MAX(data) FROM cotacoes_historico")
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def get_cotacoes_do_dia(data):
+    """[(categoria, praca, preco_vista)] gravadas na data."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT categoria, praca, preco_vista FROM cotacoes_historico WHERE data = %s",
+            (data,)
+        )
+        return cursor.fetchall()
+
+
+def get_historico(inicio, fim):
+    """[(data, categoria, praca, preco_vista)] de [inicio, fim] em ordem de data.
+
+    Inclui a última data anterior a `inicio`, que vale até a próxima cotação.
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT data, categoria, praca, preco_vista FROM cotacoes_historico "
+            "WHERE data BETWEEN COALESCE("
+            "  (SELECT MAX(data) FROM cotacoes_historico WHERE data < %s), %s) AND %s "
+            "ORDER BY data",
+            (inicio, inicio, fim)
+        )
+        return cursor.fetchall()
@@ -1,4 +1,5 @@
 from db_config import get_db_cursor
+from repositories import busca_repository
 
 _COLUNAS_SALDO_ESTOQUE = (
     "produto_id, user_id, nome, unidade, categoria, estoque_minimo, "
@@ -30,7 +31,9 @@ def insert_produto(user_id, nome, unidade, categoria, estoque_minimo):
             "VALUES (%s, %s, %s, %s, %s)",
             (user_id, nome, unidade, categoria, estoque_minimo or 0)
         )
-        return cursor.lastrowid
+        produto_id = cursor.lastrowid
+        busca_repository.incrementar_versao(cursor, user_id)
+        return produto_id
 
 
 def get_produto_by_id(produto_id, user_id):
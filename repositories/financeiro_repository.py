@@ -1,6 +1,8 @@
 from db_config import get_db_cursor
 from datetime import date
-from repositories.animal_repository import _gmd_ctes
+from repositories import kpi_repository
+from repositories.animal_repository import _gmd_ctes, atualizar_resultado_lotes
+from utils.custeio import competencia_de, fim_competencia, ratear
 
 
 # ---- REBANHO ----
@@ -56,6 +58,13 @@ _CUSTOS_POR_ANO_UNION = (
     " FROM medicacoes m JOIN animais a ON m.animal_id = a.id "
     " WHERE a.user_id = %s AND m.data_aplicacao >= %s AND m.data_aplicacao <= %s "
     "   AND m.deleted_at IS NULL AND a.deleted_at IS NULL "
+    " GROUP BY m.data_aplicacao, m.nome_medicamento) "
+    "UNION ALL "
+    "(SELECT m.data_aplicacao, 'Sanitário', m.nome_medicamento, "
+    " SUM(m.custo), COUNT(*), MAX(m.observacoes) "
+    " FROM medicacoes_arquivo m JOIN animais_arquivo a ON m.animal_id = a.id "
+    " WHERE a.user_id = %s AND m.data_aplicacao >= %s AND m.data_aplicacao <= %s "
+    "   AND m.deleted_at IS NULL AND a.deleted_at IS NULL "
     " GROUP BY m.data_aplicacao, m.nome_medicamento)"
 )
 
@@ -71,7 +80,7 @@ def get_custos_por_ano(user_id, ano):
     with get_db_cursor() as cursor:
         cursor.execute(
             _CUSTOS_POR_ANO_UNION + " ORDER BY 1 DESC",
-            (user_id, inicio, fim, user_id, inicio, fim)
+            (user_id, inicio, fim, user_id, inicio, fim, user_id, inicio, fim)
         )
         return cursor.fetchall()
 
@@ -83,7 +92,7 @@ def get_custos_por_ano_paginado(user_id, ano, limit, offset):
     with get_db_cursor() as cursor:
         cursor.execute(
             _CUSTOS_POR_ANO_UNION + " ORDER BY 1 DESC LIMIT %s OFFSET %s",
-            (user_id, inicio, fim, user_id, inicio, fim, limit, offset)
+            (user_id, inicio, fim, user_id, inicio, fim, user_id, inicio, fim, limit, offset)
         )
         return cursor.fetchall()
 
@@ -95,7 +104,7 @@ def count_custos_por_ano(user_id, ano):
     with get_db_cursor() as cursor:
         cursor.execute(
             "SELECT COUNT(*) FROM (" + _CUSTOS_POR_ANO_UNION + ") t",
-            (user_id, inicio, fim, user_id, inicio, fim)
+            (user_id, inicio, fim, user_id, inicio, fim, user_id, inicio, fim)
         )
         return cursor.fetchone()[0]
 
@@ -108,6 +117,15 @@ def insert_custo_operacional(user_id, categoria, tipo_custo, valor, data_custo,
             "VALUES (%s, %s, %s, %s, %s, %s)",
             (user_id, categoria, tipo_custo, valor, data_custo, descricao)
         )
+        kpi_repository.incrementar_versao(cursor, user_id)
+        # Lançamento retroativo num mês já fechado: refaz o rateio daquele mês.
+        competencia = competencia_de(data_custo)
+        cursor.execute(
+            "SELECT 1 FROM fechamento_custos WHERE user_id = %s AND competencia = %s",
+            (user_id, competencia)
+        )
+        if cursor.fetchone():
+            fechar_competencia(cursor, user_id, competencia)
 
 
 _CATEGORIAS_CACHE = None
@@ -153,10 +171,15 @@ def insert_agendamento(user_id, descricao, valor, vencimento):
 
 # ---- RESULTADO POR LOTE (P&L) ----
 
+# Lido de lote_resultado (animal_repository.atualizar_resultado_lotes).
+# (lote_id, codigo_lote, descricao, data_aquisicao, total_animais,
+#  custo_aquisicao, receita_vendas, custo_medicacoes, animais_vendidos,
+#  margem_bruta, gmd_medio)
 _COLUNAS_RESULTADO_LOTE = (
-    "lote_id, codigo_lote, descricao, data_aquisicao, "
-    "total_animais, custo_aquisicao, receita_vendas, "
-    "custo_medicacoes, animais_vendidos, margem_bruta"
+    "r.lote_id, l.codigo_lote, l.descricao, l.data_aquisicao, "
+    "r.total_animais, r.custo_aquisicao, r.receita_vendas, "
+    "r.custo_medicacoes, r.animais_vendidos, r.margem_bruta, r.gmd_medio, "
+    "r.custo_operacional, r.margem_liquida"
 )
 
 
@@ -164,8 +187,8 @@ def get_resultado_lotes(user_id):
     with get_db_cursor() as cursor:
         cursor.execute(
             f"SELECT {_COLUNAS_RESULTADO_LOTE} "
-            "FROM vw_resultado_lote "
-            "WHERE user_id = %s ORDER BY data_aquisicao DESC",
+            "FROM lote_resultado r JOIN lotes l ON l.id = r.lote_id AND l.deleted_at IS NULL "
+            "WHERE r.user_id = %s ORDER BY l.data_aquisicao DESC",
             (user_id,)
         )
         return cursor.fetchall()
@@ -175,8 +198,8 @@ def get_resultado_lote_by_id(lote_id, user_id):
     with get_db_cursor() as cursor:
         cursor.execute(
             f"SELECT {_COLUNAS_RESULTADO_LOTE} "
-            "FROM vw_resultado_lote "
-            "WHERE lote_id = %s AND user_id = %s",
+            "FROM lote_resultado r JOIN lotes l ON l.id = r.lote_id AND l.deleted_at IS NULL "
+            "WHERE r.lote_id = %s AND r.user_id = %s",
             (lote_id, user_id)
         )
         return cursor.fetchone()
@@ -186,8 +209,9 @@ def get_animais_por_lote(lote_id, user_id):
     with get_db_cursor() as cursor:
         cursor.execute(
             _gmd_ctes(
-                "JOIN animais a ON a.id = p.animal_id"
-                "    AND a.lote_id = %s AND a.user_id = %s AND a.deleted_at IS NULL"
+                "JOIN vw_animais_historico a ON a.id = p.animal_id"
+                "    AND a.lote_id = %s AND a.user_id = %s AND a.deleted_at IS NULL",
+                fonte="vw_pesagens_historico",
             ) + (
             ","
             " gmd_calc AS ("
@@ -203,15 +227,17 @@ def get_animais_por_lote(lote_id, user_id):
             "  COALESCE(m.custo_med, 0) AS custo_med,"
             "  COALESCE(g.gmd, 0) AS gmd,"
             "  COALESCE(g.peso_final, 0) AS peso_atual"
-            " FROM animais a"
-            " LEFT JOIN (SELECT animal_id, SUM(custo) AS custo_med"
-            "            FROM medicacoes WHERE deleted_at IS NULL GROUP BY animal_id) m"
+            " FROM vw_animais_historico a"
+            " LEFT JOIN (SELECT m.animal_id, SUM(m.custo) AS custo_med"
+            "            FROM vw_medicacoes_historico m"
+            "            JOIN vw_animais_historico am ON am.id = m.animal_id AND am.lote_id = %s"
+            "            WHERE m.deleted_at IS NULL GROUP BY m.animal_id) m"
             "   ON m.animal_id = a.id"
             " LEFT JOIN gmd_calc g ON g.animal_id = a.id"
             " WHERE a.lote_id = %s AND a.user_id = %s AND a.deleted_at IS NULL"
-            " ORDER BY a.brinco ASC"
+            " ORDER BY a.brinco_ordem ASC"
             ),
-            (lote_id, user_id, lote_id, user_id)
+            (lote_id, user_id, lote_id, lote_id, user_id)
         )
         return cursor.fetchall()
 
@@ -263,4 +289,152 @@ def baixar_agendamento(id_agendamento, user_id):
             (user_id, 'Financeiro', 'Agendamento', valor, date.today(),
              descricao_origem + " (Via Agendamento)")
         )
+        kpi_repository.incrementar_versao(cursor, user_id)
         return True
+
+
+# ---- CUSTEIO POR ANIMAL ----
+
+_ANIMAIS_POR_VEZ = 500
+
+
+def fechar_competencia(cursor, user_id, competencia, refazer_lotes=True):
+    """Rateia os custos operacionais do mês entre os animais presentes (animal-dia).
+
+    Idempotente: refechar o mês substitui o rateio anterior e refaz o razão
+    custo_animal (e lote_resultado) dos animais que entraram ou saíram dele.
+    Retorna (total_custos, animal_dias).
+    """
+    fim = fim_competencia(competencia)
+    cursor.execute(
+        "SELECT COALESCE(SUM(valor), 0) FROM custos_operacionais "
+        "WHERE user_id = %s AND data_custo BETWEEN %s AND %s AND deleted_at IS NULL",
+        (user_id, competencia, fim)
+    )
+    total = float(cursor.fetchone()[0])
+    cursor.execute(
+        "SELECT id, COALESCE(data_compra, data_nascimento), data_venda FROM vw_animais_historico "
+        "WHERE user_id = %s AND deleted_at IS NULL "
+        "  AND COALESCE(data_compra, data_nascimento) <= %s "
+        "  AND (data_venda IS NULL OR data_venda > %s)",
+        (user_id, fim, competencia)
+    )
+    animais = cursor.fetchall()
+    dias, valores = ratear([a[1] for a in animais], [a[2] for a in animais],
+                           competencia, fim, total)
+
+    cursor.execute(
+        "SELECT animal_id FROM custo_animal_mes WHERE user_id = %s AND competencia = %s",
+        (user_id, competencia)
+    )
+    afetados = {row[0] for row in cursor.fetchall()}
+    cursor.execute(
+        "DELETE FROM custo_animal_mes WHERE user_id = %s AND competencia = %s",
+        (user_id, competencia)
+    )
+    linhas = [(a[0], competencia, user_id, float(v), int(d))
+              for a, d, v in zip(animais, dias, valores) if d > 0]
+    if linhas:
+        cursor.executemany(
+            "INSERT INTO custo_animal_mes (animal_id, competencia, user_id, valor, dias) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            linhas
+        )
+    afetados.update(linha[0] for linha in linhas)
+
+    animal_dias = int(dias.sum())
+    cursor.execute(
+        "INSERT INTO fechamento_custos (user_id, competencia, total_custos, total_alocado, animal_dias) "
+        "VALUES (%s, %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE total_custos = VALUES(total_custos), "
+        "  total_alocado = VALUES(total_alocado), animal_dias = VALUES(animal_dias), "
+        "  fechado_em = CURRENT_TIMESTAMP",
+        (user_id, competencia, total, float(valores.sum()), animal_dias)
+    )
+    atualizar_custo_animais(cursor, afetados, refazer_lotes=refazer_lotes)
+    return total, animal_dias
+
+
+def atualizar_custo_animais(cursor, animal_ids, refazer_lotes=True):
+    """Refaz o razão custo_animal (soma de custo_animal_mes) dos animais."""
+    ids = sorted(animal_ids)
+    lotes = set()
+    for inicio in range(0, len(ids), _ANIMAIS_POR_VEZ):
+        parte = ids[inicio:inicio + _ANIMAIS_POR_VEZ]
+        placeholders = ','.join(['%s'] * len(parte))
+        cursor.execute(f"DELETE FROM custo_animal WHERE animal_id IN ({placeholders})", parte)
+        cursor.execute(
+            "INSERT INTO custo_animal (animal_id, user_id, custo_operacional, dias) "
+            "SELECT animal_id, user_id, SUM(valor), SUM(dias) FROM custo_animal_mes "
+            f"WHERE animal_id IN ({placeholders}) GROUP BY animal_id, user_id",
+            parte
+        )
+        if refazer_lotes:
+            cursor.execute(
+                "SELECT DISTINCT lote_id FROM vw_animais_historico "
+                f"WHERE id IN ({placeholders}) AND lote_id IS NOT NULL",
+                parte
+            )
+            lotes.update(row[0] for row in cursor.fetchall())
+    if lotes:
+        atualizar_resultado_lotes(cursor, lotes)
+
+
+def refechar_competencias(cursor, user_id, datas):
+    """Refaz os meses já fechados a partir da mais antiga de `datas`, na transação do chamador.
+
+    Cadastro retroativo, venda, exclusão e restauração de animal mudam quem
+    esteve no rebanho em meses já rateados. lote_resultado é refeito uma vez
+    no fim, para os lotes do tenant. Retorna quantas competências foram refeitas.
+    """
+    competencias = [competencia_de(d) for d in datas if d]
+    if not competencias:
+        return 0
+    cursor.execute(
+        "SELECT competencia FROM fechamento_custos WHERE user_id = %s AND competencia >= %s "
+        "ORDER BY competencia",
+        (user_id, min(competencias))
+    )
+    fechadas = [row[0] for row in cursor.fetchall()]
+    for competencia in fechadas:
+        fechar_competencia(cursor, user_id, competencia, refazer_lotes=False)
+    if fechadas:
+        cursor.execute("SELECT id FROM lotes WHERE user_id = %s", (user_id,))
+        atualizar_resultado_lotes(cursor, [row[0] for row in cursor.fetchall()])
+        kpi_repository.incrementar_versao(cursor, user_id)
+    return len(fechadas)
+
+
+def get_usuarios_com_custos(competencia):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT user_id FROM custos_operacionais "
+            "WHERE data_custo BETWEEN %s AND %s AND deleted_at IS NULL",
+            (competencia, fim_competencia(competencia))
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def get_custo_animal(animal_id, user_id):
+    """(custo_operacional, dias) acumulados do animal, ou None se nunca rateado."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT custo_operacional, dias FROM custo_animal "
+            "WHERE animal_id = %s AND user_id = %s",
+            (animal_id, user_id)
+        )
+        return cursor.fetchone()
+
+
+def get_custo_animal_dia(user_id, competencia_inicial):
+    """Custo operacional por animal-dia dos meses fechados desde a competência, ou None."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT SUM(total_alocado), SUM(animal_dias) FROM fechamento_custos "
+            "WHERE user_id = %s AND competencia >= %s",
+            (user_id, competencia_inicial)
+        )
+        alocado, animal_dias = cursor.fetchone()
+        if not animal_dias:
+            return None
+        return float(alocado) / int(animal_dias)
@@ -0,0 +1,168 @@
+"""Genealogia em tabela de fechamento: um par (ancestral, descendente) por
+distância em gerações. Mantida no cadastro do animal (animal_repository.
+_inserir_animal, inclusive o bezerro de registrar_parto_com_bezerro) e na
+troca de pais (atualizar_pais). Leituras de N gerações viram um range scan.
+"""
+from db_config import get_db_cursor
+
+
+# (ancestral, filho, g + 1) para cada ancestral do pai/mãe, mais os próprios pais.
+_HERDAR_ANCESTRAIS_SQL = (
+    "INSERT IGNORE INTO genealogia (user_id, ancestral_id, descendente_id, geracoes) "
+    "SELECT %s, ancestral_id, %s, geracoes + 1 FROM genealogia "
+    "WHERE descendente_id IN (%s, %s)"
+)
+
+
+def _inserir_genealogia(cursor, animal_id, user_id, pai_id=None, mae_id=None):
+    """Grava as linhas de ancestralidade de um animal a partir dos seus pais."""
+    pais = [p for p in (pai_id, mae_id) if p]
+    if not pais:
+        return
+    cursor.executemany(
+        "INSERT IGNORE INTO genealogia (user_id, ancestral_id, descendente_id, geracoes) "
+        "VALUES (%s, %s, %s, 1)",
+        [(user_id, p, animal_id) for p in pais]
+    )
+    cursor.execute(_HERDAR_ANCESTRAIS_SQL, (user_id, animal_id, pais[0], pais[-1]))
+
+
+def _reconstruir_subarvore(cursor, animal_id):
+    """Refaz as linhas do animal e de todos os descendentes após troca de pais.
+
+    Descendentes em ordem crescente da maior distância até o animal: todo pai
+    dentro da subárvore é refeito antes dos seus filhos.
+    """
+    cursor.execute(
+        "SELECT descendente_id FROM genealogia WHERE ancestral_id = %s "
+        "GROUP BY descendente_id ORDER BY MAX(geracoes)",
+        (animal_id,)
+    )
+    ids = [animal_id] + [row[0] for row in cursor.fetchall()]
+    for aid in ids:
+        cursor.execute(
+            "SELECT user_id, pai_id, mae_id FROM vw_animais_historico WHERE id = %s", (aid,)
+        )
+        row = cursor.fetchone()
+        cursor.execute("DELETE FROM genealogia WHERE descendente_id = %s", (aid,))
+        if row:
+            _inserir_genealogia(cursor, aid, *row)
+
+
+def reconstruir_genealogia(cursor):
+    """Backfill completo (migração v0005): uma geração por passada."""
+    cursor.execute("DELETE FROM genealogia")
+    for coluna in ("pai_id", "mae_id"):
+        cursor.execute(
+            "INSERT IGNORE INTO genealogia (user_id, ancestral_id, descendente_id, geracoes) "
+            f"SELECT user_id, {coluna}, id, 1 FROM vw_animais_historico WHERE {coluna} IS NOT NULL"
+        )
+    geracao = 1
+    while True:
+        inseridos = 0
+        for coluna in ("pai_id", "mae_id"):
+            cursor.execute(
+                "INSERT IGNORE INTO genealogia (user_id, ancestral_id, descendente_id, geracoes) "
+                "SELECT f.user_id, g.ancestral_id, f.id, g.geracoes + 1 "
+                f"FROM genealogia g JOIN vw_animais_historico f ON f.{coluna} = g.descendente_id "
+                "WHERE g.geracoes = %s",
+                (geracao,)
+            )
+            inseridos += cursor.rowcount
+        if not inseridos:
+            break
+        geracao += 1
+
+
+def atualizar_pais(animal_id, user_id, pai_id, mae_id):
+    """Define pai/mãe do animal e refaz a genealogia da subárvore.
+
+    Retorna 'ok', 'nao_encontrado', 'pai_invalido' (outro tenant ou sexo
+    errado) ou 'ciclo' (pai/mãe é o próprio animal ou um descendente dele).
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT id FROM animais WHERE id = %s AND user_id = %s AND deleted_at IS NULL",
+            (animal_id, user_id)
+        )
+        if not cursor.fetchone():
+            return 'nao_encontrado'
+
+        for pai, sexo in ((pai_id, 'M'), (mae_id, 'F')):
+            if not pai:
+                continue
+            cursor.execute(
+                "SELECT 1 FROM vw_animais_historico WHERE id = %s AND user_id = %s AND sexo = %s",
+                (pai, user_id, sexo)
+            )
+            if not cursor.fetchone():
+                return 'pai_invalido'
+            cursor.execute(
+                "SELECT 1 FROM genealogia WHERE ancestral_id = %s AND descendente_id = %s LIMIT 1",
+                (animal_id, pai)
+            )
+            if pai == animal_id or cursor.fetchone():
+                return 'ciclo'
+
+        cursor.execute(
+            "UPDATE animais SET pai_id = %s, mae_id = %s WHERE id = %s",
+            (pai_id or None, mae_id or None, animal_id)
+        )
+        _reconstruir_subarvore(cursor, animal_id)
+        return 'ok'
+
+
+# ---- LEITURAS ----
+
+def get_ancestrais(animal_id, user_id, geracoes=3):
+    """(id, brinco, sexo, geracao) dos ancestrais até N gerações, pela menor distância."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT a.id, a.brinco, a.sexo, MIN(g.geracoes) AS geracao "
+            "FROM genealogia g "
+            "JOIN vw_animais_historico a ON a.id = g.ancestral_id "
+            "WHERE g.descendente_id = %s AND g.user_id = %s AND g.geracoes <= %s "
+            "GROUP BY a.id, a.brinco, a.sexo "
+            "ORDER BY geracao, a.brinco_ordem",
+            (animal_id, user_id, geracoes)
+        )
+        return cursor.fetchall()
+
+
+def get_descendentes(animal_id, user_id):
+    """(id, brinco, sexo, geracao, gmd) de todos os descendentes.
+
+    GMD pela primeira/última pesagem em animal_pesagem_resumo — sem varrer
+    pesagens; animais já arquivados voltam com gmd NULL.
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT d.id, d.brinco, d.sexo, MIN(g.geracoes) AS geracao, "
+            "    ROUND((r.ultimo_peso - r.primeiro_peso) "
+            "          / NULLIF(DATEDIFF(r.ultima_data, r.primeira_data), 0), 3) AS gmd "
+            "FROM genealogia g "
+            "JOIN vw_animais_historico d ON d.id = g.descendente_id AND d.deleted_at IS NULL "
+            "LEFT JOIN animal_pesagem_resumo r ON r.animal_id = d.id "
+            "WHERE g.ancestral_id = %s AND g.user_id = %s "
+            "GROUP BY d.id, d.brinco, d.sexo, r.ultimo_peso, r.primeiro_peso, "
+            "    r.ultima_data, r.primeira_data "
+            "ORDER BY geracao, d.brinco_ordem",
+            (animal_id, user_id)
+        )
+        return cursor.fetchall()
+
+
+def get_pedigree(animal_ids, user_id):
+    """[(id, pai_id, mae_id)] dos animais e de todos os seus ancestrais."""
+    if not animal_ids:
+        return []
+    ids = list(animal_ids)
+    placeholders = ','.join(['%s'] * len(ids))
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT a.id, a.pai_id, a.mae_id FROM vw_animais_historico a "
+            f"WHERE a.user_id = %s AND (a.id IN ({placeholders}) OR a.id IN ("
+            f"    SELECT ancestral_id FROM genealogia WHERE descendente_id IN ({placeholders})))",
+            [user_id] + ids + ids
+        )
+        return cursor.fetchall()
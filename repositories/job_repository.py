@@ -0,0 +1,126 @@
+"""Registro de jobs em segundo plano (tabela jobs) — ver utils.jobs.
+
+status: pendente -> executando -> concluido | erro. Toda leitura de fora do
+executor filtra por user_id: job de outro usuário não existe.
+"""
+from db_config import get_db_cursor
+
+
+def criar(job_id, user_id, tipo, ttl_segundos):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO jobs (id, user_id, tipo, expira_em) "
+            "VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND)",
+            (job_id, user_id, tipo, ttl_segundos)
+        )
+
+
+def criar_concluido(job_id, user_id, tipo, blob_chave, ttl_segundos):
+    """Job que já nasce concluído, apontando para um blob existente (cache)."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO jobs (id, user_id, tipo, status, progresso, blob_chave, concluido_em, expira_em) "
+            "VALUES (%s, %s, %s, 'concluido', 100, %s, NOW(), NOW() + INTERVAL %s SECOND)",
+            (job_id, user_id, tipo, blob_chave, ttl_segundos)
+        )
+
+
+def marcar_executando(job_id):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE jobs SET status = 'executando', heartbeat_em = NOW() "
+            "WHERE id = %s AND status = 'pendente'",
+            (job_id,)
+        )
+
+
+def heartbeat(job_id):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE jobs SET heartbeat_em = NOW() WHERE id = %s AND status = 'executando'",
+            (job_id,)
+        )
+
+
+def gravar_progresso(job_id, percentual):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE jobs SET progresso = %s, heartbeat_em = NOW() "
+            "WHERE id = %s AND status = 'executando'",
+            (percentual, job_id)
+        )
+
+
+def concluir(job_id, resultado=None, blob_chave=None):
+    """Grava o resultado (JSON) ou a chave do blob. False se o job já não estava executando."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE jobs SET status = 'concluido', resultado = %s, blob_chave = %s, "
+            "progresso = 100, concluido_em = NOW() WHERE id = %s AND status = 'executando'",
+            (resultado, blob_chave, job_id)
+        )
+        return cursor.rowcount > 0
+
+
+def falhar(job_id, erro):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE jobs SET status = 'erro', erro = %s, concluido_em = NOW() "
+            "WHERE id = %s AND status IN ('pendente', 'executando')",
+            (str(erro)[:500], job_id)
+        )
+
+
+def get_job(job_id, user_id):
+    """(tipo, status, resultado, blob_chave, erro, progresso) do job do usuário, ou None (inclusive expirado)."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT tipo, status, resultado, blob_chave, erro, progresso FROM jobs "
+            "WHERE id = %s AND user_id = %s AND expira_em > NOW()",
+            (job_id, user_id)
+        )
+        return cursor.fetchone()
+
+
+def marcar_mortos(sem_heartbeat_segundos):
+    """Jobs sem heartbeat há mais que o limite viram erro (thread/processo morreu)."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE jobs SET status = 'erro', erro = 'Execução interrompida', concluido_em = NOW() "
+            "WHERE status IN ('pendente', 'executando') "
+            "AND heartbeat_em < NOW() - INTERVAL %s SECOND",
+            (sem_heartbeat_segundos,)
+        )
+        return cursor.rowcount
+
+
+def get_expirados(limite=500):
+    """[(id, blob_chave)] dos jobs vencidos."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT id, blob_chave FROM jobs WHERE expira_em <= NOW() ORDER BY expira_em LIMIT %s",
+            (limite,)
+        )
+        return cursor.fetchall()
+
+
+def apagar(job_ids):
+    if not job_ids:
+        return
+    marcadores = ", ".join(["%s"] * len(job_ids))
+    with get_db_cursor() as cursor:
+        cursor.execute(f"DELETE FROM jobs WHERE id IN ({marcadores})", tuple(job_ids))
+
+
+def get_blobs_referenciados(chaves):
+    """Subconjunto de `chaves` ainda apontado por jobs ou relatorio_cache."""
+    if not chaves:
+        return set()
+    marcadores = ", ".join(["%s"] * len(chaves))
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            f"SELECT blob_chave FROM jobs WHERE blob_chave IN ({marcadores}) "
+            f"UNION SELECT blob_chave FROM relatorio_cache WHERE blob_chave IN ({marcadores})",
+            tuple(chaves) * 2
+        )
+        return {row[0] for row in cursor.fetchall()}
@@ -0,0 +1,59 @@
+"""KPIs por tenant (kpi_snapshot) e a versão que os invalida (tenant_versao.versao_kpi)."""
+import json
+
+from db_config import get_db_cursor
+
+
+def incrementar_versao(cursor, user_id):
+    """Marca os KPIs do tenant como velhos, na mesma transação da escrita.
+
+    Para pesagens, custos e medicações; escritas de catálogo já sobem versao_kpi em
+    busca_repository.incrementar_versao.
+    """
+    cursor.execute(
+        "INSERT INTO tenant_versao (user_id, versao_kpi) VALUES (%s, 1) "
+        "ON DUPLICATE KEY UPDATE versao_kpi = versao_kpi + 1",
+        (user_id,)
+    )
+
+
+def get_versao(user_id):
+    """versao_kpi atual do tenant (0 se nunca houve escrita)."""
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT versao_kpi FROM tenant_versao WHERE user_id = %s", (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+
+def get_snapshot(user_id):
+    """(versao_atual, versao_snapshot, data_referencia, dados) — snapshot ausente = Nones."""
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT versao_kpi FROM tenant_versao WHERE user_id = %s", (user_id,))
+        row = cursor.fetchone()
+        versao = row[0] if row else 0
+        cursor.execute(
+            "SELECT versao_kpi, data_referencia, dados FROM kpi_snapshot WHERE user_id = %s",
+            (user_id,)
+        )
+        snap = cursor.fetchone()
+    if not snap:
+        return versao, None, None, None
+    return versao, snap[0], snap[1], json.loads(snap[2])
+
+
+def gravar_snapshot(user_id, versao, data_referencia, dados):
+    """Grava o snapshot calculado na `versao` lida antes do cálculo.
+
+    Um cálculo mais lento, iniciado numa versão anterior, não sobrescreve um
+    mais novo (as atribuições do UPDATE são avaliadas em ordem).
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO kpi_snapshot (user_id, versao_kpi, data_referencia, dados) "
+            "VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE "
+            "  dados = IF(VALUES(versao_kpi) >= versao_kpi, VALUES(dados), dados), "
+            "  data_referencia = IF(VALUES(versao_kpi) >= versao_kpi, VALUES(data_referencia), data_referencia), "
+            "  versao_kpi = GREATEST(versao_kpi, VALUES(versao_kpi))",
+            (user_id, versao, data_referencia, json.dumps(dados))
+        )
@@ -1,4 +1,178 @@
+from datetime import date
 from db_config import get_db_cursor
+from repositories import busca_repository
+from utils.calculo import KG_POR_UA, ganho_na_janela
+
+
+# Recalcula a linha de modulo_estado de um módulo a partir das suas próprias
+# ocupações (idx_ocupacoes_modulo) — chamado dentro da transação de cada escrita
+# que muda a ocupação. ua_atual/pct_lotacao/ua_por_ha ficam NULL com o módulo
+# livre; ultima_saida é a base dos dias de descanso, calculados na leitura.
+# UA = último peso / KG_POR_UA (animal_pesagem_resumo); sem pesagem conta 1 UA.
+_ESTADO_MODULO_SQL = (
+    "INSERT INTO modulo_estado "
+    "    (modulo_id, user_id, pasto_id, ocupacao_id, data_entrada, "
+    "     qtd_animais, ua_atual, pct_lotacao, ua_por_ha, superlotado, ultima_saida) "
+    "SELECT m.id, m.user_id, m.pasto_id, ab.ocupacao_id, ab.data_entrada, "
+    "    COALESCE(ab.qtd, 0), ROUND(ab.ua, 2), "
+    "    ROUND(ab.ua / NULLIF(m.capacidade_ua, 0) * 100, 1), "
+    "    ROUND(ab.ua / NULLIF(m.area_hectares, 0), 2), "
+    "    COALESCE(ab.ua > m.capacidade_ua, 0), "
+    "    (SELECT MAX(data_saida) FROM ocupacoes "
+    "     WHERE modulo_id = m.id AND data_saida IS NOT NULL) "
+    "FROM modulos m "
+    "LEFT JOIN ("
+    "    SELECT o.modulo_id, o.id AS ocupacao_id, o.data_entrada, COUNT(oa.animal_id) AS qtd, "
+    "        COALESCE(SUM(CASE WHEN oa.animal_id IS NOT NULL "
+    f"                          THEN COALESCE(r.ultimo_peso, {KG_POR_UA}) END), 0) / {KG_POR_UA} AS ua "
+    "    FROM ocupacoes o "
+    "    LEFT JOIN ocupacao_animais oa ON oa.ocupacao_id = o.id "
+    "    LEFT JOIN animal_pesagem_resumo r ON r.animal_id = oa.animal_id "
+    "    WHERE o.modulo_id = %s AND o.data_saida IS NULL "
+    "    GROUP BY o.modulo_id, o.id, o.data_entrada"
+    ") ab ON ab.modulo_id = m.id "
+    "WHERE m.id = %s "
+    "ON DUPLICATE KEY UPDATE "
+    "    ocupacao_id = VALUES(ocupacao_id), data_entrada = VALUES(data_entrada), "
+    "    qtd_animais = VALUES(qtd_animais), ua_atual = VALUES(ua_atual), "
+    "    pct_lotacao = VALUES(pct_lotacao), ua_por_ha = VALUES(ua_por_ha), "
+    "    superlotado = VALUES(superlotado), ultima_saida = VALUES(ultima_saida)"
+)
+
+
+def _atualizar_estado_modulo(cursor, modulo_id):
+    cursor.execute(_ESTADO_MODULO_SQL, (modulo_id, modulo_id))
+
+
+def atualizar_lotacao_por_animais(cursor, animal_ids):
+    """Hook de pesagem: refaz a lotação dos módulos onde esses animais estão agora."""
+    if not animal_ids:
+        return
+    placeholders = ','.join(['%s'] * len(animal_ids))
+    cursor.execute(
+        "SELECT DISTINCT o.modulo_id FROM ocupacao_animais oa "
+        "JOIN ocupacoes o ON o.id = oa.ocupacao_id "
+        f"WHERE oa.animal_id IN ({placeholders}) AND o.data_saida IS NULL",
+        list(animal_ids)
+    )
+    for (modulo_id,) in cursor.fetchall():
+        _atualizar_estado_modulo(cursor, modulo_id)
+
+
+def recalcular_estado_todos_modulos(cursor):
+    """Backfill completo de modulo_estado (migração v0004)."""
+    cursor.execute("SELECT id FROM modulos ORDER BY id")
+    for (modulo_id,) in cursor.fetchall():
+        _atualizar_estado_modulo(cursor, modulo_id)
+
+
+# ---- GMD POR JANELA DE OCUPAÇÃO ----
+
+def _recalcular_gmd_ocupacao(cursor, ocupacao_id, hoje=None):
+    """Grava em ocupacao_gmd o ganho dos animais dentro da janela da ocupação.
+
+    Janela = [data_entrada, data_saida], ou até hoje se ainda aberta (parcial).
+    O peso nas bordas é interpolado entre as pesagens vizinhas
+    (utils.calculo.ganho_na_janela). gmd_medio = ganho total / animal-dias.
+    Animais arquivados continuam na janela: quente e frio são lidos cada um
+    com sua tabela de pesagens.
+    Retorna o modulo_id (ou None se a ocupação não existe).
+    """
+    cursor.execute(
+        "SELECT modulo_id, user_id, data_entrada, data_saida FROM ocupacoes WHERE id = %s",
+        (ocupacao_id,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    modulo_id, user_id, data_entrada, data_saida = row
+    fim = data_saida or hoje or date.today()
+
+    cursor.execute(
+        "SELECT oa.animal_id, p.data_pesagem, p.peso "
+        "FROM ocupacao_animais oa "
+        "LEFT JOIN pesagens p ON p.animal_id = oa.animal_id AND p.deleted_at IS NULL "
+        "WHERE oa.ocupacao_id = %s "
+        "UNION ALL "
+        "SELECT oa.animal_id, p.data_pesagem, p.peso "
+        "FROM ocupacao_animais_arquivo oa "
+        "LEFT JOIN pesagens_arquivo p ON p.animal_id = oa.animal_id AND p.deleted_at IS NULL "
+        "WHERE oa.ocupacao_id = %s "
+        "ORDER BY 1, 2",
+        (ocupacao_id, ocupacao_id)
+    )
+    pesagens_por_animal = {}
+    for animal_id, data_pesagem, peso in cursor.fetchall():
+        serie = pesagens_por_animal.setdefault(animal_id, [])
+        if data_pesagem is not None:
+            serie.append((data_pesagem, peso))
+
+    ganhos = [g for g in (ganho_na_janela(serie, data_entrada, fim)
+                          for serie in pesagens_por_animal.values()) if g]
+    ganho_kg = sum(g for g, _ in ganhos)
+    animal_dias = sum(d for _, d in ganhos)
+    gmd_medio = round(ganho_kg / animal_dias, 3) if animal_dias else None
+
+    cursor.execute(
+        "INSERT INTO ocupacao_gmd "
+        "    (ocupacao_id, modulo_id, user_id, qtd_animais, animais_com_gmd, "
+        "     ganho_kg, animal_dias, gmd_medio, parcial) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE "
+        "    qtd_animais = VALUES(qtd_animais), animais_com_gmd = VALUES(animais_com_gmd), "
+        "    ganho_kg = VALUES(ganho_kg), animal_dias = VALUES(animal_dias), "
+        "    gmd_medio = VALUES(gmd_medio), parcial = VALUES(parcial)",
+        (ocupacao_id, modulo_id, user_id, len(pesagens_por_animal), len(ganhos),
+         round(ganho_kg, 2), animal_dias, gmd_medio, data_saida is None)
+    )
+    return modulo_id
+
+
+def _atualizar_gmd_modulo(cursor, modulo_id):
+    """Agrega as ocupações do módulo em modulo_estado (ponderado por animal-dias).
+
+    qtd_animais_historico conta também os animais já arquivados.
+    """
+    cursor.execute(
+        "UPDATE modulo_estado SET "
+        "    gmd_medio = (SELECT ROUND(SUM(ganho_kg) / NULLIF(SUM(animal_dias), 0), 3) "
+        "                 FROM ocupacao_gmd WHERE modulo_id = %s), "
+        "    qtd_animais_historico = (SELECT COUNT(DISTINCT x.animal_id) FROM ("
+        "        SELECT oa.animal_id FROM ocupacoes o "
+        "        JOIN ocupacao_animais oa ON oa.ocupacao_id = o.id WHERE o.modulo_id = %s "
+        "        UNION ALL "
+        "        SELECT oa.animal_id FROM ocupacoes o "
+        "        JOIN ocupacao_animais_arquivo oa ON oa.ocupacao_id = o.id WHERE o.modulo_id = %s"
+        "    ) x) "
+        "WHERE modulo_id = %s",
+        (modulo_id, modulo_id, modulo_id, modulo_id)
+    )
+
+
+def recalcular_gmd_por_animais(cursor, animal_ids):
+    """Hook de pesagem: refaz o GMD das ocupações (abertas ou não) desses animais.
+
+    Uma pesagem nova ou excluída muda a interpolação nas bordas de qualquer
+    janela vizinha, então todas as ocupações do animal são refeitas — são poucas.
+    """
+    if not animal_ids:
+        return
+    placeholders = ','.join(['%s'] * len(animal_ids))
+    cursor.execute(
+        f"SELECT DISTINCT ocupacao_id FROM ocupacao_animais WHERE animal_id IN ({placeholders})",
+        list(animal_ids)
+    )
+    modulos = {_recalcular_gmd_ocupacao(cursor, oc_id) for (oc_id,) in cursor.fetchall()}
+    for modulo_id in modulos - {None}:
+        _atualizar_gmd_modulo(cursor, modulo_id)
+
+
+def recalcular_gmd_todas_ocupacoes(cursor):
+    """Backfill completo (migração v0003)."""
+    cursor.execute("SELECT id FROM ocupacoes ORDER BY id")
+    modulos = {_recalcular_gmd_ocupacao(cursor, oc_id) for (oc_id,) in cursor.fetchall()}
+    for modulo_id in modulos - {None}:
+        _atualizar_gmd_modulo(cursor, modulo_id)
 
 
 # ---- PASTOS ----
@@ -6,9 +180,7 @@ from db_config import get_db_cursor
 def get_pastos(user_id, termo=None):
     """Lista pastos do usuário com contagem de módulos e alertas de lotação.
 
-    Um único LEFT JOIN agregado em vez de 3 subqueries correlacionadas por
-    linha — vw_ocupacao_atual já é uma view com GROUP BY por módulo, então
-    reprocessá-la 2x por pasto era redundante.
+    Lotação lida de modulo_estado (lookup por PK), sem agregar ocupações.
     """
     where = "WHERE p.user_id = %s"
     params = [user_id]
@@ -19,11 +191,11 @@ def get_pastos(user_id, termo=None):
         cursor.execute(
             "SELECT p.id, p.nome, p.area_hectares, p.forrageira, p.capacidade_ua, "
             "    COUNT(DISTINCT m.id) AS qtd_modulos, "
-            "    COUNT(DISTINCT CASE WHEN va.pct_lotacao > 100 THEN va.modulo_id END) AS superlotados, "
-            "    COUNT(DISTINCT CASE WHEN va.pct_lotacao BETWEEN 80 AND 100 THEN va.modulo_id END) AS em_alerta "
+            "    COUNT(DISTINCT CASE WHEN me.superlotado = 1 THEN me.modulo_id END) AS superlotados, "
+            "    COUNT(DISTINCT CASE WHEN me.pct_lotacao BETWEEN 80 AND 100 THEN me.modulo_id END) AS em_alerta "
             "FROM pastos p "
             "LEFT JOIN modulos m ON m.pasto_id = p.id "
-            "LEFT JOIN vw_ocupacao_atual va ON va.modulo_id = m.id "
+            "LEFT JOIN modulo_estado me ON me.modulo_id = m.id "
             + where +
             " GROUP BY p.id, p.nome, p.area_hectares, p.forrageira, p.capacidade_ua "
             "ORDER BY p.nome",
@@ -39,7 +211,9 @@ def insert_pasto(user_id, nome, area_hectares, forrageira, capacidade_ua):
             "VALUES (%s, %s, %s, %s, %s)",
             (user_id, nome, area_hectares, forrageira, capacidade_ua)
         )
-        return cursor.lastrowid
+        pasto_id = cursor.lastrowid
+        busca_repository.incrementar_versao(cursor, user_id)
+        return pasto_id
 
 
 def get_pasto_by_id(pasto_id, user_id):
@@ -55,15 +229,23 @@ def get_pasto_by_id(pasto_id, user_id):
 # ---- MÓDULOS ----
 
 def get_modulos_by_pasto(pasto_id, user_id):
-    """Retorna módulos com status de ocupação (vw_ocupacao_atual) e descanso (vw_dias_descanso)."""
+    """Retorna módulos com status de ocupação e descanso (modulo_estado).
+
+    (id, nome, area_hectares, capacidade_ua, ua_atual, pct_lotacao, ocupacao_id,
+    data_entrada, dias_descanso, ultima_saida, ua_por_ha, superlotado).
+    Descanso só faz sentido com o módulo livre: ocupado, dias_descanso e
+    ultima_saida voltam NULL.
+    """
     with get_db_cursor() as cursor:
         cursor.execute(
             "SELECT m.id, m.nome, m.area_hectares, m.capacidade_ua, "
-            "    va.ua_atual, va.pct_lotacao, va.ocupacao_id, va.data_entrada, "
-            "    vd.dias_descanso, vd.ultima_saida "
+            "    me.ua_atual, me.pct_lotacao, me.ocupacao_id, me.data_entrada, "
+            "    CASE WHEN me.ocupacao_id IS NULL "
+            "         THEN DATEDIFF(CURDATE(), me.ultima_saida) END AS dias_descanso, "
+            "    CASE WHEN me.ocupacao_id IS NULL THEN me.ultima_saida END AS ultima_saida, "
+            "    me.ua_por_ha, me.superlotado "
             "FROM modulos m "
-            "LEFT JOIN vw_ocupacao_atual va ON va.modulo_id = m.id "
-            "LEFT JOIN vw_dias_descanso vd ON vd.modulo_id = m.id "
+            "LEFT JOIN modulo_estado me ON me.modulo_id = m.id "
             "WHERE m.pasto_id = %s AND m.user_id = %s "
             "ORDER BY m.nome",
             (pasto_id, user_id)
@@ -78,7 +260,9 @@ def insert_modulo(pasto_id, user_id, nome, area_hectares, capacidade_ua):
             "VALUES (%s, %s, %s, %s, %s)",
             (pasto_id, user_id, nome, area_hectares, capacidade_ua)
         )
-        return cursor.lastrowid
+        modulo_id = cursor.lastrowid
+        _atualizar_estado_modulo(cursor, modulo_id)
+        return modulo_id
 
 
 def get_modulo_by_id(modulo_id, user_id):
@@ -145,6 +329,9 @@ def iniciar_ocupacao(modulo_id, user_id, data_entrada, animal_ids):
                 [(ocupacao_id, aid) for aid in validos]
             )
 
+        _atualizar_estado_modulo(cursor, modulo_id)
+        _recalcular_gmd_ocupacao(cursor, ocupacao_id)
+        _atualizar_gmd_modulo(cursor, modulo_id)
         return ocupacao_id
 
 
@@ -152,17 +339,22 @@ def encerrar_ocupacao(ocupacao_id, user_id, data_saida):
     """Verifica ownership via modulo e registra data_saida. Retorna True/False."""
     with get_db_cursor() as cursor:
         cursor.execute(
-            "SELECT o.id FROM ocupacoes o "
+            "SELECT o.modulo_id FROM ocupacoes o "
             "JOIN modulos m ON o.modulo_id = m.id "
             "WHERE o.id = %s AND m.user_id = %s AND o.data_saida IS NULL",
             (ocupacao_id, user_id)
         )
-        if not cursor.fetchone():
+        row = cursor.fetchone()
+        if not row:
             return False
         cursor.execute(
             "UPDATE ocupacoes SET data_saida = %s WHERE id = %s",
             (data_saida, ocupacao_id)
         )
+        _atualizar_estado_modulo(cursor, row[0])
+        # Valor definitivo da janela fechada
+        _recalcular_gmd_ocupacao(cursor, ocupacao_id)
+        _atualizar_gmd_modulo(cursor, row[0])
         return True
 
 
@@ -189,41 +381,77 @@ def get_animais_ocupacoes_ativas(pasto_id, user_id):
             "JOIN animais a ON a.id = oa.animal_id "
             "JOIN modulos m ON m.id = o.modulo_id "
             "WHERE m.pasto_id = %s AND m.user_id = %s AND o.data_saida IS NULL "
-            "ORDER BY a.brinco",
+            "ORDER BY a.brinco_ordem",
             (pasto_id, user_id)
         )
         return cursor.fetchall()
 
 
-# ---- VIEWS ----
+# ---- ESTADO DOS MÓDULOS E VIEWS ----
 
 def get_ocupacao_atual(user_id):
+    """Módulos ocupados: (modulo_id, pasto_id, modulo_nome, capacidade_ua,
+    ua_atual, pct_lotacao, ocupacao_id, data_entrada)."""
     with get_db_cursor() as cursor:
         cursor.execute(
-            "SELECT modulo_id, pasto_id, modulo_nome, capacidade_ua, "
-            "    ua_atual, pct_lotacao, ocupacao_id, data_entrada "
-            "FROM vw_ocupacao_atual WHERE user_id = %s",
+            "SELECT me.modulo_id, me.pasto_id, m.nome, m.capacidade_ua, "
+            "    me.ua_atual, me.pct_lotacao, me.ocupacao_id, me.data_entrada "
+            "FROM modulo_estado me "
+            "JOIN modulos m ON m.id = me.modulo_id "
+            "WHERE me.user_id = %s AND me.ocupacao_id IS NOT NULL",
+            (user_id,)
+        )
+        return cursor.fetchall()
+
+
+def get_mapa_lotacao(user_id):
+    """Mapa de lotação da fazenda, um registro por módulo, ordenado por pasto.
+
+    (pasto_id, pasto_nome, pasto_area_ha, modulo_id, modulo_nome, area_hectares,
+    capacidade_ua, qtd_animais, ua_atual, pct_lotacao, ua_por_ha, superlotado).
+    Tudo vem de modulo_estado — nenhuma leitura de pesagens.
+    """
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT p.id, p.nome, p.area_hectares, m.id, m.nome, m.area_hectares, "
+            "    m.capacidade_ua, me.qtd_animais, me.ua_atual, me.pct_lotacao, "
+            "    me.ua_por_ha, me.superlotado "
+            "FROM modulo_estado me "
+            "JOIN modulos m ON m.id = me.modulo_id "
+            "JOIN pastos p ON p.id = me.pasto_id "
+            "WHERE me.user_id = %s "
+            "ORDER BY p.nome, m.nome",
             (user_id,)
         )
         return cursor.fetchall()
 
 
 def get_dias_descanso(user_id):
+    """Módulos livres: (modulo_id, pasto_id, modulo_nome, ultima_saida, dias_descanso)."""
     with get_db_cursor() as cursor:
         cursor.execute(
-            "SELECT modulo_id, pasto_id, modulo_nome, ultima_saida, dias_descanso "
-            "FROM vw_dias_descanso WHERE user_id = %s",
+            "SELECT me.modulo_id, me.pasto_id, m.nome, me.ultima_saida, "
+            "    DATEDIFF(CURDATE(), me.ultima_saida) AS dias_descanso "
+            "FROM modulo_estado me "
+            "JOIN modulos m ON m.id = me.modulo_id "
+            "WHERE me.user_id = %s AND me.ocupacao_id IS NULL",
             (user_id,)
         )
         return cursor.fetchall()
 
 
 def get_gmd_por_modulo(user_id):
+    """(modulo_id, modulo_nome, pasto_id, qtd_animais, gmd_medio) dos módulos já ocupados.
+
+    GMD medido dentro das janelas de ocupação (ocupacao_gmd), lido de modulo_estado.
+    """
     with get_db_cursor() as cursor:
         cursor.execute(
-            "SELECT modulo_id, modulo_nome, pasto_id, qtd_animais, gmd_medio "
-            "FROM vw_gmd_por_modulo WHERE user_id = %s "
-            "ORDER BY gmd_medio DESC",
+            "SELECT me.modulo_id, m.nome, me.pasto_id, me.qtd_animais_historico, me.gmd_medio "
+            "FROM modulo_estado me "
+            "JOIN modulos m ON m.id = me.modulo_id "
+            "WHERE me.user_id = %s AND me.qtd_animais_historico > 0 "
+            "ORDER BY me.gmd_medio DESC",
             (user_id,)
         )
         return cursor.fetchall()
@@ -233,11 +461,12 @@ def get_top_gmd_por_modulo(user_id, limit=5):
     """Top módulos por GMD médio, incluindo nome do pasto."""
     with get_db_cursor() as cursor:
         cursor.execute(
-            "SELECT g.modulo_nome, p.nome AS pasto_nome, g.gmd_medio, g.qtd_animais "
-            "FROM vw_gmd_por_modulo g "
-            "JOIN pastos p ON p.id = g.pasto_id "
-            "WHERE g.user_id = %s AND g.gmd_medio IS NOT NULL "
-            "ORDER BY g.gmd_medio DESC LIMIT %s",
+            "SELECT m.nome, p.nome AS pasto_nome, me.gmd_medio, me.qtd_animais_historico "
+            "FROM modulo_estado me "
+            "JOIN modulos m ON m.id = me.modulo_id "
+            "JOIN pastos p ON p.id = me.pasto_id "
+            "WHERE me.user_id = %s AND me.gmd_medio IS NOT NULL "
+            "ORDER BY me.gmd_medio DESC LIMIT %s",
             (user_id, limit)
         )
         return cursor.fetchall()
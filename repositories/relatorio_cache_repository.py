@@ -0,0 +1,75 @@
+"""Índice dos PDFs do relatório guardados no blob store (relatorio_cache) — ver utils.relatorio."""
+from db_config import get_db_cursor
+
+
+def usar(chave, user_id):
+    """blob_chave do PDF em cache, marcando o pedido do usuário; None se não há."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE relatorio_cache SET acessado_em = NOW(), solicitado_em = NOW() "
+            "WHERE chave = %s AND user_id = %s",
+            (chave, user_id)
+        )
+        cursor.execute(
+            "SELECT blob_chave FROM relatorio_cache WHERE chave = %s AND user_id = %s",
+            (chave, user_id)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def get_blob_chave(chave, user_id):
+    """Como `usar`, sem marcar acesso (pré-geração)."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT blob_chave FROM relatorio_cache WHERE chave = %s AND user_id = %s",
+            (chave, user_id)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def registrar(chave, user_id, blob_chave, tamanho, solicitado=True):
+    """Grava o PDF recém-gerado; solicitado=False na pré-geração."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO relatorio_cache (chave, user_id, blob_chave, tamanho, solicitado_em) "
+            "VALUES (%s, %s, %s, %s, IF(%s, NOW(), NULL)) "
+            "ON DUPLICATE KEY UPDATE blob_chave = VALUES(blob_chave), "
+            "  tamanho = VALUES(tamanho), acessado_em = NOW(), "
+            "  solicitado_em = COALESCE(VALUES(solicitado_em), solicitado_em)",
+            (chave, user_id, blob_chave, tamanho, solicitado)
+        )
+
+
+def get_excedentes(max_bytes):
+    """[(chave, blob_chave)] além de max_bytes, somando do acesso mais recente ao mais antigo."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT chave, blob_chave FROM ("
+            "  SELECT chave, blob_chave, "
+            "    SUM(tamanho) OVER (ORDER BY acessado_em DESC, chave) AS acumulado "
+            "  FROM relatorio_cache"
+            ") t WHERE acumulado > %s",
+            (max_bytes,)
+        )
+        return cursor.fetchall()
+
+
+def apagar(chaves):
+    if not chaves:
+        return
+    marcadores = ", ".join(["%s"] * len(chaves))
+    with get_db_cursor() as cursor:
+        cursor.execute(f"DELETE FROM relatorio_cache WHERE chave IN ({marcadores})", tuple(chaves))
+
+
+def get_usuarios_recentes(dias):
+    """user_ids que pediram o relatório nos últimos `dias` dias."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT user_id FROM relatorio_cache "
+            "WHERE solicitado_em >= NOW() - INTERVAL %s DAY",
+            (dias,)
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,33 @@
+"""Relatório mensal por email: destinatários (opt-in) e envios por mês — ver utils.relatorio."""
+from db_config import get_db_cursor
+
+
+def get_destinatarios(referencia):
+    """[(user_id, email, nome_fazenda)] com opt-in e email, que ainda não receberam o mês."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "SELECT u.id, u.email, c.nome_fazenda FROM configuracoes c "
+            "JOIN usuarios u ON u.id = c.user_id "
+            "LEFT JOIN relatorio_mensal_envio e "
+            "  ON e.user_id = u.id AND e.referencia = %s AND e.status = 'enviado' "
+            "WHERE c.relatorio_mensal = 1 AND u.desativado_em IS NULL "
+            "AND u.email IS NOT NULL AND u.email != '' AND e.user_id IS NULL "
+            "ORDER BY u.id",
+            (referencia,)
+        )
+        return cursor.fetchall()
+
+
+def registrar_envios(referencia, envios):
+    """Upsert de [(user_id, status, blob_chave, erro)] no mês de referência."""
+    if not envios:
+        return
+    with get_db_cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO relatorio_mensal_envio (user_id, referencia, status, blob_chave, erro) "
+            "VALUES (%s, %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE status = VALUES(status), blob_chave = VALUES(blob_chave), "
+            "  erro = VALUES(erro), tentativas = tentativas + 1",
+            [(user_id, referencia, status, blob_chave, (erro or '')[:500] or None)
+             for user_id, status, blob_chave, erro in envios]
+        )
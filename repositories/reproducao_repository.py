@@ -1,6 +1,6 @@
 from db_config import get_db_cursor
 from datetime import timedelta, date, datetime
-from repositories.animal_repository import _inserir_animal
+from repositories.animal_repository import _inserir_animal, _refechar_custos
 
 
 def _inserir_reproducao(cursor, user_id, vaca_id, touro_id, touro_externo, data_cobertura, data_parto, resultado):
@@ -47,7 +47,9 @@ def registrar_parto_com_bezerro(user_id, vaca_id, touro_id, touro_externo, data_
                 cursor, brinco_bezerro, sexo_bezerro,
                 data_compra=None, preco_compra=None, peso_entrada=None,
                 user_id=user_id, data_nascimento=data_parto, mae_id=vaca_id,
+                pai_id=touro_id or None,
             )
+            _refechar_custos(cursor, user_id, data_parto)
         return reproducao_id, bezerro_id
 
 
@@ -0,0 +1,79 @@
+"""Retrato diário do rebanho (rebanho_snapshot_diario) — ver utils.snapshot."""
+from datetime import timedelta
+
+from db_config import get_db_cursor
+
+_COLUNAS = ("data, cabecas, machos, femeas, bezerros, animais_pesados, "
+            "peso_total, peso_medio, gmd_medio, valor_contabil")
+
+
+def get_usuarios_com_animais():
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT DISTINCT user_id FROM vw_animais_historico WHERE deleted_at IS NULL")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def get_proximo_dia(cursor, user_id):
+    """Dia seguinte ao último snapshot; sem snapshot, a primeira entrada (compra ou
+    nascimento); None sem animais."""
+    cursor.execute("SELECT MAX(data) FROM rebanho_snapshot_diario WHERE user_id = %s", (user_id,))
+    ultimo = cursor.fetchone()[0]
+    if ultimo is not None:
+        return ultimo + timedelta(days=1)
+    cursor.execute(
+        "SELECT MIN(COALESCE(data_compra, data_nascimento)) FROM vw_animais_historico "
+        "WHERE user_id = %s AND deleted_at IS NULL",
+        (user_id,)
+    )
+    return cursor.fetchone()[0]
+
+
+def get_dados_rebanho(cursor, user_id, inicio, fim):
+    """(animais, pesagens) de quem esteve no rebanho em algum dia de [inicio, fim].
+
+    Formato esperado por utils.snapshot.calcular_snapshots.
+    """
+    filtro = (
+        "a.user_id = %s AND a.deleted_at IS NULL AND COALESCE(a.data_compra, a.data_nascimento) <= %s "
+        "AND (a.data_venda IS NULL OR a.data_venda > %s)"
+    )
+    cursor.execute(
+        "SELECT a.id, a.sexo, a.data_compra, a.data_venda, a.data_nascimento, a.preco_compra "
+        f"FROM vw_animais_historico a WHERE {filtro}",
+        (user_id, fim, inicio)
+    )
+    animais = cursor.fetchall()
+    cursor.execute(
+        "SELECT p.animal_id, p.data_pesagem, p.peso FROM vw_pesagens_historico p "
+        f"JOIN vw_animais_historico a ON a.id = p.animal_id AND {filtro} "
+        "WHERE p.deleted_at IS NULL AND p.data_pesagem <= %s",
+        (user_id, fim, inicio, fim)
+    )
+    return animais, cursor.fetchall()
+
+
+def gravar_snapshots(cursor, user_id, linhas):
+    """Upsert das linhas de calcular_snapshots (refazer um dia substitui o anterior)."""
+    if not linhas:
+        return
+    cursor.executemany(
+        f"INSERT INTO rebanho_snapshot_diario (user_id, {_COLUNAS}) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE cabecas = VALUES(cabecas), machos = VALUES(machos), "
+        "  femeas = VALUES(femeas), bezerros = VALUES(bezerros), "
+        "  animais_pesados = VALUES(animais_pesados), peso_total = VALUES(peso_total), "
+        "  peso_medio = VALUES(peso_medio), gmd_medio = VALUES(gmd_medio), "
+        "  valor_contabil = VALUES(valor_contabil)",
+        [(user_id, *linha) for linha in linhas]
+    )
+
+
+def get_serie(user_id, inicio, fim):
+    """Snapshots de [inicio, fim] em ordem de data — leitura pela PK."""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            f"SELECT {_COLUNAS} FROM rebanho_snapshot_diario "
+            "WHERE user_id = %s AND data BETWEEN %s AND %s ORDER BY data",
+            (user_id, inicio, fim)
+        )
+        return cursor.fetchall()
@@ -1,20 +1,28 @@
-from flask import Blueprint, jsonify, render_template, Response, request, session
+from flask import Blueprint, jsonify, render_template, Response, request, stream_with_context, url_for
 from flask_login import login_required, current_user
 from werkzeug.exceptions import HTTPException
 import csv
 import io
+import json
 import logging
-import os as _os
 import re as _re
 import threading
 import time
-import uuid
 import requests
-from datetime import date
-from playwright.sync_api import sync_playwright
-from repositories import animal_repository, configuracao_repository, financeiro_repository
+from datetime import date, timedelta
+from repositories import (animal_repository, configuracao_repository, cotacao_repository,
+                          financeiro_repository, genealogia_repository, pasto_repository,
+                          snapshot_repository)
 from extensions import limiter
+from routes.validators import validate
+from utils import cidades as cidades_util
+from utils import cotacoes as cotacoes_util
+from utils import jobs
+from utils import relatorio
+from utils.busca import buscar
 from utils.calculo import KG_POR_ARROBA
+from utils.genetica import endogamia_acasalamentos
+from utils.simulacao import CENARIOS_MAX, CENARIOS_PADRAO, grade_custo_arroba, simular_custo_arroba
 
 api_bp = Blueprint('api', __name__)
 logger = logging.getLogger(__name__)
@@ -28,51 +36,14 @@ def _handle_uncaught_error(e):
     logger.error(f"Erro em {request.endpoint}: {e}", exc_info=True)
     return jsonify({'error': str(e)}), 500
 
-# ── Cache de cotações (TTL 30 min) ──────────────────────────────────────────
-_COTACOES_TTL = 30 * 60
-_cotacoes_lock = threading.Lock()
-_cotacoes_cache: dict = {'ts': 0.0, 'boi': [], 'novilha': []}
-
 # ── Cache de cidades IBGE (TTL 24h) ─────────────────────────────────────────
 _CIDADES_TTL = 24 * 3600
 _cidades_lock = threading.Lock()
 _cidades_cache: dict = {'ts': 0.0, 'dados': []}
 
-# ── Mapa completo UF → nome (todos os 27 estados) ───────────────────────────
-_MAPA_ESTADOS = {
-    'AC': 'Acre',               'AL': 'Alagoas',            'AP': 'Amapá',
-    'AM': 'Amazonas',           'BA': 'Bahia',              'CE': 'Ceará',
-    'DF': 'Distrito Federal',   'ES': 'Espírito Santo',     'GO': 'Goiás',
-    'MA': 'Maranhão',           'MT': 'Mato Grosso',        'MS': 'Mato Grosso do Sul',
-    'MG': 'Minas Gerais',       'PA': 'Pará',               'PB': 'Paraíba',
-    'PR': 'Paraná',             'PE': 'Pernambuco',         'PI': 'Piauí',
-    'RJ': 'Rio de Janeiro',     'RN': 'Rio Grande do Norte','RS': 'Rio Grande do Sul',
-    'RO': 'Rondônia',           'RR': 'Roraima',            'SC': 'Santa Catarina',
-    'SP': 'São Paulo',          'SE': 'Sergipe',            'TO': 'Tocantins',
-}
-
-_PDF_DIR = '/tmp'
-_PDF_MAX_AGE = 3600  # 1h — jobs abandonados (.pdf/.error/.pending) viram lixo em /tmp
 _UUID_RE = _re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$')
 
 
-def _limpar_pdfs_orfaos() -> None:
-    """Remove sgg_pdf_* com mais de 1h ao criar um job novo — limpeza
-    oportunística, sem worker/cron dedicado.
-    ponytail: best-effort, nunca propaga erro para a geração do relatório."""
-    corte = time.time() - _PDF_MAX_AGE
-    try:
-        with _os.scandir(_PDF_DIR) as it:
-            for entry in it:
-                if entry.name.startswith('sgg_pdf_') and entry.stat().st_mtime < corte:
-                    try:
-                        _os.remove(entry.path)
-                    except OSError:
-                        pass
-    except OSError:
-        pass
-
-
 def _csv_response(filename: str, header: list, rows: list) -> Response:
     """Serializa linhas já formatadas em CSV (BOM utf-8) e devolve como anexo."""
     buf = io.StringIO()
@@ -86,61 +57,6 @@ def _csv_response(filename: str, header: list, rows: list) -> Response:
     )
 
 
-def _fetch_cotacoes_github() -> tuple[list, list]:
-    """Retorna (boi, novilha) com cache em memória de 30 minutos."""
-    now = time.time()
-    with _cotacoes_lock:
-        if now - _cotacoes_cache['ts'] < _COTACOES_TTL:
-            return _cotacoes_cache['boi'], _cotacoes_cache['novilha']
-
-    base = "https://raw.githubusercontent.com/dom1ng0s/gado-scraper/main"
-
-    def _get(endpoint: str) -> list:
-        try:
-            r = requests.get(f"{base}/{endpoint}", timeout=5)
-            if r.status_code != 200:
-                return []
-            dados = r.json()
-            return dados if isinstance(dados, list) else []
-        except Exception:
-            return []
-
-    boi = _get("cotacoes_boi_hoje.json")
-    novilha = _get("cotacoes_novilha_hoje.json")
-
-    if boi or novilha:
-        with _cotacoes_lock:
-            _cotacoes_cache.update({'ts': now, 'boi': boi, 'novilha': novilha})
-
-    return boi, novilha
-
-
-def _gerar_pdf_bg(job_id: str, html: str) -> None:
-    pdf_path  = f"{_PDF_DIR}/sgg_pdf_{job_id}.pdf"
-    pend_path = f"{_PDF_DIR}/sgg_pdf_{job_id}.pending"
-    err_path  = f"{_PDF_DIR}/sgg_pdf_{job_id}.error"
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            page = browser.new_page()
-            page.set_content(html, wait_until='load')
-            pdf_bytes = page.pdf(format='A4', margin={
-                'top': '20mm', 'bottom': '20mm',
-                'left': '15mm', 'right': '15mm',
-            })
-            browser.close()
-        with open(pdf_path, 'wb') as f:
-            f.write(pdf_bytes)
-    except Exception as e:
-        logger.error(f"Erro PDF bg job {job_id}: {e}", exc_info=True)
-        with open(err_path, 'w') as f:
-            f.write(str(e))
-    finally:
-        try:
-            _os.unlink(pend_path)
-        except FileNotFoundError:
-            pass
-
 @api_bp.route('/graficos')
 @login_required
 @limiter.limit("60 per minute")
@@ -196,6 +112,53 @@ def graficos_gmd():
     return _with_cache(jsonify({'gmd_medio': gmd_medio}))
 
 
+@api_bp.route('/api/v1/rebanho/serie')
+@login_required
+@limiter.limit("60 per minute")
+def serie_rebanho():
+    """Série diária do rebanho (?dias=, 7–1830, padrão 180) lida de rebanho_snapshot_diario."""
+    dias = min(max(request.args.get('dias', 180, type=int), 7), 1830)
+    fim = date.today()
+    rows = snapshot_repository.get_serie(current_user.id, fim - timedelta(days=dias), fim)
+
+    def _f(v):
+        return float(v) if v is not None else None
+
+    return _with_cache(jsonify({
+        'datas': [r[0].isoformat() for r in rows],
+        'cabecas': [r[1] for r in rows],
+        'machos': [r[2] for r in rows],
+        'femeas': [r[3] for r in rows],
+        'bezerros': [r[4] for r in rows],
+        'peso_total': [_f(r[6]) for r in rows],
+        'peso_medio': [_f(r[7]) for r in rows],
+        'gmd_medio': [_f(r[8]) for r in rows],
+        'valor_contabil': [_f(r[9]) for r in rows],
+    }), max_age=600)
+
+
+
+@api_bp.route('/api/v1/rebanho/valor-mercado')
+@login_required
+@limiter.limit("60 per minute")
+def serie_valor_mercado():
+    """Valor do rebanho a mercado x contábil por dia (?dias=, 7–1830, padrão 180).
+
+    Peso de rebanho_snapshot_diario x cotação regional de cotacoes_historico.
+    """
+    dias = min(max(request.args.get('dias', 180, type=int), 7), 1830)
+    fim = date.today()
+    inicio = fim - timedelta(days=dias)
+    rows = snapshot_repository.get_serie(current_user.id, inicio, fim)
+    config = configuracao_repository.get_configuracao(current_user.id)
+    precos = cotacoes_util.precos_por_data(cotacao_repository.get_historico(inicio, fim),
+                                           cotacoes_util.uf_da_fazenda(config[1] if config else None))
+    return _with_cache(jsonify({
+        'datas': [r[0].isoformat() for r in rows],
+        'valor_mercado': cotacoes_util.serie_valor_mercado(rows, precos),
+        'valor_contabil': [float(r[9]) for r in rows],
+    }), max_age=600)
+
 @api_bp.route('/api/animais/gmd-lote')
 @login_required
 @limiter.limit("120 per minute")
@@ -247,47 +210,219 @@ def dashboard_summary():
         },
     }))
 
+@api_bp.route('/api/v1/pastos/lotacao')
+@login_required
+@limiter.limit("60 per minute")
+def mapa_lotacao():
+    """Lotação (UA pelo peso vivo) por módulo e por pasto — lida de modulo_estado."""
+    def _f(v):
+        return float(v) if v is not None else None
+
+    pastos = {}
+    for (pasto_id, pasto_nome, pasto_area, modulo_id, modulo_nome, area, capacidade,
+         qtd, ua, pct, ua_ha, superlotado) in pasto_repository.get_mapa_lotacao(current_user.id):
+        pasto = pastos.setdefault(pasto_id, {
+            'id': pasto_id, 'nome': pasto_nome, 'area_hectares': _f(pasto_area),
+            'ua_total': 0.0, 'superlotados': 0, 'modulos': [],
+        })
+        pasto['ua_total'] += float(ua or 0)
+        pasto['superlotados'] += int(superlotado)
+        pasto['modulos'].append({
+            'id': modulo_id, 'nome': modulo_nome, 'area_hectares': _f(area),
+            'capacidade_ua': _f(capacidade), 'qtd_animais': qtd, 'ua_atual': _f(ua),
+            'pct_lotacao': _f(pct), 'ua_por_ha': _f(ua_ha), 'superlotado': bool(superlotado),
+        })
+    for pasto in pastos.values():
+        pasto['ua_total'] = round(pasto['ua_total'], 2)
+        area = pasto['area_hectares']
+        pasto['ua_por_ha'] = round(pasto['ua_total'] / area, 2) if area else None
+
+    return _with_cache(jsonify({
+        'ua_total': round(sum(p['ua_total'] for p in pastos.values()), 2),
+        'superlotados': sum(p['superlotados'] for p in pastos.values()),
+        'pastos': list(pastos.values()),
+    }))
+
+
+@api_bp.route('/api/v1/animais/<int:animal_id>/ancestrais')
+@login_required
+@limiter.limit("60 per minute")
+def ancestrais(animal_id):
+    """Ancestrais até N gerações (?geracoes=, 1–10, padrão 3)."""
+    if not animal_repository.get_animal_by_id(animal_id, current_user.id):
+        return jsonify({'error': 'Animal não encontrado'}), 404
+    geracoes = min(max(request.args.get('geracoes', 3, type=int), 1), 10)
+    rows = genealogia_repository.get_ancestrais(animal_id, current_user.id, geracoes)
+    return _with_cache(jsonify([
+        {'id': r[0], 'brinco': r[1], 'sexo': r[2], 'geracao': r[3]} for r in rows
+    ]))
+
+
+@api_bp.route('/api/v1/animais/<int:animal_id>/descendentes')
+@login_required
+@limiter.limit("60 per minute")
+def descendentes(animal_id):
+    """Todos os descendentes, com geração e GMD."""
+    if not animal_repository.get_animal_by_id(animal_id, current_user.id):
+        return jsonify({'error': 'Animal não encontrado'}), 404
+    rows = genealogia_repository.get_descendentes(animal_id, current_user.id)
+    return _with_cache(jsonify([
+        {'id': r[0], 'brinco': r[1], 'sexo': r[2], 'geracao': r[3],
+         'gmd': float(r[4]) if r[4] is not None else None} for r in rows
+    ]))
+
+
+@api_bp.route('/api/v1/genealogia/endogamia')
+@login_required
+@limiter.limit("30 per minute")
+def endogamia():
+    """Coeficiente de endogamia do filho de cada acasalamento planejado.
+
+    ?touro_id=X&vacas=1,2,3 (até 200 vacas) — uma matriz de parentesco para o lote.
+    """
+    touro_id = request.args.get('touro_id', type=int)
+    try:
+        vacas = [int(i) for i in request.args.get('vacas', '').split(',') if i.strip()]
+    except ValueError:
+        return jsonify({'error': 'IDs inválidos'}), 400
+    if not touro_id or not vacas:
+        return jsonify({'error': 'Informe touro_id e vacas'}), 400
+    if len(vacas) > 200:
+        return jsonify({'error': 'Máximo 200 vacas por requisição'}), 400
+
+    pedigree = genealogia_repository.get_pedigree([touro_id] + vacas, current_user.id)
+    conhecidos = {r[0] for r in pedigree}
+    if touro_id not in conhecidos:
+        return jsonify({'error': 'Touro não encontrado'}), 404
+    vacas = [v for v in vacas if v in conhecidos]
+    coeficientes = endogamia_acasalamentos(pedigree, [(touro_id, v) for v in vacas])
+    return jsonify({
+        'touro_id': touro_id,
+        'acasalamentos': [{'vaca_id': v, 'endogamia': f} for v, f in zip(vacas, coeficientes)],
+    })
+
+
+# tipo do item -> (endpoint, nome do argumento) da tela de detalhe
+_DETALHE_BUSCA = {
+    'animal': ('operacional.detalhes', 'id_animal'),
+    'pasto': ('pastos.detalhe_pasto', 'pasto_id'),
+    'produto': ('estoque.detalhe_estoque', 'produto_id'),
+}
+
+
+@api_bp.route('/api/v1/busca')
+@login_required
+@limiter.limit("120 per minute")
+def busca():
+    """Typeahead sobre brinco, código de lote, pasto e produto (utils.busca).
+
+    ?q= (prefixo, trecho do meio/fim ou aproximado), ?limite= (1–50, padrão 10)
+    e ?tipo= opcional (animal, lote, pasto, produto).
+    """
+    q = request.args.get('q', '').strip()[:50]
+    limite = min(max(request.args.get('limite', 10, type=int), 1), 50)
+    resultados = []
+    for tipo, item_id, rotulo, detalhe in buscar(current_user.id, q, limite,
+                                                 request.args.get('tipo') or None):
+        destino = _DETALHE_BUSCA.get(tipo)
+        resultados.append({
+            'tipo': tipo, 'id': item_id, 'rotulo': rotulo, 'detalhe': detalhe,
+            'url': url_for(destino[0], **{destino[1]: item_id}) if destino else None,
+        })
+    return jsonify({'q': q, 'resultados': resultados})
+
+
+# Acima disso a simulação sai da thread da request (~200 ms por 1M de cenários).
+_CENARIOS_SINCRONO = 250_000
+
+
+@api_bp.route('/api/v1/simulador/monte-carlo', methods=['POST'])
+@login_required
+@limiter.limit("20 per minute")
+def simulador_monte_carlo():
+    """Custo da @ em N cenários (GMD reamostrado do rebanho, custo e preço com variação).
+
+    Até _CENARIOS_SINCRONO responde o resultado; acima, 202 com job_id para polling.
+    """
+    errors = validate(request.form, [
+        ('qtd_animais',  {'required': True, 'type': 'int',   'min_val': 1, 'max_val': 99999, 'label': 'Qtd. animais'}),
+        ('custo_anual',  {'required': True, 'type': 'float', 'min_val': 0,                    'label': 'Custo anual'}),
+        ('preco_arroba', {'required': True, 'type': 'float', 'min_val': 0,                    'label': 'Preço da @'}),
+        ('cenarios',     {'type': 'int',   'min_val': 1000, 'max_val': CENARIOS_MAX,          'label': 'Cenários'}),
+        ('cv_custo',     {'type': 'float', 'min_val': 0,    'max_val': 100,                   'label': 'Variação do custo (%)'}),
+        ('cv_preco',     {'type': 'float', 'min_val': 0,    'max_val': 100,                   'label': 'Variação do preço (%)'}),
+    ])
+    if errors:
+        return jsonify({'error': errors[0]}), 400
+
+    def _num(campo, padrao):
+        return float(request.form.get(campo) or padrao)
+
+    gmds = animal_repository.get_gmds_rebanho(current_user.id)
+    cenarios = int(_num('cenarios', CENARIOS_PADRAO))
+    args = (gmds, _num('custo_anual', 0), int(_num('qtd_animais', 1)), _num('preco_arroba', 0))
+    kwargs = {'cenarios': cenarios,
+              'cv_custo': _num('cv_custo', 10) / 100, 'cv_preco': _num('cv_preco', 10) / 100}
+    if cenarios <= _CENARIOS_SINCRONO:
+        return jsonify({'status': 'concluido', 'resultado': simular_custo_arroba(*args, **kwargs)})
+
+    job_id = jobs.executar('monte_carlo', current_user.id, simular_custo_arroba, *args, **kwargs)
+    return jsonify({'status': 'pendente', 'job_id': job_id}), 202
+
+
+@api_bp.route('/api/v1/simulador/monte-carlo/<job_id>')
+@login_required
+def simulador_monte_carlo_status(job_id: str):
+    if not _UUID_RE.match(job_id):
+        return jsonify({'error': 'Simulação não encontrada ou expirada'}), 404
+    estado = jobs.estado(job_id, current_user.id)
+    if estado is None or estado['tipo'] != 'monte_carlo':
+        return jsonify({'error': 'Simulação não encontrada ou expirada'}), 404
+    return jsonify(estado)
+
+
+@api_bp.route('/api/v1/simulador/grade', methods=['POST'])
+@login_required
+@limiter.limit("30 per minute")
+def simulador_grade():
+    """Grade de sensibilidade do custo da @ (heatmap do simulador) numa request.
+
+    Corpo JSON: {parâmetro: número | {"de", "ate", "passos"}} para qtd_animais,
+    gmd, arrendamento, suplementacao, mao_obra e extras. Devolve a matriz do
+    custo da @ com uma dimensão por parâmetro que varia (utils.simulacao).
+    """
+    parametros = request.get_json(silent=True)
+    if not isinstance(parametros, dict):
+        return jsonify({'error': 'Envie os parâmetros da grade em JSON.'}), 400
+    try:
+        return jsonify(grade_custo_arroba(parametros))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
 @api_bp.route('/api/v1/relatorio/pdf', methods=['POST'])
 @login_required
 @limiter.limit("6 per minute")
 def relatorio_pdf():
-    """Inicia geração de PDF em background. Retorna job_id para polling."""
-    config    = configuracao_repository.get_configuracao(current_user.id)
-    fluxo     = financeiro_repository.get_fluxo_caixa(current_user.id)
-    animais   = animal_repository.get_animais_com_gmd(current_user.id)
-    gmds      = [float(a[5]) for a in animais if a[5] is not None]
-    gmd_medio = sum(gmds) / len(gmds) if gmds else 0.0
-
-    html = render_template('relatorio_pdf.html',
-                           config=config, fluxo=fluxo, animais=animais,
-                           gmd_medio=gmd_medio,
-                           data_geracao=date.today().strftime('%d/%m/%Y'))
-
-    _limpar_pdfs_orfaos()
-    job_id = str(uuid.uuid4())
-    jobs = session.get('pdf_jobs', [])
-    jobs = (jobs[-9:] if len(jobs) >= 10 else jobs) + [job_id]
-    session['pdf_jobs'] = jobs
-    open(f"{_PDF_DIR}/sgg_pdf_{job_id}.pending", 'w').close()
-    threading.Thread(target=_gerar_pdf_bg, args=(job_id, html), daemon=True).start()
+    """Inicia geração de PDF em background (ou reaproveita o do cache). Retorna job_id para polling."""
+    job_id = relatorio.solicitar_pdf(current_user.id)
 
     return jsonify({'job_id': job_id})
 
 
+# status do registro de jobs -> contrato do polling do front (index.html)
+_STATUS_PDF = {'pendente': 'pending', 'executando': 'pending', 'concluido': 'done', 'erro': 'error'}
+
+
 @api_bp.route('/api/v1/relatorio/pdf/<job_id>/status')
 @login_required
 def pdf_status(job_id: str):
     if not _UUID_RE.match(job_id):
         return jsonify({'status': 'not_found'}), 404
-    if job_id not in session.get('pdf_jobs', []):
+    estado = jobs.estado(job_id, current_user.id)
+    if estado is None or estado['tipo'] != 'pdf':
         return jsonify({'status': 'not_found'}), 404
-    if _os.path.exists(f"{_PDF_DIR}/sgg_pdf_{job_id}.pdf"):
-        return jsonify({'status': 'done'})
-    if _os.path.exists(f"{_PDF_DIR}/sgg_pdf_{job_id}.error"):
-        return jsonify({'status': 'error'})
-    if _os.path.exists(f"{_PDF_DIR}/sgg_pdf_{job_id}.pending"):
-        return jsonify({'status': 'pending'})
-    return jsonify({'status': 'not_found'}), 404
+    return jsonify({'status': _STATUS_PDF[estado['status']]})
 
 
 @api_bp.route('/api/v1/relatorio/pdf/<job_id>/download')
@@ -295,17 +430,9 @@ def pdf_status(job_id: str):
 def pdf_download(job_id: str):
     if not _UUID_RE.match(job_id):
         return jsonify({'error': 'Invalid job ID'}), 400
-    if job_id not in session.get('pdf_jobs', []):
-        return jsonify({'error': 'PDF não encontrado ou expirado'}), 404
-    pdf_path = f"{_PDF_DIR}/sgg_pdf_{job_id}.pdf"
-    if not _os.path.exists(pdf_path):
+    pdf_bytes = jobs.ler_blob(job_id, current_user.id)
+    if pdf_bytes is None:
         return jsonify({'error': 'PDF não encontrado ou expirado'}), 404
-    with open(pdf_path, 'rb') as f:
-        pdf_bytes = f.read()
-    try:
-        _os.unlink(pdf_path)
-    except Exception:
-        pass
     return Response(
         pdf_bytes,
         mimetype='application/pdf',
@@ -313,6 +440,66 @@ def pdf_download(job_id: str):
     )
 
 
+# ── Acompanhamento de jobs: SSE, com long polling de reserva ─────────────────
+_SSE_DURACAO = 55      # abaixo do timeout de proxy; o EventSource reconecta sozinho
+_LONG_POLL_MAX = 25
+
+
+def _evento_sse(dados):
+    return f"data: {json.dumps(dados)}\n\n"
+
+
+@api_bp.route('/api/v1/jobs/<job_id>/events')
+@login_required
+def job_eventos(job_id: str):
+    """Server-sent events com status e progresso do job até um estado final.
+
+    Uma request autenticada por acompanhamento, em vez de uma por consulta:
+    os avisos vêm do pub/sub (utils.pubsub) e, na falta deles, o estado é
+    relido no banco (utils.jobs.acompanhar). Linhas ": ping" mantêm a conexão.
+    """
+    if not _UUID_RE.match(job_id):
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    estados = jobs.acompanhar(job_id, current_user.id, _SSE_DURACAO)
+    primeiro = next(estados)
+    if primeiro is None:
+        estados.close()
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+
+    def _stream():
+        try:
+            yield "retry: 2000\n" + _evento_sse(primeiro)
+            for atual in estados:
+                yield _evento_sse(atual) if atual is not None else ": ping\n\n"
+        finally:
+            estados.close()
+
+    return Response(stream_with_context(_stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@api_bp.route('/api/v1/jobs/<job_id>')
+@login_required
+def job_estado(job_id: str):
+    """Status e progresso do job — reserva do SSE (long polling).
+
+    Com ?status=...&progresso=... (o último estado visto), segura a resposta
+    até o job mudar ou _LONG_POLL_MAX segundos; sem eles, responde na hora.
+    """
+    if not _UUID_RE.match(job_id):
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    status = request.args.get('status')
+    if status:
+        conhecido = {'status': status, 'progresso': request.args.get('progresso', 0, type=int)}
+        atual = jobs.aguardar(job_id, current_user.id, conhecido, _LONG_POLL_MAX)
+    else:
+        dados = jobs.estado(job_id, current_user.id)
+        atual = jobs.resumo(dados) if dados else None
+    if atual is None:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    return jsonify(atual)
+
+
 @api_bp.route('/api/v1/export/animais.csv')
 @login_required
 @limiter.limit("10 per minute")
@@ -436,40 +623,65 @@ def _fetch_cidades_ibge() -> list:
 @api_bp.route('/proxy-cidades')
 @limiter.limit("10 per minute")
 def proxy_cidades():
-    """Cidades brasileiras via IBGE — cache de 24h, evita chamada por request."""
+    """Lista completa via IBGE — cache de 24h. As telas usam /api/v1/cidades."""
     return jsonify(_fetch_cidades_ibge())
 
+
+@api_bp.route('/api/v1/cidades')
+@limiter.limit("120 per minute")
+def buscar_cidades():
+    """Typeahead de município: ?q= (prefixo do nome ou de uma palavra, sem acento),
+    ?uf= opcional, ?limite= (1–50, padrão 10). Público: usado no cadastro."""
+    q = request.args.get('q', '').strip()[:60]
+    uf = request.args.get('uf', '').strip().upper()[:2] or None
+    limite = min(max(request.args.get('limite', 10, type=int), 1), 50)
+    indice = cidades_util.get_indice(fallback=_fetch_cidades_ibge)
+    return _with_cache(jsonify([
+        {'nome': c['nome'], 'uf': c['uf'], 'rotulo': f"{c['nome']} - {c['uf']}"}
+        for c in indice.buscar(q, uf, limite)
+    ]), max_age=3600)
+
+
+@api_bp.route('/api/v1/cidades/<uf>')
+@limiter.limit("30 per minute")
+def cidades_por_uf(uf):
+    """Todos os municípios da UF — JSON pré-montado e pré-comprimido, ETag forte."""
+    indice = cidades_util.get_indice(fallback=_fetch_cidades_ibge)
+    payload = indice.payloads.get(uf.upper())
+    if not payload:
+        return jsonify({'error': 'UF não encontrada'}), 404
+    corpo, corpo_gzip, etag = payload
+    usar_gzip = request.accept_encodings.quality('gzip') > 0
+    if usar_gzip:
+        corpo, etag = corpo_gzip, etag + '-gz'  # ETag forte é por representação
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(corpo, mimetype='application/json')
+        if usar_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
 @api_bp.route('/cotacoes-regionais')
 @login_required
 @limiter.limit("30 per minute")
 def cotacoes_regionais():
-    uf_usuario = None
     res = configuracao_repository.get_configuracao(current_user.id)
-    if res and res[1]:
-        partes = res[1].split('-')
-        if len(partes) > 1:
-            uf_usuario = partes[-1].strip().upper()
+    uf_usuario = cotacoes_util.uf_da_fazenda(res[1] if res else None)
 
     if not uf_usuario:
         return jsonify({'erro': 'Localização não configurada'}), 404
 
-    boi_todos, novilha_todos = _fetch_cotacoes_github()
-
-    nome_completo = _MAPA_ESTADOS.get(uf_usuario, '')
-
-    def filtrar(dados):
-        out = []
-        for item in dados:
-            praca = item.get('praca', '').upper()
-            if praca.startswith(uf_usuario) or praca == uf_usuario or \
-                    (nome_completo and praca == nome_completo.upper()):
-                out.append(item)
-        return out
+    boi_todos, novilha_todos = cotacoes_util.buscar_cotacoes()
 
     return jsonify({
         'uf': uf_usuario,
-        'boi': filtrar(boi_todos),
-        'novilha': filtrar(novilha_todos),
+        'boi': cotacoes_util.filtrar_por_uf(boi_todos, uf_usuario),
+        'novilha': cotacoes_util.filtrar_por_uf(novilha_todos, uf_usuario),
     })
 
 
@@ -478,5 +690,5 @@ def cotacoes_regionais():
 @limiter.limit("30 per minute")
 def cotacoes_brasil():
     """Retorna cotações de todas as praças — servido do cache compartilhado."""
-    boi, novilha = _fetch_cotacoes_github()
+    boi, novilha = cotacoes_util.buscar_cotacoes()
     return jsonify({'boi': boi, 'novilha': novilha})
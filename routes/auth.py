@@ -2,7 +2,7 @@ import secrets
 import logging
 from datetime import datetime, timedelta, timezone
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
 from flask_login import login_user, login_required, logout_user, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
 
@@ -12,6 +12,7 @@ from models import User
 from repositories import auth_repository
 from routes.validators import validate
 from utils.email_service import send_reset_code, send_welcome_email
+from utils.purga import iniciar_purga
 
 auth_bp = Blueprint('auth', __name__)
 logger = logging.getLogger(__name__)
@@ -37,7 +38,8 @@ def login():
         try:
             with get_db_cursor() as cursor:
                 cursor.execute(
-                    "SELECT id, username, password_hash, email FROM usuarios WHERE username = %s OR email = %s",
+                    "SELECT id, username, password_hash, email FROM usuarios "
+                    "WHERE (username = %s OR email = %s) AND desativado_em IS NULL",
                     (username, username)
                 )
                 dados = cursor.fetchone()
@@ -279,7 +281,10 @@ def apagar_conta():
 
     user_id = current_user.id
     try:
-        auth_repository.delete_user_and_data(user_id)
+        # Desativa na hora; os dados saem em lotes numa thread (utils/purga.py) —
+        # apagar tudo dentro da requisição estourava o timeout em fazendas grandes.
+        auth_repository.desativar_conta(user_id)
+        iniciar_purga(current_app._get_current_object(), user_id)
         logout_user()
         session.clear()
         flash('Conta excluída com sucesso.', 'success')
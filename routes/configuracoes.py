@@ -26,7 +26,8 @@ def settings():
                 res = configuracao_repository.get_configuracao(current_user.id)
                 if res:
                     dados_atuais = {'nome_fazenda': res[0], 'cidade_estado': res[1], 'area_total': res[2],
-                                    'gmd_meta': res[3] if res[3] is not None else 0.800}
+                                    'gmd_meta': res[3] if res[3] is not None else 0.800,
+                                    'relatorio_mensal': bool(res[4])}
             except Exception as e:
                 logger.error(f"Erro ao carregar configurações: {e}", exc_info=True)
             dados_atuais.update({
@@ -34,6 +35,7 @@ def settings():
                 'cidade_estado': request.form.get('cidade_estado', dados_atuais.get('cidade_estado', '')),
                 'area_total': request.form.get('area_total', dados_atuais.get('area_total', '')),
                 'gmd_meta': request.form.get('gmd_meta', dados_atuais.get('gmd_meta', 0.800)),
+                'relatorio_mensal': 'relatorio_mensal' in request.form,
             })
             return render_template('configuracoes.html', config=dados_atuais, mensagem=errors[0]), 400
         try:
@@ -41,8 +43,10 @@ def settings():
             cidade = request.form.get('cidade_estado', '').strip()
             area = request.form.get('area_total') or 0
             gmd_meta = request.form.get('gmd_meta') or 0.800
+            relatorio_mensal = 'relatorio_mensal' in request.form
 
-            configuracao_repository.upsert_configuracao(current_user.id, nome, cidade, area, gmd_meta)
+            configuracao_repository.upsert_configuracao(current_user.id, nome, cidade, area, gmd_meta,
+                                                        relatorio_mensal)
             session.pop('nome_fazenda', None)
             session.pop('gmd_meta', None)
             flash("Configurações salvas com sucesso!", 'success')
@@ -57,7 +61,8 @@ def settings():
         res = configuracao_repository.get_configuracao(current_user.id)
         if res:
             dados_atuais = {'nome_fazenda': res[0], 'cidade_estado': res[1], 'area_total': res[2],
-                            'gmd_meta': res[3] if res[3] is not None else 0.800}
+                            'gmd_meta': res[3] if res[3] is not None else 0.800,
+                            'relatorio_mensal': bool(res[4])}
     except Exception as e:
         logger.error(f"Erro ao carregar configurações: {e}", exc_info=True)
 
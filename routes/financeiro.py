@@ -1,52 +1,17 @@
 from flask import Blueprint, render_template, request, url_for, redirect, flash
 from flask_login import login_required, current_user
 import math
-from datetime import date, timedelta
+from datetime import date
 import logging
-from repositories import animal_repository, financeiro_repository
+from repositories import financeiro_repository
 from routes.validators import validate
 from utils.calculo import KG_POR_ARROBA
+from utils.kpis import get_kpis
 
 financeiro_bp = Blueprint('financeiro', __name__)
 logger = logging.getLogger(__name__)
 
 
-def calcular_kpis_unificados(user_id):
-    dados = {
-        'qtd_animais': 0, 'gmd_medio': 0.0, 'custo_mensal_total': 0.0,
-        'custo_diaria': 0.0, 'custo_arroba': 0.0, 'dias_para_arroba': 0,
-        'arrendamento': 0.0, 'suplementacao': 0.0, 'mao_obra': 0.0, 'extras': 0.0
-    }
-
-    dados['qtd_animais'] = animal_repository.count_animais(user_id, status='ativos')
-    dados['gmd_medio'] = animal_repository.get_gmd_medio_rebanho(user_id)
-
-    dt_lim = date.today() - timedelta(days=365)
-    custos = financeiro_repository.get_custos_por_tipo_trimestre(user_id, dt_lim)
-
-    tot_anual = 0.0
-    for tipo, val in custos:
-        v = float(val)
-        tot_anual += v
-        if tipo == 'Arrendamento':
-            dados['arrendamento'] += v
-        elif tipo == 'Nutrição':
-            dados['suplementacao'] += v
-        elif tipo == 'Salário':
-            dados['mao_obra'] += v
-        else:
-            dados['extras'] += v
-    dados['custo_mensal_total'] = tot_anual
-
-    if dados['qtd_animais'] > 0:
-        dados['custo_diaria'] = (tot_anual / dados['qtd_animais']) / 365
-    if dados['gmd_medio'] > 0:
-        dados['dias_para_arroba'] = KG_POR_ARROBA / dados['gmd_medio']
-        dados['custo_arroba'] = dados['custo_diaria'] * dados['dias_para_arroba']
-
-    return dados
-
-
 @financeiro_bp.route('/financeiro')
 @login_required
 def financeiro():
@@ -56,16 +21,13 @@ def financeiro():
         'custo_diaria': "---", 'custo_arroba': "---",
         'entradas_ano': 0, 'saidas_ano': 0, 'reposicao_ano': 0,
         'custos_op_ano': 0, 'med_ano': 0, 'balanco_ano': 0,
+        'valor_contabil': 0, 'data_cotacao': None,
     }
     anos = [date.today().year]
 
     try:
         uid = current_user.id
 
-        valor_reb = financeiro_repository.get_valor_rebanho(uid)
-        if valor_reb:
-            view_data['valor_rebanho'] = f"{valor_reb:,.2f}"
-
         hist = financeiro_repository.get_fluxo_caixa(uid)
         if hist:
             anos = [row[0] for row in hist]
@@ -80,7 +42,14 @@ def financeiro():
                 view_data['saidas_ano'] = f"{(d_ano[2] + d_ano[3] + d_ano[4]):,.2f}"
                 view_data['balanco_ano'] = f"{(d_ano[1] - (d_ano[2] + d_ano[3] + d_ano[4])):,.2f}"
 
-        kpis = calcular_kpis_unificados(uid)
+        kpis = get_kpis(uid)
+        # Valor de mercado (cotação regional); sem cotação gravada, o contábil.
+        valor_reb = kpis['valor_mercado'] if kpis['valor_mercado'] is not None else kpis['valor_contabil']
+        if valor_reb:
+            view_data['valor_rebanho'] = f"{valor_reb:,.2f}"
+        view_data['valor_contabil'] = f"{kpis['valor_contabil']:,.2f}"
+        if kpis['valor_mercado'] is not None:
+            view_data['data_cotacao'] = date.fromisoformat(kpis['data_cotacao'])
         if kpis['custo_arroba'] > 0:
             view_data['custo_diaria'] = f"{kpis['custo_diaria']:.2f}"
             view_data['custo_arroba'] = f"{kpis['custo_arroba']:.2f}"
@@ -117,7 +86,7 @@ def simulador_custo():
 
     try:
         if request.method == 'GET':
-            sugestoes = calcular_kpis_unificados(current_user.id)
+            sugestoes = get_kpis(current_user.id)
     except Exception as e:
         logger.error(f"Erro simulador: {e}", exc_info=True)
 
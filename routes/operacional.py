@@ -7,9 +7,13 @@ import io
 import re as _re
 from mysql.connector import errors as _mysql_errors
 from datetime import date as _date
-from repositories import animal_repository, reproducao_repository, sanitario_repository
+from repositories import (animal_repository, arquivo_repository, busca_repository,
+                          financeiro_repository, genealogia_repository, reproducao_repository,
+                          sanitario_repository)
 from routes.validators import validate
 from utils.calculo import preco_por_arroba
+from utils.streaming import stream_pagina
+from utils.venda import sugerir_venda
 from decimal import Decimal
 
 operacional_bp = Blueprint('operacional', __name__)
@@ -78,6 +82,42 @@ def restaurar_animal(id_animal):
         logger.error(f"Erro restaurar: {e}", exc_info=True)
     return redirect(url_for('operacional.lixeira'))
 
+@operacional_bp.route('/arquivo')
+@login_required
+def arquivo():
+    animais = []
+    termo = request.args.get('busca', '')
+    pg = request.args.get('page', 1, type=int)
+    limit, offset = 20, (pg - 1) * 20
+    total_pg = 1
+
+    try:
+        total = arquivo_repository.count_animais_arquivados(current_user.id, termo)
+        animais = arquivo_repository.get_animais_arquivados_paginados(current_user.id, limit, offset, termo)
+        if total > 0:
+            total_pg = math.ceil(total / limit)
+    except Exception as e:
+        logger.error(f"Erro arquivo: {e}", exc_info=True)
+        flash("Não foi possível carregar o arquivo agora. Tente novamente em instantes.", 'error')
+
+    return render_template("arquivo.html", lista_animais=animais, pagina_atual=pg, total_paginas=total_pg, busca=termo)
+
+@operacional_bp.route('/arquivo/<int:id_animal>/restaurar', methods=['POST'])
+@login_required
+def restaurar_arquivado(id_animal):
+    try:
+        resultado = arquivo_repository.restaurar_animal_arquivado(id_animal, current_user.id)
+        if resultado == 'ok':
+            flash("Animal restaurado do arquivo.", 'success')
+        elif resultado == 'brinco_em_uso':
+            flash("Já existe um animal ativo com este brinco. Renomeie-o antes de restaurar.", 'error')
+        else:
+            flash("Animal não encontrado no arquivo.", 'error')
+    except Exception as e:
+        logger.error(f"Erro restaurar arquivo: {e}", exc_info=True)
+        flash("Não foi possível restaurar o animal agora.", 'error')
+    return redirect(url_for('operacional.arquivo'))
+
 @operacional_bp.route("/cadastro", methods=["GET", "POST"])
 @login_required
 def cadastro():
@@ -149,13 +189,16 @@ def detalhes(id_animal):
         pesagens = animal_repository.get_pesagens_by_animal(id_animal)
         meds = animal_repository.get_medicacoes_by_animal(id_animal)
         view = animal_repository.get_gmd_by_animal(id_animal)
+        razao = financeiro_repository.get_custo_animal(id_animal, current_user.id)
+        custo_operacional = float(razao[0]) if razao else 0.0
 
         kpis = {
             'peso_atual': view[0] if view else (pesagens[0][3] if pesagens else 0),
             'ganho_total': view[1] if view else 0,
             'dias': view[2] if view else 0,
             'gmd': "{:.3f}".format(view[3]) if view else "0.000",
-            'custo_total': f"{(float(animal[5] or 0) + sum(float(m[4] or 0) for m in meds)):.2f}",
+            'custo_total': f"{(float(animal[5] or 0) + sum(float(m[4] or 0) for m in meds) + custo_operacional):.2f}",
+            'custo_operacional': f"{custo_operacional:.2f}",
         }
 
         # Índices da query explícita em get_animal_by_id:
@@ -167,13 +210,49 @@ def detalhes(id_animal):
             delta = (_date.today() - data_nasc).days
             idade_meses = delta // 30
 
+        # Pai e mãe atuais, mesmo vendidos ou arquivados; os demais vêm do typeahead.
+        pais = {sexo: (pai_id, brinco) for pai_id, brinco, sexo, _ in
+                genealogia_repository.get_ancestrais(id_animal, current_user.id, geracoes=1)}
+
         return render_template("detalhes.html", animal=animal, historico_peso=pesagens,
-                               historico_med=meds, indicadores=kpis, idade_meses=idade_meses)
+                               historico_med=meds, indicadores=kpis, idade_meses=idade_meses,
+                               pai=pais.get('M'), mae=pais.get('F'))
     except Exception as e:
         logger.error(f"Erro detalhes: {e}", exc_info=True)
         flash("Não foi possível carregar os dados do animal agora. Tente novamente.", 'error')
         return redirect(url_for('operacional.painel'))
 
+@operacional_bp.route('/animal/<int:id_animal>/pais', methods=['POST'])
+@login_required
+def definir_pais(id_animal):
+    """Troca pai/mãe do animal; a genealogia da subárvore é refeita na mesma transação.
+
+    Campo ausente do formulário mantém o valor atual; vazio = desconhecido.
+    """
+    def _id(campo, atual):
+        if campo not in request.form:
+            return atual
+        valor = request.form[campo].strip()
+        return int(valor) if valor.isdigit() else None
+
+    try:
+        atuais = {sexo: pai_id for pai_id, _, sexo, _ in
+                  genealogia_repository.get_ancestrais(id_animal, current_user.id, geracoes=1)}
+        resultado = genealogia_repository.atualizar_pais(
+            id_animal, current_user.id, _id('pai_id', atuais.get('M')), _id('mae_id', atuais.get('F')))
+    except Exception as e:
+        logger.error(f"Erro definir_pais: {e}", exc_info=True)
+        resultado = 'erro'
+    mensagens = {
+        'ok': ("Genealogia atualizada.", 'success'),
+        'nao_encontrado': ("Animal não encontrado.", 'error'),
+        'pai_invalido': ("Pai deve ser um macho e mãe uma fêmea do seu rebanho.", 'error'),
+        'ciclo': ("Um animal não pode ser pai ou mãe de um ancestral seu.", 'error'),
+        'erro': ("Não foi possível atualizar a genealogia. Tente novamente.", 'error'),
+    }
+    flash(*mensagens[resultado])
+    return redirect(url_for('operacional.detalhes', id_animal=id_animal))
+
 @operacional_bp.route('/vender/<int:id_animal>', methods=['GET', 'POST'])
 @login_required
 def vender(id_animal):
@@ -255,8 +334,47 @@ def venda_lote():
         flash(msg, 'success')
         return redirect(url_for('operacional.painel'))
 
+    # Rebanho inteiro numa página: linhas em streaming (utils.streaming).
+    animais = animal_repository.iterar_animais_ativos_com_ultimo_peso(current_user.id)
+    return stream_pagina('venda_lote.html', animais=animais,
+                         lotes=animal_repository.get_lotes(current_user.id))
+
+@operacional_bp.route('/venda-lote/otimizar')
+@login_required
+def venda_lote_otimizar():
+    """Sugere os animais da venda (utils.venda) e devolve o formulário já marcado."""
     animais = animal_repository.get_animais_ativos_com_ultimo_peso(current_user.id)
-    return render_template('venda_lote.html', animais=animais)
+    lotes = animal_repository.get_lotes(current_user.id)
+    errors = validate(request.args, [
+        ('data_venda',   {'required': True, 'type': 'date',  'label': 'Data de venda'}),
+        ('valor_arroba', {'required': True, 'type': 'float', 'min_val': 0.01, 'label': 'Valor da arroba'}),
+        ('max_cabecas',  {'type': 'int',   'min_val': 1, 'label': 'Cabeças'}),
+        ('max_peso',     {'type': 'float', 'min_val': 1, 'label': 'Capacidade (kg)'}),
+        ('peso_minimo',  {'type': 'float', 'min_val': 0, 'label': 'Peso mínimo'}),
+        ('sexo',         {'choices': ['M', 'F'], 'label': 'Sexo'}),
+        ('lote_id',      {'type': 'int',   'min_val': 1, 'label': 'Lote'}),
+    ])
+    if not errors and not (request.args.get('max_cabecas') or request.args.get('max_peso')):
+        errors = ["Informe a quantidade de cabeças ou a capacidade em kg."]
+    if errors:
+        return render_template('venda_lote.html', animais=animais, lotes=lotes, erro=errors[0],
+                               form_data=request.args), 400
+
+    def _num(campo, tipo=float):
+        valor = request.args.get(campo)
+        return tipo(float(valor.replace(',', '.'))) if valor else None
+
+    candidatos = animal_repository.get_candidatos_venda(
+        current_user.id, sexo=request.args.get('sexo') or None, lote_id=_num('lote_id', int))
+    sugestao = sugerir_venda(candidatos, request.args['data_venda'], _num('valor_arroba'),
+                             max_cabecas=_num('max_cabecas', int), max_peso=_num('max_peso'),
+                             peso_minimo=_num('peso_minimo'))
+    restore_data = {
+        'animal_ids': [str(a['id']) for a in sugestao['animais']],
+        'pesos_venda': [str(a['peso']) for a in sugestao['animais']],
+    }
+    return render_template('venda_lote.html', animais=animais, lotes=lotes, sugestao=sugestao,
+                           form_data=request.args, restore_data=restore_data)
 
 @operacional_bp.route('/medicar/<int:id_animal>', methods=['GET', 'POST'])
 @login_required
@@ -368,9 +486,10 @@ def vacinacao_coletiva():
             return render_template('vacinacao_lote.html', erro="Erro interno ao processar vacinação.", animais=lista_animais), 500
 
     try:
-        lista_animais = animal_repository.get_animais_ativos(current_user.id)
+        # Rebanho inteiro numa página: linhas em streaming (utils.streaming).
+        lista_animais = animal_repository.iterar_animais_ativos(current_user.id)
         nome_pre = request.args.get('protocolo', '')
-        return render_template('vacinacao_lote.html', animais=lista_animais, nome_pre=nome_pre)
+        return stream_pagina('vacinacao_lote.html', animais=lista_animais, nome_pre=nome_pre)
     except Exception as e:
         logger.error(f"Erro carregar lote: {e}", exc_info=True)
         return redirect(url_for('operacional.painel'))
@@ -490,13 +609,14 @@ def pesagem_lote():
             flash(msg, 'success')
             return redirect(url_for('operacional.pesagem_lote', lote_id=lote_id))
 
-        animais = animal_repository.get_animais_ativos_por_lote(current_user.id, lote_id)
+        # Sem lote escolhido é o rebanho inteiro: linhas em streaming (utils.streaming).
+        animais = animal_repository.iterar_animais_ativos_por_lote(current_user.id, lote_id)
     except Exception as e:
         logger.error(f"Erro pesagem lote: {e}", exc_info=True)
         erro_geral = "Erro ao registrar pesagens. Tente novamente."
 
-    return render_template('pesagem_lote.html', lotes=lotes, animais=animais,
-                           lote_id_selecionado=lote_id, erro=erro_geral)
+    return stream_pagina('pesagem_lote.html', lotes=lotes, animais=animais,
+                         lote_id_selecionado=lote_id, erro=erro_geral)
 
 
 # ════════════════════════════════════════════════════════════════════════════
@@ -784,9 +904,10 @@ def importar_csv():
                 chunk = linhas_validas[inicio:inicio + _CSV_CHUNK_SIZE]
                 try:
                     cursor.executemany(
-                        "INSERT INTO animais (brinco, sexo, raca, data_compra, data_nascimento, "
-                        "preco_compra, user_id) VALUES (%s,%s,%s,%s,%s,%s,%s)",
-                        [(brinco, sexo, raca, data_compra, data_nasc, preco_compra, current_user.id)
+                        "INSERT INTO animais (brinco, brinco_ordem, sexo, raca, data_compra, data_nascimento, "
+                        "preco_compra, user_id) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
+                        [(brinco, animal_repository.chave_ordem_brinco(brinco), sexo, raca,
+                          data_compra, data_nasc, preco_compra, current_user.id)
                          for _, brinco, sexo, raca, data_compra, data_nasc, preco_compra, peso in chunk]
                     )
                     inseridos += len(chunk)
@@ -796,9 +917,10 @@ def importar_csv():
                     for linha, brinco, sexo, raca, data_compra, data_nasc, preco_compra, peso in chunk:
                         try:
                             cursor.execute(
-                                "INSERT INTO animais (brinco, sexo, raca, data_compra, data_nascimento, "
-                                "preco_compra, user_id) VALUES (%s,%s,%s,%s,%s,%s,%s)",
-                                (brinco, sexo, raca, data_compra, data_nasc, preco_compra, current_user.id)
+                                "INSERT INTO animais (brinco, brinco_ordem, sexo, raca, data_compra, data_nascimento, "
+                                "preco_compra, user_id) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
+                                (brinco, animal_repository.chave_ordem_brinco(brinco), sexo, raca,
+                                 data_compra, data_nasc, preco_compra, current_user.id)
                             )
                             inseridos += 1
                             inseridos_pesagem.append((brinco, data_compra or data_nasc, peso))
@@ -822,6 +944,8 @@ def importar_csv():
                     [(id_por_brinco[brinco], data_pesagem, peso)
                      for brinco, data_pesagem, peso in inseridos_pesagem if brinco in id_por_brinco]
                 )
+                animal_repository.atualizar_resumo_pesagens(cursor, list(id_por_brinco.values()))
+                busca_repository.incrementar_versao(cursor, current_user.id)
 
     except Exception as e:
         logger.error(f"Erro importação CSV: {e}", exc_info=True)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Gera data/municipios.json — snapshot dos municípios do IBGE lido por utils.cidades.
+
+Roda no build (Dockerfile e nixpacks.toml), então cada deploy sai com a lista
+atual. Sem o snapshot o app ainda funciona, mas cada worker busca a lista no
+IBGE na primeira consulta de cidades.
+
+Rodar:
+    python scripts/atualizar_municipios.py
+"""
+import json
+import os
+import sys
+
+import requests
+
+URL = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios"
+DESTINO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'data', 'municipios.json')
+
+
+def main():
+    resposta = requests.get(URL, timeout=30)
+    resposta.raise_for_status()
+    cidades = []
+    for item in resposta.json():
+        try:
+            cidades.append({'nome': item['nome'],
+                            'uf': item['microrregiao']['mesorregiao']['UF']['sigla']})
+        except (KeyError, TypeError):
+            continue
+    if len(cidades) < 5000:
+        sys.exit(f"Resposta do IBGE incompleta ({len(cidades)} municípios) — snapshot não gravado.")
+    cidades.sort(key=lambda c: (c['uf'], c['nome']))
+    os.makedirs(os.path.dirname(DESTINO), exist_ok=True)
+    with open(DESTINO, 'w', encoding='utf-8') as f:
+        json.dump(cidades, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"{len(cidades)} municípios gravados em {DESTINO}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,9 @@ Seed histórico: conta demonstracao — simulação econômica completa 2020-01-
 Reescrita completa (v2) do seed original. Reconstrói do zero os dados de gestão vinculados
 ao usuário 'demonstracao' (NUNCA altera usuarios/configuracoes). Usa mysql.connector puro —
 este projeto não usa SQLAlchemy/ORM (ver CLAUDE.md: "SQL puro — não introduzir SQLAlchemy
-ou ORM"), então app.app_context()/db.session não se aplicam aqui.
+ou ORM"), então app.app_context()/db.session não se aplicam aqui. Como os INSERTs não
+passam pelos repositórios, o passo 12 chama as funções de backfill deles sobre o mesmo
+cursor para montar as tabelas derivadas (genealogia, resumos, P&L, rateio, snapshots).
 
 Modelo de crescimento (unificado para todo animal individualmente rastreado — lote comercial
 ou cria nascida na fazenda):
@@ -53,10 +55,18 @@ Rodar:
 import os
 import random
 import heapq
+import sys
 from datetime import date, timedelta
 from dotenv import load_dotenv
 import mysql.connector
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from repositories import (  # noqa: E402
+    animal_repository, busca_repository, financeiro_repository, genealogia_repository, pasto_repository,
+)
+from utils.custeio import competencia_de  # noqa: E402
+from utils.snapshot import atualizar_snapshots  # noqa: E402
+
 load_dotenv()
 random.seed(20260630)
 
@@ -186,9 +196,9 @@ def mov(pid, tipo, qtd, custo_unit, data, motivo, categoria_fin=None, tipo_custo
 
 try:
     # ══════════════════════════════════════════════════════════════
-    # [0/13] USUÁRIO — localizar (NÃO alterar usuarios/configuracoes)
+    # [0/14] USUÁRIO — localizar (NÃO alterar usuarios/configuracoes)
     # ══════════════════════════════════════════════════════════════
-    print("[0/13] Localizando usuário 'demonstracao'...")
+    print("[0/14] Localizando usuário 'demonstracao'...")
     cur.execute("SELECT id FROM usuarios WHERE LOWER(username) = LOWER(%s)", ('demonstracao',))
     row = cur.fetchone()
     if not row:
@@ -197,9 +207,13 @@ try:
     print(f"      uid={uid}")
 
     # ══════════════════════════════════════════════════════════════
-    # [1/13] LIMPEZA — apaga dados de gestão vinculados ao user_id
+    # [1/14] LIMPEZA — apaga dados de gestão vinculados ao user_id
     # ══════════════════════════════════════════════════════════════
-    print("[1/13] Limpando dados de gestão anteriores...")
+    print("[1/14] Limpando dados de gestão anteriores...")
+    # Derivadas sem FK para animais/módulos/lotes: não caem em cascata.
+    for tabela in ("genealogia", "custo_animal_mes", "custo_animal", "fechamento_custos",
+                   "rebanho_snapshot_diario"):
+        cur.execute(f"DELETE FROM {tabela} WHERE user_id = %s", (uid,))
     cur.execute("SELECT id FROM animais WHERE user_id = %s", (uid,))
     old_aids = [r[0] for r in cur.fetchall()]
     if old_aids:
@@ -239,17 +253,17 @@ try:
     print(f"      {len(old_aids)} animais antigos removidos")
 
     # ══════════════════════════════════════════════════════════════
-    # [2/13] APORTE DE CAPITAL INICIAL
+    # [2/14] APORTE DE CAPITAL INICIAL
     # ══════════════════════════════════════════════════════════════
-    print("[2/13] Lançando aporte de capital inicial (R$ 600.000,00)...")
+    print("[2/14] Lançando aporte de capital inicial (R$ 600.000,00)...")
     custos_rows.append((uid, 'Aporte', 'Capital Inicial', -600000.00, START,
                          'Aporte de Capital Inicial - Sócios (financia o Vale da Morte do 1º ciclo)'))
     registrar_caixa(START, 600000.00, 'aporte')
 
     # ══════════════════════════════════════════════════════════════
-    # [3/13] PASTOS
+    # [3/14] PASTOS
     # ══════════════════════════════════════════════════════════════
-    print("[3/13] Criando pastos...")
+    print("[3/14] Criando pastos...")
     pasto_config = [
         ('Piquete Norte A', 'Brachiaria Brizantha', 35.0, 55),
         ('Piquete Norte B', 'Brachiaria Brizantha', 35.0, 55),
@@ -275,9 +289,9 @@ try:
     print(f"      {len(modulos)} módulos criados")
 
     # ══════════════════════════════════════════════════════════════
-    # [4/13] ESTOQUE — produtos + saldo inicial (Jan/2020) + cadência
+    # [4/14] ESTOQUE — produtos + saldo inicial (Jan/2020) + cadência
     # ══════════════════════════════════════════════════════════════
-    print("[4/13] Criando produtos de estoque e programando movimentações...")
+    print("[4/14] Criando produtos de estoque e programando movimentações...")
 
     def criar_produto(nome, unidade, categoria, minimo):
         cur.execute(
@@ -321,9 +335,9 @@ try:
           f"(estaca/arame/sal — aftosa/anabólico entram na etapa de sanidade)")
 
     # ══════════════════════════════════════════════════════════════
-    # [5/13] REBANHO FUNDADOR — matrizes e touros
+    # [5/14] REBANHO FUNDADOR — matrizes e touros
     # ══════════════════════════════════════════════════════════════
-    print("[5/13] Fundando rebanho reprodutor (matrizes e touros)...")
+    print("[5/14] Fundando rebanho reprodutor (matrizes e touros)...")
 
     def cadastra_reprodutor(brinco, sexo, peso, data_entrada, raca_nome='Nelore'):
         compra_arroba, _ = preco_arroba(data_entrada)
@@ -397,9 +411,9 @@ try:
           f"(fundação + ondas de expansão 2022-2024; {n_obitos_fundadoras} óbitos no plantel reprodutivo)")
 
     # ══════════════════════════════════════════════════════════════
-    # [6/13] PIPELINE COMERCIAL — compra/venda de lotes de 20 cabeças
+    # [6/14] PIPELINE COMERCIAL — compra/venda de lotes de 20 cabeças
     # ══════════════════════════════════════════════════════════════
-    print("[6/13] Simulando pipeline comercial (carência + regime estável)...")
+    print("[6/14] Simulando pipeline comercial (carência + regime estável)...")
 
     lote_seq = 0
     wip = []  # fila FIFO de lotes comprados e ainda não vendidos
@@ -543,9 +557,9 @@ try:
           f"{len(wip)} lotes ainda em curral no fim da simulação")
 
     # ══════════════════════════════════════════════════════════════
-    # [7/13] REPRODUÇÃO — coberturas, partos, crescimento da fazenda
+    # [7/14] REPRODUÇÃO — coberturas, partos, crescimento da fazenda
     # ══════════════════════════════════════════════════════════════
-    print("[7/13] Simulando reprodução e nascimentos na fazenda...")
+    print("[7/14] Simulando reprodução e nascimentos na fazenda...")
 
     born_seq = 0
     _counter = 0
@@ -665,9 +679,9 @@ try:
           f"({len(matriz_pool) - 10} novilhas incorporadas como futuras matrizes)")
 
     # ══════════════════════════════════════════════════════════════
-    # [8/13] MEDICAÇÕES — febre aftosa anual + anabólico trimestral (machos vivos)
+    # [8/14] MEDICAÇÕES — febre aftosa anual + anabólico trimestral (machos vivos)
     # ══════════════════════════════════════════════════════════════
-    print("[8/13] Gerando medicações (aftosa + anabólico)...")
+    print("[8/14] Gerando medicações (aftosa + anabólico)...")
 
     cur.execute(
         "SELECT id, sexo, data_compra, data_nascimento, data_venda FROM animais WHERE user_id = %s", (uid,)
@@ -705,9 +719,9 @@ try:
     print(f"      {len(medicacoes_rows)} medicações programadas")
 
     # ══════════════════════════════════════════════════════════════
-    # [9/13] FOLHA DE PAGAMENTO
+    # [9/14] FOLHA DE PAGAMENTO
     # ══════════════════════════════════════════════════════════════
-    print("[9/13] Lançando folha de pagamento mensal...")
+    print("[9/14] Lançando folha de pagamento mensal...")
 
     d = date(START.year, START.month, 5)
     while d <= END:
@@ -720,9 +734,9 @@ try:
     print(f"      {len(custos_rows)} lançamentos de custos operacionais no total")
 
     # ══════════════════════════════════════════════════════════════
-    # [10/13] OCUPAÇÕES — snapshot de alocação em pasto (situação atual)
+    # [10/14] OCUPAÇÕES — snapshot de alocação em pasto (situação atual)
     # ══════════════════════════════════════════════════════════════
-    print("[10/13] Alocando rebanho ativo nos pastos (snapshot atual)...")
+    print("[10/14] Alocando rebanho ativo nos pastos (snapshot atual)...")
 
     cur.execute(
         "SELECT id, sexo FROM animais WHERE user_id = %s AND data_venda IS NULL AND deleted_at IS NULL", (uid,)
@@ -747,9 +761,9 @@ try:
     conn.commit()
 
     # ══════════════════════════════════════════════════════════════
-    # [11/13] BULK INSERT — pesagens, medicações, custos, reprodução, estoque
+    # [11/14] BULK INSERT — pesagens, medicações, custos, reprodução, estoque
     # ══════════════════════════════════════════════════════════════
-    print("[11/13] Gravando registros em lote...")
+    print("[11/14] Gravando registros em lote...")
     bulk("INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, %s, %s)", pesagens_rows)
     print(f"      {len(pesagens_rows)} pesagens")
     bulk("INSERT INTO medicacoes (animal_id, data_aplicacao, nome_medicamento, custo, observacoes) "
@@ -767,9 +781,43 @@ try:
     print(f"      {len(estoque_mov_rows)} movimentações de estoque")
 
     # ══════════════════════════════════════════════════════════════
-    # [12/13] RELATÓRIO ANO A ANO — receita, despesas, vendas, lucro, margem
+    # [12/14] DADOS DERIVADOS — o que as escritas pelos repositórios manteriam
+    # ══════════════════════════════════════════════════════════════
+    # Os INSERTs acima passam por fora dos repositórios, depois dos backfills
+    # das migrações: sem este passo a conta demo fica sem genealogia, resumo de
+    # pesagens, lotação/GMD dos módulos, P&L por lote, rateio de custos,
+    # ranking de touros, série do rebanho e ordenação natural de brinco.
+    print("[12/14] Refazendo dados derivados...")
+    cur.execute("SELECT id, brinco FROM animais WHERE user_id = %s", (uid,))
+    animais_demo = cur.fetchall()
+    cur.executemany("UPDATE animais SET brinco_ordem = %s WHERE id = %s",
+                    [(animal_repository.chave_ordem_brinco(brinco), aid) for aid, brinco in animais_demo])
+    aids_demo = [aid for aid, _ in animais_demo]
+    genealogia_repository.reconstruir_genealogia(cur)
+    animal_repository.atualizar_resumo_pesagens(cur, aids_demo)
+    pasto_repository.recalcular_estado_todos_modulos(cur)
+    pasto_repository.recalcular_gmd_todas_ocupacoes(cur)
+    # Meses encerrados até o anterior ao corrente — o que o job mensal já teria fechado.
+    ultima = competencia_de(min(END, date.today().replace(day=1) - timedelta(days=1)))
+    competencia = competencia_de(START)
+    n_meses = 0
+    while competencia <= ultima:
+        financeiro_repository.fechar_competencia(cur, uid, competencia, refazer_lotes=False)
+        competencia = competencia_de(competencia + timedelta(days=31))
+        n_meses += 1
+    cur.execute("SELECT id FROM lotes WHERE user_id = %s", (uid,))
+    animal_repository.atualizar_resultado_lotes(cur, [r[0] for r in cur.fetchall()])
+    n_touros = animal_repository.recalcular_ranking_touros(cur)
+    n_dias = atualizar_snapshots(uid, cursor=cur)
+    busca_repository.incrementar_versao(cur, uid)
+    conn.commit()
+    print(f"      {n_meses} meses de custo fechados, {n_touros} touros no ranking, "
+          f"{n_dias} dias de snapshot")
+
+    # ══════════════════════════════════════════════════════════════
+    # [13/14] RELATÓRIO ANO A ANO — receita, despesas, vendas, lucro, margem
     # ══════════════════════════════════════════════════════════════
-    print("\n[12/13] Relatório financeiro ano a ano:")
+    print("\n[13/14] Relatório financeiro ano a ano:")
     anos = list(range(START.year, END.year + 1))
     por_ano = {a: {'venda': 0.0, 'compra_gado': 0.0, 'estoque': 0.0, 'folha': 0.0,
                     'sanidade': 0.0, 'aporte': 0.0} for a in anos}
@@ -794,7 +842,7 @@ try:
             print(f"      ALERTA: margem de {a} abaixo de 30% (regra exige ≥30% após o 1º ano).")
 
     # ══════════════════════════════════════════════════════════════
-    # [13/13] RESUMO E VALIDAÇÃO DE CAIXA
+    # [14/14] RESUMO E VALIDAÇÃO DE CAIXA
     # ══════════════════════════════════════════════════════════════
     caixa_ordenado = sorted(caixa_ledger, key=lambda x: x[0])
     saldo = 0.0
@@ -848,7 +896,7 @@ try:
         print("  Caixa nunca ficou negativo — aporte cobriu integralmente o Vale da Morte do 1º ciclo.")
 
     conn.commit()
-    print("\n[13/13] Concluído com sucesso.")
+    print("\n[14/14] Concluído com sucesso.")
 
 except Exception as exc:
     conn.rollback()
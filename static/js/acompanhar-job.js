@@ -0,0 +1,48 @@
+// Acompanha um job em segundo plano (PDF, Monte Carlo) até terminar.
+// Usa SSE (/api/v1/jobs/<id>/events); se o EventSource não existir ou a conexão
+// cair, segue por long polling em /api/v1/jobs/<id>. Resolve com o estado final
+// ({status: 'concluido' | 'erro', progresso, erro?}); aoProgresso recebe cada mudança.
+
+function acompanharJob(jobId, { aoProgresso } = {}) {
+  const base = '/api/v1/jobs/' + encodeURIComponent(jobId);
+  const FINAIS = ['concluido', 'erro'];
+
+  return new Promise((resolve, reject) => {
+    let ultimo = { status: 'pendente', progresso: 0 };
+
+    function receber(estado) {
+      ultimo = estado;
+      if (aoProgresso) aoProgresso(estado);
+      if (FINAIS.includes(estado.status)) { resolve(estado); return true; }
+      return false;
+    }
+
+    async function longPolling() {
+      for (let falhas = 0; falhas < 5; ) {
+        try {
+          const url = `${base}?status=${encodeURIComponent(ultimo.status)}&progresso=${ultimo.progresso}`;
+          const res = await fetch(url);
+          if (res.status === 404) { reject(new Error('Job não encontrado ou expirado')); return; }
+          if (!res.ok) throw new Error('HTTP ' + res.status);
+          if (receber(await res.json())) return;
+          falhas = 0;
+        } catch (e) {
+          falhas++;
+          await new Promise(r => setTimeout(r, 1000 * falhas));
+        }
+      }
+      reject(new Error('Sem resposta do servidor'));
+    }
+
+    if (!window.EventSource) { longPolling(); return; }
+    const fonte = new EventSource(base + '/events');
+    fonte.onmessage = ev => {
+      if (receber(JSON.parse(ev.data))) fonte.close();
+    };
+    // Fim de stream (reconexão) também dispara onerror: só desiste do SSE se o
+    // navegador não for reconectar sozinho.
+    fonte.onerror = () => {
+      if (fonte.readyState === EventSource.CLOSED) longPolling();
+    };
+  });
+}
@@ -0,0 +1,185 @@
+"""
+Testes do arquivo frio (hot/cold) de animais encerrados.
+Repositório: arquivo_repository. Job: utils.arquivamento.
+"""
+import pytest
+import itertools
+from datetime import date, datetime, timedelta
+from werkzeug.security import generate_password_hash
+import db_config as dbc
+from repositories import (arquivo_repository, animal_repository, financeiro_repository,
+                          auth_repository, genealogia_repository)
+from utils.arquivamento import _cortes
+
+_seq = itertools.count(14000)
+
+# Cortes "agora": tudo vendido/excluído antes de amanhã é elegível.
+_CORTE_VENDA = date.today() + timedelta(days=1)
+_CORTE_LIXEIRA = datetime.now() + timedelta(days=1)
+
+
+def _n():
+    return next(_seq)
+
+
+# ── helpers de banco ──────────────────────────────────────────────────────────
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"arq_{_n()}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _make_animal(user_id, brinco=None, data_venda=None, preco_venda=None,
+                 deleted_at=None, pai_id=None, mae_id=None, sexo="M"):
+    brinco = brinco or f"AR{_n()}"
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO animais (brinco, sexo, data_compra, preco_compra, data_venda, preco_venda,"
+        " user_id, deleted_at, pai_id, mae_id)"
+        " VALUES (%s, %s, '2020-01-01', 1000, %s, %s, %s, %s, %s, %s)",
+        (brinco, sexo, data_venda, preco_venda, user_id, deleted_at, pai_id, mae_id),
+    )
+    aid = cur.lastrowid
+    genealogia_repository._inserir_genealogia(cur, aid, user_id, pai_id, mae_id)
+    cur.execute(
+        "INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, '2020-01-01', 300)",
+        (aid,),
+    )
+    cur.execute(
+        "INSERT INTO medicacoes (animal_id, data_aplicacao, nome_medicamento, custo)"
+        " VALUES (%s, '2020-02-01', 'Ivermectina', 50)",
+        (aid,),
+    )
+    conn.commit(); cur.close(); conn.close()
+    return aid
+
+
+def _count(sql, params):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    n = cur.fetchone()[0]
+    cur.close(); conn.close()
+    return n
+
+
+def _arquivar(user_id):
+    """Só o usuário do teste: outros testes (e o banco compartilhado) ficam intactos."""
+    return arquivo_repository.arquivar_encerrados(_CORTE_VENDA, _CORTE_LIXEIRA, limite=2,
+                                                  user_id=user_id)
+
+
+@pytest.fixture
+def um(app):
+    """Um usuário isolado; delete_user_and_data limpa quente e frio."""
+    uid = _make_user()
+    yield uid
+    auth_repository.delete_user_and_data(uid)
+
+
+# ── cortes ────────────────────────────────────────────────────────────────────
+
+def test_cortes_converte_meses_e_dias():
+    agora = datetime(2026, 1, 31, 12, 0)
+    corte_venda, corte_lixeira = _cortes(agora, meses_venda=2, dias_lixeira=10)
+    assert corte_venda == date(2025, 12, 2)
+    assert corte_lixeira == datetime(2026, 1, 21, 12, 0)
+
+
+# ── arquivamento ──────────────────────────────────────────────────────────────
+
+def test_arquiva_vendido_com_pesagens_e_medicacoes(um):
+    aid = _make_animal(um, data_venda='2020-06-01', preco_venda=2000)
+    _arquivar(um)
+    assert _count("SELECT COUNT(*) FROM animais WHERE id = %s", (aid,)) == 0
+    assert _count("SELECT COUNT(*) FROM animais_arquivo WHERE id = %s", (aid,)) == 1
+    assert _count("SELECT COUNT(*) FROM pesagens_arquivo WHERE animal_id = %s", (aid,)) == 1
+    assert _count("SELECT COUNT(*) FROM medicacoes_arquivo WHERE animal_id = %s", (aid,)) == 1
+    assert _count("SELECT COUNT(*) FROM pesagens WHERE animal_id = %s", (aid,)) == 0
+
+
+def test_arquiva_da_lixeira_e_preserva_ativos(um):
+    excluido = _make_animal(um, deleted_at=datetime(2020, 1, 1))
+    ativo = _make_animal(um)
+    _arquivar(um)
+    assert _count("SELECT COUNT(*) FROM animais_arquivo WHERE id = %s", (excluido,)) == 1
+    assert _count("SELECT COUNT(*) FROM animais WHERE id = %s", (ativo,)) == 1
+
+
+def test_nao_arquiva_venda_recente(um):
+    aid = _make_animal(um, data_venda=date.today(), preco_venda=2000)
+    arquivo_repository.arquivar_encerrados(date.today() - timedelta(days=30), _CORTE_LIXEIRA,
+                                           user_id=um)
+    assert _count("SELECT COUNT(*) FROM animais WHERE id = %s", (aid,)) == 1
+
+
+def test_nao_arquiva_pai_de_animal(um):
+    """pai_id tem FK para animais — o pai precisa ficar na tabela quente."""
+    pai = _make_animal(um, data_venda='2020-06-01', preco_venda=2000)
+    _make_animal(um, pai_id=pai)
+    _arquivar(um)
+    assert _count("SELECT COUNT(*) FROM animais WHERE id = %s", (pai,)) == 1
+
+
+def test_fluxo_caixa_inclui_arquivados(um):
+    _make_animal(um, data_venda='2020-06-01', preco_venda=2000)
+    antes = financeiro_repository.get_fluxo_caixa(um)
+    _arquivar(um)
+    assert financeiro_repository.get_fluxo_caixa(um) == antes
+
+
+def test_progenie_inclui_filho_arquivado(um):
+    mae = _make_animal(um, sexo="F")
+    filho = _make_animal(um, mae_id=mae, data_venda='2020-06-01', preco_venda=2000)
+    _arquivar(um)
+    ids = [row[0] for row in animal_repository.get_progenie_by_touro(mae, um)]
+    assert filho in ids
+
+
+# ── consulta e restauração ────────────────────────────────────────────────────
+
+def test_listagem_isolada_por_usuario(um):
+    outro = _make_user()
+    try:
+        _make_animal(outro, data_venda='2020-06-01', preco_venda=2000)
+        _arquivar(outro)
+        assert arquivo_repository.count_animais_arquivados(um) == 0
+        assert arquivo_repository.restaurar_animal_arquivado(
+            arquivo_repository.get_animais_arquivados_paginados(outro, 10, 0)[0][0], um
+        ) == 'nao_encontrado'
+    finally:
+        auth_repository.delete_user_and_data(outro)
+
+
+def test_restaurar_devolve_animal_e_historico(um):
+    aid = _make_animal(um, data_venda='2020-06-01', preco_venda=2000)
+    _arquivar(um)
+    assert arquivo_repository.restaurar_animal_arquivado(aid, um) == 'ok'
+    assert _count("SELECT COUNT(*) FROM animais WHERE id = %s", (aid,)) == 1
+    assert _count("SELECT COUNT(*) FROM pesagens WHERE animal_id = %s", (aid,)) == 1
+    assert _count("SELECT COUNT(*) FROM animais_arquivo WHERE id = %s", (aid,)) == 0
+
+
+def test_restaurar_recusa_brinco_reutilizado(um):
+    aid = _make_animal(um, brinco="ARQ-DUP", data_venda='2020-06-01', preco_venda=2000)
+    _arquivar(um)
+    _make_animal(um, brinco="ARQ-DUP")
+    assert arquivo_repository.restaurar_animal_arquivado(aid, um) == 'brinco_em_uso'
+    assert _count("SELECT COUNT(*) FROM animais_arquivo WHERE id = %s", (aid,)) == 1
+
+
+def test_delete_user_and_data_apaga_arquivo(app):
+    uid = _make_user()
+    _make_animal(uid, data_venda='2020-06-01', preco_venda=2000)
+    _arquivar(uid)
+    auth_repository.delete_user_and_data(uid)
+    assert _count("SELECT COUNT(*) FROM animais_arquivo WHERE user_id = %s", (uid,)) == 0
+    assert _count("SELECT COUNT(*) FROM usuarios WHERE id = %s", (uid,)) == 0
@@ -306,7 +306,12 @@ def test_nova_senha_confirmacao_diferente_retorna_erro(client, mock_smtp):
 
 # ── /conta/apagar ────────────────────────────────────────────────────────────
 
-def test_apagar_conta_confirmacao_correta_exclui_usuario(client):
+def test_apagar_conta_confirmacao_correta_exclui_usuario(client, monkeypatch):
+    # Purga síncrona no teste: em produção roda numa thread (utils/purga.py)
+    import routes.auth
+    from utils.purga import purgar_tenant
+    monkeypatch.setattr(routes.auth, 'iniciar_purga', lambda app, user_id: purgar_tenant(user_id))
+
     uid, username = _make_user_with_email(f"apagar_{_n()}@example.com")
     client.post('/login', data={'username': username, 'password': 'senhaAntiga1'},
                 follow_redirects=True)
@@ -316,6 +321,26 @@ def test_apagar_conta_confirmacao_correta_exclui_usuario(client):
 
     row = _fetch_one("SELECT id FROM usuarios WHERE id=%s", (uid,))
     assert row is None
+    purga = _fetch_one("SELECT concluida_em FROM purga_tenant WHERE user_id=%s", (uid,))
+    assert purga is not None and purga[0] is not None
+
+
+def test_apagar_conta_bloqueia_login_antes_da_purga(client, monkeypatch):
+    """A conta fica inacessível já na requisição, mesmo com a purga pendente."""
+    import routes.auth
+    monkeypatch.setattr(routes.auth, 'iniciar_purga', lambda app, user_id: None)
+
+    uid, username = _make_user_with_email(f"desativar_{_n()}@example.com")
+    client.post('/login', data={'username': username, 'password': 'senhaAntiga1'},
+                follow_redirects=True)
+    client.post('/conta/apagar', data={'confirmacao': username}, follow_redirects=True)
+
+    row = _fetch_one("SELECT desativado_em, email FROM usuarios WHERE id=%s", (uid,))
+    assert row[0] is not None and row[1] is None
+
+    r = client.post('/login', data={'username': username, 'password': 'senhaAntiga1'})
+    assert b'incorretos' in r.data
+    _purge_user(uid)
 
 
 def test_apagar_conta_confirmacao_incorreta_mantem_usuario(client):
@@ -0,0 +1,129 @@
+"""
+Testes do índice de busca em memória (typeahead).
+Índice: utils.busca | Repositório: busca_repository | Rota: /api/v1/busca
+"""
+import pytest
+import itertools
+from werkzeug.security import generate_password_hash
+import db_config as dbc
+from repositories import animal_repository, auth_repository, busca_repository, pasto_repository
+from utils import busca
+from utils.busca import IndiceBusca, normalizar
+
+_seq = itertools.count(16000)
+
+
+def _n():
+    return next(_seq)
+
+
+# ── helpers de banco ──────────────────────────────────────────────────────────
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"bus_{_n()}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _login(client, uid):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM usuarios WHERE id = %s", (uid,))
+    username = cur.fetchone()[0]
+    cur.close(); conn.close()
+    client.post("/login", data={"username": username, "password": "x"},
+                follow_redirects=True)
+
+
+@pytest.fixture
+def um(app):
+    uid = _make_user()
+    yield uid
+    auth_repository.delete_user_and_data(uid)
+
+
+def _indice(*rotulos):
+    return IndiceBusca([('animal', i, r, None) for i, r in enumerate(rotulos, 1)])
+
+
+# ── índice (puro) ─────────────────────────────────────────────────────────────
+
+def test_normalizar_remove_acento_e_caixa():
+    assert normalizar("  Piquete São João ") == "piquete sao joao"
+
+
+def test_prefixo_vem_antes_de_contem():
+    indice = _indice("1234", "991234", "12345", "777")
+    assert [r[2] for r in indice.buscar("123")] == ["1234", "12345", "991234"]
+
+
+def test_contem_acha_final_do_brinco():
+    indice = _indice("BR-004512", "BR-004513", "BR-114512")
+    assert sorted(r[2] for r in indice.buscar("4512")) == ["BR-004512", "BR-114512"]
+
+
+def test_termo_curto_so_casa_prefixo():
+    indice = _indice("45", "145", "450")
+    assert [r[2] for r in indice.buscar("45")] == ["45", "450"]
+
+
+def test_aproximado_quando_nada_contem_o_termo():
+    indice = _indice("PIQUETE", "RESERVA", "BR12345")
+    assert [r[2] for r in indice.buscar(normalizar("piqete"))] == ["PIQUETE"]
+    assert indice.buscar("zzzz") == []
+
+
+def test_tipo_restringe_os_itens():
+    indice = IndiceBusca([('lote', 1, "L4512", None), ('animal', 2, "BR4512", None),
+                          ('pasto', 3, "Piquete", None), ('animal', 4, "4512", None)])
+    assert [r[1] for r in indice.buscar("4512", tipo='animal')] == [4, 2]
+    assert [r[1] for r in indice.buscar("l45", tipo='animal')] == []
+    assert [r[1] for r in indice.buscar("piqete", tipo='pasto')] == [3]
+
+
+def test_limite_respeitado():
+    indice = _indice(*[f"A{i:03d}" for i in range(100)])
+    assert len(indice.buscar("a0", limite=7)) == 7
+
+
+# ── cache por versão do tenant ────────────────────────────────────────────────
+
+def test_indice_refeito_quando_versao_muda(um):
+    sufixo = _n()
+    animal_repository.cadastrar_animal(f"X{sufixo}77", "M", "2024-01-01", 1000.0, 280.0, um)
+    antes = busca.get_indice(um)
+    assert busca.get_indice(um) is antes
+
+    pasto_repository.insert_pasto(um, f"Piquete {sufixo}", 10, None, None)
+    assert busca_repository.get_versao(um) == 2
+    achados = busca.buscar(um, f"{sufixo}")
+    assert {r[0] for r in achados} == {'animal', 'pasto'}
+
+
+def test_animal_na_lixeira_sai_da_busca(um):
+    brinco = f"LX{_n()}"
+    aid = animal_repository.cadastrar_animal(brinco, "F", "2024-01-01", 1000.0, 280.0, um)
+    assert [r[1] for r in busca.buscar(um, brinco)] == [aid]
+    animal_repository.soft_delete_animal(aid, um)
+    assert busca.buscar(um, brinco) == []
+
+
+def test_api_busca_devolve_url_de_detalhe(app):
+    uid = _make_user()
+    try:
+        brinco = f"API{_n()}"
+        aid = animal_repository.cadastrar_animal(brinco, "M", "2024-01-01", 1000.0, 280.0, uid)
+        with app.test_client() as client:
+            _login(client, uid)
+            r = client.get(f"/api/v1/busca?q={brinco[-4:]}")
+            assert r.status_code == 200
+            resultados = r.get_json()['resultados']
+            assert [(x['id'], x['url']) for x in resultados] == [(aid, f"/animal/{aid}")]
+    finally:
+        auth_repository.delete_user_and_data(uid)
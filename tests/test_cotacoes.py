@@ -0,0 +1,131 @@
+"""
+Testes do histórico de cotações e do valor de mercado do rebanho.
+Cálculo: utils.cotacoes | Repositório: cotacao_repository | KPIs: utils.kpis
+Rota: /api/v1/rebanho/valor-mercado
+"""
+import pytest
+import itertools
+from datetime import date
+from werkzeug.security import generate_password_hash
+import db_config as dbc
+from repositories import animal_repository, auth_repository, configuracao_repository, cotacao_repository
+from utils.calculo import KG_POR_ARROBA
+from utils.cotacoes import (
+    _linhas_do_feed, preco_regional, serie_valor_mercado, uf_da_fazenda, valor_de_mercado,
+)
+
+_seq = itertools.count(19000)
+_DATA_TESTE = date(2000, 1, 3)  # cotacoes_historico é global: data que nenhum job grava
+
+
+def _n():
+    return next(_seq)
+
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"cot_{_n()}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _login(client, uid):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM usuarios WHERE id = %s", (uid,))
+    username = cur.fetchone()[0]
+    cur.close(); conn.close()
+    client.post("/login", data={"username": username, "password": "x"},
+                follow_redirects=True)
+
+
+def _apagar_cotacoes_teste():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM cotacoes_historico WHERE data = %s", (_DATA_TESTE,))
+    conn.commit(); cur.close(); conn.close()
+
+
+# ── cálculo (puro) ────────────────────────────────────────────────────────────
+
+_LINHAS = [
+    ('boi', 'SP Araçatuba', 320.0), ('boi', 'SP Presidente Prudente', 310.0),
+    ('boi', 'GO Goiânia', 290.0), ('novilha', 'GO Goiânia', 280.0),
+]
+
+
+def test_preco_regional_usa_uf_e_cai_na_media_nacional():
+    precos = preco_regional(_LINHAS, 'SP')
+    assert precos['boi'] == 315.0
+    assert precos['novilha'] == 280.0  # SP sem novilha: média nacional
+    assert preco_regional(_LINHAS, None)['boi'] == pytest.approx(306.67)
+    assert preco_regional([], 'SP') == {'boi': None, 'novilha': None}
+
+
+def test_uf_da_fazenda():
+    assert uf_da_fazenda('Ribeirão Preto-SP') == 'SP'
+    assert uf_da_fazenda('Sem UF') is None
+    assert uf_da_fazenda(None) is None
+
+
+def test_valor_de_mercado_por_sexo_e_compra_dos_nao_pesados():
+    grupos = [('M', 2, 2, 900.0, 0), ('F', 2, 1, 300.0, 1500.0)]
+    valor = valor_de_mercado(grupos, {'boi': 300.0, 'novilha': 270.0})
+    assert valor == pytest.approx(900 / KG_POR_ARROBA * 300 + 300 / KG_POR_ARROBA * 270 + 1500)
+    assert valor_de_mercado(grupos, {'boi': None, 'novilha': None}) is None
+    # Sem cotação de novilha, fêmeas usam a do boi.
+    assert valor_de_mercado([('F', 1, 1, 300.0, 0)], {'boi': 300.0, 'novilha': None}) == 3000.0
+
+
+def test_serie_valor_mercado_usa_ultima_cotacao_ate_o_dia():
+    snap = lambda d, machos, femeas, peso: (d, machos + femeas, machos, femeas, 0, machos + femeas, peso)
+    snapshots = [snap(date(2024, 1, 1), 1, 0, 300.0), snap(date(2024, 1, 2), 1, 1, 600.0),
+                 snap(date(2024, 1, 5), 0, 0, 0.0)]
+    precos = {date(2024, 1, 2): {'boi': 300.0, 'novilha': 240.0}}
+    assert serie_valor_mercado(snapshots, precos) == [None, 600 / KG_POR_ARROBA * 270, 0.0]
+
+
+def test_linhas_do_feed_descarta_itens_invalidos():
+    boi = [{'praca': 'SP', 'preco_vista': '320.5'}, {'praca': 'GO', 'preco_vista': 'n/d'}, {'preco_vista': 1}]
+    assert _linhas_do_feed(boi, []) == [('boi', 'SP', 320.5)]
+
+
+# ── repositório / KPIs ────────────────────────────────────────────────────────
+
+def test_kpis_trazem_valor_de_mercado_da_cotacao_regional(app):
+    from utils.kpis import get_kpis
+    uid = _make_user()
+    try:
+        configuracao_repository.upsert_configuracao(uid, 'Fazenda', 'Araçatuba-SP', 100.0)
+        animal_repository.cadastrar_animal(f"CT{_n()}", "M", "1999-12-01", 2000.0, 450.0, uid)
+        cotacao_repository.gravar_cotacoes(_DATA_TESTE, [('boi', 'SP Araçatuba', 300.0),
+                                                         ('novilha', 'SP Araçatuba', 280.0)])
+        if cotacao_repository.get_data_mais_recente() != _DATA_TESTE:
+            pytest.skip("cotacoes_historico já tem datas reais")
+        kpis = get_kpis(uid)
+        assert kpis['valor_contabil'] == pytest.approx(2000.0)
+        assert kpis['valor_mercado'] == pytest.approx(450.0 / KG_POR_ARROBA * 300.0)
+        assert kpis['data_cotacao'] == _DATA_TESTE.isoformat()
+    finally:
+        _apagar_cotacoes_teste()
+        auth_repository.delete_user_and_data(uid)
+
+
+# ── rota ──────────────────────────────────────────────────────────────────────
+
+def test_api_valor_mercado_retorna_series_alinhadas(app):
+    uid = _make_user()
+    try:
+        with app.test_client() as client:
+            _login(client, uid)
+            r = client.get("/api/v1/rebanho/valor-mercado?dias=30")
+            assert r.status_code == 200
+            dados = r.get_json()
+            assert len(dados['datas']) == len(dados['valor_mercado']) == len(dados['valor_contabil'])
+    finally:
+        auth_repository.delete_user_and_data(uid)
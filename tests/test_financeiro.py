@@ -3,6 +3,7 @@ import mysql.connector
 from werkzeug.security import generate_password_hash
 
 from conftest import TEST_DB_CONFIG as DB_CONFIG
+from repositories import animal_repository, financeiro_repository
 
 def login(client):
     return client.post('/login', data={'username': 'testuser', 'password': '123'}, follow_redirects=True)
@@ -61,6 +62,7 @@ def _criar_lote_com_animais(user_id, codigo="LOTE-PL", com_venda=False):
             "UPDATE animais SET data_venda='2024-06-01', preco_venda=1500 WHERE id=%s",
             (a1,)
         )
+    animal_repository.atualizar_resultado_lotes(cur, [lote_id])
     conn.commit()
     cur.close()
     conn.close()
@@ -183,6 +185,174 @@ def test_detalhe_lote_exibe_animais(client):
     assert b'PL-DET-A1' in response.data
 
 
+def test_resultado_lote_acompanha_venda_medicacao_e_pesagem(client):
+    """lote_resultado é refeito pelas escritas — sem recalcular na leitura."""
+    uid = _get_user_id()
+    lote_id = animal_repository.cadastrar_lote(
+        uid, "PL-TAB", "Lote tabela", "2024-01-10",
+        [("PL-TAB-1", "M", 300.0, 1000.0), ("PL-TAB-2", "F", 280.0, 800.0)])
+    lote = financeiro_repository.get_resultado_lote_by_id(lote_id, uid)
+    assert (lote[4], float(lote[5]), float(lote[9])) == (2, 1800.0, -1800.0)
+
+    a1, a2 = [r[0] for r in animal_repository.get_animais_ativos_por_lote(uid, lote_id)]
+    animal_repository.registrar_medicacao(a1, uid, "2024-02-01", "Vermífugo", 50.0, "")
+    animal_repository.registrar_pesagem(a2, uid, "2024-03-10", 340.0)
+    animal_repository.registrar_venda(a1, uid, "2024-06-01", 2500.0, 450.0)
+
+    lote = financeiro_repository.get_resultado_lote_by_id(lote_id, uid)
+    assert float(lote[6]) == 2500.0          # receita
+    assert float(lote[7]) == 50.0            # medicações
+    assert lote[8] == 1                      # vendidos
+    assert float(lote[9]) == 2500.0 - 1800.0 - 50.0
+    assert lote[10] is not None              # GMD médio
+
+
+def test_resultado_lote_conta_arquivados_ao_refazer(client):
+    """Pesagem de um animal do lote refaz a linha; o arquivado segue contando."""
+    from datetime import datetime
+    from repositories import arquivo_repository
+    uid = _make_user('fin_lote_arquivo')
+    lote_id = animal_repository.cadastrar_lote(
+        uid, "PL-ARQ", "Lote arquivo", "2012-01-10",
+        [("PL-ARQ-1", "M", 300.0, 1000.0), ("PL-ARQ-2", "F", 280.0, 800.0)])
+    a1, a2 = [r[0] for r in animal_repository.get_animais_ativos_por_lote(uid, lote_id)]
+    animal_repository.registrar_medicacao(a1, uid, "2012-02-01", "Vermífugo", 50.0, "")
+    animal_repository.registrar_pesagem(a1, uid, "2012-03-01", 360.0)
+    animal_repository.registrar_venda(a1, uid, "2012-06-01", 2500.0, 450.0)
+    antes = financeiro_repository.get_resultado_lote_by_id(lote_id, uid)
+
+    assert arquivo_repository.arquivar_lote("2013-01-01", datetime.now(), user_id=uid)[0] == 1
+    animal_repository.registrar_pesagem(a2, uid, "2012-03-01", 330.0)
+
+    lote = financeiro_repository.get_resultado_lote_by_id(lote_id, uid)
+    assert (lote[4], float(lote[6]), float(lote[7]), lote[8]) == (2, 2500.0, 50.0, 1)
+    assert float(lote[9]) == float(antes[9])
+    assert lote[10] is not None and lote[10] != antes[10]  # GMD médio agora com os dois
+
+
+def test_ratear_por_animal_dia_fecha_com_o_total():
+    from datetime import date
+    from utils.custeio import fim_competencia, ratear
+    inicio = date(2024, 2, 1)
+    fim = fim_competencia(inicio)
+    assert fim == date(2024, 2, 29)
+    dias, valores = ratear(
+        [date(2023, 12, 1), date(2024, 2, 10), date(2024, 1, 5), date(2024, 3, 2)],
+        [None, None, date(2024, 2, 15), None],
+        inicio, fim, 100.0)
+    assert dias.tolist() == [29, 20, 14, 0]
+    assert round(float(valores.sum()), 2) == 100.0
+    assert valores[3] == 0.0
+    assert valores[0] > valores[1] > valores[2]
+
+
+def test_fechamento_rateia_custo_por_animal_dia_e_refaz_mes_fechado(client):
+    """Custo do mês vai para os animais presentes, na proporção dos dias."""
+    from datetime import date
+    from db_config import get_db_cursor
+    uid = _get_user_id()
+    lote_id = animal_repository.cadastrar_lote(
+        uid, "PL-CUS", "Lote custeio", "2010-03-01",
+        [("PL-CUS-1", "M", 300.0, 1000.0), ("PL-CUS-2", "F", 280.0, 800.0)])
+    a1, a2 = [r[0] for r in animal_repository.get_animais_ativos_por_lote(uid, lote_id)]
+    animal_repository.registrar_venda(a1, uid, "2010-03-11", 1500.0, 350.0)
+    financeiro_repository.insert_custo_operacional(
+        uid, "Fixo", "Arrendamento", 400.0, "2010-03-15", "Arrendamento março")
+
+    with get_db_cursor() as cursor:
+        assert financeiro_repository.fechar_competencia(cursor, uid, date(2010, 3, 1)) == (400.0, 41)
+    custo, dias = financeiro_repository.get_custo_animal(a1, uid)
+    assert (float(custo), dias) == (97.56, 10)
+    assert float(financeiro_repository.get_custo_animal(a2, uid)[0]) == 302.44
+    lote = financeiro_repository.get_resultado_lote_by_id(lote_id, uid)
+    assert float(lote[11]) == 400.0
+    assert float(lote[12]) == float(lote[9]) - 400.0
+
+    # Lançamento retroativo refaz o mês já fechado
+    financeiro_repository.insert_custo_operacional(
+        uid, "Variável", "Nutrição", 82.0, "2010-03-20", "Sal mineral")
+    assert float(financeiro_repository.get_custo_animal(a1, uid)[0]) == 117.56
+    assert float(financeiro_repository.get_custo_animal(a2, uid)[0]) == 364.44
+    assert float(financeiro_repository.get_resultado_lote_by_id(lote_id, uid)[11]) == 482.0
+
+
+def test_mes_fechado_refeito_por_cadastro_venda_exclusao_e_restauracao(client):
+    """Quem esteve no rebanho num mês já fechado muda: o rateio acompanha na mesma escrita."""
+    from datetime import date
+    from db_config import get_db_cursor
+    uid = _make_user('fin_refechar')
+
+    def _custo(animal_id):
+        row = financeiro_repository.get_custo_animal(animal_id, uid)
+        return float(row[0]) if row else None
+
+    a1 = animal_repository.cadastrar_animal("RF-CUS-1", "M", "2011-04-01", 1000.0, 300.0, uid)
+    financeiro_repository.insert_custo_operacional(
+        uid, "Fixo", "Arrendamento", 300.0, "2011-04-10", "Arrendamento abril")
+    with get_db_cursor() as cursor:
+        financeiro_repository.fechar_competencia(cursor, uid, date(2011, 4, 1))
+    assert _custo(a1) == 300.0
+
+    a2 = animal_repository.cadastrar_animal("RF-CUS-2", "F", "2011-04-01", 900.0, 280.0, uid)
+    assert (_custo(a1), _custo(a2)) == (150.0, 150.0)
+
+    animal_repository.registrar_venda(a2, uid, "2011-04-11", 1300.0, 310.0)
+    assert (_custo(a1), _custo(a2)) == (225.0, 75.0)
+
+    animal_repository.soft_delete_animal(a2, uid)
+    assert (_custo(a1), _custo(a2)) == (300.0, None)
+
+    animal_repository.restore_animal(a2, uid)
+    assert (_custo(a1), _custo(a2)) == (225.0, 75.0)
+
+
+def test_bezerro_nascido_na_fazenda_entra_no_rateio(client):
+    """Sem data_compra, a entrada do bezerro é o nascimento — e o parto refaz o mês fechado."""
+    from datetime import date
+    from db_config import get_db_cursor
+    from repositories import reproducao_repository
+    uid = _make_user('fin_bezerro')
+
+    def _custo(animal_id):
+        row = financeiro_repository.get_custo_animal(animal_id, uid)
+        return float(row[0]) if row else None
+
+    vaca = animal_repository.cadastrar_animal("BZ-CUS-V", "F", "2011-05-01", 2000.0, 420.0, uid)
+    financeiro_repository.insert_custo_operacional(
+        uid, "Fixo", "Arrendamento", 310.0, "2011-05-10", "Arrendamento maio")
+    with get_db_cursor() as cursor:
+        financeiro_repository.fechar_competencia(cursor, uid, date(2011, 5, 1))
+    assert _custo(vaca) == 310.0
+
+    _, bezerro = reproducao_repository.registrar_parto_com_bezerro(
+        uid, vaca, None, None, "2010-08-05", "2011-05-17", "vivo",
+        brinco_bezerro="BZ-CUS-B", sexo_bezerro="M")
+    assert (_custo(vaca), _custo(bezerro)) == (208.91, 101.09)  # 31 e 15 dias de 46
+
+    animal_repository.soft_delete_animal(bezerro, uid)
+    assert (_custo(vaca), _custo(bezerro)) == (310.0, None)
+    animal_repository.restore_animal(bezerro, uid)
+    assert (_custo(vaca), _custo(bezerro)) == (208.91, 101.09)
+
+
+def test_kpis_servidos_do_snapshot_ate_escrita_mudar_a_versao(client):
+    """get_kpis só recalcula quando versao_kpi muda — custo lançado invalida."""
+    from datetime import date
+    from repositories import kpi_repository
+    from utils.kpis import get_kpis
+    uid = _get_user_id()
+    antes = get_kpis(uid)
+    versao, versao_snap, data_ref, dados = kpi_repository.get_snapshot(uid)
+    assert (versao_snap, data_ref, dados) == (versao, date.today(), antes)
+
+    financeiro_repository.insert_custo_operacional(
+        uid, "Fixo", "Salário", 700.0, date.today(), "Folha")
+    assert kpi_repository.get_snapshot(uid)[0] == versao + 1
+    depois = get_kpis(uid)
+    assert depois['mao_obra'] == antes['mao_obra'] + 700.0
+    assert kpi_repository.get_snapshot(uid)[1] == versao + 1
+
+
 def test_detalhe_lote_outro_usuario_redireciona(client):
     """Lote de outro usuário redireciona para lista (não vaza dados)."""
     login(client)
@@ -200,6 +370,7 @@ def test_detalhe_lote_outro_usuario_redireciona(client):
         "VALUES ('ALHEIO-01','M','2024-01-01',500,%s,%s)",
         (outro_id, lote_alheio)
     )
+    animal_repository.atualizar_resultado_lotes(cur, [lote_alheio])
     conn.commit()
     cur.close()
     conn.close()
@@ -0,0 +1,153 @@
+"""
+Testes da genealogia (tabela de fechamento) e da endogamia por matriz A.
+Repositório: genealogia_repository | Cálculo: utils.genetica
+"""
+import pytest
+import itertools
+from werkzeug.security import generate_password_hash
+import db_config as dbc
+from repositories import animal_repository, auth_repository, genealogia_repository, reproducao_repository
+from utils.genetica import endogamia_acasalamentos, matriz_parentesco
+
+_seq = itertools.count(15000)
+
+
+def _n():
+    return next(_seq)
+
+
+# ── helpers de banco ──────────────────────────────────────────────────────────
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"gen_{_n()}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _animal(user_id, sexo="M", pai_id=None, mae_id=None):
+    return animal_repository.cadastrar_animal(
+        f"GN{_n()}", sexo, '2024-01-01', 1000, 300, user_id, pai_id=pai_id, mae_id=mae_id)
+
+
+def _login(client, uid):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM usuarios WHERE id = %s", (uid,))
+    username = cur.fetchone()[0]
+    cur.close(); conn.close()
+    client.post("/login", data={"username": username, "password": "x"},
+                follow_redirects=True)
+
+
+@pytest.fixture
+def um(app):
+    uid = _make_user()
+    yield uid
+    auth_repository.delete_user_and_data(uid)
+
+
+# ── matriz de parentesco (puro) ───────────────────────────────────────────────
+
+def test_matriz_parentesco_meio_irmaos_e_irmaos_completos():
+    # 1 x 2 -> 3, 4 (irmãos completos); 1 x 5 -> 6 (meio-irmão de 3)
+    pedigree = [(3, 1, 2), (4, 1, 2), (6, 1, 5), (1, None, None), (2, None, None), (5, None, None)]
+    indice, A = matriz_parentesco(pedigree)
+    assert A[indice[3], indice[4]] == pytest.approx(0.5)
+    assert A[indice[3], indice[6]] == pytest.approx(0.25)
+    assert A[indice[1], indice[3]] == pytest.approx(0.5)
+    # filhos planejados: irmãos completos 0,25; meio-irmãos 0,125; pai x filha 0,25
+    assert endogamia_acasalamentos(pedigree, [(3, 4), (6, 4), (1, 3), (1, 5)]) == [0.25, 0.125, 0.25, 0.0]
+
+
+def test_matriz_parentesco_propaga_endogamia_do_proprio_animal():
+    # 7 é filho de irmãos completos: F7 = 0,25 => A[7,7] = 1,25
+    pedigree = [(7, 3, 4), (3, 1, 2), (4, 1, 2), (1, None, None), (2, None, None)]
+    indice, A = matriz_parentesco(pedigree)
+    assert A[indice[7], indice[7]] == pytest.approx(1.25)
+
+
+# ── fechamento ────────────────────────────────────────────────────────────────
+
+def test_cadastro_grava_ancestrais_de_varias_geracoes(um):
+    avo = _animal(um)
+    avoa = _animal(um, sexo="F")
+    pai = _animal(um, pai_id=avo, mae_id=avoa)
+    mae = _animal(um, sexo="F")
+    neto = _animal(um, pai_id=pai, mae_id=mae)
+
+    ancestrais = {r[0]: r[3] for r in genealogia_repository.get_ancestrais(neto, um, geracoes=5)}
+    assert ancestrais == {pai: 1, mae: 1, avo: 2, avoa: 2}
+    assert {r[0]: r[3] for r in genealogia_repository.get_ancestrais(neto, um, geracoes=1)} == {pai: 1, mae: 1}
+
+    descendentes = {r[0]: r[3] for r in genealogia_repository.get_descendentes(avo, um)}
+    assert descendentes == {pai: 1, neto: 2}
+
+
+def test_atualizar_pais_refaz_subarvore_e_bloqueia_ciclo(um):
+    avo_antigo, avo_novo = _animal(um), _animal(um)
+    pai = _animal(um, pai_id=avo_antigo)
+    neto = _animal(um, pai_id=pai)
+
+    assert genealogia_repository.atualizar_pais(pai, um, avo_novo, None) == 'ok'
+    ancestrais = {r[0] for r in genealogia_repository.get_ancestrais(neto, um, geracoes=5)}
+    assert ancestrais == {pai, avo_novo}
+
+    assert genealogia_repository.atualizar_pais(avo_novo, um, neto, None) == 'ciclo'
+    assert genealogia_repository.atualizar_pais(neto, um, None, pai) == 'pai_invalido'
+
+
+def test_detalhes_mostra_pais_atuais_e_post_parcial_nao_os_apaga(app):
+    uid = _make_user()
+    try:
+        pai, mae = _animal(uid), _animal(uid, sexo="F")
+        filho = _animal(uid, pai_id=pai, mae_id=mae)
+        outro = _animal(uid)
+        animal_repository.registrar_venda(pai, uid, '2024-06-01', 3000.0, 450.0)
+        brinco_pai = animal_repository.get_animal_by_id(pai, uid)[1]
+        brinco_outro = animal_repository.get_animal_by_id(outro, uid)[1]
+        with app.test_client() as client:
+            _login(client, uid)
+            html = client.get(f"/animal/{filho}").get_data(as_text=True)
+            assert f'<option value="{pai}" data-atual selected>{brinco_pai}</option>' in html
+            assert brinco_outro not in html  # o rebanho não vem mais como <option>
+
+            client.post(f"/animal/{filho}/pais", data={'pai_id': str(pai)})
+            assert {r[0] for r in genealogia_repository.get_ancestrais(filho, uid, geracoes=1)} == {pai, mae}
+            client.post(f"/animal/{filho}/pais", data={'pai_id': str(pai), 'mae_id': ''})
+            assert {r[0] for r in genealogia_repository.get_ancestrais(filho, uid, geracoes=1)} == {pai}
+    finally:
+        auth_repository.delete_user_and_data(uid)
+
+
+def test_parto_registra_touro_como_pai_do_bezerro(um):
+    touro = _animal(um)
+    vaca = _animal(um, sexo="F")
+    _, bezerro = reproducao_repository.registrar_parto_com_bezerro(
+        um, vaca, touro, None, '2024-01-01', '2024-10-12', 'vivo',
+        brinco_bezerro=f"BZ{_n()}", sexo_bezerro='M')
+
+    assert {r[0] for r in genealogia_repository.get_ancestrais(bezerro, um)} == {touro, vaca}
+    assert [f[0] for f in animal_repository.get_progenie_by_touro(touro, um)] == [bezerro]
+
+
+def test_api_endogamia_de_acasalamento_entre_meio_irmaos(app):
+    uid = _make_user()
+    try:
+        touro_base = _animal(uid)
+        filho = _animal(uid, pai_id=touro_base)
+        filha = _animal(uid, sexo="F", pai_id=touro_base)
+        estranha = _animal(uid, sexo="F")
+        with app.test_client() as client:
+            _login(client, uid)
+            r = client.get(f"/api/v1/genealogia/endogamia?touro_id={filho}&vacas={filha},{estranha}")
+            assert r.status_code == 200
+            coef = {a['vaca_id']: a['endogamia'] for a in r.get_json()['acasalamentos']}
+            assert coef == {filha: 0.125, estranha: 0.0}
+    finally:
+        auth_repository.delete_user_and_data(uid)
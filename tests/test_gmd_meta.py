@@ -7,7 +7,7 @@ import pytest
 import itertools
 from werkzeug.security import generate_password_hash
 import db_config as dbc
-from repositories import animal_repository, configuracao_repository
+from repositories import animal_repository, configuracao_repository, genealogia_repository
 
 _seq = itertools.count(10000)
 
@@ -56,6 +56,7 @@ def _purge(user_id):
     cur = conn.cursor()
     cur.execute("SET FOREIGN_KEY_CHECKS = 0")
     for sql in [
+        "DELETE FROM genealogia WHERE user_id = %s",
         "DELETE p FROM pesagens p JOIN animais a ON p.animal_id = a.id WHERE a.user_id = %s",
         "DELETE FROM animais WHERE user_id = %s",
         "DELETE FROM configuracoes WHERE user_id = %s",
@@ -158,6 +159,7 @@ def test_rota_progenie_exibe_gmd_meta_customizada(app):
         for i in range(2):
             filho_id = _make_animal_com_gmd(uid, gmd_alvo=0.6, brinco=f'FILHO{i}-{_n()}')
             cur.execute("UPDATE animais SET pai_id = %s WHERE id = %s", (touro_id, filho_id))
+            genealogia_repository._inserir_genealogia(cur, filho_id, uid, touro_id)
         conn.commit(); cur.close(); conn.close()
 
         with app.test_client() as client:
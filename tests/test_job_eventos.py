@@ -0,0 +1,105 @@
+"""
+Testes do acompanhamento de jobs: pub/sub em memória, progresso e SSE/long polling.
+Pub/sub: utils.pubsub | Jobs: utils.jobs | Rotas: /api/v1/jobs/<id>[/events]
+"""
+import itertools
+import threading
+
+from werkzeug.security import generate_password_hash
+
+import db_config as dbc
+from repositories import auth_repository, job_repository
+from utils import jobs
+from utils.pubsub import PubSubLocal
+
+_seq = itertools.count(22000)
+
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"jobev_{next(_seq)}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _login(client, uid):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM usuarios WHERE id = %s", (uid,))
+    username = cur.fetchone()[0]
+    cur.close(); conn.close()
+    client.post("/login", data={"username": username, "password": "x"},
+                follow_redirects=True)
+
+
+# ── pub/sub em memória (puro) ────────────────────────────────────────────────
+
+def test_pubsub_local_entrega_o_ultimo_estado_e_expira():
+    pubsub = PubSubLocal()
+    pubsub.publicar('job:x', {'status': 'perdido'})  # sem assinante: descartado
+    with pubsub.assinar('job:x') as assinatura:
+        assert assinatura.proxima(0.01) is None
+        pubsub.publicar('job:x', {'progresso': 10})
+        pubsub.publicar('job:x', {'progresso': 20})
+        assert assinatura.proxima(0.01) == {'progresso': 20}
+        assert assinatura.proxima(0.01) is None
+    assert not pubsub._canais
+
+
+def test_pubsub_local_acorda_quem_espera_em_outra_thread():
+    pubsub = PubSubLocal()
+    with pubsub.assinar('job:y') as assinatura:
+        threading.Timer(0.05, pubsub.publicar, args=('job:y', {'status': 'concluido'})).start()
+        assert assinatura.proxima(5) == {'status': 'concluido'}
+
+
+def test_progresso_fora_de_job_nao_faz_nada():
+    jobs.progresso(50)  # sem job na thread: nem banco nem pub/sub
+
+
+def test_acompanhar_segue_avisos_ate_o_estado_final(monkeypatch):
+    pubsub = PubSubLocal()
+    monkeypatch.setattr(jobs, 'get_pubsub', lambda: pubsub)
+    monkeypatch.setattr(jobs, 'estado', lambda job_id, user_id: {
+        'tipo': 'pdf', 'status': 'executando', 'progresso': 0})
+
+    def _avancar():
+        jobs._avisar('j1', 'executando', 30)
+        jobs._avisar('j1', 'concluido', 100)
+
+    estados = jobs.acompanhar('j1', 1, duracao=5)
+    assert next(estados) == {'status': 'executando', 'progresso': 0}
+    threading.Timer(0.05, _avancar).start()
+    vistos = [e for e in estados if e is not None]
+    assert vistos[-1] == {'status': 'concluido', 'progresso': 100}
+
+
+# ── rotas ─────────────────────────────────────────────────────────────────────
+
+def test_sse_e_long_polling_de_job_concluido(app):
+    uid, outro = _make_user(), _make_user()
+    job_id = jobs.concluido('pdf', uid, 'relatorios/x.pdf')
+    try:
+        with app.test_client() as client:
+            _login(client, uid)
+            r = client.get(f"/api/v1/jobs/{job_id}/events")
+            assert r.status_code == 200
+            assert r.mimetype == 'text/event-stream'
+            assert '"status": "concluido"' in r.get_data(as_text=True)
+
+            r = client.get(f"/api/v1/jobs/{job_id}?status=executando&progresso=60")
+            assert r.get_json() == {'status': 'concluido', 'progresso': 100}
+
+        with app.test_client() as client:
+            _login(client, outro)
+            assert client.get(f"/api/v1/jobs/{job_id}/events").status_code == 404
+            assert client.get(f"/api/v1/jobs/{job_id}").status_code == 404
+    finally:
+        job_repository.apagar([job_id])
+        auth_repository.delete_user_and_data(uid)
+        auth_repository.delete_user_and_data(outro)
@@ -0,0 +1,41 @@
+"""
+Testes do runner de migrações versionadas (migrations/).
+O banco de teste é criado pelo próprio runner em conftest.py:db_setup.
+"""
+import mysql.connector
+from conftest import TEST_DB_CONFIG
+from migrations import Ddl, aplicar_pendentes, descobrir, versoes_aplicadas
+
+
+def _conn():
+    return mysql.connector.connect(**TEST_DB_CONFIG)
+
+
+def test_todas_as_versoes_registradas_com_duracao(app):
+    conn = _conn()
+    cur = conn.cursor()
+    assert versoes_aplicadas(cur) == {v for v, _ in descobrir()}
+    cur.execute("SELECT COUNT(*) FROM schema_migrations WHERE duracao_ms < 0")
+    assert cur.fetchone()[0] == 0
+    cur.close(); conn.close()
+
+
+def test_segunda_execucao_nao_aplica_nada(app):
+    conn = _conn()
+    assert aplicar_pendentes(conn, saida=lambda _msg: None) == []
+    conn.close()
+
+
+def test_dry_run_nao_executa_ddl(app):
+    conn = _conn()
+    cur = conn.cursor()
+    msgs = []
+    ddl = Ddl(cur, dry_run=True, saida=msgs.append)
+
+    ddl.adicionar_coluna("animais", "coluna_dry_run", "INT NULL")
+    ddl.criar_indice("animais", "idx_animais_brinco", "user_id, deleted_at, brinco")
+
+    assert not ddl.coluna_existe("animais", "coluna_dry_run")
+    assert "ALGORITHM=INPLACE, LOCK=NONE" in msgs[0]
+    assert "já existe" in msgs[1]
+    cur.close(); conn.close()
@@ -319,17 +319,9 @@ class TestCotacoesRegionais:
     """L5 — O filtro de cotações deve funcionar para todos os estados brasileiros."""
 
     def _filtrar(self, uf, dados_boi):
-        """Replica a lógica de filtragem de cotacoes_regionais."""
-        from routes.api import _MAPA_ESTADOS  # será importado após o fix
-        nome_completo = _MAPA_ESTADOS.get(uf, '')
-
-        resultado = []
-        for item in dados_boi:
-            praca = item.get('praca', '').upper()
-            if (praca.startswith(uf) or praca == uf or
-                    (nome_completo and praca == nome_completo.upper())):
-                resultado.append(item)
-        return resultado
+        """Filtro usado por cotacoes_regionais."""
+        from utils.cotacoes import filtrar_por_uf
+        return filtrar_por_uf(dados_boi, uf)
 
     def test_estados_principais_do_agronegocio(self, app):
         """GO, MT, MS, MG, SP — maiores estados pecuários do Brasil."""
@@ -350,7 +342,7 @@ class TestCotacoesRegionais:
 
     def test_mapa_estados_cobre_todos_27_estados(self, app):
         """Verifica que _MAPA_ESTADOS está completo."""
-        from routes.api import _MAPA_ESTADOS
+        from utils.cotacoes import MAPA_ESTADOS as _MAPA_ESTADOS
         ufs_brasil = {
             'AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES', 'GO',
             'MA', 'MT', 'MS', 'MG', 'PA', 'PB', 'PR', 'PE', 'PI',
@@ -361,7 +353,7 @@ class TestCotacoesRegionais:
 
     def test_estado_por_nome_completo(self, app):
         """Praças com nome completo do estado devem ser encontradas."""
-        from routes.api import _MAPA_ESTADOS
+        from utils.cotacoes import MAPA_ESTADOS as _MAPA_ESTADOS
         dados_mock = [
             {'praca': 'MATO GROSSO DO SUL', 'preco_vista': '198.00'},
             {'praca': 'RORAIMA', 'preco_vista': '185.00'},
@@ -460,6 +452,82 @@ class TestProxyCidadesCache:
                 assert data[0]['uf'] == 'GO'
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# /api/v1/cidades: índice por UF no servidor em vez da lista inteira no cliente
+# ══════════════════════════════════════════════════════════════════════════════
+
+_MUNICIPIOS = [
+    {'nome': 'São Paulo', 'uf': 'SP'}, {'nome': 'São Pedro', 'uf': 'SP'},
+    {'nome': 'Sapezal', 'uf': 'MT'}, {'nome': 'Paulínia', 'uf': 'SP'},
+    {'nome': "Olho d'Água", 'uf': 'AL'}, {'nome': 'Goiânia', 'uf': 'GO'},
+]
+
+
+class TestBuscaCidades:
+
+    def test_prefixo_sem_acento_e_por_palavra(self):
+        from utils.cidades import IndiceCidades
+        indice = IndiceCidades(_MUNICIPIOS)
+        assert [c['nome'] for c in indice.buscar('sao p')] == ['São Paulo', 'São Pedro']
+        # nome que começa com o termo vem antes do que só tem uma palavra com ele
+        assert [c['nome'] for c in indice.buscar('paul')] == ['Paulínia', 'São Paulo']
+        assert [c['nome'] for c in indice.buscar('agua')] == ["Olho d'Água"]
+        assert [c['nome'] for c in indice.buscar('sa', uf='mt')] == ['Sapezal']
+
+    def test_payload_por_uf_gzip_com_etag_forte(self, app, monkeypatch):
+        import gzip
+        import json
+        from utils import cidades as cidades_util
+        monkeypatch.setattr(cidades_util, '_indice', cidades_util.IndiceCidades(_MUNICIPIOS))
+
+        with app.test_client() as client:
+            r = client.get('/api/v1/cidades/sp', headers={'Accept-Encoding': 'gzip'})
+            assert r.status_code == 200
+            assert r.headers['Content-Encoding'] == 'gzip'
+            etag, fraco = r.get_etag()
+            assert etag and not fraco
+            assert json.loads(gzip.decompress(r.data))['cidades'] == ['Paulínia', 'São Paulo', 'São Pedro']
+
+            r304 = client.get('/api/v1/cidades/sp', headers={
+                'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag}"'})
+            assert r304.status_code == 304
+
+            assert client.get('/api/v1/cidades/xx').status_code == 404
+
+    def test_busca_publica_nao_chama_ibge_com_indice_carregado(self, app, monkeypatch):
+        from utils import cidades as cidades_util
+        monkeypatch.setattr(cidades_util, '_indice', cidades_util.IndiceCidades(_MUNICIPIOS))
+
+        with patch('routes.api.requests.get') as mock_get:
+            with app.test_client() as client:
+                r = client.get('/api/v1/cidades?q=goi')
+            assert mock_get.call_count == 0
+        assert r.get_json() == [{'nome': 'Goiânia', 'uf': 'GO', 'rotulo': 'Goiânia - GO'}]
+
+    def test_fallback_do_ibge_nao_segura_as_outras_threads(self, tmp_path, monkeypatch):
+        from utils import cidades as cidades_util
+        monkeypatch.setattr(cidades_util, '_indice', None)
+        monkeypatch.setattr(cidades_util, '_proxima_tentativa', 0.0)
+        monkeypatch.setattr(cidades_util, 'SNAPSHOT', str(tmp_path / 'nao_existe.json'))
+        chamou, liberar, chamadas = threading.Event(), threading.Event(), []
+
+        def _ibge_lento():
+            chamadas.append(1)
+            chamou.set()
+            liberar.wait(5)
+            return _MUNICIPIOS
+
+        lenta = threading.Thread(target=cidades_util.get_indice, args=(_ibge_lento,))
+        lenta.start()
+        assert chamou.wait(5)
+        # Com a busca em andamento, as outras voltam na hora com o índice vazio.
+        assert cidades_util.get_indice(_ibge_lento).buscar('goi') == []
+        liberar.set()
+        lenta.join(5)
+        assert len(chamadas) == 1
+        assert [c['nome'] for c in cidades_util.get_indice(_ibge_lento).buscar('goi')] == ['Goiânia']
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # M6 — Cache-Control headers nas respostas JSON da API
 # ══════════════════════════════════════════════════════════════════════════════
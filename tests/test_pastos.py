@@ -51,12 +51,18 @@ def _purge(user_id):
     cur = conn.cursor()
     cur.execute("SET FOREIGN_KEY_CHECKS = 0")
     for sql in [
+        "DELETE FROM ocupacao_gmd WHERE user_id = %s",
+        "DELETE FROM modulo_estado WHERE user_id = %s",
+        "DELETE FROM animal_pesagem_resumo WHERE user_id = %s",
         "DELETE oa FROM ocupacao_animais oa JOIN ocupacoes o ON oa.ocupacao_id = o.id JOIN modulos m ON o.modulo_id = m.id WHERE m.user_id = %s",
+        "DELETE oa FROM ocupacao_animais_arquivo oa JOIN ocupacoes o ON oa.ocupacao_id = o.id JOIN modulos m ON o.modulo_id = m.id WHERE m.user_id = %s",
         "DELETE o FROM ocupacoes o JOIN modulos m ON o.modulo_id = m.id WHERE m.user_id = %s",
         "DELETE FROM modulos WHERE user_id = %s",
         "DELETE FROM pastos WHERE user_id = %s",
         "DELETE p FROM pesagens p JOIN animais a ON p.animal_id = a.id WHERE a.user_id = %s",
         "DELETE FROM reproducao WHERE user_id = %s",
+        "DELETE p FROM pesagens_arquivo p JOIN animais_arquivo a ON p.animal_id = a.id WHERE a.user_id = %s",
+        "DELETE FROM animais_arquivo WHERE user_id = %s",
         "DELETE FROM animais WHERE user_id = %s",
         "DELETE FROM estoque_movimentacoes WHERE user_id = %s",
         "DELETE FROM estoque_produtos WHERE user_id = %s",
@@ -237,6 +243,28 @@ def test_modulo_encerrado_aparece_em_dias_descanso(um):
     assert any(row[0] == mid for row in descanso)
 
 
+def test_modulo_estado_acompanha_ocupacao_e_descanso(um):
+    """modulo_estado é mantido pelas escritas: entrada preenche ocupação e
+    contagem; saída limpa a ocupação e grava a base dos dias de descanso."""
+    a1, a2 = _make_animal(um), _make_animal(um)
+    pid = pasto_repository.insert_pasto(um, "P Estado", None, None, None)
+    mid = pasto_repository.insert_modulo(pid, um, "M Estado", None, 4.0)
+
+    estado = "SELECT ocupacao_id, qtd_animais, pct_lotacao, ultima_saida FROM modulo_estado WHERE modulo_id = %s"
+    assert _fetch_one(estado, (mid,)) == (None, 0, None, None)
+
+    oc_id = pasto_repository.iniciar_ocupacao(mid, um, "2024-01-01", [a1, a2])
+    row = _fetch_one(estado, (mid,))
+    assert row[0] == oc_id and row[1] == 2 and float(row[2]) == 50.0
+
+    pasto_repository.encerrar_ocupacao(oc_id, um, "2024-02-01")
+    row = _fetch_one(estado, (mid,))
+    assert row[0] is None and row[1] == 0 and str(row[3]) == "2024-02-01"
+
+    modulo = next(m for m in pasto_repository.get_modulos_by_pasto(pid, um) if m[0] == mid)
+    assert modulo[6] is None and modulo[8] > 0
+
+
 def test_get_pastos_termo_filtra_por_nome(um):
     pasto_repository.insert_pasto(um, "Norte", None, None, None)
     pasto_repository.insert_pasto(um, "Sul", None, None, None)
@@ -284,6 +312,125 @@ def test_get_gmd_por_modulo_calcula_gmd_do_animal_ocupante(um):
     assert float(row[4]) == pytest.approx(1.0)
 
 
+def test_ganho_na_janela_interpola_bordas_sem_extrapolar():
+    from datetime import date
+    from utils.calculo import ganho_na_janela
+    pesagens = [(date(2024, 1, 1), 300), (date(2024, 1, 21), 320)]
+    # janela interna: bordas interpoladas (1 kg/dia)
+    assert ganho_na_janela(pesagens, date(2024, 1, 6), date(2024, 1, 16)) == (10.0, 10)
+    # janela maior que as pesagens: recortada à primeira/última
+    assert ganho_na_janela(pesagens, date(2023, 12, 1), date(2024, 3, 1)) == (20.0, 20)
+    assert ganho_na_janela(pesagens[:1], date(2024, 1, 1), date(2024, 2, 1)) is None
+
+
+def test_gmd_modulo_usa_so_a_janela_da_ocupacao(um):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO animais (brinco, sexo, data_compra, preco_compra, user_id) "
+        "VALUES (%s, 'M', '2024-01-01', 1000, %s)",
+        (f"PJAN{_n()}", um),
+    )
+    aid = cur.lastrowid
+    # 0,5 kg/dia em janeiro, 2 kg/dia em fevereiro
+    cur.execute("INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, '2024-01-01', 300)", (aid,))
+    cur.execute("INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, '2024-01-31', 315)", (aid,))
+    conn.commit(); cur.close(); conn.close()
+
+    pid = pasto_repository.insert_pasto(um, "P Janela", None, None, 5.0)
+    m1 = pasto_repository.insert_modulo(pid, um, "M Jan", None, 5.0)
+    m2 = pasto_repository.insert_modulo(pid, um, "M Fev", None, 5.0)
+    oc1 = pasto_repository.iniciar_ocupacao(m1, um, "2024-01-01", [aid])
+    pasto_repository.encerrar_ocupacao(oc1, um, "2024-01-31")
+    pasto_repository.iniciar_ocupacao(m2, um, "2024-01-31", [aid])
+
+    # Pesagem posterior chega pelo hook e atualiza só a janela de fevereiro
+    from repositories import animal_repository
+    assert animal_repository.registrar_pesagem(aid, um, "2024-03-01", 375)
+
+    gmd = {r[0]: float(r[4]) for r in pasto_repository.get_gmd_por_modulo(um)}
+    assert gmd[m1] == pytest.approx(0.5)
+    assert gmd[m2] == pytest.approx(2.0)
+
+
+def test_gmd_da_ocupacao_encerrada_mantem_animal_arquivado(um):
+    """Pesagem de quem dividiu o módulo refaz a janela sem perder o arquivado."""
+    from datetime import datetime
+    from repositories import animal_repository, arquivo_repository
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    ids = []
+    for peso_fim in (330, 315):   # 1 kg/dia e 0,5 kg/dia em janeiro
+        cur.execute(
+            "INSERT INTO animais (brinco, sexo, data_compra, preco_compra, user_id) "
+            "VALUES (%s, 'M', '2024-01-01', 1000, %s)",
+            (f"PARQ{_n()}", um),
+        )
+        aid = cur.lastrowid
+        cur.execute("INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, '2024-01-01', 300)", (aid,))
+        cur.execute("INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, '2024-01-31', %s)",
+                    (aid, peso_fim))
+        ids.append(aid)
+    conn.commit(); cur.close(); conn.close()
+    vendido, fica = ids
+
+    pid = pasto_repository.insert_pasto(um, "P Arquivo", None, None, 5.0)
+    mid = pasto_repository.insert_modulo(pid, um, "M Arquivo", None, 5.0)
+    oc = pasto_repository.iniciar_ocupacao(mid, um, "2024-01-01", ids)
+    pasto_repository.encerrar_ocupacao(oc, um, "2024-01-31")
+    animal_repository.registrar_venda(vendido, um, "2024-02-15", 3000.0, 340.0)
+    assert arquivo_repository.arquivar_lote("2025-01-01", datetime.now(), user_id=um)[0] == 1
+
+    assert animal_repository.registrar_pesagem(fica, um, "2024-03-01", 375)
+    qtd, ganho, dias = _fetch_one(
+        "SELECT qtd_animais, ganho_kg, animal_dias FROM ocupacao_gmd WHERE ocupacao_id = %s", (oc,))
+    assert (qtd, float(ganho), dias) == (2, 45.0, 60)
+    historico = _fetch_one("SELECT qtd_animais_historico FROM modulo_estado WHERE modulo_id = %s", (mid,))
+    assert historico[0] == 2
+
+
+def test_lotacao_em_ua_pelo_peso_e_atualizada_na_pesagem(um):
+    """UA = último peso / 450 kg (animal sem pesagem = 1 UA); nova pesagem
+    de animal ocupante refaz ua_atual, ua_por_ha e superlotado."""
+    from repositories import animal_repository
+    leve = animal_repository.cadastrar_animal(f"PUA{_n()}", 'M', '2024-01-01', 1000, 225, um)
+    sem_peso = animal_repository.cadastrar_animal(f"PUA{_n()}", 'M', '2024-01-01', 1000, None, um)
+    pid = pasto_repository.insert_pasto(um, "P UA", 10.0, None, None)
+    mid = pasto_repository.insert_modulo(pid, um, "M UA", 2.0, 2.0)
+    pasto_repository.iniciar_ocupacao(mid, um, "2024-01-01", [leve, sem_peso])
+
+    estado = "SELECT ua_atual, pct_lotacao, ua_por_ha, superlotado FROM modulo_estado WHERE modulo_id = %s"
+    ua, pct, ua_ha, superlotado = _fetch_one(estado, (mid,))
+    assert float(ua) == pytest.approx(1.5)        # 0,5 + 1
+    assert float(pct) == pytest.approx(75.0)
+    assert float(ua_ha) == pytest.approx(0.75)
+    assert superlotado == 0
+
+    assert animal_repository.registrar_pesagem(leve, um, "2024-03-01", 675)
+    ua, pct, ua_ha, superlotado = _fetch_one(estado, (mid,))
+    assert float(ua) == pytest.approx(2.5)        # 1,5 + 1
+    assert superlotado == 1
+    assert pasto_repository.get_pastos(um)[0][6] == 1
+
+
+def test_api_mapa_lotacao_agrupa_por_pasto(app):
+    with app.test_client() as client:
+        uid = _make_user()
+        _login(client, uid)
+        pid = pasto_repository.insert_pasto(uid, "P Mapa", 4.0, None, None)
+        m1 = pasto_repository.insert_modulo(pid, uid, "M1", 2.0, 2.0)
+        pasto_repository.insert_modulo(pid, uid, "M2", 2.0, 2.0)
+        pasto_repository.iniciar_ocupacao(m1, uid, "2024-01-01", [_make_animal(uid)])
+
+        resp = client.get('/api/v1/pastos/lotacao')
+        assert resp.status_code == 200
+        pasto = next(p for p in resp.get_json()['pastos'] if p['id'] == pid)
+        assert len(pasto['modulos']) == 2
+        assert pasto['ua_total'] == pytest.approx(1.0)
+        assert pasto['ua_por_ha'] == pytest.approx(0.25)
+        _purge(uid)
+
+
 # ── rotas HTTP ────────────────────────────────────────────────────────────────
 
 def test_get_pastos_redireciona_sem_login(client):
@@ -1,28 +1,141 @@
-"""Issue #37 — limpeza oportunística de PDFs órfãos em /tmp."""
+"""Issue #37 — jobs de PDF abandonados não podem virar lixo eterno.
+
+O estado saiu de /tmp para a tabela jobs (utils.jobs): a manutenção do
+scheduler marca como erro quem parou de bater e apaga os expirados com o blob.
+"""
+import itertools
 import os
 import time
 
-from routes.api import _limpar_pdfs_orfaos, _PDF_DIR, _PDF_MAX_AGE
+import pytest
+
+from werkzeug.security import generate_password_hash
+
+import db_config as dbc
+from repositories import auth_repository, job_repository, relatorio_cache_repository
+from utils import jobs
+from utils.blob_store import BlobStoreLocal
+
+_seq = itertools.count(20000)
+
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"pdfc_{next(_seq)}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _envelhecer(job_id, heartbeat_seg=0, expira_seg=0):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE jobs SET heartbeat_em = NOW() - INTERVAL %s SECOND, "
+        "expira_em = NOW() + INTERVAL %s SECOND WHERE id = %s",
+        (heartbeat_seg, expira_seg, job_id),
+    )
+    conn.commit(); cur.close(); conn.close()
+
+
+def test_blob_store_local_grava_le_apaga_e_recusa_chave_fora_do_diretorio(tmp_path):
+    store = BlobStoreLocal(str(tmp_path))
+    store.gravar('jobs/abc', b'%PDF')
+    assert store.ler('jobs/abc') == b'%PDF'
+    store.apagar('jobs/abc')
+    assert store.ler('jobs/abc') is None
+    for chave in ('../fora', '/abs', 'jobs/../../x'):
+        with pytest.raises(ValueError):
+            store.gravar(chave, b'x')
+
+
+def test_manutencao_marca_mortos_e_apaga_expirados_com_blob(app, tmp_path, monkeypatch):
+    store = BlobStoreLocal(str(tmp_path))
+    monkeypatch.setattr(jobs, 'get_blob_store', lambda: store)
+    uid = _make_user()
+    try:
+        morto = 'a' * 8 + '-0000-4000-8000-' + '0' * 12
+        job_repository.criar(morto, uid, 'pdf', 3600)
+        job_repository.marcar_executando(morto)
+        _envelhecer(morto, heartbeat_seg=jobs.MORTO_APOS_SEG + 60, expira_seg=3600)
+
+        expirado = 'b' * 8 + '-0000-4000-8000-' + '0' * 12
+        job_repository.criar(expirado, uid, 'pdf', 3600)
+        job_repository.marcar_executando(expirado)
+        store.gravar(f"jobs/{expirado}", b'%PDF')
+        job_repository.concluir(expirado, blob_chave=f"jobs/{expirado}")
+        _envelhecer(expirado, expira_seg=-1)
+
+        recente = 'c' * 8 + '-0000-4000-8000-' + '0' * 12
+        job_repository.criar(recente, uid, 'pdf', 3600)
 
+        alheio = tmp_path / 'outro_arquivo_qualquer.tmp'
+        alheio.write_bytes(b'x')
 
-def _touch(nome, idade_seg):
-    caminho = os.path.join(_PDF_DIR, nome)
-    open(caminho, 'w').close()
-    t = time.time() - idade_seg
-    os.utime(caminho, (t, t))
-    return caminho
+        jobs.manter_jobs(app)
+
+        assert jobs.estado(morto, uid)['status'] == 'erro'
+        assert jobs.estado(expirado, uid) is None
+        assert store.ler(f"jobs/{expirado}") is None
+        assert jobs.estado(recente, uid)['status'] == 'pendente'
+        assert os.path.exists(alheio)
+    finally:
+        auth_repository.delete_user_and_data(uid)
+
+
+def _chaves(store):
+    return sorted(chave for prefixo in ('jobs/', 'relatorios/') for chave, _ in store.listar(prefixo))
 
 
-def test_limpa_orfaos_antigos_preserva_recentes_e_alheios():
-    velho   = _touch('sgg_pdf_teste_velho.pending', _PDF_MAX_AGE + 120)
-    novo    = _touch('sgg_pdf_teste_novo.pending', 10)
-    alheio  = _touch('outro_arquivo_qualquer.tmp', _PDF_MAX_AGE + 120)
+def _antigo(store, chave):
+    """Blob gravado antes da folga de ORFAO_APOS_SEG."""
+    store.gravar(chave, b'%PDF')
+    antes = time.time() - jobs.ORFAO_APOS_SEG - 60
+    os.utime(os.path.join(store.diretorio, *chave.split('/')), (antes, antes))
+
+
+def test_manutencao_recolhe_blobs_orfaos(app, tmp_path, monkeypatch):
+    store = BlobStoreLocal(str(tmp_path))
+    monkeypatch.setattr(jobs, 'get_blob_store', lambda: store)
+    uid = _make_user()
     try:
-        _limpar_pdfs_orfaos()
-        assert not os.path.exists(velho)      # órfão antigo removido
-        assert os.path.exists(novo)           # job recente intacto
-        assert os.path.exists(alheio)         # não toca em arquivos de terceiros
+        apontado = f"relatorios/{uid}/{'a' * 64}.pdf"
+        _antigo(store, apontado)
+        relatorio_cache_repository.registrar('a' * 64, uid, apontado, 4, solicitado=False)
+        _antigo(store, f"relatorios/{uid}/{'b' * 64}.pdf")
+        _antigo(store, 'jobs/' + 'd' * 8 + '-0000-4000-8000-' + '0' * 12)
+        store.gravar(f"relatorios/{uid}/{'c' * 64}.pdf", b'%PDF')  # ainda na folga
+
+        jobs.manter_jobs(app)
+
+        assert _chaves(store) == [
+            apontado, f"relatorios/{uid}/{'c' * 64}.pdf",
+        ]
     finally:
-        for p in (velho, novo, alheio):
-            if os.path.exists(p):
-                os.remove(p)
+        auth_repository.delete_user_and_data(uid)
+
+
+def test_purga_apaga_os_blobs_do_tenant(app, tmp_path, monkeypatch):
+    store = BlobStoreLocal(str(tmp_path))
+    monkeypatch.setattr(auth_repository, 'get_blob_store', lambda: store)
+    uid = _make_user()
+    outro = _make_user()
+    try:
+        job_id = 'e' * 8 + '-0000-4000-8000-' + '0' * 12
+        job_repository.criar(job_id, uid, 'pdf', 3600)
+        store.gravar(f"jobs/{job_id}", b'%PDF')
+        job_repository.concluir(job_id, blob_chave=f"jobs/{job_id}")
+        for n in range(3):
+            store.gravar(f"relatorios/{uid}/{n}.pdf", b'%PDF')
+        store.gravar(f"relatorios/{outro}/0.pdf", b'%PDF')
+
+        auth_repository.delete_user_and_data(uid, limite=2)
+
+        assert _chaves(store) == [f"relatorios/{outro}/0.pdf"]
+    finally:
+        auth_repository.delete_user_and_data(outro)
+
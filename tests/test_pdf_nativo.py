@@ -0,0 +1,184 @@
+"""
+Testes do motor nativo de PDF (sem Chromium) do relatório do rebanho.
+Escritor: utils.pdf_nativo | Layout e escolha do motor: utils.relatorio
+Rota: /api/v1/relatorio/pdf
+"""
+import io
+import itertools
+import re
+import time
+import zlib
+from datetime import date
+from decimal import Decimal
+
+from werkzeug.security import generate_password_hash
+
+import db_config as dbc
+from repositories import animal_repository, auth_repository
+from utils import jobs, pdf_nativo, relatorio
+from utils.blob_store import BlobStoreLocal
+
+_seq = itertools.count(24000)
+
+_KPIS = {
+    'qtd_animais': 3, 'gmd_medio': 0.8, 'custo_diaria': 3.5, 'custo_arroba': 0.0,
+    'valor_contabil': 6000.0, 'valor_mercado': None, 'preco_boi': None, 'preco_novilha': None,
+    'data_cotacao': None,
+}
+
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"pdfn_{next(_seq)}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _login(client, uid):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM usuarios WHERE id = %s", (uid,))
+    username = cur.fetchone()[0]
+    cur.close(); conn.close()
+    client.post("/login", data={"username": username, "password": "x"},
+                follow_redirects=True)
+
+
+def _animais(n):
+    # Mesmo formato de get_animais_com_gmd: id brinco sexo raca data_compra gmd dias peso_final
+    for i in range(n):
+        gmd = None if i % 3 == 0 else Decimal('0.500') if i % 3 == 1 else Decimal('1.100')
+        yield (i, f"B{i:05d}", 'M' if i % 2 else 'F', 'Nelore', date(2025, 3, 1), gmd, 90, Decimal('380.0'))
+
+
+def _relatorio(animais, fluxo=()):
+    saida = io.BytesIO()
+    rel = pdf_nativo.RelatorioTabular(saida, rodape='Sistema de Gestão de Gado')
+    relatorio._compor_nativo(rel, ('Fazenda Boa Esperança', 'Uberaba - MG'), list(fluxo), _KPIS,
+                             animais, '19/10/2026')
+    rel.fechar()
+    return saida.getvalue()
+
+
+def _conteudos(pdf):
+    """Content streams descomprimidos, um por página, em WinAnsi."""
+    return [zlib.decompress(m).decode('cp1252')
+            for m in re.findall(rb'/FlateDecode >>\nstream\n(.*?)\nendstream', pdf, re.S)]
+
+
+def _checar_estrutura(pdf):
+    """xref aponta para cada objeto e /Count bate com as páginas escritas."""
+    assert pdf.startswith(b'%PDF-1.4') and pdf.endswith(b'%%EOF\n')
+    inicio = int(pdf.rsplit(b'startxref\n', 1)[1].split(b'\n')[0])
+    linhas = pdf[inicio:].split(b'\n')
+    assert linhas[0] == b'xref'
+    total = int(linhas[1].split()[1])
+    for num in range(1, total):
+        offset = int(linhas[2 + num][:10])
+        assert pdf[offset:].startswith(f"{num} 0 obj".encode())
+    paginas = len(re.findall(rb'/Type /Page ', pdf))
+    assert int(re.search(rb'/Count (\d+)', pdf).group(1)) == paginas
+    return paginas
+
+
+# ── escritor (puro) ───────────────────────────────────────────────────────────
+
+def test_pdf_valido_com_acentos_e_status():
+    pdf = _relatorio(_animais(6), fluxo=[(2025, Decimal('1500.50'), 200, 0, None)])
+    assert _checar_estrutura(pdf) == 1
+    texto = _conteudos(pdf)[0]
+    assert 'Fazenda Boa Esperança' in texto
+    assert '1.500,50' in texto and '1.300,50' in texto  # entradas e resultado no formato brl
+    assert 'Fêmea' in texto and '01/03/2025' in texto and '380.0' in texto
+    assert texto.count('(Sem pesagem)') == 2
+    assert texto.count('(Abaixo da média)') == 2
+    assert texto.count('(Normal)') == 2
+
+
+def test_cabecalho_repete_e_paginas_crescem_com_as_linhas():
+    pequeno = _checar_estrutura(_relatorio(_animais(10)))
+    grande_pdf = _relatorio(_animais(400))
+    grande = _checar_estrutura(grande_pdf)
+    assert pequeno == 1 and grande > 5
+    conteudos = _conteudos(grande_pdf)
+    assert all('(Brinco)' in c for c in conteudos[1:])
+    assert all(f"(Página {i})" in c for i, c in enumerate(conteudos, 1))
+    assert sum(c.count('(B0') for c in conteudos) == 400
+
+
+def test_linhas_consumidas_sob_demanda():
+    """As linhas vão para o PDF à medida que chegam: nada obriga a ter a lista inteira."""
+    saida = io.BytesIO()
+    rel = pdf_nativo.RelatorioTabular(saida)
+    consumidas = []
+
+    def _linhas():
+        for i in range(300):
+            consumidas.append(i)
+            yield [str(i)]
+
+    antes = len(saida.getvalue())
+    escritas = rel.tabela([('N', 1, 'esquerda')], _linhas())
+    assert escritas == 300 and len(consumidas) == 300
+    # Páginas cheias já foram escritas na saída antes do fechar().
+    assert len(saida.getvalue()) > antes + 1000
+    rel.fechar()
+    assert _checar_estrutura(saida.getvalue()) > 1
+
+
+def test_sem_dados_escreve_mensagens_de_vazio():
+    texto = _conteudos(_relatorio(iter(())))[0]
+    assert 'Nenhum dado financeiro disponível.' in texto
+    assert 'Nenhum animal ativo no rebanho.' in texto
+
+
+def test_cortar_respeita_a_largura():
+    assert pdf_nativo.cortar('Curto', 100, 9) == 'Curto'
+    cortado = pdf_nativo.cortar('Brinco muito comprido para a coluna', 50, 9)
+    assert cortado.endswith('…') and pdf_nativo.largura_texto(cortado, 9) <= 50
+    assert pdf_nativo.largura_texto('ã', 10) == pdf_nativo.largura_texto('a', 10)
+
+
+def test_motor_entra_na_chave():
+    nativo = relatorio._fonte_layout(relatorio.MOTOR_NATIVO)
+    chave = relatorio.calcular_chave(nativo, 7, 3, None, date(2026, 10, 19))
+    assert relatorio.MOTORES['rebanho'] in (relatorio.MOTOR_NATIVO, relatorio.MOTOR_CHROMIUM)
+    assert chave != relatorio.calcular_chave('<html>', 7, 3, None, date(2026, 10, 19))
+
+
+# ── rota ──────────────────────────────────────────────────────────────────────
+
+def test_relatorio_nativo_pela_rota_sem_chromium(app, tmp_path, monkeypatch):
+    store = BlobStoreLocal(str(tmp_path))
+    monkeypatch.setattr(relatorio, 'get_blob_store', lambda: store)
+    monkeypatch.setattr(jobs, 'get_blob_store', lambda: store)
+    monkeypatch.setitem(relatorio.MOTORES, 'rebanho', relatorio.MOTOR_NATIVO)
+
+    def _sem_chromium(*args, **kwargs):
+        raise AssertionError("motor nativo não deveria abrir o Chromium")
+
+    monkeypatch.setattr(relatorio, 'gerar_pdf', _sem_chromium)
+    monkeypatch.setattr(relatorio, 'sync_playwright', _sem_chromium)
+    uid = _make_user()
+    try:
+        animal_id = animal_repository.cadastrar_animal(f"PN{next(_seq)}", "M", "2024-01-01", 2000.0, 300.0, uid)
+        animal_repository.registrar_pesagem(animal_id, uid, "2024-03-01", 345.0)
+        with app.test_client() as client:
+            _login(client, uid)
+            job_id = client.post("/api/v1/relatorio/pdf").get_json()['job_id']
+            for _ in range(250):
+                status = client.get(f"/api/v1/relatorio/pdf/{job_id}/status").get_json()['status']
+                if status not in ('pending', 'running'):
+                    break
+                time.sleep(0.02)
+            assert status == 'done'
+            pdf = client.get(f"/api/v1/relatorio/pdf/{job_id}/download").data
+        _checar_estrutura(pdf)
+        assert any('(Normal)' in c for c in _conteudos(pdf))
+    finally:
+        auth_repository.delete_user_and_data(uid)
@@ -0,0 +1,138 @@
+"""
+Testes do cache de PDFs do relatório (chave por conteúdo, LRU, job pronto).
+Cálculo: utils.relatorio | Repositório: relatorio_cache_repository | Jobs: utils.jobs
+Rota: /api/v1/relatorio/pdf
+"""
+import itertools
+from datetime import date
+
+from werkzeug.security import generate_password_hash
+
+import db_config as dbc
+from repositories import auth_repository, job_repository, relatorio_cache_repository
+from utils import jobs, relatorio
+from utils.blob_store import BlobStoreLocal
+
+_seq = itertools.count(21000)
+
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"relc_{next(_seq)}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _login(client, uid):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM usuarios WHERE id = %s", (uid,))
+    username = cur.fetchone()[0]
+    cur.close(); conn.close()
+    client.post("/login", data={"username": username, "password": "x"},
+                follow_redirects=True)
+
+
+def _executar_sql(sql, params):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    conn.commit(); cur.close(); conn.close()
+
+
+def _nao_renderiza(html):
+    raise AssertionError("PDF em cache não deveria abrir o Chromium")
+
+
+# ── chave (puro) ──────────────────────────────────────────────────────────────
+
+def test_chave_muda_com_template_dados_cotacao_e_dia():
+    base = ('<html>v1</html>', 7, 3, date(2024, 5, 1), date(2024, 5, 2))
+    chave = relatorio.calcular_chave(*base)
+    assert len(chave) == 64
+    assert relatorio.calcular_chave(*base) == chave
+    variacoes = [
+        ('<html>v2</html>', 7, 3, date(2024, 5, 1), date(2024, 5, 2)),
+        ('<html>v1</html>', 8, 3, date(2024, 5, 1), date(2024, 5, 2)),
+        ('<html>v1</html>', 7, 4, date(2024, 5, 1), date(2024, 5, 2)),
+        ('<html>v1</html>', 7, 3, None, date(2024, 5, 2)),
+        ('<html>v1</html>', 7, 3, date(2024, 5, 1), date(2024, 5, 3)),
+    ]
+    assert len({relatorio.calcular_chave(*v) for v in variacoes} | {chave}) == 6
+
+
+def test_blob_store_existe(tmp_path):
+    store = BlobStoreLocal(str(tmp_path))
+    assert not store.existe('relatorios/1/abc.pdf')
+    store.gravar('relatorios/1/abc.pdf', b'%PDF')
+    assert store.existe('relatorios/1/abc.pdf')
+
+
+# ── cache / jobs ──────────────────────────────────────────────────────────────
+
+def test_pdf_em_cache_conclui_o_job_sem_renderizar(app, tmp_path, monkeypatch):
+    store = BlobStoreLocal(str(tmp_path))
+    monkeypatch.setattr(relatorio, 'get_blob_store', lambda: store)
+    monkeypatch.setattr(jobs, 'get_blob_store', lambda: store)
+    monkeypatch.setattr(relatorio, 'gerar_pdf', _nao_renderiza)
+    uid = _make_user()
+    try:
+        with app.test_request_context():
+            chave = relatorio.chave_relatorio(uid)
+        blob_chave = f"relatorios/{uid}/{chave}.pdf"
+        store.gravar(blob_chave, b'%PDF-cache')
+        relatorio_cache_repository.registrar(chave, uid, blob_chave, 10, solicitado=False)
+
+        with app.test_client() as client:
+            _login(client, uid)
+            job_id = client.post("/api/v1/relatorio/pdf").get_json()['job_id']
+            assert client.get(f"/api/v1/relatorio/pdf/{job_id}/status").get_json() == {'status': 'done'}
+            assert client.get(f"/api/v1/relatorio/pdf/{job_id}/download").data == b'%PDF-cache'
+        assert relatorio_cache_repository.get_usuarios_recentes(1).count(uid) == 1
+
+        # Blob compartilhado: expirar o job não apaga o PDF do cache.
+        _executar_sql("UPDATE jobs SET expira_em = NOW() - INTERVAL 1 SECOND WHERE id = %s", (job_id,))
+        jobs.manter_jobs(app)
+        assert job_repository.get_job(job_id, uid) is None
+        assert store.existe(blob_chave)
+    finally:
+        auth_repository.delete_user_and_data(uid)
+
+
+def test_despejo_lru_tira_os_acessados_ha_mais_tempo(app, tmp_path, monkeypatch):
+    store = BlobStoreLocal(str(tmp_path))
+    monkeypatch.setattr(relatorio, 'get_blob_store', lambda: store)
+    uid = _make_user()
+    giga = 1_000_000_000
+    try:
+        chaves = [f"{uid:08d}".ljust(64, str(i)) for i in range(3)]
+        for i, chave in enumerate(chaves):
+            blob_chave = f"relatorios/{uid}/{chave}.pdf"
+            store.gravar(blob_chave, b'%PDF')
+            relatorio_cache_repository.registrar(chave, uid, blob_chave, giga)
+            _executar_sql("UPDATE relatorio_cache SET acessado_em = NOW() + INTERVAL %s MINUTE "
+                          "WHERE chave = %s", (60 + i, chave))
+        monkeypatch.setattr(relatorio, 'MAX_BYTES', 2 * giga)
+        relatorio._despejar()
+        assert relatorio_cache_repository.get_blob_chave(chaves[0], uid) is None
+        assert not store.existe(f"relatorios/{uid}/{chaves[0]}.pdf")
+        assert all(relatorio_cache_repository.get_blob_chave(c, uid) for c in chaves[1:])
+    finally:
+        auth_repository.delete_user_and_data(uid)
+
+
+def test_medicacao_invalida_o_relatorio(app):
+    from repositories import animal_repository, kpi_repository
+    uid = _make_user()
+    try:
+        animal_id = animal_repository.cadastrar_animal(f"RC{next(_seq)}", "M", "2024-01-01", 2000.0, 300.0, uid)
+        antes = kpi_repository.get_versao(uid)
+        assert animal_repository.registrar_medicacao(animal_id, uid, "2024-02-01", "Vacina", 15.0, "")
+        assert kpi_repository.get_versao(uid) > antes
+    finally:
+        auth_repository.delete_user_and_data(uid)
@@ -0,0 +1,118 @@
+"""
+Testes do relatório mensal por email (opt-in, envios idempotentes, lote SMTP).
+Pipeline: utils.relatorio | Email: utils.email_service | Repositório: relatorio_mensal_repository
+Rota: /configuracoes
+"""
+import itertools
+import smtplib
+from datetime import date
+
+from werkzeug.security import generate_password_hash
+
+import db_config as dbc
+from repositories import auth_repository, configuracao_repository, relatorio_mensal_repository
+from utils import email_service
+from utils.relatorio import referencia_mensal
+
+_seq = itertools.count(23000)
+_REFERENCIA = date(2001, 1, 1)  # mês que nenhum job real usa
+
+
+def _make_user(email=True):
+    n = next(_seq)
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash, email) VALUES (%s, %s, %s)",
+        (f"relm_{n}", generate_password_hash("x"), f"relm_{n}@exemplo.com" if email else None),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _login(client, uid):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM usuarios WHERE id = %s", (uid,))
+    username = cur.fetchone()[0]
+    cur.close(); conn.close()
+    client.post("/login", data={"username": username, "password": "x"},
+                follow_redirects=True)
+
+
+# ── puro ──────────────────────────────────────────────────────────────────────
+
+def test_referencia_e_o_mes_fechado():
+    assert referencia_mensal(date(2026, 1, 1)) == date(2025, 12, 1)
+    assert referencia_mensal(date(2026, 3, 2)) == date(2026, 2, 1)
+
+
+class _SMTPFalso:
+    def __init__(self, log):
+        self.log = log
+
+    def sendmail(self, de, para, mensagem):
+        if para == 'recusado@x.com':
+            raise smtplib.SMTPRecipientsRefused({para: (550, b'nao existe')})
+        if para == 'derruba@x.com':
+            raise smtplib.SMTPServerDisconnected('caiu')
+        self.log.append((id(self), para, 'application/pdf' in mensagem))
+
+    def close(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+def test_lote_smtp_reaproveita_conexao_e_reconecta_apos_queda(monkeypatch):
+    monkeypatch.setenv('MAIL_USERNAME', 'sgg@x.com')
+    monkeypatch.setenv('MAIL_PASSWORD', 'x')
+    log, conexoes = [], []
+
+    def _conectar(cfg):
+        conexoes.append(_SMTPFalso(log))
+        return conexoes[-1]
+
+    monkeypatch.setattr(email_service, '_conectar', _conectar)
+    envios = [('a@x.com', 'Fazenda A', b'%PDF-a'), ('recusado@x.com', 'B', b'%PDF-b'),
+              ('c@x.com', 'C', b'%PDF-c'), ('derruba@x.com', 'D', b'%PDF-d'), ('e@x.com', None, b'%PDF-e')]
+    falhas = email_service.send_relatorios_mensais(envios, '09/2026')
+    assert set(falhas) == {1, 3}
+    assert [para for _, para, _ in log] == ['a@x.com', 'c@x.com', 'e@x.com']
+    assert all(tem_pdf for _, _, tem_pdf in log)
+    assert len(conexoes) == 2  # só a queda abre conexão nova
+
+
+# ── repositório / rota ────────────────────────────────────────────────────────
+
+def test_destinatarios_so_opt_in_com_email_e_ainda_nao_enviados(app):
+    com_opt_in, sem_opt_in, sem_email = _make_user(), _make_user(), _make_user(email=False)
+    try:
+        configuracao_repository.upsert_configuracao(com_opt_in, 'Fazenda A', 'Uberaba - MG', 10, relatorio_mensal=True)
+        configuracao_repository.upsert_configuracao(sem_opt_in, 'Fazenda B', 'Uberaba - MG', 10)
+        configuracao_repository.upsert_configuracao(sem_email, 'Fazenda C', 'Uberaba - MG', 10, relatorio_mensal=True)
+        ids = lambda: {d[0] for d in relatorio_mensal_repository.get_destinatarios(_REFERENCIA)}
+
+        assert com_opt_in in ids() and not {sem_opt_in, sem_email} & ids()
+        relatorio_mensal_repository.registrar_envios(_REFERENCIA, [(com_opt_in, 'erro', None, 'SMTP fora')])
+        assert com_opt_in in ids()  # falha volta na repescagem
+        relatorio_mensal_repository.registrar_envios(_REFERENCIA, [(com_opt_in, 'enviado', 'relatorios/x.pdf', None)])
+        assert com_opt_in not in ids()
+    finally:
+        for uid in (com_opt_in, sem_opt_in, sem_email):
+            auth_repository.delete_user_and_data(uid)
+
+
+def test_configuracoes_grava_opt_in_do_relatorio_mensal(app):
+    uid = _make_user()
+    try:
+        with app.test_client() as client:
+            _login(client, uid)
+            client.post("/configuracoes", data={'nome_fazenda': 'F', 'relatorio_mensal': '1'})
+            assert configuracao_repository.get_configuracao(uid)[4] == 1
+            client.post("/configuracoes", data={'nome_fazenda': 'F'})
+            assert configuracao_repository.get_configuracao(uid)[4] == 0
+    finally:
+        auth_repository.delete_user_and_data(uid)
@@ -241,6 +241,22 @@ def test_get_racas_distintas_agrupa_variacoes(um):
     assert "nelore " not in racas and "NELORE" not in racas
 
 
+def test_chave_ordem_brinco_ordena_trechos_numericos():
+    """'A2' antes de 'A10'; maiúsculas/minúsculas e espaços não contam."""
+    brincos = ["a10", "A2", " A1 ", "B1", "A2-3", "A2-10", "100", "20"]
+    ordenados = sorted(brincos, key=animal_repository.chave_ordem_brinco)
+    assert ordenados == ["20", "100", " A1 ", "A2", "A2-3", "A2-10", "a10", "B1"]
+
+
+def test_get_animais_ativos_ordena_brinco_natural(um):
+    sufixo = _n()
+    for brinco in (f"ORD{sufixo}-10", f"ORD{sufixo}-2", f"ORD{sufixo}-1"):
+        animal_repository.cadastrar_animal(brinco, "M", "2024-01-01", 1000.0, 280.0, um)
+    brincos = [row[1] for row in animal_repository.get_animais_ativos(um)
+               if row[1].startswith(f"ORD{sufixo}-")]
+    assert brincos == [f"ORD{sufixo}-1", f"ORD{sufixo}-2", f"ORD{sufixo}-10"]
+
+
 def test_delete_user_and_data_remove_tudo_com_fk_restrict(app):
     """Issue #45 — DELETE direto em usuarios falha por FK RESTRICT quando há
     dados. delete_user_and_data apaga na ordem certa (pesagens→animais→lotes)
@@ -260,6 +276,53 @@ def test_delete_user_and_data_remove_tudo_com_fk_restrict(app):
     assert _count("SELECT COUNT(*) FROM lotes WHERE user_id = %s", (uid,)) == 0
 
 
+def test_purgar_lote_grava_progresso_e_retoma(app):
+    """Purga em lotes: cada chamada apaga no máximo `limite` linhas e grava a
+    etapa em purga_tenant; delete_user_and_data retoma de onde parou."""
+    uid = _make_user()
+    for _ in range(3):
+        _make_animal(uid)
+    auth_repository.desativar_conta(uid)
+
+    etapa = 0
+    while auth_repository._ETAPAS_PURGA[etapa][0] != "pesagens":
+        etapa, _ = auth_repository.purgar_lote(uid, etapa, limite=2)
+    etapa, apagadas = auth_repository.purgar_lote(uid, etapa, limite=2)
+    assert apagadas == 2
+    assert auth_repository.get_etapa_purga(uid) == etapa
+    assert _count("SELECT COUNT(*) FROM pesagens p JOIN animais a ON p.animal_id = a.id"
+                  " WHERE a.user_id = %s", (uid,)) == 1
+
+    auth_repository.delete_user_and_data(uid, limite=2)
+
+    assert _count("SELECT COUNT(*) FROM usuarios WHERE id = %s", (uid,)) == 0
+    assert _count("SELECT COUNT(*) FROM purga_tenant WHERE user_id = %s AND concluida_em IS NOT NULL", (uid,)) == 1
+    assert auth_repository.get_purgas_pendentes().count(uid) == 0
+
+
+def test_purga_apaga_derivadas_sem_id_em_lotes(app):
+    """custo_animal_mes e afins não têm coluna id: a etapa apaga por user_id
+    com LIMIT, em vez de deixar a cascata de usuarios levar tudo de uma vez."""
+    uid = _make_user()
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO custo_animal_mes (animal_id, competencia, user_id, valor, dias)"
+        " VALUES (%s, '2024-01-01', %s, 10, 31)",
+        [(aid, uid) for aid in (1, 2, 3)]
+    )
+    conn.commit(); cur.close(); conn.close()
+    auth_repository.desativar_conta(uid)
+
+    etapa = [t for t, _ in auth_repository._ETAPAS_PURGA].index("custo_animal_mes")
+    assert auth_repository.purgar_lote(uid, etapa, limite=2) == (etapa, 2)
+    assert auth_repository.purgar_lote(uid, etapa, limite=2) == (etapa + 1, 1)
+    assert _count("SELECT COUNT(*) FROM custo_animal_mes WHERE user_id = %s", (uid,)) == 0
+
+    auth_repository.delete_user_and_data(uid, limite=2)
+    assert _count("SELECT COUNT(*) FROM usuarios WHERE id = %s", (uid,)) == 0
+
+
 def test_cadastrar_lote_associa_pesagem_ao_animal_correto(um):
     """cadastrar_lote insere animais e pesagens via executemany, mapeando o
     animal_id de volta por brinco — cada pesagem tem que ficar com o animal certo,
@@ -7,7 +7,7 @@ import pytest
 import itertools
 from werkzeug.security import generate_password_hash
 import db_config as dbc
-from repositories import animal_repository, reproducao_repository
+from repositories import animal_repository, genealogia_repository, reproducao_repository
 
 _seq = itertools.count(7000)
 
@@ -40,6 +40,7 @@ def _make_animal(user_id, sexo="M", brinco=None, pai_id=None, mae_id=None):
         (brinco, sexo, user_id, pai_id, mae_id),
     )
     aid = cur.lastrowid
+    genealogia_repository._inserir_genealogia(cur, aid, user_id, pai_id, mae_id)
     cur.execute(
         "INSERT INTO pesagens (animal_id, data_pesagem, peso) VALUES (%s, '2024-01-01', 300)",
         (aid,),
@@ -53,6 +54,9 @@ def _purge(user_id):
     cur = conn.cursor()
     cur.execute("SET FOREIGN_KEY_CHECKS = 0")
     for sql in [
+        "DELETE FROM genealogia WHERE user_id = %s",
+        "DELETE FROM ranking_touros WHERE user_id = %s",
+        "DELETE FROM animal_pesagem_resumo WHERE user_id = %s",
         "DELETE oa FROM ocupacao_animais oa JOIN ocupacoes o ON oa.ocupacao_id = o.id JOIN modulos m ON o.modulo_id = m.id WHERE m.user_id = %s",
         "DELETE o FROM ocupacoes o JOIN modulos m ON o.modulo_id = m.id WHERE m.user_id = %s",
         "DELETE FROM modulos WHERE user_id = %s",
@@ -216,6 +220,36 @@ def test_progenie_isolamento(dois):
     assert filhos == []
 
 
+# ── Ranking de touros (job noturno) ──────────────────────────────────────────
+
+def test_avaliar_touros_encolhe_desvio_pelo_numero_de_filhos():
+    from utils.genetica import avaliar_touros
+    # grupo "a": média 1,0; grupo "b" tem um filho só e não informa nada
+    avaliacao = avaliar_touros([1, 1, 2, 2, 3], ["a", "a", "a", "a", "b"], [1.2, 1.2, 0.8, 0.8, 2.0])
+    assert set(avaliacao) == {1, 2}
+    n, desvio, efeito, acuracia = avaliacao[1]
+    assert (n, desvio) == (2, 0.2)
+    assert 0 < efeito < desvio               # encolhido com poucos filhos
+    assert avaliacao[2][2] == -efeito
+    assert 0 < acuracia < 1
+
+
+def test_recalcular_ranking_touros_ordena_por_efeito_ajustado(um):
+    touro_bom = _make_animal(um, sexo="M")
+    touro_fraco = _make_animal(um, sexo="M")
+    for touro, peso_final in ((touro_bom, 400), (touro_bom, 390), (touro_fraco, 330), (touro_fraco, 340)):
+        filho = _make_animal(um, sexo="M", pai_id=touro)
+        animal_repository.registrar_pesagem(filho, um, "2024-04-10", peso_final)
+
+    with dbc.get_db_cursor() as cursor:
+        assert animal_repository.recalcular_ranking_touros(cursor) >= 2
+
+    ranking = animal_repository.get_ranking_touros(um)
+    assert [r[0] for r in ranking] == [touro_bom, touro_fraco]
+    assert ranking[0][3] == 2 and ranking[0][7] == 2
+    assert float(ranking[0][5]) > 0 > float(ranking[1][5])
+
+
 # ── Histórico reprodutivo (vw_historico_vaca) ─────────────────────────────────
 
 def test_historico_vaca_sem_eventos(um):
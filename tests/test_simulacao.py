@@ -0,0 +1,162 @@
+"""
+Testes da simulação de Monte Carlo do custo da arroba.
+Cálculo: utils.simulacao | Jobs: utils.jobs | Rotas: /api/v1/simulador/monte-carlo, /api/v1/simulador/grade
+"""
+import time
+import pytest
+import itertools
+from werkzeug.security import generate_password_hash
+import db_config as dbc
+from repositories import animal_repository, auth_repository
+from utils import jobs
+from utils.calculo import KG_POR_ARROBA
+from utils.simulacao import grade_custo_arroba, simular_custo_arroba
+
+_seq = itertools.count(18000)
+
+
+def _n():
+    return next(_seq)
+
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"sim_{_n()}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _login(client, uid):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM usuarios WHERE id = %s", (uid,))
+    username = cur.fetchone()[0]
+    cur.close(); conn.close()
+    client.post("/login", data={"username": username, "password": "x"},
+                follow_redirects=True)
+
+
+# ── cálculo (puro) ────────────────────────────────────────────────────────────
+
+def test_sem_variacao_reproduz_o_simulador_deterministico():
+    r = simular_custo_arroba([0.5], 36500.0, 10, 300.0, cenarios=1000, cv_custo=0, cv_preco=0)
+    esperado = 36500.0 / 10 / 365 * KG_POR_ARROBA / 0.5
+    assert list(r['percentis'].values()) == [pytest.approx(esperado)] * 5
+    assert r['prob_lucro'] == (1.0 if 300.0 >= esperado else 0.0)
+
+
+def test_percentis_ordenados_e_probabilidade_entre_zero_e_um():
+    r = simular_custo_arroba([0.4, 0.6, 0.8, 1.0], 50000.0, 100, 150.0, semente=7)
+    p = r['percentis']
+    assert p['p5'] < p['p25'] < p['p50'] < p['p75'] < p['p95']
+    assert 0.0 < r['prob_lucro'] < 1.0
+    assert r['cenarios'] == 100_000
+
+
+def test_gmd_sem_ganho_conta_como_prejuizo():
+    r = simular_custo_arroba([0.0, -0.1], 1000.0, 1, 1e9, cenarios=1000)
+    assert r['prob_lucro'] == 0.0 and r['prob_sem_ganho'] == 1.0
+    assert r['percentis']['p50'] is None
+
+
+def test_100k_cenarios_dentro_do_orcamento():
+    gmds = [0.3 + i / 1000 for i in range(1000)]
+    inicio = time.perf_counter()
+    simular_custo_arroba(gmds, 500000.0, 1000, 300.0, cenarios=100_000)
+    assert time.perf_counter() - inicio < 0.2
+
+
+def test_job_grava_resultado_no_registro(app):
+    uid = _make_user()
+    try:
+        job_id = jobs.executar('soma', uid, lambda a, b: {'total': a + b}, 2, 3)
+        for _ in range(100):
+            estado = jobs.estado(job_id, uid)
+            if estado['status'] in ('pendente', 'executando'):
+                time.sleep(0.02)
+                continue
+            break
+        assert estado == {'tipo': 'soma', 'status': 'concluido', 'progresso': 100,
+                          'resultado': {'total': 5}}
+        assert jobs.estado(job_id, uid + 1) is None  # dono é quem criou
+        assert jobs.estado('inexistente', uid) is None
+    finally:
+        auth_repository.delete_user_and_data(uid)
+
+
+# ── rota ──────────────────────────────────────────────────────────────────────
+
+def test_api_monte_carlo_usa_gmd_do_rebanho(app):
+    uid = _make_user()
+    try:
+        aid = animal_repository.cadastrar_animal(f"MC{_n()}", "M", "2024-01-01", 1000.0, 300.0, uid)
+        animal_repository.registrar_pesagem(aid, uid, "2024-03-01", 330.0)
+        assert animal_repository.get_gmds_rebanho(uid) == [pytest.approx(0.5)]
+        with app.test_client() as client:
+            _login(client, uid)
+            r = client.post("/api/v1/simulador/monte-carlo", data={
+                "qtd_animais": "1", "custo_anual": "3650", "preco_arroba": "300",
+                "cenarios": "10000", "cv_custo": "0", "cv_preco": "0",
+            })
+            assert r.status_code == 200
+            resultado = r.get_json()['resultado']
+            assert resultado['animais_amostrados'] == 1
+            assert resultado['percentis']['p50'] == pytest.approx(10.0 * KG_POR_ARROBA / 0.5)
+
+            r = client.post("/api/v1/simulador/monte-carlo", data={"qtd_animais": "1"})
+            assert r.status_code == 400
+    finally:
+        auth_repository.delete_user_and_data(uid)
+
+
+# ── grade de sensibilidade ────────────────────────────────────────────────────
+
+def test_grade_cobre_o_produto_cartesiano():
+    r = grade_custo_arroba({
+        'qtd_animais': {'de': 10, 'ate': 100, 'passos': 50},
+        'gmd': {'de': 0.0, 'ate': 1.0, 'passos': 50},
+        'arrendamento': 36500.0,
+    })
+    assert r['dimensoes'] == ['qtd_animais', 'gmd']
+    assert len(r['custo_arroba']) == 50 and len(r['custo_arroba'][0]) == 50
+    assert r['fixos']['arrendamento'] == 36500.0
+    # GMD zero não produz arroba; o resto bate com a fórmula do simulador.
+    assert all(linha[0] is None for linha in r['custo_arroba'])
+    qtd, gmd = r['eixos']['qtd_animais'][-1], r['eixos']['gmd'][-1]
+    assert r['custo_arroba'][-1][-1] == pytest.approx(36500.0 / qtd / 365 * KG_POR_ARROBA / gmd, abs=0.01)
+
+
+def test_grade_rejeita_faixa_invalida_e_grade_grande_demais():
+    with pytest.raises(ValueError):
+        grade_custo_arroba({'qtd_animais': {'de': 0, 'ate': 10, 'passos': 5}})
+    with pytest.raises(ValueError):
+        grade_custo_arroba({'gmd': {'de': 0.1, 'ate': 1, 'passos': 500}})
+    with pytest.raises(ValueError):
+        grade_custo_arroba({nome: {'de': 1, 'ate': 2, 'passos': 100}
+                            for nome in ('gmd', 'arrendamento', 'mao_obra')})
+
+
+def test_api_grade_de_sensibilidade(app):
+    uid = _make_user()
+    try:
+        with app.test_client() as client:
+            _login(client, uid)
+            r = client.post("/api/v1/simulador/grade", json={
+                'qtd_animais': 1, 'arrendamento': 3650,
+                'gmd': {'de': 0.5, 'ate': 1.0, 'passos': 2},
+                'mao_obra': {'de': 0, 'ate': 3650, 'passos': 2},
+            })
+            assert r.status_code == 200
+            dados = r.get_json()
+            assert dados['dimensoes'] == ['gmd', 'mao_obra']
+            assert dados['custo_arroba'] == [[600.0, 1200.0], [300.0, 600.0]]
+
+            r = client.post("/api/v1/simulador/grade", json={'gmd': 'x'})
+            assert r.status_code == 400
+    finally:
+        auth_repository.delete_user_and_data(uid)
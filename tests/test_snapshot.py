@@ -0,0 +1,135 @@
+"""
+Testes do retrato diário do rebanho.
+Cálculo: utils.snapshot | Repositório: snapshot_repository | Rota: /api/v1/rebanho/serie
+"""
+import pytest
+import itertools
+from datetime import date, timedelta
+from werkzeug.security import generate_password_hash
+import db_config as dbc
+from repositories import animal_repository, auth_repository, snapshot_repository
+from utils.snapshot import atualizar_snapshots, calcular_snapshots
+
+_seq = itertools.count(17000)
+
+
+def _n():
+    return next(_seq)
+
+
+# ── helpers de banco ──────────────────────────────────────────────────────────
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"snap_{_n()}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _login(client, uid):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM usuarios WHERE id = %s", (uid,))
+    username = cur.fetchone()[0]
+    cur.close(); conn.close()
+    client.post("/login", data={"username": username, "password": "x"},
+                follow_redirects=True)
+
+
+@pytest.fixture
+def um(app):
+    uid = _make_user()
+    yield uid
+    auth_repository.delete_user_and_data(uid)
+
+
+# ── cálculo (puro) ────────────────────────────────────────────────────────────
+
+D = date(2024, 3, 1)
+
+
+def test_snapshot_conta_presentes_e_usa_ultima_pesagem_ate_o_dia():
+    animais = [
+        (1, 'M', D, None, None, 1000),
+        (2, 'F', D, D + timedelta(days=10), D - timedelta(days=100), 800),
+        (3, 'M', D + timedelta(days=5), None, None, 900),
+    ]
+    pesagens = [
+        (1, D, 300.0), (1, D + timedelta(days=20), 320.0),
+        (2, D, 200.0),
+        (3, D + timedelta(days=5), 250.0),
+    ]
+    dia0, dia10, dia20 = calcular_snapshots(
+        animais, pesagens, [D, D + timedelta(days=10), D + timedelta(days=20)])
+
+    # (data, cabecas, machos, femeas, bezerros, pesados, peso_total, peso_medio, gmd, valor)
+    assert dia0 == (D, 2, 1, 1, 1, 2, 500.0, 250.0, None, 1800.0)
+    assert dia10[1:4] == (2, 2, 0)           # fêmea vendida no dia 10 já saiu
+    assert dia10[6] == 550.0                 # animal 1 ainda com 300 kg
+    assert dia20[6] == 570.0 and dia20[8] == 1.0   # (320 - 300) / 20
+
+
+def test_nascido_na_fazenda_entra_pelo_nascimento():
+    animais = [
+        (1, 'F', D, None, None, 1000),
+        (2, 'M', None, None, D + timedelta(days=3), None),   # bezerro da fazenda
+    ]
+    dia0, dia3 = calcular_snapshots(animais, [], [D, D + timedelta(days=3)])
+    assert dia0[1:5] == (1, 0, 1, 0)
+    assert dia3[1:5] == (2, 1, 1, 1)         # cabecas, machos, femeas, bezerros
+    assert dia3[9] == 1000.0
+
+
+def test_snapshot_sem_animais():
+    assert calcular_snapshots([], [], [D]) == [(D, 0, 0, 0, 0, 0, 0.0, None, None, 0.0)]
+
+
+# ── backfill, job e API ───────────────────────────────────────────────────────
+
+def test_backfill_comeca_na_primeira_compra_e_continua_do_ultimo_dia(um):
+    compra = date.today() - timedelta(days=200)
+    aid = animal_repository.cadastrar_animal(f"SN{_n()}", "M", compra.isoformat(), 1000.0, 280.0, um)
+    animal_repository.registrar_pesagem(aid, um, (compra + timedelta(days=100)).isoformat(), 330.0)
+
+    ontem = date.today() - timedelta(days=1)
+    assert atualizar_snapshots(um) == 200
+    assert atualizar_snapshots(um) == 0
+
+    serie = snapshot_repository.get_serie(um, compra, ontem)
+    assert (serie[0][0], serie[-1][0]) == (compra, ontem)
+    assert {r[1] for r in serie} == {1}
+    assert float(serie[-1][8]) == 0.5        # (330 - 280) / 100
+
+
+def test_fazenda_so_com_nascidos_ganha_snapshot(um):
+    nascimento = date.today() - timedelta(days=30)
+    animal_repository.cadastrar_animal(f"SN{_n()}", "F", None, None, 35.0, um,
+                                       data_nascimento=nascimento.isoformat())
+
+    assert atualizar_snapshots(um) == 30
+    serie = snapshot_repository.get_serie(um, nascimento, date.today())
+    assert serie[0][0] == nascimento
+    assert {(r[1], r[4]) for r in serie} == {(1, 1)}   # cabecas, bezerros
+
+
+def test_api_serie_rebanho(app):
+    uid = _make_user()
+    try:
+        compra = date.today() - timedelta(days=30)
+        animal_repository.cadastrar_animal(f"SA{_n()}", "F", compra.isoformat(), 900.0, 250.0, uid)
+        atualizar_snapshots(uid)
+        with app.test_client() as client:
+            _login(client, uid)
+            r = client.get("/api/v1/rebanho/serie?dias=7")
+            assert r.status_code == 200
+            serie = r.get_json()
+            assert len(serie['datas']) == 7
+            assert serie['femeas'] == [1] * 7
+            assert serie['peso_medio'][-1] == 250.0
+    finally:
+        auth_repository.delete_user_and_data(uid)
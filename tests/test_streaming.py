@@ -0,0 +1,132 @@
+"""
+Testes das páginas em streaming (stream_template + fetchmany).
+Helper: utils.streaming | Linhas: db_config.iterar_consulta, animal_repository.iterar_*
+Rotas: /venda-lote, /pesagem-lote, /vacinacao-coletiva
+"""
+import itertools
+import re
+
+from werkzeug.security import generate_password_hash
+
+import db_config as dbc
+from repositories import animal_repository, auth_repository
+from utils.streaming import em_blocos
+
+_seq = itertools.count(25000)
+
+
+def _make_user():
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+        (f"strm_{next(_seq)}", generate_password_hash("x")),
+    )
+    uid = cur.lastrowid
+    conn.commit(); cur.close(); conn.close()
+    return uid
+
+
+def _login(client, uid):
+    conn = dbc.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM usuarios WHERE id = %s", (uid,))
+    username = cur.fetchone()[0]
+    cur.close(); conn.close()
+    client.post("/login", data={"username": username, "password": "x"},
+                follow_redirects=True)
+
+
+def _cadastrar(uid, n):
+    return [animal_repository.cadastrar_animal(f"ST{next(_seq)}", "M", "2024-01-01", 2000.0, 300.0, uid)
+            for _ in range(n)]
+
+
+# ── em_blocos (puro) ──────────────────────────────────────────────────────────
+
+def test_em_blocos_agrupa_e_fecha_o_gerador_de_baixo():
+    fechado = []
+
+    def _pedacos():
+        try:
+            for _ in range(100):
+                yield 'x' * 10
+        finally:
+            fechado.append(True)
+
+    blocos = list(em_blocos(_pedacos(), tamanho=250))
+    assert [len(b) for b in blocos] == [250, 250, 250, 250]
+    assert fechado == [True]
+
+    fechado.clear()
+    parcial = em_blocos(_pedacos(), tamanho=50)
+    next(parcial)
+    parcial.close()  # cliente desconectou no meio
+    assert fechado == [True]
+
+
+# ── iterar_consulta ───────────────────────────────────────────────────────────
+
+def test_iterar_devolve_o_mesmo_que_get_e_solta_a_conexao(app):
+    uid = _make_user()
+    try:
+        _cadastrar(uid, 5)
+        assert list(animal_repository.iterar_animais_ativos(uid)) == animal_repository.get_animais_ativos(uid)
+        assert (list(animal_repository.iterar_animais_com_gmd(uid))
+                == animal_repository.get_animais_com_gmd(uid))
+        # Fechados no meio, com linhas ainda no socket: nada sobra preso.
+        for _ in range(4):
+            linhas = dbc.iterar_consulta("SELECT id FROM animais WHERE user_id = %s", (uid,), tamanho=1)
+            next(linhas)
+            linhas.close()
+        # Streams abertos não tiram conexão do pool (2 nos testes).
+        abertos = [dbc.iterar_consulta("SELECT id FROM animais WHERE user_id = %s", (uid,), tamanho=1)
+                   for _ in range(3)]
+        for linhas in abertos:
+            next(linhas)
+        assert len(animal_repository.get_animais_ativos(uid)) == 5
+        assert len(animal_repository.get_animais_ativos(uid)) == 5
+        for linhas in abertos:
+            assert len([next(linhas)] + list(linhas)) == 4
+    finally:
+        auth_repository.delete_user_and_data(uid)
+
+
+# ── rotas ─────────────────────────────────────────────────────────────────────
+
+def test_paginas_em_lote_saem_em_streaming(app):
+    uid = _make_user()
+    try:
+        _cadastrar(uid, 3)
+        brincos = [r[1] for r in animal_repository.get_animais_ativos(uid)]
+        with app.test_client() as client:
+            _login(client, uid)
+            for url in ("/venda-lote", "/pesagem-lote", "/vacinacao-coletiva"):
+                r = client.get(url)
+                assert r.status_code == 200 and r.is_streamed, url
+                html = r.get_data(as_text=True)
+                assert all(b in html for b in brincos), url
+                assert html.rstrip().endswith('</html>'), url
+    finally:
+        auth_repository.delete_user_and_data(uid)
+
+
+def test_flash_e_csrf_resolvidos_antes_do_corpo(app, monkeypatch):
+    """A sessão sai antes do corpo: o flash não reaparece e o token CSRF da página vale no POST."""
+    uid = _make_user()
+    try:
+        ids = _cadastrar(uid, 2)
+        with app.test_client() as client:
+            _login(client, uid)
+            monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', True)
+            html = client.get("/vacinacao-coletiva").get_data(as_text=True)
+            token = re.search(r'name="csrf_token" value="([^"]+)"', html).group(1)
+            r = client.post("/vacinacao-coletiva", data={
+                'csrf_token': token, 'animais_ids': [str(i) for i in ids],
+                'data_aplicacao': '2024-02-01', 'nome': 'Aftosa', 'custo': '3.5', 'obs': '',
+            })
+            assert r.status_code == 302
+            assert "vacinado(s) com sucesso" in client.get("/vacinacao-coletiva").get_data(as_text=True)
+            assert "vacinado(s) com sucesso" not in client.get("/vacinacao-coletiva").get_data(as_text=True)
+    finally:
+        auth_repository.delete_user_and_data(uid)
@@ -1,13 +1,16 @@
 """
 Sprint 4 — Venda Coletiva.
 Repositório: animal_repository.registrar_venda_lote / get_animais_ativos_com_ultimo_peso
-Rota: /venda-lote
+Sugestão: utils.venda / animal_repository.get_candidatos_venda
+Rota: /venda-lote, /venda-lote/otimizar
 """
 import pytest
 import itertools
+from datetime import date
 from werkzeug.security import generate_password_hash
 import db_config as dbc
-from repositories import animal_repository
+from repositories import animal_repository, auth_repository
+from utils.venda import projetar_pesos, selecionar_venda, sugerir_venda
 
 _seq = itertools.count(8000)
 
@@ -220,3 +223,68 @@ def test_rota_venda_lote_calcula_preco_por_arroba(app):
         assert preco == 4800.0
     finally:
         _purge(uid)
+
+
+# ── sugestão de venda ────────────────────────────────────────────────────────
+
+def test_projetar_pesos_usa_gmd_ate_a_data_da_venda():
+    pesos = projetar_pesos([400.0, 300.0, 350.0], [date(2024, 1, 1)] * 3,
+                           [1.0, None, -0.5], date(2024, 1, 11))
+    assert list(pesos) == [410.0, 300.0, 350.0]
+
+
+def test_selecionar_venda_por_cabecas_e_por_capacidade():
+    pesos = [400.0, 300.0, 500.0, 200.0, 100.0]
+    margens = [400.0, 450.0, 100.0, -5.0, 50.0]
+    # Maiores margens; margem negativa nunca entra.
+    assert list(selecionar_venda(pesos, margens, max_cabecas=2)) == [1, 0]
+    assert list(selecionar_venda(pesos, margens, max_cabecas=10)) == [1, 0, 2, 4]
+    # Capacidade: margem/kg, completando com o que ainda cabe.
+    assert list(selecionar_venda(pesos, margens, max_peso=800)) == [1, 0, 4]
+    assert list(selecionar_venda(pesos, margens, max_peso=650)) == [1, 4]
+    assert list(selecionar_venda(pesos, margens, max_peso=1000, max_cabecas=1)) == [1]
+
+
+def test_sugerir_venda_respeita_peso_minimo():
+    candidatos = [
+        (1, 'A', 450.0, date(2024, 1, 1), 1.0, 1000.0, 200.0),
+        (2, 'B', 300.0, date(2024, 1, 1), None, 1000.0, None),
+    ]
+    r = sugerir_venda(candidatos, '2024-01-31', 300.0, max_cabecas=5, peso_minimo=400)
+    assert [a['id'] for a in r['animais']] == [1]
+    assert r['peso_total'] == 480.0
+    assert r['margem'] == pytest.approx(480.0 / 30 * 300 - 1200.0)
+
+
+def test_sugerir_venda_em_20_mil_cabecas_e_interativo():
+    import time
+    candidatos = [(i, f"B{i}", 250.0 + i % 300, date(2024, 1, 1), 0.1 * (i % 12), 1500.0, 100.0)
+                  for i in range(20000)]
+    inicio = time.perf_counter()
+    r = sugerir_venda(candidatos, '2024-03-01', 300.0, max_peso=18000, max_cabecas=40)
+    assert time.perf_counter() - inicio < 0.5
+    assert r['cabecas'] <= 40 and r['peso_total'] <= 18000
+
+
+def test_rota_venda_lote_otimizar_pre_marca_formulario(app):
+    uid = _make_user()
+    try:
+        leve = animal_repository.cadastrar_animal(f"VL{_n()}", "M", "2024-01-01", 1000.0, 300.0, uid)
+        pesado = animal_repository.cadastrar_animal(f"VL{_n()}", "M", "2024-01-01", 1000.0, 450.0, uid)
+        candidatos = animal_repository.get_candidatos_venda(uid)
+        assert {c[0] for c in candidatos} == {leve, pesado}
+        with app.test_client() as client:
+            _login(client, uid)
+            r = client.get("/venda-lote/otimizar", query_string={
+                'data_venda': '2024-06-01', 'valor_arroba': '300', 'max_cabecas': '1',
+            })
+            assert r.status_code == 200
+            html = r.get_data(as_text=True)
+            assert f'"{pesado}"' in html and f'"{leve}"' not in html.split('_RESTORE')[1]
+
+            r = client.get("/venda-lote/otimizar", query_string={
+                'data_venda': '2024-06-01', 'valor_arroba': '300',
+            })
+            assert r.status_code == 400
+    finally:
+        auth_repository.delete_user_and_data(uid)
@@ -0,0 +1,35 @@
+import logging
+import os
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def _cortes(agora=None, meses_venda=None, dias_lixeira=None):
+    """(corte_venda, corte_lixeira) a partir de ARQUIVO_MESES_VENDA / ARQUIVO_DIAS_LIXEIRA.
+
+    Meses contados como 30 dias — precisão de calendário não importa para arquivamento.
+    corte_venda é date (data_venda é DATE); corte_lixeira é datetime (deleted_at é DATETIME).
+    """
+    agora = agora or datetime.now()
+    if meses_venda is None:
+        meses_venda = int(os.getenv('ARQUIVO_MESES_VENDA', 24))
+    if dias_lixeira is None:
+        dias_lixeira = int(os.getenv('ARQUIVO_DIAS_LIXEIRA', 90))
+    corte_venda = (agora - timedelta(days=30 * meses_venda)).date()
+    corte_lixeira = agora - timedelta(days=dias_lixeira)
+    return corte_venda, corte_lixeira
+
+
+def arquivar_animais_encerrados(app):
+    with app.app_context():
+        try:
+            from repositories.arquivo_repository import arquivar_encerrados
+            corte_venda, corte_lixeira = _cortes()
+            total = arquivar_encerrados(
+                corte_venda, corte_lixeira,
+                limite=int(os.getenv('ARQUIVO_CHUNK', 500)),
+            )
+            logger.info(f"Arquivamento: {total} animais movidos para o arquivo")
+        except Exception as e:
+            logger.error(f"Arquivamento: {e}", exc_info=True)
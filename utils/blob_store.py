@@ -0,0 +1,81 @@
+"""Armazenamento de blobs (PDFs de jobs e do cache de relatórios) atrás de uma interface mínima.
+
+gravar(chave, dados) / ler(chave) / existe(chave) / apagar(chave) /
+listar(prefixo), com chaves no formato de object store ("jobs/<uuid>.pdf").
+Hoje só há o backend em diretório local (BLOB_STORE_DIR); com mais de uma
+réplica ele precisa ser um volume compartilhado. Um backend S3-compatível
+entra implementando os mesmos cinco métodos e sendo escolhido em
+get_blob_store.
+"""
+import os
+import re
+import threading
+
+BLOB_STORE_DIR = os.getenv('BLOB_STORE_DIR', '/tmp/sgg_blobs')
+_CHAVE_RE = re.compile(r'^[A-Za-z0-9_\-]+(/[A-Za-z0-9_\-.]+)*$')
+
+
+class BlobStoreLocal:
+    """Um arquivo por chave sob `diretorio`; escrita atômica (tmp + os.replace)."""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+
+    def _caminho(self, chave):
+        if not _CHAVE_RE.match(chave) or '..' in chave:
+            raise ValueError(f"Chave de blob inválida: {chave!r}")
+        return os.path.join(self.diretorio, *chave.split('/'))
+
+    def gravar(self, chave, dados):
+        caminho = self._caminho(chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tmp = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(dados)
+        os.replace(tmp, caminho)
+
+    def ler(self, chave):
+        """Bytes do blob, ou None se não existe."""
+        try:
+            with open(self._caminho(chave), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def existe(self, chave):
+        return os.path.isfile(self._caminho(chave))
+
+    def apagar(self, chave):
+        try:
+            os.remove(self._caminho(chave))
+        except FileNotFoundError:
+            pass
+
+    def listar(self, prefixo):
+        """(chave, modificado_em) de cada blob sob `prefixo` ("relatorios/7/"); epoch em segundos.
+
+        Gerador: o diretório é percorrido aos poucos. Temporários de gravar em
+        andamento ficam de fora.
+        """
+        for raiz, _, arquivos in os.walk(self._caminho(prefixo.rstrip('/'))):
+            for nome in arquivos:
+                if nome.endswith('.tmp'):
+                    continue
+                caminho = os.path.join(raiz, nome)
+                try:
+                    modificado = os.path.getmtime(caminho)
+                except FileNotFoundError:
+                    continue
+                yield os.path.relpath(caminho, self.diretorio).replace(os.sep, '/'), modificado
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStoreLocal(BLOB_STORE_DIR)
+        return _store
@@ -0,0 +1,146 @@
+"""Índice de busca em memória por tenant (typeahead de /api/v1/busca).
+
+Rótulos de animais (brinco), lotes, pastos e produtos, normalizados (sem
+acento, casefold), em duas estruturas:
+    - array ordenado: prefixo por bisect;
+    - postings de trigramas: "contém" pela interseção das listas do termo,
+      conferida com `in`, e busca aproximada (Dice sobre trigramas) quando
+      nada contém o termo — brinco digitado com um dígito trocado.
+Termos com menos de 3 caracteres só casam por prefixo.
+
+O índice é montado na primeira busca do tenant e refeito quando
+tenant_versao.versao muda (busca_repository.incrementar_versao). Cada worker
+tem o seu; a versão no banco é o que mantém todos coerentes.
+"""
+import bisect
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+
+from repositories import busca_repository
+
+MAX_TENANTS = 64
+SIMILARIDADE_MINIMA = 0.4
+# trigramas presentes em mais que esta fração dos rótulos (e em mais de
+# _TRIGRAMA_COMUM_MINIMO) não discriminam nada na busca aproximada e só custam
+# tempo (ex.: prefixo comum "br0").
+_FRACAO_TRIGRAMA_COMUM = 0.05
+_TRIGRAMA_COMUM_MINIMO = 500
+_CANDIDATOS_CONFERIR = 256
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', (texto or '').strip().casefold())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceBusca:
+    """Índice imutável sobre [(tipo, id, rotulo, detalhe)]."""
+
+    def __init__(self, itens):
+        self.itens = list(itens)
+        self.chaves = [normalizar(item[2]) for item in self.itens]
+        self._ordem = sorted(range(len(self.chaves)), key=self.chaves.__getitem__)
+        self._ordenadas = [self.chaves[i] for i in self._ordem]
+        self._rank = [0] * len(self._ordem)
+        for r, i in enumerate(self._ordem):
+            self._rank[i] = r
+        self._postings = {}
+        for pos, chave in enumerate(self.chaves):
+            for tri in _trigramas(chave):
+                self._postings.setdefault(tri, []).append(pos)
+
+    def _do_tipo(self, pos, tipo):
+        return tipo is None or self.itens[pos][0] == tipo
+
+    def _prefixo(self, termo, limite, tipo=None):
+        achados = []
+        for r in range(bisect.bisect_left(self._ordenadas, termo), len(self._ordenadas)):
+            if len(achados) >= limite or not self._ordenadas[r].startswith(termo):
+                break
+            if self._do_tipo(self._ordem[r], tipo):
+                achados.append(self._ordem[r])
+        return achados
+
+    def _contem(self, termo, tipo=None):
+        listas = sorted((self._postings.get(t, ()) for t in _trigramas(termo)), key=len)
+        if not listas[0]:
+            return []
+        # com poucos candidatos, conferir `in` sai mais barato que varrer as
+        # listas longas restantes (trigramas comuns como "br0").
+        candidatos = set(listas[0])
+        for lista in listas[1:]:
+            if len(candidatos) <= _CANDIDATOS_CONFERIR:
+                break
+            candidatos.intersection_update(lista)
+        return sorted((p for p in candidatos if termo in self.chaves[p] and self._do_tipo(p, tipo)),
+                      key=self._rank.__getitem__)
+
+    def _aproximado(self, termo, limite, tipo=None):
+        tris = _trigramas(termo)
+        teto = max(_TRIGRAMA_COMUM_MINIMO, int(len(self.chaves) * _FRACAO_TRIGRAMA_COMUM))
+        contagem = Counter()
+        for t in tris:
+            lista = self._postings.get(t, ())
+            if len(lista) <= teto:
+                contagem.update(lista)
+        pontuados = []
+        for pos, comuns in contagem.items():
+            dice = 2.0 * comuns / (len(tris) + max(len(self.chaves[pos]) - 2, 1))
+            if dice >= SIMILARIDADE_MINIMA and self._do_tipo(pos, tipo):
+                pontuados.append((-dice, self._rank[pos], pos))
+        pontuados.sort()
+        return [pos for _, _, pos in pontuados[:limite]]
+
+    def buscar(self, termo, limite=10, tipo=None):
+        """Itens por relevância: prefixo, depois "contém", depois aproximados.
+
+        `termo` já normalizado (normalizar()); `tipo` restringe a um tipo de item.
+        """
+        if not termo or not self.chaves:
+            return []
+        achados = self._prefixo(termo, limite, tipo)
+        if len(termo) >= 3 and len(achados) < limite:
+            vistos = set(achados)
+            contem = [p for p in self._contem(termo, tipo) if p not in vistos]
+            achados += contem[:limite - len(achados)]
+            if not achados:
+                achados = self._aproximado(termo, limite, tipo)
+        return [self.itens[p] for p in achados]
+
+
+_indices = OrderedDict()  # user_id -> (versao, IndiceBusca), LRU
+_lock = threading.Lock()
+
+
+def get_indice(user_id):
+    """Índice do tenant, refeito se a versão no banco mudou.
+
+    A versão é lida antes dos itens: uma escrita no meio deixa o índice com
+    dados mais novos que a versão anotada, e ele só é refeito à toa uma vez.
+    """
+    versao = busca_repository.get_versao(user_id)
+    with _lock:
+        atual = _indices.get(user_id)
+        if atual and atual[0] == versao:
+            _indices.move_to_end(user_id)
+            return atual[1]
+    indice = IndiceBusca(busca_repository.get_itens_busca(user_id))
+    with _lock:
+        _indices[user_id] = (versao, indice)
+        _indices.move_to_end(user_id)
+        while len(_indices) > MAX_TENANTS:
+            _indices.popitem(last=False)
+    return indice
+
+
+def buscar(user_id, termo, limite=10, tipo=None):
+    """[(tipo, id, rotulo, detalhe)] do tenant que casam com `termo`."""
+    termo = normalizar(termo)
+    if not termo:
+        return []
+    return get_indice(user_id).buscar(termo, limite, tipo)
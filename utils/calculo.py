@@ -1,6 +1,45 @@
 KG_POR_ARROBA = 30
 
+# Unidade Animal: bovino de 450 kg de peso vivo
+KG_POR_UA = 450
+
 
 def preco_por_arroba(peso_kg, valor_arroba):
     """Preço de compra/venda a partir do peso vivo e valor da arroba, arredondado a centavos."""
     return round((peso_kg / KG_POR_ARROBA) * valor_arroba, 2)
+
+
+def peso_interpolado(pesagens, dia):
+    """Peso no `dia` por interpolação linear entre as pesagens vizinhas.
+
+    pesagens: [(data, peso)] ordenada por data. Sem extrapolação — fora do
+    intervalo [primeira, última] pesagem retorna None.
+    """
+    anterior = None
+    for data, peso in pesagens:
+        if data == dia:
+            return float(peso)
+        if data > dia:
+            if anterior is None:
+                return None
+            d0, p0 = anterior
+            frac = (dia - d0).days / (data - d0).days
+            return float(p0) + (float(peso) - float(p0)) * frac
+        anterior = (data, peso)
+    return None
+
+
+def ganho_na_janela(pesagens, inicio, fim):
+    """(ganho_kg, dias) do animal dentro de [inicio, fim], interpolando nas bordas.
+
+    A janela é recortada ao intervalo coberto por pesagens (sem extrapolar
+    antes da primeira nem depois da última). None se sobrar menos de 1 dia.
+    """
+    if not pesagens:
+        return None
+    ini = max(inicio, pesagens[0][0])
+    fim = min(fim, pesagens[-1][0])
+    dias = (fim - ini).days
+    if dias < 1:
+        return None
+    return peso_interpolado(pesagens, fim) - peso_interpolado(pesagens, ini), dias
@@ -0,0 +1,131 @@
+"""Municípios do IBGE em memória: busca por prefixo por UF e payload por UF.
+
+A lista vem de data/municipios.json (snapshot gerado no build por
+scripts/atualizar_municipios.py), lida uma vez por worker — funciona sem
+rede. Sem snapshot, usa a função de fallback (IBGE ao vivo); se ela também
+falhar, tenta de novo depois de _ESPERA_FALLBACK segundos.
+
+Índice por UF (e um para todas): lista ordenada de (chave, posição), com uma
+chave por início de palavra do nome sem acento — "paulo" acha "São Paulo",
+mas nomes que começam com o termo vêm antes. O JSON completo de cada UF é
+montado e comprimido (gzip) na carga, com ETag forte do conteúdo.
+"""
+import bisect
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from utils.busca import normalizar
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'data', 'municipios.json')
+_ESPERA_FALLBACK = 5 * 60
+
+
+class IndiceCidades:
+    """Índice imutável sobre [{'nome', 'uf'}]."""
+
+    def __init__(self, cidades):
+        self.cidades = sorted(
+            ({'nome': c['nome'], 'uf': c['uf'].upper()} for c in cidades),
+            key=lambda c: (normalizar(c['nome']), c['uf'])
+        )
+        self._chaves = {}  # uf ('' = todas) -> [(chave, posicao)]
+        for pos, cidade in enumerate(self.cidades):
+            nome = normalizar(cidade['nome'])
+            inicios = [0] + [i + 1 for i, ch in enumerate(nome) if ch in ' -\'']
+            for inicio in inicios:
+                if inicio < len(nome):
+                    chave = (nome[inicio:], pos)
+                    self._chaves.setdefault('', []).append(chave)
+                    self._chaves.setdefault(cidade['uf'], []).append(chave)
+        for lista in self._chaves.values():
+            lista.sort()
+
+        self.payloads = {}  # uf -> (json_bytes, gzip_bytes, etag)
+        por_uf = {}
+        for cidade in self.cidades:
+            por_uf.setdefault(cidade['uf'], []).append(cidade['nome'])
+        for uf, nomes in por_uf.items():
+            corpo = json.dumps({'uf': uf, 'cidades': nomes}, ensure_ascii=False,
+                               separators=(',', ':')).encode('utf-8')
+            etag = hashlib.sha256(corpo).hexdigest()[:32]
+            self.payloads[uf] = (corpo, gzip.compress(corpo, compresslevel=9, mtime=0), etag)
+
+    def buscar(self, termo, uf=None, limite=10):
+        """Cidades cujo nome (ou uma palavra dele) começa com `termo`."""
+        termo = normalizar(termo)
+        chaves = self._chaves.get((uf or '').upper(), [])
+        if not termo or not chaves:
+            return []
+        inicio = bisect.bisect_left(chaves, (termo,))
+        no_inicio, no_meio, vistos = [], [], set()
+        for chave, pos in chaves[inicio:]:
+            if not chave.startswith(termo):
+                break
+            if pos in vistos:
+                continue
+            vistos.add(pos)
+            nome = normalizar(self.cidades[pos]['nome'])
+            (no_inicio if nome.startswith(termo) else no_meio).append(pos)
+            if len(no_inicio) >= limite:
+                break
+        return [self.cidades[p] for p in sorted(no_inicio)[:limite] + sorted(no_meio)][:limite]
+
+
+_indice = None
+_proxima_tentativa = 0.0
+_buscando = False
+_lock = threading.Lock()
+
+
+def _ler_snapshot():
+    try:
+        with open(SNAPSHOT, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.error(f"Snapshot de municípios ilegível ({SNAPSHOT}): {e}")
+        return None
+
+
+def get_indice(fallback=None):
+    """Índice do worker; `fallback()` -> [{'nome', 'uf'}] quando não há snapshot.
+
+    O fallback roda fora de _lock, numa thread só: as demais seguem com o
+    índice vazio em vez de esperar o IBGE, e o índice pronto entra no lugar.
+    """
+    global _indice, _proxima_tentativa, _buscando
+    if _indice is not None:
+        return _indice
+    with _lock:
+        if _indice is not None:
+            return _indice
+        cidades = _ler_snapshot()
+        if cidades is not None:
+            _indice = IndiceCidades(cidades)
+            return _indice
+        if not fallback or _buscando or time.time() < _proxima_tentativa:
+            return IndiceCidades([])
+        _buscando = True
+
+    novo = None
+    try:
+        cidades = fallback() or None
+        if cidades is not None:
+            novo = IndiceCidades(cidades)
+    finally:
+        with _lock:
+            _buscando = False
+            if novo is not None:
+                _indice = novo
+            else:
+                _proxima_tentativa = time.time() + _ESPERA_FALLBACK
+    return novo or IndiceCidades([])
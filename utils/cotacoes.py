@@ -0,0 +1,179 @@
+"""Cotações da arroba: feed do scraper, histórico diário e preço regional.
+
+buscar_cotacoes lê o feed (boi e novilha de hoje, por praça) com cache de 30
+minutos em memória — é o que os widgets de /cotacoes-* mostram. O job diário
+grava o feed em cotacoes_historico, de onde sai o preço usado no valor de
+mercado do rebanho: média das praças da UF da fazenda (configuracoes
+.cidade_estado, "Cidade-UF"), ou a média nacional se a UF não tem praça.
+Machos valem pela cotação do boi, fêmeas pela da novilha.
+"""
+import logging
+import threading
+import time
+from datetime import date
+
+import requests
+
+from utils.calculo import KG_POR_ARROBA
+
+logger = logging.getLogger(__name__)
+
+CATEGORIAS = ('boi', 'novilha')
+_BASE_FEED = "https://raw.githubusercontent.com/dom1ng0s/gado-scraper/main"
+
+# ── Cache do feed (TTL 30 min) ──────────────────────────────────────────────
+_COTACOES_TTL = 30 * 60
+_cotacoes_lock = threading.Lock()
+_cotacoes_cache: dict = {'ts': 0.0, 'boi': [], 'novilha': []}
+
+# ── Mapa completo UF → nome (todos os 27 estados) ───────────────────────────
+MAPA_ESTADOS = {
+    'AC': 'Acre',               'AL': 'Alagoas',            'AP': 'Amapá',
+    'AM': 'Amazonas',           'BA': 'Bahia',              'CE': 'Ceará',
+    'DF': 'Distrito Federal',   'ES': 'Espírito Santo',     'GO': 'Goiás',
+    'MA': 'Maranhão',           'MT': 'Mato Grosso',        'MS': 'Mato Grosso do Sul',
+    'MG': 'Minas Gerais',       'PA': 'Pará',               'PB': 'Paraíba',
+    'PR': 'Paraná',             'PE': 'Pernambuco',         'PI': 'Piauí',
+    'RJ': 'Rio de Janeiro',     'RN': 'Rio Grande do Norte','RS': 'Rio Grande do Sul',
+    'RO': 'Rondônia',           'RR': 'Roraima',            'SC': 'Santa Catarina',
+    'SP': 'São Paulo',          'SE': 'Sergipe',            'TO': 'Tocantins',
+}
+
+
+def buscar_cotacoes() -> tuple[list, list]:
+    """Retorna (boi, novilha) com cache em memória de 30 minutos."""
+    now = time.time()
+    with _cotacoes_lock:
+        if now - _cotacoes_cache['ts'] < _COTACOES_TTL:
+            return _cotacoes_cache['boi'], _cotacoes_cache['novilha']
+
+    def _get(endpoint: str) -> list:
+        try:
+            r = requests.get(f"{_BASE_FEED}/{endpoint}", timeout=5)
+            if r.status_code != 200:
+                return []
+            dados = r.json()
+            return dados if isinstance(dados, list) else []
+        except Exception:
+            return []
+
+    boi = _get("cotacoes_boi_hoje.json")
+    novilha = _get("cotacoes_novilha_hoje.json")
+
+    if boi or novilha:
+        with _cotacoes_lock:
+            _cotacoes_cache.update({'ts': now, 'boi': boi, 'novilha': novilha})
+
+    return boi, novilha
+
+
+def uf_da_fazenda(cidade_estado):
+    """'Ribeirão Preto-SP' -> 'SP'; None se não configurado."""
+    if not cidade_estado:
+        return None
+    partes = cidade_estado.split('-')
+    return partes[-1].strip().upper() if len(partes) > 1 else None
+
+
+def da_uf(praca, uf):
+    """A praça ("SP Araçatuba", "SP", "São Paulo") é da UF?"""
+    praca = (praca or '').upper()
+    nome_completo = MAPA_ESTADOS.get(uf, '')
+    return praca.startswith(uf) or praca == uf or bool(nome_completo and praca == nome_completo.upper())
+
+
+def filtrar_por_uf(itens, uf):
+    return [item for item in itens if da_uf(item.get('praca', ''), uf)]
+
+
+def preco_regional(linhas, uf):
+    """{categoria: preço} de [(categoria, praca, preco)] — média da UF, senão nacional."""
+    precos = {}
+    for categoria in CATEGORIAS:
+        todos = [float(p) for c, _, p in linhas if c == categoria]
+        regionais = [float(p) for c, praca, p in linhas if c == categoria and uf and da_uf(praca, uf)]
+        base = regionais or todos
+        precos[categoria] = round(sum(base) / len(base), 2) if base else None
+    return precos
+
+
+def precos_por_data(historico, uf):
+    """{data: {categoria: preço}} a partir de cotacao_repository.get_historico."""
+    por_data = {}
+    for data, categoria, praca, preco in historico:
+        por_data.setdefault(data, []).append((categoria, praca, preco))
+    return {data: preco_regional(linhas, uf) for data, linhas in por_data.items()}
+
+
+def categoria_do_sexo(sexo):
+    return 'boi' if sexo == 'M' else 'novilha'
+
+
+def valor_de_mercado(grupos, precos):
+    """Valor do rebanho a preço de mercado, ou None sem cotação.
+
+    grupos: animal_repository.get_peso_rebanho_por_sexo; precos: preco_regional.
+    Peso / KG_POR_ARROBA x cotação da categoria (a outra, se faltar uma);
+    animais sem pesagem entram pelo preço de compra.
+    """
+    if not any(precos.values()):
+        return None
+    total = 0.0
+    for sexo, _, _, peso_total, compra_nao_pesados in grupos:
+        categoria = categoria_do_sexo(sexo)
+        preco = precos.get(categoria) or next(p for p in precos.values() if p)
+        total += float(peso_total) / KG_POR_ARROBA * preco + float(compra_nao_pesados)
+    return round(total, 2)
+
+
+def serie_valor_mercado(snapshots, precos):
+    """Valor a mercado por dia de rebanho_snapshot_diario (None antes da 1ª cotação).
+
+    snapshots: snapshot_repository.get_serie; precos: precos_por_data. Vale a
+    última cotação até o dia; sem o peso por sexo no retrato, a @ é a média
+    de boi e novilha ponderada por machos e fêmeas.
+    """
+    datas_cotacao = sorted(precos)
+    valores, i, vigente = [], 0, None
+    for snap in snapshots:
+        data, machos, femeas, peso_total = snap[0], snap[2], snap[3], snap[6]
+        while i < len(datas_cotacao) and datas_cotacao[i] <= data:
+            vigente = precos[datas_cotacao[i]]
+            i += 1
+        if not vigente or not any(vigente.values()):
+            valores.append(None)
+            continue
+        boi = vigente['boi'] or vigente['novilha']
+        novilha = vigente['novilha'] or vigente['boi']
+        cabecas = machos + femeas
+        preco = (machos * boi + femeas * novilha) / cabecas if cabecas else boi
+        valores.append(round(float(peso_total) / KG_POR_ARROBA * preco, 2))
+    return valores
+
+
+def _linhas_do_feed(boi, novilha):
+    linhas = []
+    for categoria, itens in (('boi', boi), ('novilha', novilha)):
+        for item in itens:
+            try:
+                preco = float(item.get('preco_vista'))
+            except (TypeError, ValueError):
+                continue
+            praca = str(item.get('praca') or '').strip()[:100]
+            if praca and preco > 0:
+                linhas.append((categoria, praca, preco))
+    return linhas
+
+
+def gravar_cotacoes_diarias(app):
+    """Job diário: grava o feed do dia em cotacoes_historico."""
+    with app.app_context():
+        try:
+            from repositories import cotacao_repository
+            gravadas = cotacao_repository.gravar_cotacoes(date.today(), _linhas_do_feed(*buscar_cotacoes()))
+            if gravadas:
+                logger.info(f"Cotações do dia: {gravadas} praças/categorias gravadas")
+            else:
+                logger.warning("Cotações do dia: feed vazio, nada gravado")
+        except Exception as e:
+            logger.error(f"Cotações do dia: {e}", exc_info=True)
@@ -0,0 +1,76 @@
+"""Rateio dos custos operacionais por animal-dia, fechado mês a mês.
+
+Cada competência (mês de data_custo) tem seu total de custos operacionais
+dividido entre os animais presentes no mês, na proporção dos dias de
+presença: entrada em data_compra, ou data_nascimento para quem nasceu na
+fazenda (conta o dia), saída em data_venda (não conta). O resultado vai para custo_animal_mes, e o razão custo_animal guarda
+o acumulado por animal — detalhes do animal e lote_resultado leem o custo
+operacional exato por chave, sem redistribuir o ano inteiro a cada request.
+
+O job mensal fecha o mês anterior de todas as fazendas; custo lançado num mês
+já fechado refaz aquele mês na mesma transação (financeiro_repository).
+"""
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def competencia_de(data):
+    """Primeiro dia do mês de `data` (date ou 'YYYY-MM-DD')."""
+    if not isinstance(data, date):
+        data = date.fromisoformat(str(data)[:10])
+    return data.replace(day=1)
+
+
+def fim_competencia(competencia):
+    """Último dia do mês da competência."""
+    proximo = (competencia.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return proximo - timedelta(days=1)
+
+
+def ratear(entradas, saidas, inicio, fim, total):
+    """(dias, valores) por animal: `total` rateado pelos dias presentes em [inicio, fim].
+
+    entradas/saidas: listas de date alinhadas por animal; saída None = ainda
+    no rebanho. Valores arredondados a centavos, com o resíduo no animal de
+    mais dias para que a soma feche com `total`.
+    """
+    n = len(entradas)
+    if not n:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    limite = fim + timedelta(days=1)
+    ent = np.array(entradas, dtype='datetime64[D]')
+    sai = np.array([s if s is not None else limite for s in saidas], dtype='datetime64[D]')
+    dias = (np.minimum(sai, np.datetime64(limite, 'D'))
+            - np.maximum(ent, np.datetime64(inicio, 'D'))).astype(np.int64)
+    dias = np.clip(dias, 0, None)
+    animal_dias = int(dias.sum())
+    if not animal_dias:
+        return dias, np.zeros(n)
+    valores = np.round(total * dias / animal_dias, 2)
+    maior = int(np.argmax(dias))
+    valores[maior] = round(valores[maior] + total - float(valores.sum()), 2)
+    return dias, valores
+
+
+def fechar_custos_mes_anterior(app):
+    """Job mensal: fecha a competência anterior de cada fazenda com custo lançado."""
+    with app.app_context():
+        try:
+            from db_config import get_db_cursor
+            from repositories import kpi_repository
+            from repositories.financeiro_repository import (
+                fechar_competencia, get_usuarios_com_custos,
+            )
+            competencia = competencia_de(date.today().replace(day=1) - timedelta(days=1))
+            usuarios = get_usuarios_com_custos(competencia)
+            for user_id in usuarios:
+                with get_db_cursor() as cursor:
+                    fechar_competencia(cursor, user_id, competencia)
+                    kpi_repository.incrementar_versao(cursor, user_id)
+            logger.info(f"Fechamento de custos {competencia:%m/%Y}: {len(usuarios)} fazendas")
+        except Exception as e:
+            logger.error(f"Fechamento de custos: {e}", exc_info=True)
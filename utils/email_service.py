@@ -4,6 +4,7 @@ import os
 import logging
 from html import escape as _esc
 from urllib.parse import quote as _quote
+from email.mime.application import MIMEApplication
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -88,6 +89,36 @@ def _get_smtp_config():
     }
 
 
+def configurado() -> bool:
+    cfg = _get_smtp_config()
+    return bool(cfg['user'] and cfg['pwd'])
+
+
+def _montar(cfg, to_email: str, subject: str, html: str, anexos=()):
+    """MIME do email: só HTML, ou HTML + anexos [(nome_arquivo, bytes)] (PDF)."""
+    msg = MIMEMultipart('mixed' if anexos else 'alternative')
+    msg['Subject'] = subject
+    msg['From'] = cfg['from']
+    msg['To'] = to_email
+    msg.attach(MIMEText(html, 'html'))
+    for nome, dados in anexos:
+        parte = MIMEApplication(dados, _subtype='pdf')
+        parte.add_header('Content-Disposition', 'attachment', filename=nome)
+        msg.attach(parte)
+    return msg
+
+
+def _conectar(cfg):
+    s = smtplib.SMTP(cfg['server'], cfg['port'], timeout=10)
+    try:
+        s.ehlo(); s.starttls(context=ssl.create_default_context())
+        s.login(cfg['user'], cfg['pwd'])
+    except Exception:
+        s.close()
+        raise
+    return s
+
+
 def _send(to_email: str, subject: str, html: str, required: bool = False) -> None:
     """Envia um email HTML. Se `required`, ausência de config levanta RuntimeError
     (caminhos síncronos como reset de senha precisam que o chamador saiba que falhou);
@@ -98,18 +129,47 @@ def _send(to_email: str, subject: str, html: str, required: bool = False) -> Non
             raise RuntimeError("MAIL_USERNAME e MAIL_PASSWORD não configurados no .env")
         logger.debug("MAIL não configurado — alerta ignorado.")
         return
-    msg = MIMEMultipart('alternative')
-    msg['Subject'] = subject
-    msg['From'] = cfg['from']
-    msg['To'] = to_email
-    msg.attach(MIMEText(html, 'html'))
-    ctx = ssl.create_default_context()
-    with smtplib.SMTP(cfg['server'], cfg['port'], timeout=10) as s:
-        s.ehlo(); s.starttls(context=ctx)
-        s.login(cfg['user'], cfg['pwd'])
+    msg = _montar(cfg, to_email, subject, html)
+    with _conectar(cfg) as s:
         s.sendmail(cfg['from'], to_email, msg.as_string())
 
 
+def _send_lote(mensagens) -> dict:
+    """Envia [(to_email, subject, html, anexos)] reaproveitando uma conexão SMTP.
+
+    Uma falha não para o lote; se derrubar a conexão, a próxima mensagem
+    reconecta. Retorna {índice: erro} das que não foram aceitas.
+    """
+    cfg = _get_smtp_config()
+    if not cfg['user'] or not cfg['pwd']:
+        raise RuntimeError("MAIL_USERNAME e MAIL_PASSWORD não configurados no .env")
+    falhas = {}
+    s = None
+    try:
+        for i, (to_email, subject, html, anexos) in enumerate(mensagens):
+            try:
+                if s is None:
+                    s = _conectar(cfg)
+                s.sendmail(cfg['from'], to_email, _montar(cfg, to_email, subject, html, anexos).as_string())
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                falhas[i] = str(e)
+            except Exception as e:
+                falhas[i] = str(e)
+                if s is not None:
+                    try:
+                        s.close()
+                    except Exception:
+                        pass
+                    s = None
+    finally:
+        if s is not None:
+            try:
+                s.quit()
+            except Exception:
+                pass
+    return falhas
+
+
 # ── Alertas proativos ──────────────────────────────────────────────────────
 
 def send_alert_contas(to_email: str, contas: list) -> None:
@@ -333,3 +393,34 @@ def send_reset_code(to_email: str, code: str) -> None:
     </html>
     """
     _send(to_email, 'Código de Verificação — SGG Sistema de Gado', html, required=True)
+
+
+# ── Relatório mensal (lote) ────────────────────────────────────────────────
+
+def send_relatorios_mensais(envios: list, mes: str) -> dict:
+    """envios: [(to_email, nome_fazenda, pdf_bytes)] do mês `mes` ("09/2026").
+
+    Um lote, uma conexão SMTP. Retorna {índice: erro} dos que falharam.
+    """
+    mensagens = []
+    for to_email, nome_fazenda, pdf in envios:
+        fazenda = _esc(nome_fazenda or 'sua fazenda')
+        html = f"""
+    <html><body style="font-family:'DM Sans',sans-serif;background:#EAF3DE;padding:32px;">
+      <table width="520" style="background:#fff;border-radius:10px;overflow:hidden;margin:0 auto;">
+        <tr><td style="background:#3B6D11;padding:20px 28px;">
+          <p style="margin:0;color:#fff;font-size:18px;font-weight:600;">SGG — Relatório Mensal</p>
+        </td></tr>
+        <tr><td style="padding:28px;">
+          <p style="margin:0 0 16px;color:#1C1C1A;">
+            Segue em anexo o relatório do rebanho de <strong>{fazenda}</strong>, fechamento de {mes}.
+          </p>
+          <p style="margin:0;color:#888780;font-size:13px;">
+            Para deixar de receber, desmarque a opção em Configurações no SGG.
+          </p>
+        </td></tr>
+      </table>
+    </body></html>"""
+        mensagens.append((to_email, f'SGG — Relatório do rebanho {mes}', html,
+                          [(f"relatorio_rebanho_{mes.replace('/', '-')}.pdf", pdf)]))
+    return _send_lote(mensagens)
@@ -0,0 +1,116 @@
+"""Parentesco e endogamia pelo método tabular (matriz de parentesco aditivo A).
+
+Para um pedigree ordenado com pais antes dos filhos:
+    A[i, i] = 1 + A[s, d] / 2
+    A[i, j] = A[j, i] = (A[j, s] + A[j, d]) / 2   para j < i
+com pai/mãe desconhecido contribuindo 0. O coeficiente de endogamia do
+animal é F = A[i, i] - 1; o de um acasalamento planejado (touro x vaca) é o
+do filho hipotético, A[touro, vaca] / 2.
+
+O pedigree vem de genealogia_repository.get_pedigree — só os ancestrais dos
+animais envolvidos, então a matriz fica pequena mesmo em rebanhos grandes.
+"""
+import numpy as np
+
+
+def ordenar_pedigree(pedigree):
+    """Ordena [(id, pai_id, mae_id)] com pais antes dos filhos.
+
+    Pais fora do pedigree são tratados como desconhecidos (None).
+    """
+    pais = {aid: (pai, mae) for aid, pai, mae in pedigree}
+    ordem, visitados = [], set()
+    for raiz in pais:
+        pilha = [(raiz, False)]
+        while pilha:
+            aid, expandido = pilha.pop()
+            if expandido:
+                ordem.append(aid)
+                continue
+            if aid in visitados:
+                continue
+            visitados.add(aid)
+            pilha.append((aid, True))
+            for p in pais[aid]:
+                if p in pais and p not in visitados:
+                    pilha.append((p, False))
+    return [(aid, *(p if p in pais else None for p in pais[aid])) for aid in ordem]
+
+
+def matriz_parentesco(pedigree):
+    """(indice, A): indice mapeia animal_id -> linha/coluna de A."""
+    ordenado = ordenar_pedigree(pedigree)
+    indice = {aid: i for i, (aid, _, _) in enumerate(ordenado)}
+    n = len(ordenado)
+    A = np.zeros((n, n))
+    for i, (_, pai, mae) in enumerate(ordenado):
+        s = indice.get(pai)
+        d = indice.get(mae)
+        A[i, i] = 1.0 + (A[s, d] / 2.0 if s is not None and d is not None else 0.0)
+        if i:
+            linha = np.zeros(i)
+            if s is not None:
+                linha += A[:i, s]
+            if d is not None:
+                linha += A[:i, d]
+            A[i, :i] = A[:i, i] = linha / 2.0
+    return indice, A
+
+
+def endogamia_acasalamentos(pedigree, pares):
+    """F do filho de cada (touro_id, vaca_id), na ordem de `pares`."""
+    indice, A = matriz_parentesco(pedigree)
+    resultado = []
+    for touro_id, vaca_id in pares:
+        s, d = indice.get(touro_id), indice.get(vaca_id)
+        resultado.append(round(A[s, d] / 2.0, 4) if s is not None and d is not None else 0.0)
+    return resultado
+
+
+# ---- AVALIAÇÃO DE TOUROS POR GRUPO CONTEMPORÂNEO ----
+
+HERDABILIDADE_GMD = 0.3
+
+
+def grupo_contemporaneo(user_id, data_ref, sexo, lote_id):
+    """Chave do grupo: fazenda x estação de nascimento (ano/semestre) x sexo x lote."""
+    estacao = (data_ref.year, 1 if data_ref.month <= 6 else 2) if data_ref else None
+    return (user_id, estacao, sexo, lote_id or 0)
+
+
+def avaliar_touros(touros, grupos, gmds, h2=HERDABILIDADE_GMD):
+    """Efeito de touro (modelo de touro simplificado), vetorizado.
+
+    touros: ids (int) e grupos: chaves hashable, um por filho; gmds: floats.
+    Cada filho vira um desvio em relação à média do seu grupo contemporâneo
+    (grupos com um único filho não informam nada e são descartados). O efeito
+    do touro é a média dos desvios encolhida por n / (n + k), k = (4 - h2) / h2;
+    a acurácia é sqrt(n / (n + k)).
+
+    Retorna {touro: (filhos_avaliados, desvio_medio, efeito, acuracia)}.
+    """
+    if not len(gmds):
+        return {}
+    gmds = np.asarray(gmds, dtype=float)
+    codigos = {}
+    g_idx = np.array([codigos.setdefault(g, len(codigos)) for g in grupos])
+    tam_grupo = np.bincount(g_idx)
+    media_grupo = np.bincount(g_idx, weights=gmds) / tam_grupo
+    informativo = tam_grupo[g_idx] > 1
+    desvios = (gmds - media_grupo[g_idx])[informativo]
+
+    chaves_touro = [t for t, ok in zip(touros, informativo) if ok]
+    if not chaves_touro:
+        return {}
+    ids_touro, t_idx = np.unique(np.array(chaves_touro), return_inverse=True)
+    n = np.bincount(t_idx).astype(float)
+    desvio_medio = np.bincount(t_idx, weights=desvios) / n
+    k = (4.0 - h2) / h2
+    confiabilidade = n / (n + k)
+    efeito = desvio_medio * confiabilidade
+    acuracia = np.sqrt(confiabilidade)
+    return {
+        ids_touro[i].item(): (int(n[i]), round(float(desvio_medio[i]), 3),
+                              round(float(efeito[i]), 3), round(float(acuracia[i]), 3))
+        for i in range(len(ids_touro))
+    }
@@ -0,0 +1,266 @@
+"""Trabalhos em segundo plano com estado no banco, visível a todas as réplicas.
+
+Para cálculos que não cabem no tempo de uma request (PDF, simulações
+grandes): `executar` registra o job em `jobs` (job_repository) com dono e
+prazo, roda a função numa thread daemon e grava o resultado ao terminar —
+JSON na própria linha, ou bytes no blob store (utils.blob_store). O polling
+pode cair em qualquer worker ou container. Quem já tem o resultado guardado
+(cache de PDF, utils.relatorio) devolve BlobPronto, ou nem roda: `concluido`
+cria o job pronto.
+
+A função informa o avanço com progresso(percentual). Cada transição e cada
+percentual é gravado e avisado pelo pub/sub (utils.pubsub, canal job:<id>);
+acompanhar() é o que o SSE e o long polling de routes.api consomem.
+
+Enquanto a função roda, uma segunda thread atualiza heartbeat_em a cada
+HEARTBEAT_SEG. O job de manutenção (manter_jobs, no scheduler) marca como
+erro quem ficou sem heartbeat (processo morto no meio) e apaga os expirados
+junto com seus blobs — só os do prefixo jobs/; blobs compartilhados têm dono
+próprio. Depois recolhe os órfãos: blobs de jobs/ e relatorios/ que nenhuma
+linha de jobs ou relatorio_cache aponta há mais de ORFAO_APOS_SEG (queda
+entre gravar o blob e registrá-lo, despejo do cache interrompido).
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+
+from repositories import job_repository
+from utils.blob_store import get_blob_store
+from utils.pubsub import get_pubsub
+
+logger = logging.getLogger(__name__)
+
+MAX_IDADE = 3600        # 1h — resultados não buscados viram lixo
+HEARTBEAT_SEG = 20
+MORTO_APOS_SEG = 5 * HEARTBEAT_SEG
+PREFIXO_BLOB = 'jobs/'
+PREFIXOS_ORFAOS = (PREFIXO_BLOB, 'relatorios/')
+ORFAO_APOS_SEG = MAX_IDADE  # folga entre gravar o blob e registrar a linha que o aponta
+FINAIS = ('concluido', 'erro')
+RELEITURA_LOCAL_SEG = 2     # sem Redis, o aviso de outro worker não chega: relê o banco
+RELEITURA_REDIS_SEG = 15
+
+_atual = threading.local()  # job que roda nesta thread (para progresso())
+
+
+class BlobPronto:
+    """Retorno de função de job: resultado já gravado no blob store sob `chave`."""
+
+    def __init__(self, chave):
+        self.chave = chave
+
+
+def _bater(job_id, parar):
+    while not parar.wait(HEARTBEAT_SEG):
+        try:
+            job_repository.heartbeat(job_id)
+        except Exception as e:
+            logger.warning(f"Job {job_id}: falha no heartbeat: {e}")
+
+
+def _canal(job_id):
+    return f"job:{job_id}"
+
+
+def _avisar(job_id, status, progresso, erro=None):
+    dados = {'status': status, 'progresso': progresso}
+    if erro is not None:
+        dados['erro'] = erro
+    try:
+        get_pubsub().publicar(_canal(job_id), dados)
+    except Exception as e:
+        logger.warning(f"Job {job_id}: falha ao avisar '{status}': {e}")
+
+
+def _rodar(job_id, tipo, funcao, args, kwargs):
+    parar = threading.Event()
+    _atual.job_id, _atual.progresso = job_id, 0
+    try:
+        job_repository.marcar_executando(job_id)
+        _avisar(job_id, 'executando', 0)
+        threading.Thread(target=_bater, args=(job_id, parar), daemon=True).start()
+        resultado = funcao(*args, **kwargs)
+        if isinstance(resultado, BlobPronto):
+            concluiu = job_repository.concluir(job_id, blob_chave=resultado.chave)
+        elif isinstance(resultado, (bytes, bytearray)):
+            chave = f"{PREFIXO_BLOB}{job_id}"
+            get_blob_store().gravar(chave, bytes(resultado))
+            concluiu = job_repository.concluir(job_id, blob_chave=chave)
+            if not concluiu:
+                get_blob_store().apagar(chave)
+        else:
+            concluiu = job_repository.concluir(job_id, resultado=json.dumps(resultado))
+        if concluiu:
+            _avisar(job_id, 'concluido', 100)
+    except Exception as e:
+        logger.error(f"Job {tipo} {job_id}: {e}", exc_info=True)
+        try:
+            job_repository.falhar(job_id, e)
+            _avisar(job_id, 'erro', _atual.progresso, str(e)[:500])
+        except Exception:
+            logger.error(f"Job {tipo} {job_id}: falha ao registrar erro", exc_info=True)
+    finally:
+        parar.set()
+        _atual.job_id = None
+
+
+def progresso(percentual):
+    """Informa o avanço (0-99) do job que roda nesta thread; fora de um job não faz nada.
+
+    Só grava e avisa quando o percentual sobe — pode ser chamado dentro de laços.
+    """
+    job_id = getattr(_atual, 'job_id', None)
+    if job_id is None:
+        return
+    percentual = max(0, min(99, int(percentual)))  # 100 é do concluir
+    if percentual <= _atual.progresso:
+        return
+    _atual.progresso = percentual
+    try:
+        job_repository.gravar_progresso(job_id, percentual)
+    except Exception as e:
+        logger.warning(f"Job {job_id}: falha ao gravar progresso: {e}")
+    _avisar(job_id, 'executando', percentual)
+
+
+def executar(tipo, user_id, funcao, *args, **kwargs):
+    """Agenda `funcao(*args, **kwargs)` numa thread; retorna o job_id.
+
+    Retorno da função: bytes vão para o blob store, BlobPronto aponta para um
+    blob que a própria função gravou, o resto é gravado como JSON.
+    """
+    job_id = str(uuid.uuid4())
+    job_repository.criar(job_id, user_id, tipo, MAX_IDADE)
+    threading.Thread(target=_rodar, args=(job_id, tipo, funcao, args, kwargs),
+                     daemon=True).start()
+    return job_id
+
+
+def concluido(tipo, user_id, blob_chave):
+    """job_id de um job já concluído sobre um blob existente — sem thread."""
+    job_id = str(uuid.uuid4())
+    job_repository.criar_concluido(job_id, user_id, tipo, blob_chave, MAX_IDADE)
+    return job_id
+
+
+def estado(job_id, user_id):
+    """{'tipo', 'status': pendente|executando|concluido|erro, 'progresso', 'resultado'|'erro'} ou None.
+
+    Job de outro usuário, inexistente ou expirado = None.
+    """
+    job = job_repository.get_job(job_id, user_id)
+    if job is None:
+        return None
+    tipo, status, resultado, blob_chave, erro, progresso = job
+    dados = {'tipo': tipo, 'status': status, 'progresso': progresso}
+    if status == 'concluido' and resultado is not None:
+        dados['resultado'] = json.loads(resultado)
+    elif status == 'erro':
+        dados['erro'] = erro
+    return dados
+
+
+def resumo(dados):
+    """Só o que muda ao longo do job (o formato dos avisos): status, progresso, erro."""
+    enxuto = {'status': dados['status'], 'progresso': dados['progresso']}
+    if 'erro' in dados:
+        enxuto['erro'] = dados['erro']
+    return enxuto
+
+
+def acompanhar(job_id, user_id, duracao):
+    """Gera o resumo do job a cada mudança, até um estado final ou `duracao` segundos.
+
+    O primeiro item é o estado atual — None se o job não existe para o usuário,
+    e a geração para. Sem aviso do pub/sub por RELEITURA_*_SEG, relê o banco;
+    se nada mudou, gera None (hora de um keep-alive).
+    """
+    pubsub = get_pubsub()
+    releitura = RELEITURA_REDIS_SEG if pubsub.entre_processos else RELEITURA_LOCAL_SEG
+    fim = time.monotonic() + duracao
+    # Assina antes de ler: um aviso entre a leitura e a assinatura não se perde.
+    with pubsub.assinar(_canal(job_id)) as assinatura:
+        dados = estado(job_id, user_id)
+        atual = resumo(dados) if dados else None
+        yield atual
+        while atual is not None and atual['status'] not in FINAIS:
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                return
+            novo = assinatura.proxima(min(releitura, restante))
+            if novo is None:
+                dados = estado(job_id, user_id)
+                if dados is None:
+                    return
+                novo = resumo(dados)
+            if novo == atual:
+                yield None
+            else:
+                atual = novo
+                yield atual
+
+
+def aguardar(job_id, user_id, conhecido, espera):
+    """Long polling: o resumo assim que diferir de `conhecido`, ou o atual após `espera` s.
+
+    None se o job não existe para o usuário.
+    """
+    ultimo = None
+    estados = acompanhar(job_id, user_id, espera)
+    try:
+        for atual in estados:
+            if atual is None:
+                continue
+            ultimo = atual
+            if atual != conhecido:
+                break
+    finally:
+        estados.close()
+    return ultimo
+
+
+def ler_blob(job_id, user_id):
+    """Bytes do resultado de um job concluído do usuário, ou None."""
+    job = job_repository.get_job(job_id, user_id)
+    if job is None or job[1] != 'concluido' or not job[3]:
+        return None
+    return get_blob_store().ler(job[3])
+
+
+def recolher_orfaos(store, lote=500):
+    """Apaga os blobs de PREFIXOS_ORFAOS sem linha que os aponte. Retorna quantos."""
+    corte = time.time() - ORFAO_APOS_SEG
+    antigos = [chave for prefixo in PREFIXOS_ORFAOS
+               for chave, modificado in store.listar(prefixo) if modificado < corte]
+    apagados = 0
+    for inicio in range(0, len(antigos), lote):
+        parte = antigos[inicio:inicio + lote]
+        referenciados = job_repository.get_blobs_referenciados(parte)
+        for chave in parte:
+            if chave not in referenciados:
+                store.apagar(chave)
+                apagados += 1
+    return apagados
+
+
+def manter_jobs(app):
+    """Job periódico: marca jobs sem heartbeat como erro, apaga os expirados com seus blobs
+    e recolhe os blobs órfãos."""
+    with app.app_context():
+        try:
+            mortos = job_repository.marcar_mortos(MORTO_APOS_SEG)
+            if mortos:
+                logger.warning(f"Jobs: {mortos} sem heartbeat marcados como erro")
+            expirados = job_repository.get_expirados()
+            store = get_blob_store()
+            for _, blob_chave in expirados:
+                if blob_chave and blob_chave.startswith(PREFIXO_BLOB):
+                    store.apagar(blob_chave)
+            job_repository.apagar([job_id for job_id, _ in expirados])
+            orfaos = recolher_orfaos(store)
+            if orfaos:
+                logger.info(f"Jobs: {orfaos} blobs órfãos apagados")
+        except Exception as e:
+            logger.error(f"Manutenção de jobs: {e}", exc_info=True)
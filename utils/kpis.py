@@ -0,0 +1,87 @@
+"""KPIs do financeiro por tenant, servidos de kpi_snapshot.
+
+/financeiro, o simulador de custo e o relatório PDF usam os mesmos números
+(rebanho ativo, GMD médio, custos dos últimos 12 meses por tipo, custo por
+animal-dia e por arroba, valor contábil e de mercado do rebanho). get_kpis
+devolve o snapshot do tenant quando ele foi calculado na versao_kpi atual,
+hoje e com a cotação mais recente de cotacoes_historico; senão recalcula e
+grava. A versão sobe nas escritas de animais, pesagens, custos e da
+localização da fazenda (kpi_repository).
+"""
+import logging
+from datetime import date, timedelta
+
+from repositories import (animal_repository, configuracao_repository, cotacao_repository,
+                          financeiro_repository, kpi_repository)
+from utils.calculo import KG_POR_ARROBA
+from utils.cotacoes import preco_regional, uf_da_fazenda, valor_de_mercado
+
+logger = logging.getLogger(__name__)
+
+
+def calcular_kpis_unificados(user_id, data_cotacao=None):
+    dados = {
+        'qtd_animais': 0, 'gmd_medio': 0.0, 'custo_mensal_total': 0.0,
+        'custo_diaria': 0.0, 'custo_arroba': 0.0, 'dias_para_arroba': 0,
+        'arrendamento': 0.0, 'suplementacao': 0.0, 'mao_obra': 0.0, 'extras': 0.0,
+        'valor_contabil': 0.0, 'valor_mercado': None, 'preco_boi': None, 'preco_novilha': None,
+        'data_cotacao': data_cotacao.isoformat() if data_cotacao else None,
+    }
+
+    dados['qtd_animais'] = animal_repository.count_animais(user_id, status='ativos')
+    dados['gmd_medio'] = animal_repository.get_gmd_medio_rebanho(user_id)
+
+    dt_lim = date.today() - timedelta(days=365)
+    custos = financeiro_repository.get_custos_por_tipo_trimestre(user_id, dt_lim)
+
+    tot_anual = 0.0
+    for tipo, val in custos:
+        v = float(val)
+        tot_anual += v
+        if tipo == 'Arrendamento':
+            dados['arrendamento'] += v
+        elif tipo == 'Nutrição':
+            dados['suplementacao'] += v
+        elif tipo == 'Salário':
+            dados['mao_obra'] += v
+        else:
+            dados['extras'] += v
+    dados['custo_mensal_total'] = tot_anual
+
+    # Meses fechados: custo por animal-dia efetivo (rebanho de cada mês).
+    # Sem fechamento ainda, cai na média pelo rebanho atual.
+    custo_animal_dia = financeiro_repository.get_custo_animal_dia(user_id, dt_lim.replace(day=1))
+    if custo_animal_dia is not None:
+        dados['custo_diaria'] = custo_animal_dia
+    elif dados['qtd_animais'] > 0:
+        dados['custo_diaria'] = (tot_anual / dados['qtd_animais']) / 365
+    if dados['gmd_medio'] > 0:
+        dados['dias_para_arroba'] = KG_POR_ARROBA / dados['gmd_medio']
+        dados['custo_arroba'] = dados['custo_diaria'] * dados['dias_para_arroba']
+
+    dados['valor_contabil'] = financeiro_repository.get_valor_rebanho(user_id)
+    if data_cotacao:
+        config = configuracao_repository.get_configuracao(user_id)
+        precos = preco_regional(cotacao_repository.get_cotacoes_do_dia(data_cotacao),
+                                uf_da_fazenda(config[1] if config else None))
+        dados['preco_boi'], dados['preco_novilha'] = precos['boi'], precos['novilha']
+        dados['valor_mercado'] = valor_de_mercado(
+            animal_repository.get_peso_rebanho_por_sexo(user_id), precos)
+
+    return dados
+
+
+def get_kpis(user_id):
+    """KPIs do tenant — do snapshot quando válido, senão recalculados e gravados."""
+    hoje = date.today()
+    versao, versao_snap, data_ref, dados = kpi_repository.get_snapshot(user_id)
+    data_cotacao = cotacao_repository.get_data_mais_recente()
+    if (dados is not None and versao_snap == versao and data_ref == hoje
+            and dados.get('data_cotacao') == (data_cotacao.isoformat() if data_cotacao else None)):
+        return dados
+    dados = calcular_kpis_unificados(user_id, data_cotacao)
+    try:
+        kpi_repository.gravar_snapshot(user_id, versao, hoje, dados)
+    except Exception as e:
+        logger.error(f"KPIs: falha ao gravar snapshot de {user_id}: {e}", exc_info=True)
+    return dados
@@ -0,0 +1,409 @@
+"""Escritor de PDF em Python puro para relatórios tabulares, sem Chromium.
+
+Cobre o que os relatórios de listagem usam — títulos, texto com negrito,
+tabelas com cabeçalho repetido a cada página, faixas zebradas, selos
+coloridos e rodapé numerado — com as fontes padrão do PDF (Helvetica e
+Helvetica-Bold em WinAnsiEncoding, que tem os acentos do português), sem
+embutir fonte nenhuma.
+
+O documento é escrito na `saida` (qualquer stream binário) à medida que as
+páginas fecham: cada página vira um content stream comprimido e só o que
+falta do arquivo (árvore de páginas, xref) espera o fim. Em memória fica a
+página corrente e dois offsets por página — uma listagem de 50 mil animais
+custa o mesmo por página que uma de 50.
+
+Medidas em pontos (1/72 pol.), com y crescendo de cima para baixo; a
+conversão para o sistema do PDF fica em Pagina.
+"""
+import unicodedata
+import zlib
+
+MM = 72 / 25.4
+A4 = (595.28, 841.89)
+
+PRETO = (0, 0, 0)
+
+_FONTES = {False: b'F1', True: b'F2'}
+
+# Larguras (milésimos do corpo) dos caracteres 32-126, das métricas AFM padrão.
+_LARGURAS_ASCII = {
+    False: (
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+    ),
+    True: (
+        278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+        975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+        333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+        611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+    ),
+}
+_LARGURAS_EXTRAS = {'—': 1000, '–': 556, '…': 1000, '•': 350, '\xa0': 278, 'º': 365, 'ª': 370}
+_larguras_cache = {False: {}, True: {}}
+_prefixos_texto = {}  # (negrito, tamanho, cor) -> b'BT /F1 9.00 Tf ... rg '
+
+
+def _largura_char(c, negrito):
+    cache = _larguras_cache[negrito]
+    largura = cache.get(c)
+    if largura is None:
+        base = unicodedata.normalize('NFD', c)[0]  # 'ã' mede o mesmo que 'a'
+        if 32 <= ord(base) <= 126:
+            largura = _LARGURAS_ASCII[negrito][ord(base) - 32]
+        else:
+            largura = _LARGURAS_EXTRAS.get(c, 556)
+        cache[c] = largura
+    return largura
+
+
+def largura_texto(texto, tamanho, negrito=False):
+    cache = _larguras_cache[negrito]
+    total = 0
+    for c in texto:
+        largura = cache.get(c)
+        total += largura if largura is not None else _largura_char(c, negrito)
+    return total * tamanho / 1000
+
+
+def cortar(texto, largura, tamanho, negrito=False):
+    """`texto` ou o maior prefixo dele com '…' que cabe em `largura`."""
+    if largura_texto(texto, tamanho, negrito) <= largura:
+        return texto
+    limite = largura - largura_texto('…', tamanho, negrito)
+    usado = 0.0
+    for i, c in enumerate(texto):
+        usado += _largura_char(c, negrito) * tamanho / 1000
+        if usado > limite:
+            return texto[:i] + '…'
+    return texto
+
+
+def cor(hexa):
+    """'#2e7d32' -> (r, g, b) em 0-1."""
+    hexa = hexa.lstrip('#')
+    return tuple(int(hexa[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def _num(valor):
+    return b'%.2f' % valor
+
+
+def _rgb(valor):
+    return b'%.3f %.3f %.3f' % valor
+
+
+def _literal(texto):
+    dados = texto.encode('cp1252', errors='replace')
+    return b'(' + dados.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class Pagina:
+    """Operações de desenho de uma página; os bytes vão para o documento ao fechar."""
+
+    def __init__(self, largura, altura):
+        self.largura, self.altura = largura, altura
+        self._ops = []
+
+    def texto(self, x, y, texto, tamanho=9, negrito=False, cor=PRETO, alinhar='esquerda'):
+        """Texto com a linha de base em `y`; alinhar='direita'/'centro' ancora em `x`."""
+        if not texto:
+            return
+        if alinhar != 'esquerda':
+            largura = largura_texto(texto, tamanho, negrito)
+            x -= largura if alinhar == 'direita' else largura / 2
+        prefixo = _prefixos_texto.get((negrito, tamanho, cor))
+        if prefixo is None:
+            prefixo = b'BT /' + _FONTES[negrito] + b' ' + _num(tamanho) + b' Tf ' + _rgb(cor) + b' rg '
+            _prefixos_texto[(negrito, tamanho, cor)] = prefixo
+        self._ops.append(prefixo + b'%.2f %.2f Td ' % (x, self.altura - y) + _literal(texto) + b' Tj ET')
+
+    def retangulo(self, x, y, largura, altura, preenchimento):
+        """Retângulo preenchido com canto superior esquerdo em (x, y)."""
+        self._ops.append(
+            _rgb(preenchimento) + b' rg ' + _num(x) + b' ' + _num(self.altura - y - altura) + b' '
+            + _num(largura) + b' ' + _num(altura) + b' re f'
+        )
+
+    def linha(self, x1, y1, x2, y2, cor=PRETO, espessura=0.5):
+        self._ops.append(
+            _num(espessura) + b' w ' + _rgb(cor) + b' RG ' + _num(x1) + b' ' + _num(self.altura - y1)
+            + b' m ' + _num(x2) + b' ' + _num(self.altura - y2) + b' l S'
+        )
+
+    def _conteudo(self):
+        return b'\n'.join(self._ops)
+
+
+class DocumentoPDF:
+    """PDF 1.4 escrito em `saida` página a página.
+
+    Objetos fixos: 1 catálogo, 2 árvore de páginas, 3-4 fontes, 5 info; cada
+    página gasta dois (conteúdo e página) a partir do 6.
+    """
+
+    def __init__(self, saida, tamanho=A4, titulo=None):
+        self._saida = saida
+        self.largura, self.altura = tamanho
+        self._titulo = titulo
+        self._pos = 0
+        self._offsets = {}
+        self._paginas = []
+        self._proximo = 6
+        self._atual = None
+        self._escrever(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        for num, nome in ((3, b'Helvetica'), (4, b'Helvetica-Bold')):
+            self._objeto(num, b'<< /Type /Font /Subtype /Type1 /BaseFont /' + nome
+                         + b' /Encoding /WinAnsiEncoding >>')
+
+    @property
+    def paginas(self):
+        return len(self._paginas) + (self._atual is not None)
+
+    def _escrever(self, dados):
+        self._saida.write(dados)
+        self._pos += len(dados)
+
+    def _objeto(self, num, corpo):
+        self._offsets[num] = self._pos
+        self._escrever(str(num).encode('ascii') + b' 0 obj\n' + corpo + b'\nendobj\n')
+
+    def nova_pagina(self):
+        """Fecha a página corrente (se houver) e abre outra."""
+        self.fechar_pagina()
+        self._atual = Pagina(self.largura, self.altura)
+        return self._atual
+
+    def fechar_pagina(self):
+        if self._atual is None:
+            return
+        conteudo = zlib.compress(self._atual._conteudo())
+        self._atual = None
+        num_conteudo, num_pagina = self._proximo, self._proximo + 1
+        self._proximo += 2
+        self._objeto(num_conteudo, b'<< /Length ' + str(len(conteudo)).encode('ascii')
+                     + b' /Filter /FlateDecode >>\nstream\n' + conteudo + b'\nendstream')
+        self._objeto(num_pagina, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 '
+                     + _num(self.largura) + b' ' + _num(self.altura) + b'] '
+                     b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents '
+                     + str(num_conteudo).encode('ascii') + b' 0 R >>')
+        self._paginas.append(num_pagina)
+
+    def fechar(self):
+        """Escreve o que falta (páginas, catálogo, xref); a `saida` fica com um PDF completo."""
+        self.fechar_pagina()
+        if not self._paginas:
+            self.nova_pagina()
+            self.fechar_pagina()
+        kids = b' '.join(str(n).encode('ascii') + b' 0 R' for n in self._paginas)
+        self._objeto(2, b'<< /Type /Pages /Kids [' + kids + b'] /Count '
+                     + str(len(self._paginas)).encode('ascii') + b' >>')
+        self._objeto(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        info = b'/Producer (SGG pdf_nativo)'
+        if self._titulo:
+            info += b' /Title ' + _literal(self._titulo)
+        self._objeto(5, b'<< ' + info + b' >>')
+        inicio_xref = self._pos
+        linhas = [b'xref\n0 ' + str(self._proximo).encode('ascii') + b'\n', b'0000000000 65535 f \n']
+        for num in range(1, self._proximo):
+            linhas.append(b'%010d 00000 n \n' % self._offsets[num])
+        self._escrever(b''.join(linhas))
+        self._escrever(b'trailer\n<< /Size ' + str(self._proximo).encode('ascii')
+                       + b' /Root 1 0 R /Info 5 0 R >>\nstartxref\n'
+                       + str(inicio_xref).encode('ascii') + b'\n%%EOF\n')
+
+
+class Celula:
+    """Célula de tabela com estilo; `fundo` desenha um selo atrás do texto."""
+
+    def __init__(self, texto, cor=PRETO, negrito=False, fundo=None):
+        self.texto, self.cor, self.negrito, self.fundo = texto, cor, negrito, fundo
+
+
+class RelatorioTabular:
+    """Layout de cima para baixo sobre DocumentoPDF.
+
+    Quebra a página sozinho, repete o cabeçalho da tabela na página nova e
+    escreve `rodape` com o número da página em cada uma. Estilo espelha o do
+    templates/relatorio_pdf.html (verde do sistema, tabelas zebradas).
+    """
+
+    VERDE = cor('#2e7d32')
+    VERDE_ESCURO = cor('#1b5e20')
+    VERDE_CLARO = cor('#aed581')
+    FUNDO_CABECALHO = cor('#e8f5e9')
+    FUNDO_ZEBRA = cor('#f9fbe7')
+    BORDA = cor('#e0e0e0')
+    CINZA = cor('#555555')
+    CINZA_CLARO = cor('#999999')
+    TEXTO = cor('#222222')
+
+    CORPO = 9
+    LINHA_TABELA = 15
+    RESPIRO_CELULA = 6
+
+    def __init__(self, saida, titulo=None, rodape='', margens=(20 * MM, 15 * MM)):
+        self.doc = DocumentoPDF(saida, titulo=titulo)
+        self.rodape = rodape
+        self.margem_v, self.margem_h = margens
+        self.esquerda = self.margem_h
+        self.largura = self.doc.largura - 2 * self.margem_h
+        self._pagina = None
+        self.y = 0.0
+
+    @property
+    def pagina(self):
+        if self._pagina is None:
+            self._nova_pagina()
+        return self._pagina
+
+    def _nova_pagina(self):
+        self._fechar_pagina()
+        self._pagina = self.doc.nova_pagina()
+        self.y = self.margem_v
+
+    def _fechar_pagina(self):
+        if self._pagina is None:
+            return
+        y = self.doc.altura - self.margem_v / 2
+        centro = self.esquerda + self.largura / 2
+        self._pagina.texto(centro, y, self.rodape, 7.5, cor=self.CINZA_CLARO, alinhar='centro')
+        self._pagina.texto(self.esquerda + self.largura, y, f"Página {self.doc.paginas}", 7.5,
+                           cor=self.CINZA_CLARO, alinhar='direita')
+        self._pagina = None
+
+    def _garantir(self, altura):
+        """Abre página nova se `altura` não cabe no que resta desta."""
+        if self._pagina is None or self.y + altura > self.doc.altura - self.margem_v:
+            self._nova_pagina()
+            return True
+        return False
+
+    def titulo(self, texto):
+        self._garantir(24)
+        self.pagina.texto(self.esquerda, self.y + 15, texto, 15, negrito=True, cor=self.VERDE)
+        self.y += 21
+
+    def paragrafo(self, partes, tamanho=CORPO, cor=None, espaco_depois=4):
+        """Texto corrido com quebra de linha; partes = [(texto, negrito)]."""
+        cor = cor or self.TEXTO
+        altura = tamanho * 1.45
+        # Palavras com o espaço que as segue, para medir e quebrar entre trechos.
+        palavras = []
+        for texto, negrito in partes:
+            for i, palavra in enumerate(texto.split(' ')):
+                if i:
+                    palavras.append((' ', negrito))
+                if palavra:
+                    palavras.append((palavra, negrito))
+        linha, usado = [], 0.0
+        for palavra, negrito in palavras + [(None, False)]:
+            largura = largura_texto(palavra, tamanho, negrito) if palavra else 0
+            if palavra is not None and (usado + largura <= self.largura or palavra == ' ' or not linha):
+                linha.append((palavra, negrito, usado))
+                usado += largura
+                continue
+            while linha and linha[-1][0] == ' ':
+                linha.pop()
+            self._garantir(altura)
+            # Um Tj por trecho de mesmo estilo, não por palavra.
+            inicio = 0
+            for i in range(1, len(linha) + 1):
+                if i == len(linha) or linha[i][1] != linha[inicio][1]:
+                    trecho = ''.join(p for p, _, _ in linha[inicio:i])
+                    self.pagina.texto(self.esquerda + linha[inicio][2], self.y + tamanho, trecho,
+                                      tamanho, negrito=linha[inicio][1], cor=cor)
+                    inicio = i
+            self.y += altura
+            linha, usado = [(palavra, negrito, 0.0)], largura
+        self.y += espaco_depois
+
+    def regua(self, cor=None, espessura=1.5, espaco_depois=10):
+        self.pagina.linha(self.esquerda, self.y, self.esquerda + self.largura, self.y,
+                          cor or self.VERDE, espessura)
+        self.y += espaco_depois
+
+    def secao(self, texto, nota=None):
+        """Título de seção sublinhado; `nota` sai ao lado, em texto normal."""
+        self._garantir(12 + 21 + self.LINHA_TABELA * 2)  # não deixa o título órfão
+        self.y += 12
+        self.pagina.texto(self.esquerda, self.y + 10.5, texto, 10.5, negrito=True, cor=self.VERDE)
+        if nota:
+            x = self.esquerda + largura_texto(texto, 10.5, True) + 8
+            self.pagina.texto(x, self.y + 10.5, nota, 8.5, cor=self.CINZA)
+        self.y += 15
+        self.pagina.linha(self.esquerda, self.y, self.esquerda + self.largura, self.y,
+                          self.VERDE_CLARO, 0.75)
+        self.y += 6
+
+    def tabela(self, colunas, linhas, vazio=None):
+        """colunas = [(titulo, peso, alinhar)]; linhas = iterável de células (str ou Celula).
+
+        `linhas` é consumido uma vez, linha a linha — pode ser um gerador.
+        Retorna o número de linhas escritas; sem nenhuma, escreve `vazio`.
+        """
+        total_pesos = sum(peso for _, peso, _ in colunas)
+        larguras = [self.largura * peso / total_pesos for _, peso, _ in colunas]
+        posicoes = []
+        x = self.esquerda
+        for largura in larguras:
+            posicoes.append(x)
+            x += largura
+        fonte = self.CORPO - 0.75
+        respiro = self.RESPIRO_CELULA
+        altura = self.LINHA_TABELA
+
+        def _x_texto(i, alinhar):
+            return posicoes[i] + larguras[i] - respiro if alinhar == 'direita' else posicoes[i] + respiro
+
+        def _cabecalho():
+            pagina = self.pagina
+            pagina.retangulo(self.esquerda, self.y, self.largura, altura + 2, self.FUNDO_CABECALHO)
+            for i, (titulo, _, alinhar) in enumerate(colunas):
+                texto = cortar(titulo, larguras[i] - 2 * respiro, fonte, True)
+                pagina.texto(_x_texto(i, alinhar), self.y + altura - 3.5, texto, fonte,
+                             negrito=True, cor=self.VERDE_ESCURO, alinhar=alinhar)
+            self.y += altura + 2
+
+        escritas = 0
+        for celulas in linhas:
+            if escritas == 0:
+                self._garantir(2 * altura + 2)
+                _cabecalho()
+            elif self._garantir(altura):
+                _cabecalho()
+            pagina = self.pagina
+            escritas += 1
+            if escritas % 2 == 0:
+                pagina.retangulo(self.esquerda, self.y, self.largura, altura, self.FUNDO_ZEBRA)
+            for i, celula in enumerate(celulas):
+                alinhar = colunas[i][2]
+                if not isinstance(celula, Celula):
+                    celula = Celula('' if celula is None else str(celula), self.TEXTO)
+                texto = cortar(celula.texto, larguras[i] - 2 * respiro, fonte, celula.negrito)
+                x = _x_texto(i, alinhar)
+                if celula.fundo is not None and texto:
+                    largura = largura_texto(texto, fonte - 1, celula.negrito) + 8
+                    inicio = x - largura + 4 if alinhar == 'direita' else x - 4
+                    pagina.retangulo(inicio, self.y + 2.5, largura, altura - 5, celula.fundo)
+                    pagina.texto(x, self.y + altura - 4.5, texto, fonte - 1, negrito=celula.negrito,
+                                 cor=celula.cor, alinhar=alinhar)
+                else:
+                    pagina.texto(x, self.y + altura - 4.5, texto, fonte, negrito=celula.negrito,
+                                 cor=celula.cor, alinhar=alinhar)
+            self.y += altura
+            pagina.linha(self.esquerda, self.y, self.esquerda + self.largura, self.y, self.BORDA, 0.5)
+        if escritas == 0 and vazio:
+            self.paragrafo([(vazio, False)], cor=self.CINZA_CLARO)
+        else:
+            self.y += 6
+        return escritas
+
+    def fechar(self):
+        self._fechar_pagina()
+        self.doc.fechar()
@@ -0,0 +1,152 @@
+"""Pub/sub leve para avisar mudanças de estado (jobs) a quem está esperando.
+
+Com REDIS_URL (o mesmo do rate limiter) as mensagens passam pelo Redis e
+chegam a qualquer worker ou réplica. Sem ele, ficam na memória do processo:
+um Condition por canal, com a última mensagem e um contador — o aviso só
+acorda quem espera no mesmo worker, e o chamador precisa reler a fonte de
+verdade de tempos em tempos (`entre_processos` diz qual é o caso).
+
+Semântica de último estado, não de fila: proxima(timeout) devolve a mensagem
+mais recente publicada desde a anterior; intermediárias podem ser puladas.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_PREFIXO = 'sgg:'
+
+
+class _Canal:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.mensagem = None
+        self.assinantes = 0
+
+
+class _AssinaturaLocal:
+    def __init__(self, pubsub, nome, canal):
+        self._pubsub, self._nome, self._canal = pubsub, nome, canal
+        with canal.cond:
+            self._visto = canal.seq
+
+    def proxima(self, timeout):
+        """Mensagem publicada desde a última lida, ou None após `timeout` segundos."""
+        canal = self._canal
+        with canal.cond:
+            if not canal.cond.wait_for(lambda: canal.seq != self._visto, timeout):
+                return None
+            self._visto = canal.seq
+            return canal.mensagem
+
+    def fechar(self):
+        self._pubsub._soltar(self._nome, self._canal)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class PubSubLocal:
+    """Condition variables por canal; só vale dentro do processo."""
+
+    entre_processos = False
+
+    def __init__(self):
+        self._canais = {}
+        self._lock = threading.Lock()
+
+    def publicar(self, canal, dados):
+        with self._lock:
+            alvo = self._canais.get(canal)
+        if alvo is None:
+            return
+        with alvo.cond:
+            alvo.seq += 1
+            alvo.mensagem = dados
+            alvo.cond.notify_all()
+
+    def assinar(self, canal):
+        with self._lock:
+            alvo = self._canais.setdefault(canal, _Canal())
+            alvo.assinantes += 1
+        return _AssinaturaLocal(self, canal, alvo)
+
+    def _soltar(self, nome, canal):
+        with self._lock:
+            canal.assinantes -= 1
+            if canal.assinantes <= 0 and self._canais.get(nome) is canal:
+                del self._canais[nome]
+
+
+class _AssinaturaRedis:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def proxima(self, timeout):
+        fim = time.monotonic() + timeout
+        ultima = None
+        while ultima is None:
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                return None
+            ultima = self._pubsub.get_message(ignore_subscribe_messages=True, timeout=restante)
+        # Drena o que já chegou: interessa só o estado mais recente.
+        while True:
+            seguinte = self._pubsub.get_message(ignore_subscribe_messages=True, timeout=0)
+            if seguinte is None:
+                break
+            ultima = seguinte
+        return json.loads(ultima['data'])
+
+    def fechar(self):
+        self._pubsub.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class PubSubRedis:
+    """PUBLISH/SUBSCRIBE do Redis; vale entre workers e réplicas."""
+
+    entre_processos = True
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def publicar(self, canal, dados):
+        self._redis.publish(_PREFIXO + canal, json.dumps(dados))
+
+    def assinar(self, canal):
+        pubsub = self._redis.pubsub()
+        pubsub.subscribe(_PREFIXO + canal)
+        return _AssinaturaRedis(pubsub)
+
+
+_pubsub = None
+_pubsub_lock = threading.Lock()
+
+
+def get_pubsub():
+    global _pubsub
+    with _pubsub_lock:
+        if _pubsub is None:
+            url = os.getenv('REDIS_URL')
+            if url:
+                try:
+                    _pubsub = PubSubRedis(url)
+                except Exception as e:
+                    logger.warning(f"Pub/sub: Redis indisponível ({e}); usando memória do processo")
+            if _pubsub is None:
+                _pubsub = PubSubLocal()
+        return _pubsub
@@ -0,0 +1,67 @@
+"""Purga em segundo plano de contas apagadas.
+
+/conta/apagar só desativa a conta (auth_repository.desativar_conta) e dispara
+uma thread; os dados saem em lotes curtos por purgar_tenant. Se o processo
+cair no meio, o job periódico retoma a partir de purga_tenant.etapa.
+
+GET_LOCK por tenant garante um único executor, mesmo com a thread da
+requisição e o scheduler disputando a mesma conta.
+"""
+import logging
+import os
+import threading
+from db_config import get_db_connection, close_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+def _limite():
+    return int(os.getenv('PURGA_LOTE', 5000))
+
+
+def purgar_tenant(user_id, limite=None):
+    """Executa a purga completa do tenant. Retorna False se outro processo já a executa."""
+    from repositories import auth_repository
+
+    conn = get_db_connection()
+    if conn is None:
+        raise ConnectionError("Falha na conexão com BD")
+    nome_lock = f"purga_tenant_{user_id}"
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (nome_lock,))
+        if cursor.fetchone()[0] != 1:
+            return False
+        try:
+            auth_repository.delete_user_and_data(user_id, limite or _limite())
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (nome_lock,))
+            cursor.fetchone()
+        logger.info(f"Purga concluída user_id={user_id}")
+        return True
+    finally:
+        cursor.close()
+        close_db_connection(conn)
+
+
+def _purgar_em_contexto(app, user_id):
+    with app.app_context():
+        try:
+            purgar_tenant(user_id)
+        except Exception as e:
+            logger.error(f"Purga user_id={user_id}: {e}", exc_info=True)
+
+
+def iniciar_purga(app, user_id):
+    """Dispara a purga numa thread daemon; a requisição não espera."""
+    threading.Thread(target=_purgar_em_contexto, args=(app, user_id), daemon=True).start()
+
+
+def retomar_purgas_pendentes(app):
+    with app.app_context():
+        try:
+            from repositories import auth_repository
+            for user_id in auth_repository.get_purgas_pendentes():
+                purgar_tenant(user_id)
+        except Exception as e:
+            logger.error(f"Retomada de purgas: {e}", exc_info=True)
@@ -0,0 +1,17 @@
+import logging
+
+from db_config import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+
+def atualizar_ranking_touros(app):
+    """Job noturno: refaz ranking_touros de todas as fazendas numa transação."""
+    with app.app_context():
+        try:
+            from repositories.animal_repository import recalcular_ranking_touros
+            with get_db_cursor() as cursor:
+                total = recalcular_ranking_touros(cursor)
+            logger.info(f"Ranking de touros: {total} touros avaliados")
+        except Exception as e:
+            logger.error(f"Ranking de touros: {e}", exc_info=True)
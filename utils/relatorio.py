@@ -0,0 +1,491 @@
+"""Relatório do rebanho em PDF, com cache endereçado pelo conteúdo.
+
+O PDF só depende do layout, dos dados do tenant e do dia (data impressa,
+cotação vigente). A chave é o sha256 de (fonte do layout, user_id,
+tenant_versao.versao_kpi — sobe a cada escrita em animais, pesagens, custos,
+medicações e configuração —, data da cotação mais recente, hoje). Se o PDF
+dessa chave já está no blob store (relatorios/<user_id>/<chave>.pdf), o job
+nasce concluído; senão o PDF é gerado em segundo plano e fica guardado sob a
+chave.
+
+Dois motores, escolhidos por tipo de relatório em MOTORES: o nativo
+(utils.pdf_nativo) escreve tabelas e texto direto dos repositórios, página a
+página, sem navegador — memória limitada mesmo com dezenas de milhares de
+animais; o Chromium (Playwright) renderiza o template HTML e fica para
+layouts com gráficos. Nos dois, as linhas vêm de iterar_animais_com_gmd
+(fetchmany): o nativo as desenha uma a uma e o template é gerado com
+stream_template direto para um arquivo temporário, que o Chromium abre —
+nem a lista nem o HTML inteiro passam pela memória do Python. O motor entra
+na chave: trocar de motor não reaproveita o PDF do outro.
+
+relatorio_cache indexa os PDFs com tamanho e último acesso: passando de
+RELATORIO_CACHE_MAX_BYTES, saem os acessados há mais tempo (LRU). Depois do
+snapshot noturno, pregerar_relatorios deixa pronto o PDF do dia de quem
+pediu o relatório nos últimos PREGERAR_DIAS dias — o primeiro clique já é
+instantâneo.
+
+No dia 1º, enviar_relatorios_mensais manda o PDF por email a quem marcou
+configuracoes.relatorio_mensal: a chave (e, no Chromium, o HTML) de cada
+fazenda sai de um pool de MENSAL_CONCORRENCIA threads (com janela limitada,
+para não acumular arquivos), um único conversor (_Conversor) gera em
+sequência, o PDF vai para o blob store pela mesma chave do cache e os emails
+saem em lotes de MENSAL_LOTE_EMAIL por conexão SMTP. relatorio_mensal_envio
+torna a passada idempotente.
+"""
+import hashlib
+import inspect
+import io
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+from flask import current_app, stream_template
+from playwright.sync_api import sync_playwright
+
+from db_config import close_db_connection, get_db_connection
+from repositories import (animal_repository, configuracao_repository, cotacao_repository,
+                          financeiro_repository, kpi_repository, relatorio_cache_repository,
+                          relatorio_mensal_repository)
+from utils import email_service, jobs, pdf_nativo
+from utils.blob_store import get_blob_store
+from utils.kpis import get_kpis
+from utils.streaming import em_blocos
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE = 'relatorio_pdf.html'
+MAX_BYTES = int(os.getenv('RELATORIO_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+PREGERAR_DIAS = 31
+MENSAL_CONCORRENCIA = int(os.getenv('RELATORIO_MENSAL_CONCORRENCIA', 2))
+MENSAL_LOTE_EMAIL = 20
+
+MOTOR_NATIVO = 'nativo'
+MOTOR_CHROMIUM = 'chromium'
+# Motor de cada tipo de relatório; RELATORIO_MOTOR_<TIPO> sobrescreve (ex.: volta ao Chromium).
+MOTORES = {
+    'rebanho': os.getenv('RELATORIO_MOTOR_REBANHO', MOTOR_NATIVO),
+}
+
+
+def calcular_chave(fonte_template, user_id, versao, data_cotacao, hoje):
+    """sha256 (hex) das entradas que determinam o PDF."""
+    partes = [
+        hashlib.sha256(fonte_template.encode('utf-8')).hexdigest(),
+        str(user_id),
+        str(versao),
+        data_cotacao.isoformat() if data_cotacao else '-',
+        hoje.isoformat(),
+    ]
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()
+
+
+def _motor():
+    return MOTORES['rebanho']
+
+
+_fonte_nativa = None
+
+
+def _fonte_layout(motor):
+    """O que define o layout do PDF: o template (Chromium) ou o código que desenha (nativo)."""
+    global _fonte_nativa
+    if motor == MOTOR_NATIVO:
+        if _fonte_nativa is None:
+            _fonte_nativa = MOTOR_NATIVO + inspect.getsource(pdf_nativo) + inspect.getsource(_compor_nativo)
+        return _fonte_nativa
+    fonte, _, _ = current_app.jinja_loader.get_source(current_app.jinja_env, TEMPLATE)
+    return fonte
+
+
+def chave_relatorio(user_id, hoje=None):
+    return calcular_chave(_fonte_layout(_motor()), user_id, kpi_repository.get_versao(user_id),
+                          cotacao_repository.get_data_mais_recente(), hoje or date.today())
+
+
+def renderizar_html(user_id):
+    """Caminho de um arquivo temporário com o HTML do relatório; quem recebe apaga (_descartar).
+
+    Gerado em streaming, bloco a bloco. Precisa de contexto de request, real ou de teste.
+    """
+    kpis = get_kpis(user_id)
+    pedacos = stream_template(TEMPLATE,
+                              config=configuracao_repository.get_configuracao(user_id),
+                              fluxo=financeiro_repository.get_fluxo_caixa(user_id),
+                              animais=animal_repository.iterar_animais_com_gmd(user_id),
+                              gmd_medio=kpis['gmd_medio'], kpis=kpis,
+                              data_geracao=date.today().strftime('%d/%m/%Y'))
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', prefix='relatorio_', suffix='.html',
+                                     delete=False) as arquivo:
+        try:
+            for bloco in em_blocos(pedacos):
+                arquivo.write(bloco)
+        except BaseException:
+            arquivo.close()
+            _descartar(arquivo.name)
+            raise
+    return arquivo.name
+
+
+def _descartar(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+
+def _pdf_de_html(browser, caminho):
+    page = browser.new_page()
+    try:
+        page.goto(Path(caminho).as_uri(), wait_until='load')
+        jobs.progresso(60)
+        return page.pdf(format='A4', margin={
+            'top': '20mm', 'bottom': '20mm',
+            'left': '15mm', 'right': '15mm',
+        })
+    finally:
+        page.close()
+
+
+def gerar_pdf(caminho: str) -> bytes:
+    """Renderiza o arquivo HTML do relatório em PDF com um Chromium próprio e o apaga."""
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            jobs.progresso(30)
+            try:
+                return _pdf_de_html(browser, caminho)
+            finally:
+                browser.close()
+    finally:
+        _descartar(caminho)
+
+
+def _brl(valor):
+    """Mesmo formato do filtro brl (app.py)."""
+    try:
+        return f"{float(valor):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    except (ValueError, TypeError):
+        return "0,00"
+
+
+def _linhas_animais(animais, gmd_medio, total):
+    """Células da listagem, informando o progresso do job a cada 500 animais."""
+    rel = pdf_nativo.RelatorioTabular
+    status_sem = pdf_nativo.Celula('Sem pesagem', rel.CINZA_CLARO)
+    status_baixo = pdf_nativo.Celula('Abaixo da média', pdf_nativo.cor('#c62828'), True,
+                                     pdf_nativo.cor('#ffebee'))
+    status_ok = pdf_nativo.Celula('Normal', rel.VERDE, True, rel.FUNDO_CABECALHO)
+    # get_animais_com_gmd: id(0) brinco(1) sexo(2) raca(3) data_compra(4) gmd(5) dias(6) peso_final(7)
+    for i, r in enumerate(animais, 1):
+        if total and i % 500 == 0:
+            jobs.progresso(10 + 85 * i / total)
+        gmd = r[5]
+        yield [
+            r[1],
+            'Macho' if r[2] == 'M' else 'Fêmea',
+            r[4].strftime('%d/%m/%Y') if r[4] else '',
+            '—' if r[6] is None else str(r[6]),
+            '—' if r[7] is None else f"{float(r[7]):.1f}",
+            '—' if gmd is None else f"{float(gmd):.3f}",
+            status_sem if gmd is None else status_baixo if gmd < gmd_medio else status_ok,
+        ]
+
+
+def _compor_nativo(rel, config, fluxo, kpis, animais, data_geracao):
+    """O conteúdo de templates/relatorio_pdf.html, desenhado em `rel` (RelatorioTabular)."""
+    fazenda = config[0] if config and config[0] else '—'
+    local = config[1] if config and config[1] else '—'
+    rel.titulo('Relatório do Rebanho')
+    rel.paragrafo([('Fazenda: ', False), (fazenda, True),
+                   (f"  |  Localização: {local}  |  Gerado em: {data_geracao}", False)],
+                  tamanho=8.25, cor=rel.CINZA)
+    rel.regua()
+
+    rel.secao('Resumo Financeiro — Fluxo de Caixa Anual')
+    positivo, negativo = rel.VERDE, pdf_nativo.cor('#c62828')
+
+    def _fluxo():
+        for row in fluxo:
+            valores = [float(v or 0) for v in row[1:5]]
+            resultado = valores[0] - sum(valores[1:])
+            yield [str(row[0])] + [_brl(v) for v in valores] + [
+                pdf_nativo.Celula(_brl(resultado), positivo if resultado >= 0 else negativo, True)]
+
+    rel.tabela([('Ano', 1, 'esquerda'), ('Entradas (R$)', 2, 'direita'), ('Compras (R$)', 2, 'direita'),
+                ('Medicações (R$)', 2, 'direita'), ('Custos Op. (R$)', 2, 'direita'),
+                ('Resultado (R$)', 2, 'direita')],
+               _fluxo(), vazio='Nenhum dado financeiro disponível.')
+
+    rel.paragrafo([
+        ('Rebanho ativo: ', False), (str(kpis['qtd_animais']), True), (' cabeças  |  ', False),
+        ('Custo por animal/dia: ', False), (_brl(kpis['custo_diaria']), True), ('  |  ', False),
+        ('Custo por arroba produzida: ', False),
+        (_brl(kpis['custo_arroba']) if kpis['custo_arroba'] else '—', True),
+    ])
+    mercado = [('Valor do rebanho (custo de compra): ', False), (f"R$ {_brl(kpis['valor_contabil'])}", True),
+               ('  |  Valor a mercado: ', False)]
+    if kpis['valor_mercado'] is not None:
+        boi = _brl(kpis['preco_boi']) if kpis['preco_boi'] else '—'
+        novilha = _brl(kpis['preco_novilha']) if kpis['preco_novilha'] else '—'
+        data_cotacao = '/'.join(reversed(kpis['data_cotacao'].split('-')))
+        mercado += [(f"R$ {_brl(kpis['valor_mercado'])}", True),
+                    (f" (@ boi {boi}, novilha {novilha} — cotação de {data_cotacao})", False)]
+    else:
+        mercado += [('—', True), (' (sem cotação gravada)', False)]
+    rel.paragrafo(mercado)
+
+    gmd_medio = kpis['gmd_medio']
+    rel.secao('Listagem de Animais com GMD', f"(GMD médio do rebanho: {gmd_medio:.3f} kg/dia)")
+    total = kpis['qtd_animais']  # animais é um gerador: o total vem da contagem dos KPIs
+    rel.tabela([('Brinco', 3, 'esquerda'), ('Sexo', 2, 'esquerda'), ('Dt. Entrada', 2.5, 'esquerda'),
+                ('Dias em lote', 2, 'direita'), ('Peso atual (kg)', 2.5, 'direita'),
+                ('GMD (kg/dia)', 2.5, 'direita'), ('Status', 3, 'esquerda')],
+               _linhas_animais(animais, gmd_medio, total), vazio='Nenhum animal ativo no rebanho.')
+
+
+def gerar_pdf_nativo(user_id) -> bytes:
+    """PDF do relatório pelo motor nativo, direto dos repositórios (sem contexto de request)."""
+    kpis = get_kpis(user_id)
+    jobs.progresso(10)
+    saida = io.BytesIO()
+    rel = pdf_nativo.RelatorioTabular(
+        saida, titulo='Relatório do Rebanho',
+        rodape='Sistema de Gestão de Gado — relatório gerado automaticamente')
+    _compor_nativo(rel, configuracao_repository.get_configuracao(user_id),
+                   financeiro_repository.get_fluxo_caixa(user_id), kpis,
+                   animal_repository.iterar_animais_com_gmd(user_id), date.today().strftime('%d/%m/%Y'))
+    rel.fechar()
+    return saida.getvalue()
+
+
+class _Conversor:
+    """Gera os PDFs de um lote (pré-geração, envio mensal) com o motor configurado.
+
+    No Chromium, um navegador só para o lote inteiro, relançado se cair.
+    """
+
+    def __init__(self, app, motor):
+        self.app, self.motor = app, motor
+        self._playwright = self._browser = None
+
+    def __enter__(self):
+        if self.motor == MOTOR_CHROMIUM:
+            self._playwright = sync_playwright().start()
+            self._browser = self._playwright.chromium.launch()
+        return self
+
+    def pdf(self, user_id, caminho=None):
+        """PDF da fazenda; `caminho` é o HTML já renderizado (Chromium), apagado depois."""
+        if self.motor != MOTOR_CHROMIUM:
+            return gerar_pdf_nativo(user_id)
+        if caminho is None:
+            with self.app.test_request_context():
+                caminho = renderizar_html(user_id)
+        try:
+            if not self._browser.is_connected():
+                self._browser = self._playwright.chromium.launch()
+            return _pdf_de_html(self._browser, caminho)
+        finally:
+            _descartar(caminho)
+
+    def __exit__(self, *exc):
+        if self._playwright is not None:
+            try:
+                self._browser.close()
+            finally:
+                self._playwright.stop()
+
+
+def _despejar():
+    """Tira do cache os PDFs menos acessados até o total caber em MAX_BYTES."""
+    excedentes = relatorio_cache_repository.get_excedentes(MAX_BYTES)
+    if not excedentes:
+        return
+    # Índice antes do blob: um pedido concorrente nunca acha chave sem arquivo.
+    relatorio_cache_repository.apagar([chave for chave, _ in excedentes])
+    store = get_blob_store()
+    for _, blob_chave in excedentes:
+        store.apagar(blob_chave)
+
+
+def _guardar(user_id, chave, pdf, solicitado=True):
+    blob_chave = f"relatorios/{user_id}/{chave}.pdf"
+    get_blob_store().gravar(blob_chave, pdf)
+    relatorio_cache_repository.registrar(chave, user_id, blob_chave, len(pdf), solicitado)
+    _despejar()
+    return blob_chave
+
+
+def _gerar_e_guardar(user_id, chave, caminho=None):
+    pdf = gerar_pdf(caminho) if caminho is not None else gerar_pdf_nativo(user_id)
+    jobs.progresso(95 if caminho is None else 90)
+    return jobs.BlobPronto(_guardar(user_id, chave, pdf))
+
+
+def solicitar_pdf(user_id):
+    """job_id do PDF do relatório: já concluído se está em cache, senão agendado."""
+    chave = chave_relatorio(user_id)
+    blob_chave = relatorio_cache_repository.usar(chave, user_id)
+    if blob_chave and get_blob_store().existe(blob_chave):
+        return jobs.concluido('pdf', user_id, blob_chave)
+    if _motor() == MOTOR_NATIVO:
+        return jobs.executar('pdf', user_id, _gerar_e_guardar, user_id, chave)
+    caminho = renderizar_html(user_id)
+    try:
+        return jobs.executar('pdf', user_id, _gerar_e_guardar, user_id, chave, caminho)
+    except Exception:
+        _descartar(caminho)
+        raise
+
+
+def pregerar_relatorios(app):
+    """Job noturno (depois do snapshot): PDF do dia de quem usa o relatório, num só conversor."""
+    with app.app_context():
+        try:
+            usuarios = relatorio_cache_repository.get_usuarios_recentes(PREGERAR_DIAS)
+            if not usuarios:
+                return
+            gerados = 0
+            store = get_blob_store()
+            with _Conversor(app, _motor()) as conversor:
+                for user_id in usuarios:
+                    try:
+                        chave = chave_relatorio(user_id)
+                        blob_chave = relatorio_cache_repository.get_blob_chave(chave, user_id)
+                        if blob_chave and store.existe(blob_chave):
+                            continue
+                        _guardar(user_id, chave, conversor.pdf(user_id), solicitado=False)
+                        gerados += 1
+                    except Exception as e:
+                        logger.error(f"Pré-geração do relatório user_id={user_id}: {e}", exc_info=True)
+            logger.info(f"Relatórios pré-gerados: {gerados} de {len(usuarios)} fazendas")
+        except Exception as e:
+            logger.error(f"Pré-geração de relatórios: {e}", exc_info=True)
+
+
+def referencia_mensal(hoje):
+    """1º dia do mês fechado (o anterior a `hoje`)."""
+    return (hoje.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+def _preparar(app, user_id):
+    """(chave, caminho, blob_chave) da fazenda: o PDF do cache se já existe, senão o HTML.
+
+    No motor nativo não há HTML: caminho volta None e o PDF sai dos repositórios.
+    """
+    with app.test_request_context():
+        chave = chave_relatorio(user_id)
+        blob_chave = relatorio_cache_repository.get_blob_chave(chave, user_id)
+        if blob_chave and get_blob_store().existe(blob_chave):
+            return chave, None, blob_chave
+        if _motor() != MOTOR_CHROMIUM:
+            return chave, None, None
+        return chave, renderizar_html(user_id), None
+
+
+def _enviar_lote_mensal(referencia, lote, resumo):
+    """lote: [(user_id, email, nome_fazenda, blob_chave, pdf)] -> emails + registro."""
+    mes = referencia.strftime('%m/%Y')
+    try:
+        falhas = email_service.send_relatorios_mensais(
+            [(email, nome, pdf) for _, email, nome, _, pdf in lote], mes)
+    except Exception as e:
+        falhas = {i: str(e) for i in range(len(lote))}
+    registros = []
+    for i, (user_id, _, _, blob_chave, _) in enumerate(lote):
+        erro = falhas.get(i)
+        registros.append((user_id, 'erro' if erro else 'enviado', blob_chave, erro))
+        resumo['falhas' if erro else 'enviados'] += 1
+    relatorio_mensal_repository.registrar_envios(referencia, registros)
+
+
+def _lote_mensal(app, referencia):
+    """Gera e envia o mês para quem ainda não recebeu; devolve o resumo da passada."""
+    resumo = {'destinatarios': 0, 'enviados': 0, 'falhas': 0, 'do_cache': 0, 'segundos': 0.0}
+    inicio = time.monotonic()
+    destinatarios = relatorio_mensal_repository.get_destinatarios(referencia)
+    resumo['destinatarios'] = len(destinatarios)
+    if not destinatarios:
+        return resumo
+    if not email_service.configurado():
+        logger.warning("Relatório mensal: MAIL não configurado, nada enviado")
+        return resumo
+
+    store = get_blob_store()
+    pendentes = iter(destinatarios)
+    fila = deque()
+    lote = []
+    with ThreadPoolExecutor(max_workers=MENSAL_CONCORRENCIA) as pool, _Conversor(app, _motor()) as conversor:
+
+        def _encher():
+            while len(fila) < 2 * MENSAL_CONCORRENCIA:
+                destinatario = next(pendentes, None)
+                if destinatario is None:
+                    return
+                fila.append((destinatario, pool.submit(_preparar, app, destinatario[0])))
+
+        _encher()
+        while fila:
+            (user_id, email, nome), futuro = fila.popleft()
+            _encher()
+            try:
+                chave, caminho, blob_chave = futuro.result()
+                pdf = store.ler(blob_chave) if blob_chave else None
+                if pdf is not None:
+                    resumo['do_cache'] += 1
+                else:
+                    # caminho None: motor nativo, ou o PDF saiu do cache entre a checagem e a leitura.
+                    pdf = conversor.pdf(user_id, caminho)
+                    blob_chave = _guardar(user_id, chave, pdf, solicitado=False)
+            except Exception as e:
+                logger.error(f"Relatório mensal user_id={user_id}: {e}", exc_info=True)
+                relatorio_mensal_repository.registrar_envios(referencia, [(user_id, 'erro', None, str(e))])
+                resumo['falhas'] += 1
+                continue
+            lote.append((user_id, email, nome, blob_chave, pdf))
+            if len(lote) >= MENSAL_LOTE_EMAIL:
+                _enviar_lote_mensal(referencia, lote, resumo)
+                lote = []
+        if lote:
+            _enviar_lote_mensal(referencia, lote, resumo)
+    resumo['segundos'] = round(time.monotonic() - inicio, 1)
+    return resumo
+
+
+def enviar_relatorios_mensais(app):
+    """Job do dia 1º (e repescagem no dia 2): relatório do mês por email para quem optou.
+
+    GET_LOCK garante um executor só, mesmo com o scheduler em mais de uma réplica.
+    """
+    with app.app_context():
+        conn = None
+        try:
+            conn = get_db_connection()
+            if conn is None:
+                raise ConnectionError("Falha na conexão com BD")
+            cursor = conn.cursor()
+            cursor.execute("SELECT GET_LOCK('relatorio_mensal', 0)")
+            if cursor.fetchone()[0] != 1:
+                logger.info("Relatório mensal: outro processo já está enviando")
+                return
+            try:
+                referencia = referencia_mensal(date.today())
+                resumo = _lote_mensal(app, referencia)
+                logger.info(
+                    f"Relatório mensal {referencia:%m/%Y}: {resumo['enviados']} enviados, "
+                    f"{resumo['falhas']} falhas, {resumo['do_cache']} PDFs do cache, "
+                    f"{resumo['destinatarios']} pendentes no início, {resumo['segundos']}s"
+                )
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK('relatorio_mensal')")
+                cursor.fetchone()
+                cursor.close()
+        except Exception as e:
+            logger.error(f"Relatório mensal: {e}", exc_info=True)
+        finally:
+            close_db_connection(conn)
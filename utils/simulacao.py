@@ -0,0 +1,130 @@
+"""Simulação de Monte Carlo do custo da arroba produzida.
+
+O simulador determinístico usa um GMD e um custo: c_anual / qtd / 365 *
+KG_POR_ARROBA / gmd. Aqui cada cenário sorteia:
+
+- o GMD de um animal do próprio rebanho (reamostragem dos GMDs medidos);
+- o custo por cabeça/dia, normal em torno do informado (coeficiente de
+  variação cv_custo, truncado em zero);
+- o preço da arroba, normal em torno do informado (cv_preco, truncado em zero).
+
+Todos os cenários saem de uma passada vetorizada (numpy). O resultado traz os
+percentis do custo da @ e a probabilidade de o preço cobrir o custo. GMD <= 0
+não produz arroba: o cenário conta como prejuízo e fica fora dos percentis.
+
+grade_custo_arroba aplica a mesma fórmula ao produto cartesiano de faixas
+(qtd de animais, GMD e custos anuais) por broadcasting — a grade 50x50 do
+heatmap do simulador sai de uma chamada, sem laço em Python.
+"""
+import numpy as np
+
+from utils.calculo import KG_POR_ARROBA
+
+PERCENTIS = (5, 25, 50, 75, 95)
+CENARIOS_PADRAO = 100_000
+CENARIOS_MAX = 2_000_000
+
+
+def simular_custo_arroba(gmds, custo_anual, qtd_animais, preco_arroba,
+                         cenarios=CENARIOS_PADRAO, cv_custo=0.10, cv_preco=0.10, semente=None):
+    """Dict com percentis do custo da @, média e probabilidade de lucro.
+
+    gmds: GMDs (kg/dia) dos animais do rebanho; vazio = nenhum cenário produz.
+    """
+    rng = np.random.default_rng(semente)
+    amostra = np.asarray(gmds, dtype=float)
+    if amostra.size == 0:
+        amostra = np.zeros(1)
+    gmd = rng.choice(amostra, size=cenarios)
+    custo_dia = (custo_anual / qtd_animais / 365.0) * np.clip(rng.normal(1.0, cv_custo, cenarios), 0, None)
+    preco = preco_arroba * np.clip(rng.normal(1.0, cv_preco, cenarios), 0, None)
+
+    produz = gmd > 0
+    custo_arroba = np.full(cenarios, np.inf)
+    np.divide(custo_dia * KG_POR_ARROBA, gmd, out=custo_arroba, where=produz)
+    lucro = preco >= custo_arroba
+
+    validos = custo_arroba[produz]
+    if validos.size:
+        percentis = dict(zip((f"p{p}" for p in PERCENTIS),
+                             (round(float(v), 2) for v in np.percentile(validos, PERCENTIS))))
+        media = round(float(validos.mean()), 2)
+    else:
+        percentis = {f"p{p}": None for p in PERCENTIS}
+        media = None
+    return {
+        'cenarios': int(cenarios),
+        'percentis': percentis,
+        'media': media,
+        'prob_lucro': round(float(lucro.mean()), 4),
+        'prob_sem_ganho': round(float(1.0 - produz.mean()), 4),
+        'animais_amostrados': int(np.asarray(gmds).size),
+    }
+
+
+# ── Grade de sensibilidade ───────────────────────────────────────────────────
+
+PARAMETROS_GRADE = ('qtd_animais', 'gmd', 'arrendamento', 'suplementacao', 'mao_obra', 'extras')
+PASSOS_MAX = 100
+CELULAS_MAX = 250_000
+
+
+def _eixo(nome, spec):
+    """Valor fixo (número) ou faixa {'de', 'ate', 'passos'} -> array de valores."""
+    if isinstance(spec, dict):
+        try:
+            de, ate, passos = float(spec['de']), float(spec['ate']), int(spec.get('passos', 10))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"'{nome}': faixa precisa de 'de', 'ate' e 'passos' numéricos.")
+        if not 1 <= passos <= PASSOS_MAX:
+            raise ValueError(f"'{nome}': 'passos' deve estar entre 1 e {PASSOS_MAX}.")
+        valores = np.linspace(de, ate, passos)
+    else:
+        try:
+            valores = np.array([float(spec)])
+        except (TypeError, ValueError):
+            raise ValueError(f"'{nome}' deve ser um número ou uma faixa.")
+    if not np.isfinite(valores).all():
+        raise ValueError(f"'{nome}' deve ser finito.")
+    if nome == 'qtd_animais':
+        valores = np.unique(np.rint(valores))
+        if valores.min() < 1:
+            raise ValueError("'qtd_animais' deve ser ao menos 1.")
+    elif nome != 'gmd' and valores.min() < 0:
+        raise ValueError(f"'{nome}' não pode ser negativo.")
+    return valores
+
+
+def grade_custo_arroba(parametros):
+    """Custo da @ no produto cartesiano das faixas, numa chamada vetorizada.
+
+    parametros: {nome: número | {'de', 'ate', 'passos'}} para PARAMETROS_GRADE
+    (custos anuais em R$; ausente = 0, exceto qtd_animais = 1). As dimensões
+    da matriz seguem a ordem de PARAMETROS_GRADE, só com os que variam; GMD <= 0
+    vira None. Levanta ValueError com mensagem para o usuário.
+    """
+    eixos = {nome: _eixo(nome, parametros.get(nome, 1 if nome == 'qtd_animais' else 0))
+             for nome in PARAMETROS_GRADE}
+    dimensoes = [nome for nome in PARAMETROS_GRADE if eixos[nome].size > 1]
+    forma = tuple(eixos[nome].size for nome in dimensoes)
+    if int(np.prod(forma, dtype=np.int64)) > CELULAS_MAX:
+        raise ValueError(f"Grade grande demais (máximo {CELULAS_MAX:,} células).".replace(',', '.'))
+
+    def _na_dimensao(nome):
+        if nome not in dimensoes:
+            return eixos[nome][0]
+        return eixos[nome].reshape([-1 if d == nome else 1 for d in dimensoes])
+
+    custo_anual = (_na_dimensao('arrendamento') + _na_dimensao('suplementacao')
+                   + _na_dimensao('mao_obra') + _na_dimensao('extras'))
+    gmd = _na_dimensao('gmd')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        custo = custo_anual / _na_dimensao('qtd_animais') / 365.0 * KG_POR_ARROBA / gmd
+        custo = np.where(gmd > 0, custo, np.nan)
+    custo = np.broadcast_to(custo, forma)
+    return {
+        'dimensoes': dimensoes,
+        'eixos': {nome: np.round(eixos[nome], 4).tolist() for nome in dimensoes},
+        'fixos': {nome: float(eixos[nome][0]) for nome in PARAMETROS_GRADE if nome not in dimensoes},
+        'custo_arroba': np.where(np.isfinite(custo), np.round(custo, 2), None).tolist(),
+    }
@@ -0,0 +1,149 @@
+"""Retrato diário do rebanho (rebanho_snapshot_diario) para séries históricas.
+
+Reconstituir cabeças, peso, GMD e valor de uma data passada a partir de
+animais/pesagens custa caro a cada gráfico; o job noturno grava uma linha por
+fazenda e dia, e a API de séries só lê a tabela (PK user_id, data).
+
+Um animal está no rebanho no dia D se entrou até D (data_compra, ou
+data_nascimento para quem nasceu na fazenda) e não foi vendido até D
+(data_venda > D ou nula); lixeira fica de fora, arquivados entram. O peso
+do dia é a última pesagem até D; o GMD é o do animal entre a primeira e essa
+pesagem (mesma regra de _gmd_ctes), e o GMD do dia é a média dos animais com
+GMD. Valor contábil = soma de preco_compra (como get_valor_rebanho).
+
+calcular_snapshots trabalha com arrays numpy: cada dia custa O(animais +
+pesagens), sem consulta por dia — é o que permite o backfill do histórico.
+"""
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DIAS_POR_VEZ = 92
+_DIAS_BEZERRO = 365
+
+
+def calcular_snapshots(animais, pesagens, datas):
+    """Uma tupla por data de `datas` (ordem das colunas de rebanho_snapshot_diario).
+
+    animais:  [(id, sexo, data_compra, data_venda, data_nascimento, preco_compra)];
+              sem data_compra, a entrada é data_nascimento.
+    pesagens: [(animal_id, data_pesagem, peso)] — só de animais de `animais`.
+    Retorna [(data, cabecas, machos, femeas, bezerros, animais_pesados,
+              peso_total, peso_medio, gmd_medio, valor_contabil)].
+    """
+    n = len(animais)
+    indice = {a[0]: i for i, a in enumerate(animais)}
+    sem_data = np.datetime64('9999-12-31', 'D')
+    entrada = np.array([a[2] if a[2] is not None else a[4] for a in animais],
+                       dtype='datetime64[D]').reshape(n)
+    saida = np.array([a[3] if a[3] is not None else sem_data for a in animais],
+                     dtype='datetime64[D]').reshape(n)
+    nascimento = np.array([a[4] if a[4] is not None else sem_data for a in animais],
+                          dtype='datetime64[D]').reshape(n)
+    macho = np.array([a[1] == 'M' for a in animais], dtype=bool)
+    preco = np.array([float(a[5] or 0) for a in animais])
+
+    pes = [(indice[p[0]], p[1], float(p[2])) for p in pesagens if p[0] in indice]
+    p_animal = np.array([p[0] for p in pes], dtype=np.int64)
+    p_data = np.array([p[1] for p in pes], dtype='datetime64[D]').reshape(len(pes))
+    p_peso = np.array([p[2] for p in pes])
+    ordem = np.lexsort((p_data, p_animal))
+    p_animal, p_data, p_peso = p_animal[ordem], p_data[ordem], p_peso[ordem]
+    # Início do grupo de cada animal: a primeira pesagem dele.
+    inicio = np.full(n, -1, dtype=np.int64)
+    if len(pes):
+        primeiras = np.flatnonzero(np.r_[True, p_animal[1:] != p_animal[:-1]])
+        inicio[p_animal[primeiras]] = primeiras
+
+    linhas = []
+    for dia in datas:
+        d = np.datetime64(dia, 'D')
+        presente = (entrada <= d) & (saida > d)
+        cabecas = int(presente.sum())
+        machos = int((presente & macho).sum())
+        bezerros = int((presente & (nascimento != sem_data)
+                        & (d - nascimento < np.timedelta64(_DIAS_BEZERRO, 'D'))).sum())
+        valor = round(float(preco[presente].sum()), 2)
+
+        ate_dia = p_data <= d
+        qtd = np.bincount(p_animal[ate_dia], minlength=n) if len(pes) else np.zeros(n, dtype=np.int64)
+        pesado = presente & (qtd > 0)
+        ultima = np.where(pesado, inicio + qtd - 1, 0)
+        peso = np.where(pesado, p_peso[ultima] if len(pes) else 0.0, 0.0)
+        pesados = int(pesado.sum())
+        peso_total = round(float(peso.sum()), 1)
+        peso_medio = round(peso_total / pesados, 1) if pesados else None
+
+        gmd_medio = None
+        if pesados:
+            primeira = np.where(pesado, inicio, 0)
+            dias = (p_data[ultima] - p_data[primeira]).astype(np.int64)
+            com_gmd = pesado & (dias > 0)
+            if com_gmd.any():
+                gmd = (p_peso[ultima] - p_peso[primeira])[com_gmd] / dias[com_gmd]
+                gmd_medio = round(float(gmd.mean()), 3)
+
+        linhas.append((dia, cabecas, machos, cabecas - machos, bezerros, pesados,
+                       peso_total, peso_medio, gmd_medio, valor))
+    return linhas
+
+
+def _dias(inicio, fim):
+    return [inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)]
+
+
+def _gravar_bloco(cursor, user_id, ate):
+    from repositories import snapshot_repository
+
+    desde = snapshot_repository.get_proximo_dia(cursor, user_id)
+    if desde is None or desde > ate:
+        return 0
+    fim = min(desde + timedelta(days=DIAS_POR_VEZ - 1), ate)
+    animais, pesagens = snapshot_repository.get_dados_rebanho(cursor, user_id, desde, fim)
+    linhas = calcular_snapshots(animais, pesagens, _dias(desde, fim))
+    snapshot_repository.gravar_snapshots(cursor, user_id, linhas)
+    return len(linhas)
+
+
+def atualizar_snapshots(user_id, ate=None, cursor=None):
+    """Grava os dias que faltam do tenant até `ate` (ontem), em blocos de DIAS_POR_VEZ.
+
+    Sem nenhum snapshot, começa na primeira entrada — é o backfill. Sem
+    `cursor`, cada bloco é uma transação. Retorna quantos dias foram gravados.
+    """
+    from db_config import get_db_cursor
+
+    ate = ate or date.today() - timedelta(days=1)
+    gravados = 0
+    while True:
+        if cursor is not None:
+            n = _gravar_bloco(cursor, user_id, ate)
+        else:
+            with get_db_cursor() as c:
+                n = _gravar_bloco(c, user_id, ate)
+        if not n:
+            return gravados
+        gravados += n
+
+
+def gravar_snapshot_diario(app):
+    """Job noturno: retrato de ontem de cada fazenda (e dias perdidos, se houver).
+
+    Em seguida deixa pronto o PDF do relatório do dia (utils.relatorio).
+    """
+    with app.app_context():
+        try:
+            from repositories.snapshot_repository import get_usuarios_com_animais
+            usuarios = get_usuarios_com_animais()
+            total = 0
+            for user_id in usuarios:
+                total += atualizar_snapshots(user_id)
+            logger.info(f"Snapshot do rebanho: {total} dias gravados em {len(usuarios)} fazendas")
+        except Exception as e:
+            logger.error(f"Snapshot do rebanho: {e}", exc_info=True)
+
+    from utils.relatorio import pregerar_relatorios
+    pregerar_relatorios(app)
@@ -0,0 +1,53 @@
+"""HTML em streaming para páginas e relatórios grandes.
+
+stream_template gera o HTML à medida que o template itera as linhas, e as
+linhas vêm de geradores sobre fetchmany (db_config.iterar_consulta, as
+funções iterar_* dos repositórios), não de listas. A memória não cresce com
+o rebanho e o navegador recebe o <head> antes de a consulta terminar.
+
+Uma página entra com stream_pagina no lugar de render_template e um
+iterar_* no lugar do get_*. O template precisa iterar as linhas uma vez só
+({% for %} com {% else %} para o vazio; nada de |length ou {% if linhas %}).
+
+O que muda em relação a render_template:
+  * a sessão é gravada antes do primeiro byte — flashes e token CSRF são
+    resolvidos aqui, e o template os lê do cache da request;
+  * status e headers saem antes do corpo: um erro no meio só vai para o log
+    e corta a resposta;
+  * a conexão do iterar_* (própria, fora do pool) fica aberta até o fim do
+    envio.
+"""
+from flask import Response, get_flashed_messages, stream_template
+from flask_wtf.csrf import generate_csrf
+
+TAMANHO_BLOCO = 16 * 1024
+
+
+def em_blocos(pedacos, tamanho=TAMANHO_BLOCO):
+    """Junta os pedaços pequenos do Jinja em blocos de ~`tamanho` caracteres.
+
+    O primeiro bloco sai assim que completa — é o <head>, e o navegador já
+    começa a buscar CSS e JS.
+    """
+    buffer, acumulado = [], 0
+    try:
+        for pedaco in pedacos:
+            buffer.append(pedaco)
+            acumulado += len(pedaco)
+            if acumulado >= tamanho:
+                yield ''.join(buffer)
+                buffer, acumulado = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        # Resposta abortada: fecha o gerador de baixo, que fecha a conexão.
+        if hasattr(pedacos, 'close'):
+            pedacos.close()
+
+
+def stream_pagina(template, status=200, **contexto):
+    """Response com `template` renderizado em streaming (ver docstring do módulo)."""
+    get_flashed_messages()
+    generate_csrf()
+    return Response(em_blocos(stream_template(template, **contexto)), status=status,
+                    mimetype='text/html')
@@ -0,0 +1,94 @@
+"""Sugestão de venda em lote: quais animais vender para uma meta de cabeças ou carga.
+
+Cada candidato tem o peso projetado para a data da venda (último peso +
+GMD x dias desde a pesagem; GMD negativo ou desconhecido não projeta) e a
+margem = receita pela arroba - (preço de compra + custo operacional acumulado
+no razão custo_animal). Só entram animais de margem positiva.
+
+A escolha é gulosa sobre arrays numpy: sem limite de peso, as maiores margens
+até a meta de cabeças; com limite de peso (capacidade do caminhão), ordem por
+margem/kg — o prefixo que cabe sai de um cumsum e as sobras são completadas
+com os que ainda cabem. É a heurística clássica da mochila; com animais de
+pesos parecidos fica rente ao ótimo e roda em milissegundos para 20 mil cabeças.
+"""
+from datetime import date
+
+import numpy as np
+
+from utils.calculo import KG_POR_ARROBA
+
+
+def projetar_pesos(pesos, ultimas_datas, gmds, data_venda):
+    """Peso (kg) na data da venda; datas como date, GMD None = sem projeção."""
+    pesos = np.asarray(pesos, dtype=float)
+    if not pesos.size:
+        return pesos
+    datas = np.array(ultimas_datas, dtype='datetime64[D]')
+    dias = np.clip((np.datetime64(data_venda, 'D') - datas).astype(np.int64), 0, None)
+    gmd = np.array([g if g is not None else 0.0 for g in gmds], dtype=float)
+    return pesos + np.clip(gmd, 0, None) * dias
+
+
+def margens_venda(pesos, custos, preco_arroba):
+    """(receitas, margens) por animal ao preço da arroba informado."""
+    receitas = np.asarray(pesos, dtype=float) / KG_POR_ARROBA * preco_arroba
+    return receitas, receitas - np.asarray(custos, dtype=float)
+
+
+def selecionar_venda(pesos, margens, max_cabecas=None, max_peso=None):
+    """Índices escolhidos (na ordem de prioridade) respeitando as metas."""
+    pesos = np.asarray(pesos, dtype=float)
+    margens = np.asarray(margens, dtype=float)
+    candidatos = np.flatnonzero((margens > 0) & (pesos > 0))
+    if max_peso is None:
+        ordem = candidatos[np.argsort(-margens[candidatos], kind='stable')]
+        return ordem[:max_cabecas] if max_cabecas is not None else ordem
+
+    ordem = candidatos[np.argsort(-(margens[candidatos] / pesos[candidatos]), kind='stable')]
+    cabe = np.cumsum(pesos[ordem]) <= max_peso
+    k = int(np.argmin(cabe)) if not cabe.all() else ordem.size
+    if max_cabecas is not None:
+        k = min(k, max_cabecas)
+    escolhidos = list(ordem[:k])
+    restante = max_peso - float(pesos[ordem[:k]].sum())
+    for i in ordem[k:]:
+        if max_cabecas is not None and len(escolhidos) >= max_cabecas:
+            break
+        if pesos[i] <= restante:
+            escolhidos.append(i)
+            restante -= pesos[i]
+    return np.array(escolhidos, dtype=np.int64)
+
+
+def sugerir_venda(candidatos, data_venda, preco_arroba, max_cabecas=None, max_peso=None,
+                  peso_minimo=None):
+    """Dict com os animais sugeridos e os totais.
+
+    candidatos: tuplas de animal_repository.get_candidatos_venda
+    (id, brinco, ultimo_peso, ultima_data, gmd, preco_compra, custo_operacional).
+    """
+    if not isinstance(data_venda, date):
+        data_venda = date.fromisoformat(str(data_venda)[:10])
+    vazio = {'animais': [], 'cabecas': 0, 'peso_total': 0.0, 'receita': 0.0, 'margem': 0.0}
+    if not candidatos:
+        return vazio
+    ids, brincos, ultimos, datas, gmds, compras, operacionais = zip(*candidatos)
+    pesos = projetar_pesos([float(p) for p in ultimos], datas,
+                           [float(g) if g is not None else None for g in gmds], data_venda)
+    custos = (np.array([float(c or 0) for c in compras])
+              + np.array([float(c or 0) for c in operacionais]))
+    receitas, margens = margens_venda(pesos, custos, preco_arroba)
+    if peso_minimo:
+        margens = np.where(pesos >= peso_minimo, margens, -np.inf)
+    escolhidos = selecionar_venda(pesos, margens, max_cabecas, max_peso)
+    if not escolhidos.size:
+        return vazio
+    return {
+        'animais': [{'id': ids[i], 'brinco': brincos[i], 'peso': round(float(pesos[i]), 1),
+                     'receita': round(float(receitas[i]), 2), 'margem': round(float(margens[i]), 2)}
+                    for i in escolhidos],
+        'cabecas': int(escolhidos.size),
+        'peso_total': round(float(pesos[escolhidos].sum()), 1),
+        'receita': round(float(receitas[escolhidos].sum()), 2),
+        'margem': round(float(margens[escolhidos].sum()), 2),
+    }